@@ -244,16 +244,31 @@ class NNConfig(ConfigBase):
         # number of annots before a new multi-indexer is built
         # nn_cfg.max_subindexers = 2
         # nn_cfg.valid_index_methods = ['single', 'multi', 'name']
-        nn_cfg.valid_index_methods = ['single']
+        nn_cfg.valid_index_methods = ['single', 'sharded']
+        # How the sharded index splits the database (featcount, species, name)
+        nn_cfg.shard_method = 'featcount'
+        nn_cfg.valid_shard_methods = ['featcount', 'species', 'name']
+        # Maximum number of descriptors per shard for featcount
+        nn_cfg.shard_max_vecs = 2 ** 24
+        # Number of shards for name
+        nn_cfg.num_shards = 4
+        # Threads used to query the shards (None means one per shard)
+        nn_cfg.shard_workers = None
+        # Stack the query vectors of a chunk into a single knn call
+        nn_cfg.batch_knn = False
         nn_cfg.update(**kwargs)
 
     def make_feasible(nn_cfg):
         # normalizer rule depends on Knorm
         assert nn_cfg.index_method in nn_cfg.valid_index_methods
+        assert nn_cfg.shard_method in nn_cfg.valid_shard_methods
 
     def get_param_info_list(nn_cfg):
         # new way to try and specify config options.
         # not sure if i like it yet
+        def _not_sharded(cfg):
+            return cfg.index_method != 'sharded'
+
         param_info_list = ut.flatten(
             [
                 [
@@ -266,6 +281,17 @@ class NNConfig(ConfigBase):
                     ut.ParamInfo('checks', 800, 'cks', type_=int),
                     # ut.ParamInfo('ratio_thresh', None, type_=float, hideif=None),
                 ],
+                [
+                    ut.ParamInfo(
+                        'shard_method', 'featcount', 'shard=', hideif=_not_sharded
+                    ),
+                    ut.ParamInfo(
+                        'shard_max_vecs', 2 ** 24, 'maxv=', type_=int, hideif=_not_sharded
+                    ),
+                    ut.ParamInfo(
+                        'num_shards', 4, 'nshards=', type_=int, hideif=_not_sharded
+                    ),
+                ],
             ]
         )
         return param_info_list
@@ -298,8 +324,21 @@ class SpatialVerifyConfig(ConfigBase):
         sv_cfg.refine_method = 'homog'
         # weight feature scores with sver errors
         sv_cfg.weight_inliers = True
+        # pairwise uses vtool per pair, batch scores the whole shortlist at once
+        sv_cfg.sv_method = 'pairwise'
+        sv_cfg.valid_sv_methods = ['pairwise', 'batch']
+        # execution of the shortlist (serial, thread, or process). These do
+        # not change the results and are not part of the cfgstr.
+        sv_cfg.sv_executor = 'serial'
+        sv_cfg.sv_workers = None
+        sv_cfg.sv_chunksize = 4
+        sv_cfg.valid_sv_executors = ['serial', 'thread', 'process']
         sv_cfg.update(**kwargs)
 
+    def make_feasible(sv_cfg):
+        assert sv_cfg.sv_method in sv_cfg.valid_sv_methods
+        assert sv_cfg.sv_executor in sv_cfg.valid_sv_executors
+
     def get_cfgstr_list(sv_cfg, **kwargs):
         if not sv_cfg.sv_on or sv_cfg.xy_thresh is None:
             return ['_SV(OFF)']
@@ -322,6 +361,9 @@ class SpatialVerifyConfig(ConfigBase):
         if sv_cfg.refine_method != 'homog':
             sv_cfgstr += [sv_cfg.refine_method]
 
+        if sv_cfg.sv_method != 'pairwise':
+            sv_cfgstr += [',' + sv_cfg.sv_method]
+
         sv_cfgstr += [
             ')',
         ]
@@ -381,6 +423,17 @@ class FlannConfig(ConfigBase):
         # General Params
         flann_cfg.algorithm = 'kdtree'  # linear
         flann_cfg.flann_cores = 0  # doesnt change config, just speed
+        # Search engine (flann or brute). brute is exact and ignores the
+        # flann structure params below
+        flann_cfg.nn_backend = 'flann'
+        flann_cfg.valid_nn_backends = ['flann', 'brute']
+        # Keep the indexed descriptors in memory mappable .npy files so
+        # processes on one host share them (doesnt change config)
+        flann_cfg.mmap_support = False
+        # Add new annotations to a small delta index which is merged into the
+        # main index in the background once it has delta_compact_thresh vecs
+        flann_cfg.nn_incremental = False
+        flann_cfg.delta_compact_thresh = 50000
         # KDTree params
         flann_cfg.trees = 8
         # KMeansTree params
@@ -399,12 +452,21 @@ class FlannConfig(ConfigBase):
             algorithm=flann_cfg.algorithm,
             trees=flann_cfg.trees,
             cores=flann_cfg.flann_cores,
+            backend=flann_cfg.nn_backend,
+            mmap_support=flann_cfg.mmap_support,
+            incremental=flann_cfg.nn_incremental,
+            delta_compact_thresh=flann_cfg.delta_compact_thresh,
         )
         return flann_params
 
+    def make_feasible(flann_cfg):
+        assert flann_cfg.nn_backend in flann_cfg.valid_nn_backends
+
     def get_cfgstr_list(flann_cfg, **kwargs):
         flann_cfgstrs = ['_FLANN(']
-        if flann_cfg.algorithm == 'kdtree':
+        if flann_cfg.nn_backend == 'brute':
+            flann_cfgstrs += ['brute']
+        elif flann_cfg.algorithm == 'kdtree':
             flann_cfgstrs += ['%d_kdtrees' % flann_cfg.trees]
         elif flann_cfg.algorithm == 'kdtree':
             flann_cfgstrs += [
@@ -725,6 +787,8 @@ class QueryConfig(ConfigBase):
             nnweight_cfg.fg_on = False
 
         nn_cfg.make_feasible()
+        query_cfg.sv_cfg.make_feasible()
+        query_cfg.flann_cfg.make_feasible()
 
     def deepcopy(query_cfg, **kwargs):
         copy_ = copy.deepcopy(query_cfg)
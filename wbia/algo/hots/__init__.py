@@ -10,12 +10,14 @@ from wbia.algo.hots import match_chips4
 from wbia.algo.hots import name_scoring
 from wbia.algo.hots import neighbor_index
 from wbia.algo.hots import neighbor_index_cache
+from wbia.algo.hots import nn_backends
 from wbia.algo.hots import nn_weights
 from wbia.algo.hots import old_chip_match
 from wbia.algo.hots import pipeline
 from wbia.algo.hots import query_params
 from wbia.algo.hots import query_request
 from wbia.algo.hots import scoring
+from wbia.algo.hots import sver_batch
 import utool
 
 print, rrr, profile = utool.inject2(__name__, '[wbia.algo.hots]')
@@ -86,12 +88,14 @@ def reload_subs(verbose=True):
     get_rrr(name_scoring)(verbose=verbose)
     get_rrr(neighbor_index)(verbose=verbose)
     get_rrr(neighbor_index_cache)(verbose=verbose)
+    get_rrr(nn_backends)(verbose=verbose)
     get_rrr(nn_weights)(verbose=verbose)
     get_rrr(old_chip_match)(verbose=verbose)
     get_rrr(pipeline)(verbose=verbose)
     get_rrr(query_params)(verbose=verbose)
     get_rrr(query_request)(verbose=verbose)
     get_rrr(scoring)(verbose=verbose)
+    get_rrr(sver_batch)(verbose=verbose)
     rrr(verbose=verbose)
     try:
         # hackish way of propogating up the new reloaded submodule attributes
@@ -111,12 +115,14 @@ IMPORT_TUPLES = [
     ('name_scoring', None),
     ('neighbor_index', None),
     ('neighbor_index_cache', None),
+    ('nn_backends', None),
     ('nn_weights', None),
     ('old_chip_match', None),
     ('pipeline', None),
     ('query_params', None),
     ('query_request', None),
     ('scoring', None),
+    ('sver_batch', None),
 ]
 """
 Regen Command:
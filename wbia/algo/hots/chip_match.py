@@ -4,6 +4,8 @@ python -m utool.util_inspect check_module_usage --pat="chip_match.py"
 """
 import logging
 import copy
+import io
+import threading
 import numpy as np
 import utool as ut
 import vtool as vt
@@ -15,6 +17,7 @@ from wbia.algo.hots import old_chip_match
 from wbia.algo.hots import scoring
 from wbia.algo.hots import name_scoring
 from wbia.algo.hots import _pipeline_helpers as plh  # NOQA
+from six.moves import cPickle as pickle
 
 print, rrr, profile = ut.inject2(__name__)
 logger = logging.getLogger('wbia')
@@ -31,6 +34,14 @@ DEBUG_CHIPMATCH = False
 MAX_FNAME_LEN = 80 if ut.WIN32 else 200
 TRUNCATE_UUIDS = ut.get_argflag(('--truncate-uuids', '--trunc-uuids'))
 
+# Write qcache files as pickles instead of the columnar format
+PICKLE_QCACHE = ut.get_argflag('--pickle-qcache')
+# Version of the columnar qcache format
+COLUMNAR_VERSION = 1
+_ZIP_MAGIC = b'PK\x03\x04'
+# Serializes the decoding of lazily loaded qcache columns
+_LAZY_LOAD_LOCK = threading.Lock()
+
 
 def safeop(op_, xs, *args, **kwargs):
     return None if xs is None else op_(xs, *args, **kwargs)
@@ -926,16 +937,157 @@ class _ChipMatchScorers(object):
         )
 
 
+def _pack_ragged(key, arr_list, columns):
+    """
+    Stores a list of arrays (or Nones) as one concatenated array plus row
+    offsets.  Returns False if the arrays can not be concatenated.
+    """
+    isnone = np.array([arr is None for arr in arr_list], dtype=np.bool_)
+    arr_list_ = [np.asarray(arr) for arr in arr_list if arr is not None]
+    lens = [arr.shape[0] if arr.ndim > 0 else -1 for arr in arr_list_]
+    if any(len_ < 0 for len_ in lens):
+        return False
+    if len(arr_list_) == 0:
+        data = np.empty(0)
+    else:
+        if len(set(arr.shape[1:] for arr in arr_list_)) > 1:
+            return False
+        data = np.concatenate(arr_list_, axis=0)
+    if data.dtype == object:
+        return False
+    offsets = np.zeros(len(arr_list), dtype=np.int64)
+    offsets[~isnone] = lens
+    columns[key + '.data'] = data
+    columns[key + '.offsets'] = np.cumsum(np.hstack([[0], offsets]))
+    columns[key + '.isnone'] = isnone
+    return True
+
+
+def _unpack_ragged(key, npz):
+    data = npz[key + '.data']
+    offsets = npz[key + '.offsets']
+    isnone = npz[key + '.isnone']
+    arr_list = [
+        None if flag else data[start:stop]
+        for start, stop, flag in zip(offsets[:-1], offsets[1:], isnone)
+    ]
+    return arr_list
+
+
 class MatchBaseIO(object):
     """"""
 
+    # Per-daid lists written as concatenated arrays and loaded lazily
+    _ragged_attrs = ['fm_list', 'fsv_list', 'fk_list', 'fs_list', 'H_list']
+    # Lists (per score column) of per-daid lists, also loaded lazily
+    _nested_ragged_attrs = ['filtnorm_aids', 'filtnorm_fxs']
+
     @classmethod
     def load_from_fpath(cls, fpath, verbose=ut.VERBOSE):
-        state_dict = ut.load_cPkl(fpath, verbose=verbose)
         self = cls()
+        state_dict = self._load_state(fpath, verbose=verbose)
         self.__setstate__(state_dict)
         return self
 
+    def _load_state(cm, fpath, verbose=ut.VERBOSE):
+        """
+        Reads a pickled or columnar qcache file.  For columnar files the
+        per-daid lists are left out of the returned state and decoded on
+        first access.
+        """
+        with open(fpath, 'rb') as file_:
+            magic = file_.read(len(_ZIP_MAGIC))
+            buf = magic + file_.read() if magic == _ZIP_MAGIC else None
+        if buf is None:
+            return ut.load_cPkl(fpath, verbose=verbose)
+        with np.load(io.BytesIO(buf), allow_pickle=False) as npz:
+            rest = pickle.loads(npz['__rest__'].tobytes())
+            state_dict = rest['state']
+            for key in rest['arrays']:
+                state_dict[key] = npz[key]
+        lazy_attrs = rest['ragged'] + list(rest['nested'].keys())
+        # The constructor defaults must not shadow the lazy attributes
+        for key in lazy_attrs:
+            cm.__dict__.pop(key, None)
+        state_dict['_lazy_buffer'] = buf
+        state_dict['_lazy_attrs'] = lazy_attrs
+        if verbose:
+            logger.info('[cm] loaded columns %s' % (ut.tail(fpath),))
+        return state_dict
+
+    def _load_lazy_attrs(cm):
+        """ Decodes the per-daid lists of a columnar qcache file """
+        with _LAZY_LOAD_LOCK:
+            buf = cm.__dict__.pop('_lazy_buffer', None)
+            if buf is None:
+                # Already decoded by another thread
+                return
+            with np.load(io.BytesIO(buf), allow_pickle=False) as npz:
+                rest = pickle.loads(npz['__rest__'].tobytes())
+                # Attributes assigned since the load are newer than the file
+                for key in rest['ragged']:
+                    if key not in cm.__dict__:
+                        cm.__dict__[key] = _unpack_ragged(key, npz)
+                for key, subkeys in rest['nested'].items():
+                    if key not in cm.__dict__:
+                        cm.__dict__[key] = [
+                            None if subkey is None else _unpack_ragged(subkey, npz)
+                            for subkey in subkeys
+                        ]
+            cm.__dict__.pop('_lazy_attrs', None)
+
+    def __getattr__(cm, name):
+        # Only called when normal lookup fails, i.e. for lazy attributes
+        lazy_attrs = cm.__dict__.get('_lazy_attrs', None)
+        if lazy_attrs is None or name not in lazy_attrs:
+            raise AttributeError(name)
+        cm._load_lazy_attrs()
+        return cm.__dict__[name]
+
+    def _save_columnar(cm, fpath):
+        state_dict = dict(cm.__getstate__())
+        columns = {}
+        arrays = []
+        ragged = []
+        nested = {}
+        for key in cm._ragged_attrs:
+            arr_list = state_dict.get(key, None)
+            if isinstance(arr_list, list) and _pack_ragged(key, arr_list, columns):
+                ragged.append(key)
+                del state_dict[key]
+        for key in cm._nested_ragged_attrs:
+            sublists = state_dict.get(key, None)
+            if not isinstance(sublists, list):
+                continue
+            subkeys = ['%s.%d' % (key, index) for index in range(len(sublists))]
+            subkeys = [
+                None if arr_list is None else subkey
+                for subkey, arr_list in zip(subkeys, sublists)
+            ]
+            packed = [
+                subkey is None or _pack_ragged(subkey, arr_list, columns)
+                for subkey, arr_list in zip(subkeys, sublists)
+            ]
+            if all(packed):
+                nested[key] = subkeys
+                del state_dict[key]
+        for key, value in list(state_dict.items()):
+            if isinstance(value, np.ndarray) and value.dtype != object:
+                columns[key] = value
+                arrays.append(key)
+                del state_dict[key]
+        rest = {
+            'version': COLUMNAR_VERSION,
+            'state': state_dict,
+            'arrays': arrays,
+            'ragged': ragged,
+            'nested': nested,
+        }
+        rest_bytes = pickle.dumps(rest, protocol=pickle.HIGHEST_PROTOCOL)
+        columns['__rest__'] = np.frombuffer(rest_bytes, dtype=np.uint8)
+        with open(fpath, 'wb') as file_:
+            np.savez(file_, **columns)
+
     def save_to_fpath(cm, fpath, verbose=ut.VERBOSE):
         """
         CommandLine:
@@ -959,9 +1111,14 @@ class MatchBaseIO(object):
             >>> ut.show_if_requested()
         """
         # ut.save_data(fpath, cm.__getstate__(), verbose=verbose)
-        ut.save_cPkl(fpath, cm.__getstate__(), verbose=verbose)
+        if PICKLE_QCACHE:
+            ut.save_cPkl(fpath, cm.__getstate__(), verbose=verbose)
+        else:
+            cm._save_columnar(fpath)
 
     def __getstate__(cm):
+        if '_lazy_attrs' in cm.__dict__:
+            cm._load_lazy_attrs()
         state_dict = cm.__dict__
         return state_dict
 
@@ -1893,7 +2050,7 @@ class _ChipMatchDebugger(object):
             'cm.daid2_idx',
         ]
         attrs_ = [attr.replace('cm.', '') for attr in attr_order]
-        unspecified_attrs = sorted(set(cm.__dict__.keys()) - set(attrs_))
+        unspecified_attrs = sorted(set(cm.__getstate__().keys()) - set(attrs_))
 
         append('ChipMatch:')
         for attr in attr_order:
@@ -2880,7 +3037,7 @@ class ChipMatch(
             >>> # result = ('json_str = \n%s' % (str(json_str),))
             >>> # print(result)
         """
-        data = cm.__dict__.copy()
+        data = cm.__getstate__().copy()
         # can't encode dictionaries with integer keys
         # this means you need to rebuild indexes on reconstruction
         ut.delete_dict_keys(data, ['daid2_idx', 'nid2_nidx'])
@@ -2911,11 +3068,36 @@ class ChipMatch(
 
     @classmethod
     def load_from_fpath(ChipMatch, fpath, verbose=None):
+        r"""
+        Loads a pickled or columnar qcache file.  Columnar files only decode
+        the per-daid feature match lists when one of them is first used.
+
+        Example:
+            >>> # ENABLE_DOCTEST
+            >>> from wbia.algo.hots.chip_match import *  # NOQA
+            >>> fm_list = [np.array([[0, 1], [2, 3]]), np.empty((0, 2), dtype=np.int64)]
+            >>> fsv_list = [np.array([[.5], [.25]]), np.empty((0, 1))]
+            >>> cm = ChipMatch(qaid=1, daid_list=[2, 3], fm_list=fm_list,
+            >>>                fsv_list=fsv_list, score_list=[.75, 0.],
+            >>>                fsv_col_lbls=['lnbnn'], filtnorm_aids=[None],
+            >>>                filtnorm_fxs=[None])
+            >>> dpath = ut.ensure_app_resource_dir('wbia', 'test_chipmatch')
+            >>> fpath = join(dpath, 'tmp_chipmatch.cPkl')
+            >>> cm.save_to_fpath(fpath)
+            >>> cm2 = ChipMatch.load_from_fpath(fpath)
+            >>> assert 'fm_list' not in cm2.__dict__
+            >>> print(cm2.score_list)
+            [0.75 0.  ]
+            >>> assert cm2 == cm
+            >>> assert 'fm_list' in cm2.__dict__
+        """
         # state_dict = ut.load_data(fpath, verbose=verbose)
-        state_dict = ut.load_cPkl(fpath, verbose=verbose)
-        if 'filtnorm_aids' not in state_dict:
-            raise NeedRecomputeError('old version of chipmatch')
         cm = ChipMatch()
+        state_dict = cm._load_state(fpath, verbose=verbose)
+        if 'filtnorm_aids' not in state_dict and 'filtnorm_aids' not in state_dict.get(
+            '_lazy_attrs', []
+        ):
+            raise NeedRecomputeError('old version of chipmatch')
         cm.__setstate__(state_dict)
         return cm
 
@@ -129,6 +129,73 @@ def submit_query_request(
     return cm_list
 
 
+def submit_query_request_iter(
+    qreq_, use_cache=None, verbose=None, save_qcache=None, use_supercache=None
+):
+    """
+    Called from qreq_.execute_iter
+
+    Streaming version of submit_query_request.  Cached chip matches are
+    yielded first and the remaining queries are then computed and yielded
+    chunk by chunk, so the caller never has to hold every result.  The big
+    cache is not used because it stores all results of a request together.
+
+    Yields:
+        ChipMatch: one chip match per query, not in the order of qreq_.qaids
+
+    Example:
+        >>> # SLOW_DOCTEST
+        >>> # xdoctest: +SKIP
+        >>> from wbia.algo.hots.match_chips4 import *  # NOQA
+        >>> import wbia
+        >>> ibs = wbia.opendb(db='testdb1')
+        >>> qreq_ = ibs.new_query_request([1, 2, 3], [1, 2, 3, 4, 5])
+        >>> cm_list = list(submit_query_request_iter(qreq_, use_cache=False))
+        >>> assert sorted([cm.qaid for cm in cm_list]) == [1, 2, 3]
+    """
+    if verbose is None:
+        verbose = pipeline.VERB_PIPELINE
+    if use_cache is None:
+        use_cache = USE_CACHE
+    if save_qcache is None:
+        save_qcache = SAVE_CACHE
+    if use_supercache is None:
+        use_supercache = USE_SUPERCACHE
+    assert qreq_ is not None, 'query request must be prebuilt'
+    if len(qreq_.daids) == 0 or len(qreq_.qaids) == 0:
+        logger.info('[mc4] impossible query request, nothing to yield')
+        return
+
+    cachehit_qaids = []
+    if use_cache:
+        external_qaids = qreq_.qaids
+        fpath_list = qreq_.get_chipmatch_fpaths(
+            external_qaids, super_qres_cache=use_supercache
+        )
+        for qaid, fpath in zip(external_qaids, fpath_list):
+            if not exists(fpath):
+                continue
+            try:
+                cm = chip_match.ChipMatch.load_from_fpath(fpath, verbose=False)
+            except chip_match.NeedRecomputeError:
+                continue
+            cachehit_qaids.append(qaid)
+            yield cm
+        if verbose:
+            logger.info(
+                '[mc4] %d/%d cm cache hits' % (len(cachehit_qaids), len(external_qaids))
+            )
+    if len(cachehit_qaids) == len(qreq_.qaids):
+        return
+    # mask queries that have already been yielded
+    qreq_.set_external_qaid_mask(cachehit_qaids)
+    try:
+        for cm in execute_query2_iter(qreq_, verbose, save_qcache, None, use_supercache):
+            yield cm
+    finally:
+        qreq_.set_external_qaid_mask(None)  # undo state changes
+
+
 @profile
 def execute_query_and_save_L1(
     qreq_,
@@ -324,6 +391,19 @@ def execute_query2(qreq_, verbose, save_qcache, batch_size=None, use_supercache=
     Breaks up query request into several subrequests
     to process "more efficiently" and safer as well.
     """
+    cm_iter = execute_query2_iter(qreq_, verbose, save_qcache, batch_size, use_supercache)
+    qaid2_cm = {cm.qaid: cm for cm in cm_iter}
+    return qaid2_cm
+
+
+def execute_query2_iter(
+    qreq_, verbose, save_qcache, batch_size=None, use_supercache=False
+):
+    """
+    Generator version of execute_query2.  Yields the chip matches of each
+    chunk of ``hots_batch_size`` queries as soon as the chunk is done (and
+    saved to the qcache if ``save_qcache`` is True).
+    """
     if qreq_.prog_hook is not None:
         preload_hook, query_hook = qreq_.prog_hook.subdivide(spacing=[0, 0.15, 0.8])
         preload_hook(0, lbl='preloading')
@@ -335,7 +415,6 @@ def execute_query2(qreq_, verbose, save_qcache, batch_size=None, use_supercache=
 
     all_qaids = qreq_.qaids
     logger.info('len(missed_qaids) = %r' % (len(all_qaids),))
-    qaid2_cm = {}
     # vsone must have a chunksize of 1
     if batch_size is None:
         if HOTS_BATCH_SIZE is None:
@@ -358,34 +437,36 @@ def execute_query2(qreq_, verbose, save_qcache, batch_size=None, use_supercache=
         label='[mc4] query chunk: ',
         prog_hook=qreq_.prog_hook,
     )
-    for sub_qreq_ in sub_qreq_iter:
-        if ut.VERBOSE:
-            logger.info('Generating vsmany chunk')
-        sub_cm_list = pipeline.request_wbia_query_L0(
-            qreq_.ibs, sub_qreq_, verbose=verbose
-        )
-        assert len(sub_qreq_.qaids) == len(sub_cm_list), 'not aligned'
-        assert all(
-            [qaid == cm.qaid for qaid, cm in zip(sub_qreq_.qaids, sub_cm_list)]
-        ), 'not corresonding'
-        if save_qcache:
-            fpath_list = list(
-                qreq_.get_chipmatch_fpaths(
-                    sub_qreq_.qaids, super_qres_cache=use_supercache
-                )
-            )
-            _iter = zip(sub_cm_list, fpath_list)
-            _iter = ut.ProgIter(
-                _iter,
-                length=len(sub_cm_list),
-                label='saving chip matches',
-                adjust=True,
-                freq=1,
-            )
-            for cm, fpath in _iter:
-                cm.save_to_fpath(fpath, verbose=False)
-        else:
+    # The query chunks share one pool of spatial verification workers
+    with pipeline.sver_executor_context(qreq_):
+        for sub_qreq_ in sub_qreq_iter:
             if ut.VERBOSE:
-                logger.info('[mc4] not saving vsmany chunk')
-        qaid2_cm.update({cm.qaid: cm for cm in sub_cm_list})
-    return qaid2_cm
+                logger.info('Generating vsmany chunk')
+            sub_cm_list = pipeline.request_wbia_query_L0(
+                qreq_.ibs, sub_qreq_, verbose=verbose
+            )
+            assert len(sub_qreq_.qaids) == len(sub_cm_list), 'not aligned'
+            assert all(
+                [qaid == cm.qaid for qaid, cm in zip(sub_qreq_.qaids, sub_cm_list)]
+            ), 'not corresonding'
+            if save_qcache:
+                fpath_list = list(
+                    qreq_.get_chipmatch_fpaths(
+                        sub_qreq_.qaids, super_qres_cache=use_supercache
+                    )
+                )
+                _iter = zip(sub_cm_list, fpath_list)
+                _iter = ut.ProgIter(
+                    _iter,
+                    length=len(sub_cm_list),
+                    label='saving chip matches',
+                    adjust=True,
+                    freq=1,
+                )
+                for cm, fpath in _iter:
+                    cm.save_to_fpath(fpath, verbose=False)
+            else:
+                if ut.VERBOSE:
+                    logger.info('[mc4] not saving vsmany chunk')
+            for cm in sub_cm_list:
+                yield cm
@@ -173,6 +173,184 @@ def compute_fmech_score(cm, qreq_=None, hack_single_ori=False):
     return nsum_score_list
 
 
+def _flatten_name_matches(cm_list, qreq_=None, hack_single_ori=False):
+    """
+    Flattens the feature matches of a list of chip matches into aligned
+    arrays so all names of all queries can be scored at once.
+
+    Returns:
+        tuple: (fs, name_ids, combo_ids, match_offsets, name_offsets) where
+            name_ids index the concatenated names of all chip matches.
+    """
+    if hack_single_ori:
+        # Features with the same xy-coordinate share one combo id
+        qaid_list = [cm.qaid for cm in cm_list]
+        kpts1_list = qreq_.ibs.get_annot_kpts(
+            qaid_list, config2_=qreq_.extern_query_config2
+        )
+        fx1_to_comboid_list = [
+            vt.compute_unique_arr_dataids(vt.get_xys(kpts1).T) for kpts1 in kpts1_list
+        ]
+    fs_parts = []
+    name_id_parts = []
+    combo_id_parts = []
+    match_offsets = [0]
+    name_offsets = [0]
+    for cmx, cm in enumerate(cm_list):
+        name_groupxs = cm.name_groupxs
+        num_matches = np.array([len(fm) for fm in cm.fm_list], dtype=np.int64)
+        # The name index of every annotation match
+        annot_nidx = np.empty(len(num_matches), dtype=np.int64)
+        if len(name_groupxs) > 0:
+            annot_nidx[np.hstack(name_groupxs)] = np.repeat(
+                np.arange(len(name_groupxs)), [len(idxs) for idxs in name_groupxs]
+            )
+        if num_matches.sum() > 0:
+            fs_parts.append(np.hstack(cm.get_fsv_prod_list()))
+            fx1 = np.hstack([fm.T[0] for fm in cm.fm_list])
+            if hack_single_ori:
+                fx1 = fx1_to_comboid_list[cmx].take(fx1)
+            combo_id_parts.append(fx1)
+            name_id_parts.append(np.repeat(annot_nidx, num_matches) + name_offsets[-1])
+        match_offsets.append(match_offsets[-1] + int(num_matches.sum()))
+        name_offsets.append(name_offsets[-1] + len(name_groupxs))
+    if len(fs_parts) > 0:
+        fs = np.hstack(fs_parts)
+        name_ids = np.hstack(name_id_parts)
+        combo_ids = np.hstack(combo_id_parts)
+    else:
+        fs = np.empty(0, dtype=hstypes.FS_DTYPE)
+        name_ids = np.empty(0, dtype=np.int64)
+        combo_ids = np.empty(0, dtype=np.int64)
+    return fs, name_ids, combo_ids, match_offsets, name_offsets
+
+
+def _group_name_matches(fs, name_ids, combo_ids):
+    """
+    Sorts the flat matches so each (name, combo id) group is contiguous and
+    returns the sort order, the group start offsets and the group maximums.
+    """
+    sortx = np.lexsort((combo_ids, name_ids))
+    name_ids_s = name_ids.take(sortx)
+    combo_ids_s = combo_ids.take(sortx)
+    is_start = np.ones(len(sortx), dtype=np.bool_)
+    is_start[1:] = (name_ids_s[1:] != name_ids_s[:-1]) | (
+        combo_ids_s[1:] != combo_ids_s[:-1]
+    )
+    group_starts = np.flatnonzero(is_start)
+    if len(group_starts) > 0:
+        group_max = np.maximum.reduceat(fs.take(sortx), group_starts)
+    else:
+        group_max = np.empty(0, dtype=fs.dtype)
+    return sortx, is_start, group_starts, group_max
+
+
+def _resolve_hack_single_ori(qreq_):
+    try:
+        return qreq_ is not None and (
+            qreq_.qparams.query_rotation_heuristic or qreq_.qparams.rotation_invariance
+        )
+    except AttributeError:
+        return True
+
+
+@profile
+def compute_fmech_score_list(cm_list, qreq_=None, hack_single_ori=False):
+    r"""
+    Vectorized version of compute_fmech_score over a list of chip matches.
+
+    All feature matches are flattened into (name, combo id, score) arrays and
+    the best match of each query feature per name is found with one sort and
+    reduction instead of a python loop over every name of every query.
+
+    Args:
+        cm_list (list): chip matches with evaluated dnids
+        qreq_ (QueryRequest): needed only if hack_single_ori is used
+        hack_single_ori (bool): if None it is determined by the qparams
+
+    Returns:
+        list: nsum_score_list of each chip match, aligned with cm.unique_nids
+
+    CommandLine:
+        python -m wbia.algo.hots.name_scoring --test-compute_fmech_score_list
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.name_scoring import *  # NOQA
+        >>> cm1 = testdata_chipmatch()
+        >>> cm2 = testdata_chipmatch()
+        >>> cm2.fsv_list = [fsv * np.arange(1, len(fsv) + 1)[:, None] for fsv in cm2.fsv_list]
+        >>> cm_list = [cm1, cm2]
+        >>> nsum_score_lists = compute_fmech_score_list(cm_list)
+        >>> print(np.array(nsum_score_lists))
+        [[ 4.  7.  5.]
+         [10. 16. 15.]]
+        >>> for cm, nsum_score_list in zip(cm_list, nsum_score_lists):
+        >>>     assert np.allclose(nsum_score_list, compute_fmech_score(cm))
+        >>> assert compute_fmech_score_list([]) == []
+    """
+    if hack_single_ori is None:
+        hack_single_ori = _resolve_hack_single_ori(qreq_)
+    fs, name_ids, combo_ids, match_offsets, name_offsets = _flatten_name_matches(
+        cm_list, qreq_, hack_single_ori
+    )
+    sortx, is_start, group_starts, group_max = _group_name_matches(
+        fs, name_ids, combo_ids
+    )
+    # Features (with the same id) can't vote for the same name twice
+    group_name_ids = name_ids.take(sortx.take(group_starts))
+    flat_name_scores = np.bincount(
+        group_name_ids, weights=group_max, minlength=name_offsets[-1]
+    ).astype(hstypes.FS_DTYPE)
+    nsum_score_lists = [
+        flat_name_scores[name_offsets[cmx] : name_offsets[cmx + 1]]
+        for cmx in range(len(cm_list))
+    ]
+    return nsum_score_lists
+
+
+@profile
+def get_chipmatch_namescore_nonvoting_feature_flags_list(cm_list, qreq_=None):
+    r"""
+    Vectorized version of get_chipmatch_namescore_nonvoting_feature_flags
+    over a list of chip matches. Like the per chip match version, every
+    match that ties for the best score of its (name, query feature) group
+    is flagged.
+
+    Returns:
+        list: the featflag_list of each chip match
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.name_scoring import *  # NOQA
+        >>> cm = testdata_chipmatch()
+        >>> cm.fsv_list[1] = cm.fsv_list[1] * 2
+        >>> featflag_lists = get_chipmatch_namescore_nonvoting_feature_flags_list([cm, cm])
+        >>> print(ut.repr2([flags.astype(int) for flags in featflag_lists[0]]))
+        [np.array([0, 0, 0, 0]), np.array([1, 1, 1, 1]), np.array([1, 1, 1, 1]), np.array([1, 1, 1, 1]), np.array([1, 1, 1, 1, 1])]
+    """
+    hack_single_ori = _resolve_hack_single_ori(qreq_)
+    fs, name_ids, combo_ids, match_offsets, name_offsets = _flatten_name_matches(
+        cm_list, qreq_, hack_single_ori
+    )
+    sortx, is_start, group_starts, group_max = _group_name_matches(
+        fs, name_ids, combo_ids
+    )
+    # Only the best scoring matches of each group can vote
+    group_index = np.cumsum(is_start) - 1
+    flags = np.empty(len(fs), dtype=np.bool_)
+    flags[sortx] = fs.take(sortx) == group_max.take(group_index)
+    featflag_lists = []
+    for cmx, cm in enumerate(cm_list):
+        cm_flags = flags[match_offsets[cmx] : match_offsets[cmx + 1]]
+        if len(cm.fm_list) == 0:
+            featflag_lists.append([])
+            continue
+        cumsum = np.cumsum([len(fm) for fm in cm.fm_list])[:-1]
+        featflag_lists.append(np.split(cm_flags, cumsum))
+    return featflag_lists
+
+
 @profile
 def get_chipmatch_namescore_nonvoting_feature_flags(cm, qreq_=None):
     """
@@ -269,7 +447,7 @@ def get_namescore_nonvoting_feature_flags(
     # Flag which features are valid in this grouped space. Only one keypoint should be able to vote
     # for each group
     name_grouped_fid_grouped_isvalid_list = [
-        np.array([fs_group.max() == fs_group for fs_group in fid_grouped_fs_list])
+        [fs_group.max() == fs_group for fs_group in fid_grouped_fs_list]
         for fid_grouped_fs_list in name_grouped_fid_grouped_fs_list
     ]
 
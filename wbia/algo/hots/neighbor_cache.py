@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Disk backed cache of the nearest neighbors found in step 1 of the pipeline.
+
+Each entry is one uncompressed ``.npz`` file holding the neighbor indices,
+distances and query feature indices of one query annotation.  Entries are
+keyed by the cacheids of ``pipeline.nearest_neighbor_cacheid2``, which
+combine the query visual uuid, the indexer and feature configs and the
+number of neighbors, followed by the layout cfgstr of the indexer (the
+cached indices are positions in that indexer).  The total size of the directory is bounded; the least
+recently used entries (by file mtime, which is bumped on every hit) are
+deleted first, so several processes can share one cache directory.
+"""
+import collections
+import logging
+import os
+import threading
+import zipfile
+from os.path import join
+import numpy as np
+import utool as ut
+
+(print, rrr, profile) = ut.inject2(__name__)
+logger = logging.getLogger('wbia')
+
+
+# Size budget (in MB) of each neighbor cache directory
+NN_CACHE_BUDGET = ut.get_argval('--nn-cache-budget', type_=float, default=2048.0)
+
+NN_CACHE_PREFIX = 'nn_'
+NN_CACHE_EXT = '.npz'
+
+
+class NeighborCache(object):
+    """
+    Size bounded LRU of neighbor arrays stored in ``dpath``.
+
+    Args:
+        dpath (str): cache directory
+        budget (float): size budget in megabytes
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.neighbor_cache import *  # NOQA
+        >>> dpath = ut.ensure_app_resource_dir('wbia', 'test_neighbor_cache')
+        >>> ut.delete(dpath, verbose=False)
+        >>> cache = NeighborCache(dpath, budget=0.1)
+        >>> idxs = np.arange(4000, dtype=np.int32).reshape(1000, 4)
+        >>> dists = np.zeros((1000, 4), dtype=np.float32)
+        >>> qfxs = np.arange(1000)
+        >>> cache.save('query1', idxs, dists, qfxs)
+        >>> cache.save('query2', idxs, dists, qfxs)
+        >>> idxs_, dists_, qfxs_ = cache.load('query2')
+        >>> assert np.all(idxs_ == idxs) and idxs_.dtype == idxs.dtype
+        >>> cache.save('query3', idxs, dists, qfxs)
+        >>> hits = [data is not None for data in cache.load_many(['query1', 'query2', 'query3'])]
+        >>> print(hits)
+        [False, True, True]
+        >>> stats = cache.get_stats()
+        >>> print(ut.repr2(ut.dict_subset(stats, ['hits', 'misses', 'evictions', 'num_entries'])))
+        {'hits': 3, 'misses': 1, 'evictions': 1, 'num_entries': 2}
+        >>> cache.clear()
+        >>> assert len(cache) == 0
+    """
+
+    def __init__(cache, dpath, budget=None):
+        if budget is None:
+            budget = NN_CACHE_BUDGET
+        cache.dpath = dpath
+        cache.budget = budget
+        # fname -> nbytes, least recently used first
+        cache._entries = None
+        cache._nbytes = 0
+        cache._lock = threading.RLock()
+        cache.stats = {'hits': 0, 'misses': 0, 'saves': 0, 'evictions': 0}
+
+    def __len__(cache):
+        with cache._lock:
+            return len(cache._get_entries())
+
+    def _fname(cache, cacheid):
+        return NN_CACHE_PREFIX + ut.hashstr27(cacheid) + NN_CACHE_EXT
+
+    def _get_entries(cache):
+        """ Lazily scans the cache directory once per process """
+        if cache._entries is None:
+            ut.ensuredir(cache.dpath)
+            scanned = []
+            for entry in os.scandir(cache.dpath):
+                if entry.name.startswith(NN_CACHE_PREFIX) and entry.name.endswith(
+                    NN_CACHE_EXT
+                ):
+                    stat = entry.stat()
+                    scanned.append((stat.st_mtime, entry.name, stat.st_size))
+            scanned.sort()
+            cache._entries = collections.OrderedDict(
+                (fname, nbytes) for _, fname, nbytes in scanned
+            )
+            cache._nbytes = sum(cache._entries.values())
+        return cache._entries
+
+    def _forget(cache, fname):
+        nbytes = cache._get_entries().pop(fname, None)
+        if nbytes is not None:
+            cache._nbytes -= nbytes
+
+    def _evict(cache):
+        entries = cache._get_entries()
+        budget_bytes = int(cache.budget * (2 ** 20))
+        while len(entries) > 0 and cache._nbytes > budget_bytes:
+            fname = next(iter(entries))
+            cache._forget(fname)
+            ut.delete(join(cache.dpath, fname), verbose=False)
+            cache.stats['evictions'] += 1
+
+    def load(cache, cacheid):
+        """ Returns (idxs, dists, qfxs) or None on a miss """
+        fname = cache._fname(cacheid)
+        fpath = join(cache.dpath, fname)
+        try:
+            with np.load(fpath, allow_pickle=False) as data:
+                if str(data['cacheid']) != cacheid:
+                    raise KeyError('cacheid collision')
+                value = (data['idxs'], data['dists'], data['qfxs'])
+            os.utime(fpath)
+        except (IOError, OSError, KeyError, ValueError, zipfile.BadZipFile):
+            # Missing, evicted by another process or corrupted
+            with cache._lock:
+                cache._forget(fname)
+                cache.stats['misses'] += 1
+            return None
+        with cache._lock:
+            entries = cache._get_entries()
+            if fname in entries:
+                entries.move_to_end(fname)
+            else:
+                # Written by another process
+                entries[fname] = os.path.getsize(fpath)
+                cache._nbytes += entries[fname]
+            cache.stats['hits'] += 1
+        return value
+
+    def load_many(cache, cacheid_list):
+        return [cache.load(cacheid) for cacheid in cacheid_list]
+
+    def save(cache, cacheid, idxs, dists, qfxs):
+        fname = cache._fname(cacheid)
+        fpath = join(cache.dpath, fname)
+        ut.ensuredir(cache.dpath)
+        # Write to a temporary file so readers never see a partial entry
+        temp_fpath = fpath + '.%d.tmp' % (os.getpid(),)
+        with open(temp_fpath, 'wb') as file_:
+            np.savez(
+                file_,
+                cacheid=np.array(cacheid),
+                idxs=idxs,
+                dists=dists,
+                qfxs=qfxs,
+            )
+        os.replace(temp_fpath, fpath)
+        with cache._lock:
+            cache._forget(fname)
+            nbytes = os.path.getsize(fpath)
+            cache._get_entries()[fname] = nbytes
+            cache._nbytes += nbytes
+            cache.stats['saves'] += 1
+            cache._evict()
+
+    def clear(cache):
+        with cache._lock:
+            for fname in list(cache._get_entries().keys()):
+                cache._forget(fname)
+                ut.delete(join(cache.dpath, fname), verbose=False)
+
+    def get_stats(cache):
+        with cache._lock:
+            stats = dict(cache.stats)
+            stats['num_entries'] = len(cache._get_entries())
+            stats['nbytes'] = cache._nbytes
+            stats['budget'] = cache.budget
+            num_requests = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / num_requests if num_requests else None
+        return stats
+
+
+# One cache per directory and process so the counters accumulate
+_NEIGHBOR_CACHES = {}
+_NEIGHBOR_CACHES_LOCK = threading.Lock()
+
+
+def get_neighbor_cache(dpath):
+    """ Returns the shared NeighborCache of a cache directory """
+    with _NEIGHBOR_CACHES_LOCK:
+        if dpath not in _NEIGHBOR_CACHES:
+            _NEIGHBOR_CACHES[dpath] = NeighborCache(dpath)
+        return _NEIGHBOR_CACHES[dpath]
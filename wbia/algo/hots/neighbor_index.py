@@ -7,6 +7,7 @@ multi_index.py as well
 https://github.com/spotify/annoy
 """
 import logging
+import os
 import six
 import numpy as np
 import utool as ut
@@ -15,9 +16,10 @@ from vtool._pyflann_backend import pyflann as pyflann
 
 # import itertools as it
 # import lockfile
-from os.path import basename
+from os.path import basename, exists, join
 from six.moves import range, zip, map  # NOQA
 from wbia.algo.hots import hstypes
+from wbia.algo.hots import nn_backends
 from wbia.algo.hots import _pipeline_helpers as plh  # NOQA
 
 (print, rrr, profile) = ut.inject2(__name__)
@@ -27,6 +29,9 @@ USE_HOTSPOTTER_CACHE = not ut.get_argflag('--nocache-hs')
 NOSAVE_FLANN = ut.get_argflag('--nosave-flann')
 NOCACHE_FLANN = ut.get_argflag('--nocache-flann') and USE_HOTSPOTTER_CACHE
 
+# Arrays written by NeighborIndex.save_support (one .npy file each)
+SUPPORT_ATTRS = ['ax2_aid', 'idx2_vec', 'idx2_fgw', 'idx2_ax', 'idx2_fx']
+
 
 def get_support_data(qreq_, daid_list):
     """
@@ -229,9 +234,17 @@ class NeighborIndex(object):
         nnindexer.cfgstr = cfgstr  # configuration id
         if flann_params is None:
             flann_params = {'algorithm': 'kdtree'}
+        flann_params = flann_params.copy()
         if 'random_seed' not in flann_params:
             # Make flann determenistic for the same data
             flann_params['random_seed'] = 42
+        # The search engine is not a flann parameter
+        nnindexer.backend = flann_params.pop('backend', nn_backends.BACKEND_FLANN)
+        # Persist the support arrays so they can be memory mapped
+        nnindexer.mmap_support = flann_params.pop('mmap_support', False)
+        # Add / remove support through a delta index instead of the main index
+        nnindexer.incremental = flann_params.pop('incremental', False)
+        nnindexer.delta_compact_thresh = flann_params.pop('delta_compact_thresh', 50000)
         nnindexer.flann_params = flann_params
 
         nprocs = ut.util_parallel.__NUM_PROCS__
@@ -266,8 +279,16 @@ class NeighborIndex(object):
         idx2_vec, idx2_fgw, idx2_ax, idx2_fx = tup
 
         ax2_aid = np.array(aid_list)
+        indexer._set_support(ax2_aid, idx2_vec, idx2_fgw, idx2_ax, idx2_fx)
 
-        indexer.flann = pyflann.FLANN()  # Approximate search structure
+    def _set_support(indexer, ax2_aid, idx2_vec, idx2_fgw, idx2_ax, idx2_fx):
+        # Approximate (or exact) search structure
+        if indexer.incremental:
+            indexer.flann = nn_backends.DeltaIndex(
+                indexer.backend, indexer.delta_compact_thresh, indexer.flann_params
+            )
+        else:
+            indexer.flann = nn_backends.new_ann_backend(indexer.backend)
         indexer.ax2_aid = ax2_aid  # (A x 1) Mapping to original annot ids
         indexer.idx2_vec = idx2_vec  # (M x D) Descriptors to index
         indexer.idx2_fgw = idx2_fgw  # (M x 1) Descriptor forground weight
@@ -483,6 +504,7 @@ class NeighborIndex(object):
             logger.info('new_idx2_vec.dtype = %r' % new_idx2_vec.dtype)
             logger.info('new_idx2_vec.shape = %r' % (new_idx2_vec.shape,))
         nnindexer.flann.add_points(new_idx2_vec)
+        nnindexer.num_indexed = len(nnindexer.idx2_ax)
         if ut.DEBUG2:
             logger.info('DONE ADD POINTS')
 
@@ -573,6 +595,9 @@ class NeighborIndex(object):
         else:
             flann_fpath = fpath
         nnindexer.flann_fpath = flann_fpath
+        if not nn_backends.is_persistent(nnindexer.flann):
+            # Nothing worth caching, the index is rebuilt on load
+            return False
         if ut.VERYVERBOSE or verbose:
             logger.info(
                 '[nnindex] flann.save_index(%r)' % ut.path_ndir_split(flann_fpath, n=5)
@@ -584,6 +609,10 @@ class NeighborIndex(object):
         Loads a cached flann neighbor indexer from disk (not the data)
         """
         load_success = False
+        if not nn_backends.is_persistent(nnindexer.flann):
+            # Building a non-persistent index is cheaper than reading one
+            nnindexer.reindex(verbose=verbose)
+            return True
         if fpath is None:
             flann_fpath = nnindexer.get_fpath(cachedir)
         else:
@@ -602,6 +631,82 @@ class NeighborIndex(object):
                 load_success = True
         return load_success
 
+    def save_support(nnindexer, dpath, verbose=True):
+        r"""
+        Writes the support arrays (not the flann index) to a directory of .npy
+        files that can be memory mapped with load_support.
+
+        The files are written to a temporary directory which is renamed into
+        place, so concurrent readers never see a partial layout.
+        """
+        if exists(dpath):
+            return True
+        if ut.VERYVERBOSE or verbose:
+            logger.info('[nnindex] save_support(%r)' % (ut.path_ndir_split(dpath, n=5),))
+        tmp_dpath = dpath + '.tmp%d' % (os.getpid(),)
+        ut.ensuredir(tmp_dpath)
+        for attr in SUPPORT_ATTRS:
+            arr = getattr(nnindexer, attr)
+            if arr is not None:
+                np.save(join(tmp_dpath, attr + '.npy'), arr)
+        try:
+            os.rename(tmp_dpath, dpath)
+        except OSError:
+            # Another process finished writing the same support first
+            ut.delete(tmp_dpath, verbose=False)
+        return True
+
+    def load_support(nnindexer, dpath, mmap_mode='c', verbose=True):
+        r"""
+        Loads support arrays written by save_support and creates an empty
+        search structure (call load or reindex afterwards).
+
+        Args:
+            dpath (str): directory written by save_support
+            mmap_mode (str): passed to np.load. The default copy-on-write
+                mapping shares the pages of the files between every process
+                that maps them, while remove_support can still modify its own
+                view. Use None to read private copies.
+
+        Returns:
+            bool: load_success
+
+        Example:
+            >>> # ENABLE_DOCTEST
+            >>> from wbia.algo.hots.neighbor_index import *  # NOQA
+            >>> rng = np.random.RandomState(0)
+            >>> vecs_list = [rng.randint(0, 255, (n, 128)).astype(np.uint8) for n in [3, 5]]
+            >>> fxs_list = [np.arange(len(vecs)) for vecs in vecs_list]
+            >>> nnindexer = NeighborIndex(None, None)
+            >>> nnindexer.init_support([1, 2], vecs_list, None, fxs_list, verbose=False)
+            >>> dpath = ut.ensure_app_resource_dir('wbia', 'test_nnsupport')
+            >>> ut.delete(dpath, verbose=False)
+            >>> nnindexer.save_support(dpath, verbose=False)
+            >>> nnindexer2 = NeighborIndex(None, None)
+            >>> assert nnindexer2.load_support(dpath, verbose=False)
+            >>> assert isinstance(nnindexer2.idx2_vec, np.memmap)
+            >>> assert np.all(nnindexer2.idx2_vec == nnindexer.idx2_vec)
+            >>> assert np.all(nnindexer2.idx2_ax == nnindexer.idx2_ax)
+            >>> assert nnindexer2.idx2_fgw is None
+            >>> ut.delete(dpath, verbose=False)
+        """
+        assert nnindexer.flann is None, 'already initalized'
+        if not ut.checkpath(join(dpath, 'idx2_vec.npy'), verbose=verbose):
+            return False
+        support = []
+        for attr in SUPPORT_ATTRS:
+            fpath = join(dpath, attr + '.npy')
+            if not exists(fpath):
+                arr = None
+            elif attr == 'ax2_aid':
+                # small and modified by remove_support, keep it in memory
+                arr = np.load(fpath)
+            else:
+                arr = np.load(fpath, mmap_mode=mmap_mode)
+            support.append(arr)
+        nnindexer._set_support(*support)
+        return True
+
     def get_prefix(nnindexer):
         return nnindexer.prefix1
 
@@ -656,12 +761,42 @@ class NeighborIndex(object):
             # flann_valsig_ = str(list(flann_params.values()))
             # flann_valsig = ut.remove_chars(flann_valsig_, ', \'[]')
             flann_cfgstr_list.append('_FLANN(' + flann_valsig_ + ')')
+            if nnindexer.backend != nn_backends.BACKEND_FLANN:
+                flann_cfgstr_list.append('_%s' % (nnindexer.backend,))
         if use_data_hash:
             vecs_hashstr = ut.hashstr_arr(nnindexer.idx2_vec, '_VECS')
             flann_cfgstr_list.append(vecs_hashstr)
         flann_cfgstr = ''.join(flann_cfgstr_list)
         return flann_cfgstr
 
+    def get_layout_cfgstr(nnindexer):
+        r"""
+        identifies which (aid, fx) each index points to. Indices returned by
+        knn are only meaningful for an indexer with the same layout.
+
+        Example:
+            >>> # ENABLE_DOCTEST
+            >>> from wbia.algo.hots.neighbor_index import *  # NOQA
+            >>> rng = np.random.RandomState(0)
+            >>> vecs_list = [rng.randint(0, 255, (n, 16)).astype(np.uint8) for n in [3, 4]]
+            >>> fxs_list = [np.arange(len(vecs)) for vecs in vecs_list]
+            >>> nnindexer1 = NeighborIndex({'backend': 'brute'}, None)
+            >>> nnindexer1.init_support([1, 2], vecs_list, None, fxs_list, verbose=False)
+            >>> nnindexer2 = NeighborIndex({'backend': 'brute'}, None)
+            >>> nnindexer2.init_support([2, 1], vecs_list[::-1], None, fxs_list[::-1], verbose=False)
+            >>> assert nnindexer1.get_layout_cfgstr() != nnindexer2.get_layout_cfgstr()
+        """
+        layout_hashstr = ut.hashstr27(
+            ''.join(
+                [
+                    ut.hashstr_arr(nnindexer.ax2_aid, ''),
+                    ut.hashstr_arr(nnindexer.idx2_ax, ''),
+                    ut.hashstr_arr(nnindexer.idx2_fx, ''),
+                ]
+            )
+        )
+        return '_LAYOUT(' + layout_hashstr + ')'
+
     def get_fname(nnindexer):
         return basename(nnindexer.get_fpath(''))
 
@@ -1048,8 +1183,10 @@ class NeighborIndex2(NeighborIndex, ut.NiceRepr):
         # logger.info('NNINDEX ON LOAD')
         aid_list = nnindexer.ax2_aid
         config = nnindexer.config
-        support = nnindexer.get_support(depc, aid_list, config.feat_cfg)
-        nnindexer.init_support(aid_list, *support)
+        support_dpath = nnindexer.get_support_dpath()
+        if not (nnindexer.mmap_support and nnindexer.load_support(support_dpath)):
+            support = nnindexer.get_support(depc, aid_list, config.feat_cfg)
+            nnindexer.init_support(aid_list, *support)
         nnindexer.load(fpath=nnindexer.flann_fpath)
         # nnindexer.ax2_aid
         pass
@@ -1058,7 +1195,13 @@ class NeighborIndex2(NeighborIndex, ut.NiceRepr):
         # logger.info('NNINDEX ON SAVE')
         # Save FLANN as well
         flann_fpath = ut.augpath(fpath, '_flann', newext='.flann')
+        nnindexer.flann_fpath = flann_fpath
         nnindexer.save(fpath=flann_fpath)
+        if nnindexer.mmap_support:
+            nnindexer.save_support(nnindexer.get_support_dpath())
+
+    def get_support_dpath(nnindexer):
+        return ut.augpath(nnindexer.flann_fpath, '_support', newext='')
 
     def __getstate__(self):
         # TODO: Figure out how to make these play nice with the depcache
@@ -1083,6 +1226,11 @@ class NeighborIndex2(NeighborIndex, ut.NiceRepr):
         return state
 
     def __setstate__(self, state_dict):
+        # Indexers pickled before these options existed
+        self.backend = nn_backends.BACKEND_FLANN
+        self.mmap_support = False
+        self.incremental = False
+        self.delta_compact_thresh = 50000
         self.__dict__.update(state_dict)
         # return {}
 
@@ -1103,6 +1251,146 @@ class NeighborIndex2(NeighborIndex, ut.NiceRepr):
     #     return conditional_knn_(nnindexer, qfx2_vec, num_neighbors, invalid_axs)
 
 
+class ShardedNeighborIndex(NeighborIndex):
+    r"""
+    A NeighborIndex whose descriptors are split across several NeighborIndex
+    shards that are searched in parallel.
+
+    Indices (idx) and annotation indices (ax) are global, so knn,
+    requery_knn and the get_nn_* lookups behave exactly like a single
+    indexer over all the shards. Only the small inverted index arrays are
+    stacked, the descriptors and search structures stay in the shards.
+
+    Args:
+        shard_list (list): built NeighborIndex objects
+        cfgstr (str): configuration id of the whole index
+        num_workers (int): threads used to query the shards
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.neighbor_index import *  # NOQA
+        >>> rng = np.random.RandomState(0)
+        >>> vecs_list = [rng.randint(0, 255, (n, 128)).astype(np.uint8) for n in [30, 50, 20]]
+        >>> fxs_list = [np.arange(len(vecs)) for vecs in vecs_list]
+        >>> flann_params = {'backend': 'brute'}
+        >>> single = NeighborIndex(flann_params, None)
+        >>> single.init_support([1, 2, 3], vecs_list, None, fxs_list, verbose=False)
+        >>> single.reindex(verbose=False)
+        >>> shard_list = []
+        >>> for aids, sl in [([1, 2], slice(0, 2)), ([3], slice(2, 3))]:
+        ...     shard = NeighborIndex(flann_params, None)
+        ...     shard.init_support(aids, vecs_list[sl], None, fxs_list[sl], verbose=False)
+        ...     shard.reindex(verbose=False)
+        ...     shard_list.append(shard)
+        >>> nnindexer = ShardedNeighborIndex(shard_list)
+        >>> qfx2_vec = rng.randint(0, 255, (10, 128)).astype(np.uint8)
+        >>> (qfx2_idx, qfx2_dist) = nnindexer.knn(qfx2_vec, 3)
+        >>> (qfx2_idx_, qfx2_dist_) = single.knn(qfx2_vec, 3)
+        >>> assert np.all(qfx2_dist == qfx2_dist_)
+        >>> assert np.all(nnindexer.get_nn_aids(qfx2_idx) == single.get_nn_aids(qfx2_idx_))
+        >>> assert np.all(nnindexer.get_nn_featxs(qfx2_idx) == single.get_nn_featxs(qfx2_idx_))
+    """
+
+    def __init__(nnindexer, shard_list, cfgstr=None, num_workers=None):
+        assert len(shard_list) > 0, 'need at least one shard'
+        shard0 = shard_list[0]
+        super(ShardedNeighborIndex, nnindexer).__init__(None, cfgstr)
+        nnindexer.backend = shard0.backend
+        nnindexer.flann_params = shard0.flann_params
+        nnindexer.cores = shard0.cores
+        nnindexer.checks = shard0.checks
+        nnindexer.max_distance_sqrd = shard0.max_distance_sqrd
+        nnindexer.shard_list = shard_list
+        nnindexer.num_workers = num_workers
+        nnindexer._stack_shards()
+
+    def _stack_shards(nnindexer):
+        shard_list = nnindexer.shard_list
+        num_annots_list = [len(shard.ax2_aid) for shard in shard_list]
+        ax_offsets = np.cumsum([0] + num_annots_list[:-1])
+        nnindexer.ax2_aid = np.hstack([shard.ax2_aid for shard in shard_list])
+        nnindexer.idx2_ax = np.hstack(
+            [shard.idx2_ax + offset for shard, offset in zip(shard_list, ax_offsets)]
+        ).astype(np.int32)
+        nnindexer.idx2_fx = np.hstack([shard.idx2_fx for shard in shard_list])
+        if any(shard.idx2_fgw is None for shard in shard_list):
+            nnindexer.idx2_fgw = None
+        else:
+            nnindexer.idx2_fgw = np.hstack([shard.idx2_fgw for shard in shard_list])
+        nnindexer.aid2_ax = ut.make_index_lookup(nnindexer.ax2_aid)
+        nnindexer.num_indexed = len(nnindexer.idx2_ax)
+        if isinstance(nnindexer.flann, nn_backends.ShardedIndex):
+            nnindexer.flann.shutdown()
+        # Rebuilding the merged engine must not bring removed points back
+        nnindexer.flann = nn_backends.ShardedIndex(
+            [shard.flann for shard in shard_list],
+            [len(shard.idx2_ax) for shard in shard_list],
+            num_workers=nnindexer.num_workers,
+            removed_list=[shard.ax2_aid[shard.idx2_ax] == -1 for shard in shard_list],
+        )
+
+    def num_indexed_vecs(nnindexer):
+        return nnindexer.num_indexed
+
+    def get_dtype(nnindexer):
+        return nnindexer.shard_list[0].get_dtype()
+
+    def get_cfgstr(nnindexer, noquery=False):
+        return ''.join(shard.get_cfgstr(noquery) for shard in nnindexer.shard_list)
+
+    def get_nn_vecs(nnindexer, qfx2_nnidx):
+        r""" gets matching vectors """
+        qfx2_nnidx = np.asarray(qfx2_nnidx)
+        offsets = nnindexer.flann.offsets
+        qfx2_shardx = np.searchsorted(offsets, qfx2_nnidx, side='right') - 1
+        shard0 = nnindexer.shard_list[0]
+        dim = shard0.idx2_vec.shape[1]
+        qfx2_vec = np.empty(qfx2_nnidx.shape + (dim,), dtype=shard0.get_dtype())
+        for shardx, shard in enumerate(nnindexer.shard_list):
+            flags = qfx2_shardx == shardx
+            local_idxs = qfx2_nnidx[flags] - offsets[shardx]
+            qfx2_vec[flags] = shard.idx2_vec.take(local_idxs, axis=0)
+        return qfx2_vec
+
+    def get_indexed_vecs(nnindexer):
+        return np.vstack([shard.get_indexed_vecs() for shard in nnindexer.shard_list])
+
+    def add_support(
+        nnindexer,
+        new_daid_list,
+        new_vecs_list,
+        new_fgws_list,
+        new_fxs_list,
+        verbose=ut.NOT_QUIET,
+    ):
+        r"""
+        adds support data to the last shard (existing indices do not move)
+        """
+        nnindexer.shard_list[-1].add_support(
+            new_daid_list, new_vecs_list, new_fgws_list, new_fxs_list, verbose=verbose
+        )
+        nnindexer._stack_shards()
+
+    def remove_support(nnindexer, remove_daid_list, verbose=ut.NOT_QUIET):
+        for shard in nnindexer.shard_list:
+            shard_remove_aids = np.intersect1d(shard.ax2_aid, remove_daid_list)
+            if len(shard_remove_aids) > 0:
+                shard.remove_support(shard_remove_aids, verbose=verbose)
+        nnindexer._stack_shards()
+
+    def reindex(nnindexer, verbose=True, memtrack=None):
+        for shard in nnindexer.shard_list:
+            shard.reindex(verbose=verbose, memtrack=memtrack)
+        nnindexer._stack_shards()
+
+    def save(nnindexer, cachedir=None, fpath=None, verbose=True):
+        # Each shard is cached on its own
+        return False
+
+    def load(nnindexer, cachedir=None, fpath=None, verbose=True):
+        return False
+
+
 def testdata_nnindexer(*args, **kwargs):
     from wbia.algo.hots.neighbor_index_cache import testdata_nnindexer
 
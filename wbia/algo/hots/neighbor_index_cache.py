@@ -3,12 +3,19 @@
 NEEDS CLEANUP
 """
 import logging
+import collections
+import threading
 from os.path import join
+import numpy as np
 import six
 import utool as ut
 from six.moves import range, zip, map  # NOQA
 from wbia.algo.hots import _pipeline_helpers as plh  # NOQA
-from wbia.algo.hots.neighbor_index import NeighborIndex, get_support_data
+from wbia.algo.hots.neighbor_index import (
+    NeighborIndex,
+    ShardedNeighborIndex,
+    get_support_data,
+)
 
 (print, rrr, profile) = ut.inject2(__name__)
 logger = logging.getLogger('wbia')
@@ -20,11 +27,237 @@ NOCACHE_UUIDS = ut.get_argflag('--nocache-uuids') and USE_HOTSPOTTER_CACHE
 # LRU cache for nn_indexers. Ensures that only a few are ever in memory
 # MAX_NEIGHBOR_CACHE_SIZE = ut.get_argval('--max-neighbor-cachesize', type_=int, default=2)
 MAX_NEIGHBOR_CACHE_SIZE = ut.get_argval('--max-neighbor-cachesize', type_=int, default=1)
+# Memory budget (in MB) for resident indexers and features. Zero means unlimited
+NEIGHBOR_CACHE_BUDGET = ut.get_argval('--nnindex-cache-budget', type_=float, default=0.0)
 # Background process for building indexes
 CURRENT_THREAD = None
 # Global map to keep track of UUID lists with prebuild indexers.
 UUID_MAP = ut.ddict(dict)
-NEIGHBOR_CACHE = ut.get_lru_cache(MAX_NEIGHBOR_CACHE_SIZE)
+
+
+def _resident_nbytes(value, _depth=0, _seen=None):
+    """
+    Rough number of bytes a cached value keeps in memory.  Memory mapped
+    arrays live in the page cache and are not counted.  Arrays and objects
+    reachable more than once (e.g. the vectors referenced by both the indexer
+    and its flann engine) are only counted once.
+    """
+    if _seen is None:
+        _seen = set()
+    if isinstance(value, np.ndarray):
+        # Views keep their base array alive
+        base = value
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if isinstance(base, np.memmap) or id(base) in _seen:
+            return 0
+        _seen.add(id(base))
+        if base.dtype == object:
+            return sum(_resident_nbytes(item, _depth + 1, _seen) for item in base.ravel())
+        return base.nbytes
+    if _depth > 6:
+        return 0
+    if isinstance(value, (list, tuple)):
+        return sum(_resident_nbytes(item, _depth + 1, _seen) for item in value)
+    if isinstance(value, dict):
+        return sum(_resident_nbytes(item, _depth + 1, _seen) for item in value.values())
+    if hasattr(value, '__dict__'):
+        if id(value) in _seen:
+            return 0
+        _seen.add(id(value))
+        nbytes = _resident_nbytes(vars(value), _depth + 1, _seen)
+        flann = getattr(value, 'flann', None)
+        idx2_vec = getattr(value, 'idx2_vec', None)
+        if flann is not None and isinstance(idx2_vec, np.ndarray):
+            # The kd-trees hold one index per vector per tree
+            num_trees = getattr(value, 'flann_params', {}).get('trees', 1)
+            nbytes += len(idx2_vec) * 4 * max(int(num_trees or 1), 1)
+        return nbytes
+    return 0
+
+
+class NeighborIndexCache(object):
+    """
+    In-process LRU of loaded nearest neighbor indexers and the preloaded
+    database annotation features that go with them, keyed by the indexer
+    cfgstr.
+
+    Entries are evicted least recently used first when there are more than
+    ``max_size`` of them or when the estimated resident size is over
+    ``budget`` megabytes.  The most recent entry is always kept.  Hit, miss,
+    eviction and load-time counters are kept so warm workers can be
+    monitored.
+
+    Args:
+        max_size (int): maximum number of entries
+        budget (float): memory budget in megabytes (0 disables the budget)
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.neighbor_index_cache import *  # NOQA
+        >>> cache = NeighborIndexCache(max_size=2)
+        >>> cache['a'] = np.zeros(10, dtype=np.float32)
+        >>> cache['b'] = np.zeros(20, dtype=np.float32)
+        >>> assert cache.get('a') is not None
+        >>> cache['c'] = np.zeros(30, dtype=np.float32)
+        >>> assert cache.get('b') is None
+        >>> print(sorted(cache.keys()))
+        ['a', 'c']
+        >>> stats = cache.get_stats()
+        >>> print(ut.repr2(ut.dict_subset(stats, ['hits', 'misses', 'evictions', 'nbytes'])))
+        {'hits': 1, 'misses': 1, 'evictions': 1, 'nbytes': 160}
+    """
+
+    def __init__(self, max_size=1, budget=0.0):
+        self.max_size = max_size
+        self.budget = budget
+        # When False only indexers are kept (the historical behavior)
+        self.keep_features = False
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'feature_hits': 0,
+            'feature_misses': 0,
+            'loads': 0,
+            'load_seconds': 0.0,
+        }
+
+    def configure(self, max_size=None, budget=None, keep_features=None):
+        """ Changes the limits of a live cache, evicting as needed """
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if budget is not None:
+                self.budget = budget
+            if keep_features is not None:
+                self.keep_features = keep_features
+            self._evict()
+
+    @property
+    def nbytes(self):
+        return sum(entry['nbytes'] for entry in self._entries.values())
+
+    def _evict(self):
+        budget_bytes = int(self.budget * (2 ** 20)) if self.budget else None
+        while len(self._entries) > 1:
+            over_size = self.max_size is not None and len(self._entries) > self.max_size
+            over_budget = budget_bytes is not None and self.nbytes > budget_bytes
+            if not (over_size or over_budget):
+                break
+            key, _ = self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+            logger.info('[nnindex.MEMCACHE] evicted cfgstr=%s' % (key,))
+
+    def _entry(self, key):
+        entry = self._entries.get(key, None)
+        if entry is None:
+            entry = {'nnindexer': None, 'feats': None, 'aids': None, 'nbytes': 0}
+            self._entries[key] = entry
+        self._entries.move_to_end(key)
+        return entry
+
+    def _resize(self, entry):
+        # Arrays shared by the indexer and the features are counted once
+        seen = set()
+        entry['nbytes'] = _resident_nbytes(entry['nnindexer'], _seen=seen) + (
+            _resident_nbytes(entry['feats'], _seen=seen)
+        )
+
+    def has_key(self, key):
+        entry = self._entries.get(key, None)
+        return entry is not None and entry['nnindexer'] is not None
+
+    __contains__ = has_key
+
+    def get(self, key, default=None):
+        """ Returns a cached indexer and records a hit or a miss """
+        with self._lock:
+            if not self.has_key(key):
+                self.stats['misses'] += 1
+                return default
+            self.stats['hits'] += 1
+            return self._entry(key)['nnindexer']
+
+    def __getitem__(self, key):
+        if not self.has_key(key):
+            raise KeyError(key)
+        with self._lock:
+            return self._entry(key)['nnindexer']
+
+    def __setitem__(self, key, nnindexer):
+        with self._lock:
+            entry = self._entry(key)
+            entry['nnindexer'] = nnindexer
+            self._resize(entry)
+            self._evict()
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def items(self):
+        return [(key, entry['nnindexer']) for key, entry in self._entries.items()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record_load(self, seconds):
+        self.stats['loads'] += 1
+        self.stats['load_seconds'] += seconds
+
+    def get_features(self, key, aids):
+        """
+        Returns the cached ``{attr: values}`` features for exactly ``aids``
+        or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None or entry['feats'] is None or entry['aids'] != tuple(aids):
+                self.stats['feature_misses'] += 1
+                return None
+            self.stats['feature_hits'] += 1
+            self._entries.move_to_end(key)
+            return entry['feats']
+
+    def set_features(self, key, aids, feats):
+        with self._lock:
+            entry = self._entry(key)
+            entry['aids'] = tuple(aids)
+            entry['feats'] = feats
+            self._resize(entry)
+            self._evict()
+
+    def get_stats(self):
+        """ Returns the counters together with the current occupancy """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['num_entries'] = len(self._entries)
+            stats['num_indexers'] = sum(
+                entry['nnindexer'] is not None for entry in self._entries.values()
+            )
+            stats['nbytes'] = self.nbytes
+            stats['max_size'] = self.max_size
+            stats['budget'] = self.budget
+            stats['keep_features'] = self.keep_features
+            num_requests = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / num_requests if num_requests else None
+        return stats
+
+
+NEIGHBOR_CACHE = NeighborIndexCache(MAX_NEIGHBOR_CACHE_SIZE, NEIGHBOR_CACHE_BUDGET)
 
 
 class UUIDMapHyrbridCache(object):
@@ -239,6 +472,78 @@ def clear_memcache():
     NEIGHBOR_CACHE.clear()
 
 
+def get_nnindex_cache_stats():
+    """ hit / miss / eviction counters and occupancy of the indexer memcache """
+    return NEIGHBOR_CACHE.get_stats()
+
+
+def preload_resident_dannots(qreq_, *attrs):
+    """
+    Preloads feature attributes of the database annotations of a query
+    request.  When the memcache keeps features (warm query workers) the values
+    are reused across query requests that share an indexer cfgstr instead of
+    being re-read through the depcache.
+
+    Only use this for attributes that are determined by the visual uuids and
+    the feature configs in the cfgstr (e.g. kpts, fgweights).  Name ids can
+    change between queries and must always be reloaded.
+    """
+    dannots = qreq_.dannots
+    if not NEIGHBOR_CACHE.keep_features:
+        dannots.preload(*attrs)
+        return
+    daids = list(dannots.aids)
+    nnindex_cfgstr = build_nnindex_cfgstr(qreq_, daids)
+    feats = NEIGHBOR_CACHE.get_features(nnindex_cfgstr, daids) or {}
+    missing_attrs = [attr for attr in attrs if attr not in feats]
+    for attr in attrs:
+        if attr in feats:
+            dannots._internal_attrs[attr] = feats[attr]
+    if missing_attrs:
+        dannots.preload(*missing_attrs)
+        feats = dict(feats)
+        for attr in missing_attrs:
+            feats[attr] = dannots._internal_attrs[attr]
+        NEIGHBOR_CACHE.set_features(nnindex_cfgstr, daids, feats)
+
+
+def warmup_nnindexer_cache(ibs, species_list, cfgdict=None, verbose=ut.NOT_QUIET):
+    """
+    Loads the indexers and database features used to query all annotations of
+    each species so that the first real query does not pay for a cold load.
+
+    Args:
+        ibs (IBEISController):
+        species_list (list): species texts to warm
+        cfgdict (dict): query config the indexers are built for
+
+    Returns:
+        list: the nnindex cfgstrs that are now resident
+    """
+    cfgstr_list = []
+    for species in species_list:
+        daid_list = ibs.get_valid_aids(species=species)
+        if len(daid_list) == 0:
+            logger.info('[nnindex] no annotations to warm for species=%r' % (species,))
+            continue
+        qreq_ = ibs.new_query_request(daid_list[0:1], daid_list, cfgdict=cfgdict)
+        if qreq_.qparams.pipeline_root != 'vsmany':
+            logger.info(
+                '[nnindex] pipeline_root=%r does not use an indexer'
+                % (qreq_.qparams.pipeline_root,)
+            )
+            continue
+        with ut.Timer(verbose=False) as timer:
+            qreq_.lazy_preload(verbose=verbose)
+            qreq_.load_indexer(verbose=verbose)
+        logger.info(
+            '[nnindex] warmed species=%r (%d annots) in %.2fs'
+            % (species, len(daid_list), timer.ellapsed)
+        )
+        cfgstr_list.append(qreq_.indexer.cfgstr)
+    return cfgstr_list
+
+
 def clear_uuid_cache(qreq_):
     """
     CommandLine:
@@ -303,23 +608,164 @@ def request_wbia_nnindexer(qreq_, verbose=True, **kwargs):
     daid_list = qreq_.get_internal_daids()
     if not hasattr(qreq_.qparams, 'use_augmented_indexer'):
         qreq_.qparams.use_augmented_indexer = True
-    if False and qreq_.qparams.use_augmented_indexer:
+    # Augmenting is only safe with the delta index (flann.add_points can segfault)
+    if qreq_.qparams.nn_incremental and qreq_.qparams.use_augmented_indexer:
         nnindexer = request_augmented_wbia_nnindexer(qreq_, daid_list, **kwargs)
     else:
         nnindexer = request_memcached_wbia_nnindexer(qreq_, daid_list, **kwargs)
     return nnindexer
 
 
+def group_daids_by_shard(qreq_, daid_list):
+    r"""
+    Splits the database annotations into the shards of a
+    ShardedNeighborIndex according to qparams.shard_method
+
+    shard_method:
+        featcount - consecutive annotations with about shard_max_vecs
+            features per shard
+        species - one shard per species
+        name - num_shards shards, all annotations of a name in the same one
+
+    Returns:
+        list: shard_aids_list
+
+    Example:
+        >>> # DISABLE_DOCTEST
+        >>> from wbia.algo.hots.neighbor_index_cache import *  # NOQA
+        >>> import wbia
+        >>> qreq_ = wbia.testdata_qreq_(defaultdb='testdb1', p='default:shard_max_vecs=5000')
+        >>> shard_aids_list = group_daids_by_shard(qreq_, qreq_.daids)
+        >>> assert sorted(ut.flatten(shard_aids_list)) == sorted(qreq_.daids)
+    """
+    ibs = qreq_.ibs
+    shard_method = qreq_.qparams.shard_method
+    daid_list = np.asarray(daid_list)
+    if shard_method == 'featcount':
+        config2_ = qreq_.get_internal_data_config2()
+        nfeats_list = np.array(ibs.get_annot_num_feats(daid_list, config2_=config2_))
+        shard_max_vecs = qreq_.qparams.shard_max_vecs
+        # Start a new shard whenever the running count passes the limit
+        shardx_list = np.cumsum(nfeats_list) // max(shard_max_vecs, 1)
+    elif shard_method == 'species':
+        shardx_list = ibs.get_annot_species_texts(daid_list)
+    elif shard_method == 'name':
+        nid_list = np.array(ibs.get_annot_nids(daid_list))
+        shardx_list = np.abs(nid_list) % qreq_.qparams.num_shards
+    else:
+        raise ValueError('unknown shard_method=%r' % (shard_method,))
+    groupxs = ut.group_indices(shardx_list)[1]
+    shard_aids_list = [sorted(daid_list.take(xs).tolist()) for xs in groupxs]
+    return shard_aids_list
+
+
+def build_sharded_nnindex_cfgstr(qreq_, daid_list):
+    """
+    like build_nnindex_cfgstr, but also identifies how the daids are split
+    into shards
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.neighbor_index_cache import *  # NOQA
+        >>> import wbia
+        >>> qreq_ = wbia.testdata_qreq_(defaultdb='testdb1',
+        >>>                             p='default:index_method=sharded,shard_max_vecs=5000')
+        >>> daid_list = qreq_.get_internal_daids()
+        >>> nnindex_cfgstr = build_sharded_nnindex_cfgstr(qreq_, daid_list)
+        >>> result = nnindex_cfgstr[len(build_nnindex_cfgstr(qreq_, daid_list)):]
+        >>> print(result)
+        _SHARDED(featcount,maxv=5000,nshards=4)
+    """
+    qparams = qreq_.qparams
+    shard_cfgstr = '_SHARDED(%s,maxv=%s,nshards=%s)' % (
+        qparams.shard_method,
+        qparams.shard_max_vecs,
+        qparams.num_shards,
+    )
+    return build_nnindex_cfgstr(qreq_, daid_list) + shard_cfgstr
+
+
+def request_sharded_wbia_nnindexer(
+    qreq_, daid_list=None, verbose=True, force_rebuild=False, memtrack=None, prog_hook=None
+):
+    r"""
+    builds a ShardedNeighborIndex over the requested annotations. Each shard
+    is loaded (or built) and cached on disk like a single indexer, so only
+    one shard needs to fit in memory while it is being built.
+
+    Args:
+        qreq_ (QueryRequest):  query request object with hyper-parameters
+        daid_list (list): defaults to the internal daids of qreq_
+
+    Returns:
+        ShardedNeighborIndex: nnindexer
+
+    CommandLine:
+        python -m wbia.algo.hots.neighbor_index_cache request_sharded_wbia_nnindexer
+
+    Example:
+        >>> # DISABLE_DOCTEST
+        >>> from wbia.algo.hots.neighbor_index_cache import *  # NOQA
+        >>> import wbia
+        >>> qreq_ = wbia.testdata_qreq_(defaultdb='testdb1',
+        >>>                             p='default:index_method=sharded,shard_max_vecs=5000')
+        >>> nnindexer = request_sharded_wbia_nnindexer(qreq_)
+        >>> assert len(nnindexer.shard_list) > 1
+        >>> assert sorted(nnindexer.get_indexed_aids()) == sorted(qreq_.daids)
+    """
+    if daid_list is None:
+        daid_list = qreq_.get_internal_daids()
+    nnindex_cfgstr = build_sharded_nnindex_cfgstr(qreq_, daid_list)
+    if not force_rebuild:
+        nnindexer = NEIGHBOR_CACHE.get(nnindex_cfgstr)
+        if nnindexer is not None:
+            if ut.VERBOSE:
+                logger.info('... sharded nnindex memcache hit')
+            return nnindexer
+    timer = ut.Timer(verbose=False)
+    timer.tic()
+    shard_aids_list = group_daids_by_shard(qreq_, daid_list)
+    num_shards = len(shard_aids_list)
+    if verbose:
+        logger.info(
+            '[nnindex] building %d shards over %d annots' % (num_shards, len(daid_list))
+        )
+    shard_list = []
+    for shardx, shard_aids in enumerate(shard_aids_list):
+        if prog_hook is not None:
+            prog_hook.set_progress(shardx, num_shards, 'Loading indexer shard')
+        # Shards go straight to the disk cache, the memcache only holds the
+        # sharded indexer (it may be too small to hold every shard)
+        shard = request_diskcached_wbia_nnindexer(
+            qreq_,
+            shard_aids,
+            verbose=verbose,
+            force_rebuild=force_rebuild,
+            memtrack=memtrack,
+        )
+        shard_list.append(shard)
+    nnindexer = ShardedNeighborIndex(
+        shard_list, nnindex_cfgstr, num_workers=qreq_.qparams.shard_workers
+    )
+    NEIGHBOR_CACHE.record_load(timer.toc())
+    NEIGHBOR_CACHE[nnindex_cfgstr] = nnindexer
+    return nnindexer
+
+
 def request_augmented_wbia_nnindexer(
     qreq_, daid_list, verbose=True, use_memcache=True, force_rebuild=False, memtrack=None
 ):
     r"""
-    DO NOT USE. THIS FUNCTION CAN CURRENTLY CAUSE A SEGFAULT
+    DO NOT USE WITHOUT nn_incremental. flann.add_points CAN CAUSE A SEGFAULT
 
     tries to give you an indexer for the requested daids using the least amount
     of computation possible. By loading and adding to a partially build nnindex
     if possible and if that fails fallbs back to request_memcache.
 
+    With nn_incremental the new annotations go into a delta index. The
+    augmented indexer is written to disk (and the uuid map) only after its
+    delta has been compacted in the background.
+
     Args:
         qreq_ (QueryRequest):  query request object with hyper-parameters
         daid_list (list):
@@ -398,6 +844,17 @@ def request_augmented_wbia_nnindexer(
 
         support_data = get_support_data(qreq_, new_daid_list)
         (new_vecs_list, new_fgws_list, new_fxs_list) = support_data
+        cachedir = qreq_.ibs.get_flann_cachedir()
+        uuid_map_fpath = get_nnindexer_uuid_map_fpath(qreq_)
+        daids_hashid = get_data_cfgstr(qreq_.ibs, daid_list)
+        visual_uuid_list = qreq_.ibs.get_annot_visual_uuids(daid_list)
+        finishtup = (uuid_map_fpath, daids_hashid, visual_uuid_list, min_reindex_thresh)
+        if base_nnindexer.incremental:
+            # Persist when the background compaction folds the delta in
+            num_vecs = base_nnindexer.num_indexed_vecs() + sum(map(len, new_vecs_list))
+            base_nnindexer.flann.on_compact = ut.partial(
+                save_compacted_nnindexer, base_nnindexer, cachedir, num_vecs, finishtup
+            )
         base_nnindexer.add_support(
             new_daid_list, new_vecs_list, new_fgws_list, new_fxs_list, verbose=True
         )
@@ -406,16 +863,13 @@ def request_augmented_wbia_nnindexer(
         # Change to the new cfgstr
         nnindex_cfgstr = build_nnindex_cfgstr(qreq_, daid_list)
         nnindexer.cfgstr = nnindex_cfgstr
-        cachedir = qreq_.ibs.get_flann_cachedir()
-        nnindexer.save(cachedir)
-        # Write to inverse uuid
-        if len(daid_list) > min_reindex_thresh:
-            uuid_map_fpath = get_nnindexer_uuid_map_fpath(qreq_)
-            daids_hashid = get_data_cfgstr(qreq_.ibs, daid_list)
-            visual_uuid_list = qreq_.ibs.get_annot_visual_uuids(daid_list)
-            UUID_MAP_CACHE.write_uuid_map_dict(
-                uuid_map_fpath, visual_uuid_list, daids_hashid
-            )
+        if not nnindexer.incremental:
+            nnindexer.save(cachedir)
+            # Write to inverse uuid
+            if len(daid_list) > min_reindex_thresh:
+                UUID_MAP_CACHE.write_uuid_map_dict(
+                    uuid_map_fpath, visual_uuid_list, daids_hashid
+                )
         # Write to memcache
         if ut.VERBOSE:
             logger.info('[aug] Wrote to memcache=%r' % (nnindex_cfgstr,))
@@ -437,6 +891,21 @@ def request_augmented_wbia_nnindexer(
         return nnindexer
 
 
+def save_compacted_nnindexer(nnindexer, cachedir, num_vecs, finishtup):
+    """
+    Called from the compaction thread of an incremental indexer. Saves the
+    indexer and records its annotations in the uuid map, unless more support
+    was added after the compaction was requested.
+    """
+    if nnindexer.num_indexed_vecs() != num_vecs:
+        logger.info('[aug] indexer changed during compaction, not saving')
+        return
+    (uuid_map_fpath, daids_hashid, visual_uuid_list, min_reindex_thresh) = finishtup
+    nnindexer.save(cachedir)
+    if len(visual_uuid_list) > min_reindex_thresh:
+        UUID_MAP_CACHE.write_uuid_map_dict(uuid_map_fpath, visual_uuid_list, daids_hashid)
+
+
 def request_memcached_wbia_nnindexer(
     qreq_,
     daid_list,
@@ -487,27 +956,27 @@ def request_memcached_wbia_nnindexer(
     #    memtrack.report('IN REQUEST MEMCACHE')
     nnindex_cfgstr = build_nnindex_cfgstr(qreq_, daid_list)
     # neighbor memory cache
-    if (
-        not force_rebuild
-        and use_memcache
-        and NEIGHBOR_CACHE.has_key(nnindex_cfgstr)  # NOQA (has_key is for a lru cache)
-    ):
+    nnindexer = None
+    if not force_rebuild and use_memcache:
+        nnindexer = NEIGHBOR_CACHE.get(nnindex_cfgstr)
+    if nnindexer is not None:
         if veryverbose or ut.VERYVERBOSE or ut.VERBOSE:
             logger.info('... nnindex memcache hit: cfgstr=%s' % (nnindex_cfgstr,))
-        nnindexer = NEIGHBOR_CACHE[nnindex_cfgstr]
     else:
         if veryverbose or ut.VERYVERBOSE or ut.VERBOSE:
             logger.info('... nnindex memcache miss: cfgstr=%s' % (nnindex_cfgstr,))
         # Write to inverse uuid
-        nnindexer = request_diskcached_wbia_nnindexer(
-            qreq_,
-            daid_list,
-            nnindex_cfgstr,
-            verbose,
-            force_rebuild=force_rebuild,
-            memtrack=memtrack,
-            prog_hook=prog_hook,
-        )
+        with ut.Timer(verbose=False) as timer:
+            nnindexer = request_diskcached_wbia_nnindexer(
+                qreq_,
+                daid_list,
+                nnindex_cfgstr,
+                verbose,
+                force_rebuild=force_rebuild,
+                memtrack=memtrack,
+                prog_hook=prog_hook,
+            )
+        NEIGHBOR_CACHE.record_load(timer.ellapsed)
         NEIGHBOR_CACHE_WRITE = True
         if NEIGHBOR_CACHE_WRITE:
             # Write to memcache
@@ -570,31 +1039,52 @@ def request_diskcached_wbia_nnindexer(
     # if memtrack is not None:
     #    memtrack.report('[PRE SUPPORT]')
     # Get annot descriptors to index
-    if prog_hook is not None:
-        prog_hook.set_progress(1, 3, 'Loading support data for indexer')
-    logger.info('[nnindex] Loading support data for indexer')
-    vecs_list, fgws_list, fxs_list = get_support_data(qreq_, daid_list)
-    if memtrack is not None:
-        memtrack.report('[AFTER GET SUPPORT DATA]')
-    try:
-        nnindexer = new_neighbor_index(
-            daid_list,
-            vecs_list,
-            fgws_list,
-            fxs_list,
-            flann_params,
-            cachedir,
-            cfgstr=cfgstr,
-            verbose=verbose,
-            force_rebuild=force_rebuild,
-            memtrack=memtrack,
-            prog_hook=prog_hook,
-        )
-    except Exception as ex:
-        ut.printex(
-            ex, True, msg_='cannot build inverted index', key_list=['ibs.get_infostr()']
-        )
-        raise
+    mmap_support = flann_params.get('mmap_support', False)
+    nnindexer = None
+    if mmap_support:
+        support_dpath = get_nnindexer_support_dpath(cachedir, cfgstr)
+        if not force_rebuild:
+            nnindexer = load_mmap_neighbor_index(
+                daid_list,
+                flann_params,
+                support_dpath,
+                cachedir,
+                cfgstr,
+                verbose=verbose,
+                memtrack=memtrack,
+                prog_hook=prog_hook,
+            )
+    if nnindexer is None:
+        if prog_hook is not None:
+            prog_hook.set_progress(1, 3, 'Loading support data for indexer')
+        logger.info('[nnindex] Loading support data for indexer')
+        vecs_list, fgws_list, fxs_list = get_support_data(qreq_, daid_list)
+        if memtrack is not None:
+            memtrack.report('[AFTER GET SUPPORT DATA]')
+        try:
+            nnindexer = new_neighbor_index(
+                daid_list,
+                vecs_list,
+                fgws_list,
+                fxs_list,
+                flann_params,
+                cachedir,
+                cfgstr=cfgstr,
+                verbose=verbose,
+                force_rebuild=force_rebuild,
+                memtrack=memtrack,
+                prog_hook=prog_hook,
+            )
+        except Exception as ex:
+            ut.printex(
+                ex,
+                True,
+                msg_='cannot build inverted index',
+                key_list=['ibs.get_infostr()'],
+            )
+            raise
+        if mmap_support:
+            nnindexer.save_support(support_dpath, verbose=verbose)
     # Record these uuids in the disk based uuid map so they can be augmented if
     # needed
     min_reindex_thresh = qreq_.qparams.min_reindex_thresh
@@ -608,6 +1098,55 @@ def request_diskcached_wbia_nnindexer(
     return nnindexer
 
 
+def get_nnindexer_support_dpath(cachedir, nnindex_cfgstr):
+    """
+    Directory of memory mappable support arrays for an indexer. Unlike the
+    flann file this does not depend on a hash of the vectors, so it can be
+    found before any descriptors are loaded.
+    """
+    _args2_fpath = ut.util_cache._args2_fpath
+    support_dpath = _args2_fpath(cachedir, 'nnsupport_', nnindex_cfgstr, '')
+    return support_dpath
+
+
+def load_mmap_neighbor_index(
+    daid_list,
+    flann_params,
+    support_dpath,
+    cachedir,
+    cfgstr,
+    verbose=True,
+    memtrack=None,
+    prog_hook=None,
+):
+    r"""
+    Constructs a neighbor index whose support arrays are memory mapped from
+    support_dpath (see NeighborIndex.save_support). Every process that loads
+    the same indexer this way shares the pages of the descriptor array
+    instead of holding a private copy.
+
+    Returns:
+        NeighborIndex: nnindexer or None if the support is not on disk
+    """
+    nnindexer = NeighborIndex(flann_params, cfgstr)
+    try:
+        load_success = nnindexer.load_support(support_dpath, verbose=verbose)
+    except Exception as ex:
+        ut.printex(ex, '... cannot load nnindex support', iswarning=True)
+        load_success = False
+    if not load_success:
+        return None
+    if not np.array_equal(nnindexer.ax2_aid, daid_list):
+        logger.info('[nnindex] support annotations do not match, ignoring')
+        return None
+    if memtrack is not None:
+        memtrack.report('AFTER MMAP SUPPORT')
+    nnindexer.ensure_indexer(
+        cachedir, verbose=verbose, memtrack=memtrack, prog_hook=prog_hook
+    )
+    return nnindexer
+
+
 def group_daids_by_cached_nnindexer(
     qreq_, daid_list, min_reindex_thresh, max_covers=None
 ):
@@ -0,0 +1,571 @@
+# -*- coding: utf-8 -*-
+"""
+Approximate / exact nearest neighbor engines used by NeighborIndex.
+
+Every engine exposes the subset of the ``pyflann.FLANN`` interface that
+:class:`wbia.algo.hots.neighbor_index.NeighborIndex` relies on
+(``build_index``, ``nn_index``, ``add_points``, ``remove_points``,
+``save_index``, ``load_index``, ``get_indexed_data``), so the indexer does
+not need to know which one it is talking to.
+
+Engines:
+    flann - pyflann kd-forest (approximate, persisted to disk)
+    brute - exact chunked search using float32 matrix multiplies (BLAS).
+        Nothing is persisted; building only precomputes squared norms.
+
+Any engine can be wrapped in a DeltaIndex to support cheap incremental
+additions and removals. A ShardedIndex searches the engines of several
+sub-indexes in parallel.
+"""
+import logging
+import threading
+from concurrent import futures
+import numpy as np
+import utool as ut
+from vtool._pyflann_backend import pyflann as pyflann
+
+(print, rrr, profile) = ut.inject2(__name__)
+logger = logging.getLogger('wbia')
+
+
+BACKEND_FLANN = 'flann'
+BACKEND_BRUTE = 'brute'
+VALID_BACKENDS = [BACKEND_FLANN, BACKEND_BRUTE]
+
+
+def new_ann_backend(backend=BACKEND_FLANN):
+    """
+    Creates an empty search structure for the requested engine
+
+    Args:
+        backend (str): one of VALID_BACKENDS
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.nn_backends import *  # NOQA
+        >>> engine = new_ann_backend('brute')
+        >>> assert not is_persistent(engine)
+    """
+    if backend == BACKEND_FLANN:
+        return pyflann.FLANN()
+    elif backend == BACKEND_BRUTE:
+        return BruteForceIndex()
+    else:
+        raise ValueError(
+            'Unknown nn backend=%r. Valid backends are %r' % (backend, VALID_BACKENDS)
+        )
+
+
+def merge_neighbors(idx_list, dist_list, K):
+    """
+    Merges (N x K_i) neighbor results of several engines into the K nearest
+    per row. Ties are broken by index.
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.nn_backends import *  # NOQA
+        >>> idx_list = [np.array([[0, 1], [1, 0]]), np.array([[5, 6], [6, 5]])]
+        >>> dist_list = [np.array([[1., 4.], [2., 3.]]), np.array([[1., 2.], [5., 6.]])]
+        >>> idxs, dists = merge_neighbors(idx_list, dist_list, 3)
+        >>> print(idxs.tolist())
+        [[0, 5, 6], [1, 0, 6]]
+    """
+    if len(idx_list) == 1:
+        return idx_list[0][:, 0:K], dist_list[0][:, 0:K]
+    cand_idx = np.hstack(idx_list)
+    cand_dist = np.hstack(dist_list)
+    sortx = np.lexsort((cand_idx, cand_dist))[:, 0:K]
+    qfx2_idx = np.take_along_axis(cand_idx, sortx, axis=1)
+    qfx2_dist = np.take_along_axis(cand_dist, sortx, axis=1)
+    return qfx2_idx, qfx2_dist
+
+
+def is_persistent(engine):
+    """ True if the engine's index structure should be cached on disk """
+    return getattr(engine, 'persistent', True)
+
+
+class BruteForceIndex(object):
+    r"""
+    Exact nearest neighbor search with a pyflann compatible interface.
+
+    Squared euclidean distances are computed as
+    ``|q|^2 + |d|^2 - 2 q.d`` using float32 matrix multiplies over chunks of
+    the query and database vectors, and the top K of each database chunk is
+    merged into a running result. For uint8 SIFT descriptors all the
+    intermediate values are integers below 2 ** 24, so the distances are
+    exactly the ones FLANN returns.
+
+    Args:
+        chunksize (int): approximate number of query x database distances
+            held in memory at once.
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.nn_backends import *  # NOQA
+        >>> rng = np.random.RandomState(0)
+        >>> data = rng.randint(0, 255, (1000, 128)).astype(np.uint8)
+        >>> qvecs = rng.randint(0, 255, (50, 128)).astype(np.uint8)
+        >>> engine = BruteForceIndex(chunksize=10000)
+        >>> engine.build_index(data)
+        >>> idxs, dists = engine.nn_index(qvecs, 3)
+        >>> diff = qvecs[:, None, :].astype(np.float64) - data[None, :, :]
+        >>> dists_ = (diff ** 2).sum(axis=2)
+        >>> idxs_ = dists_.argsort(axis=1)[:, 0:3]
+        >>> assert np.all(idxs == idxs_)
+        >>> assert np.all(dists == np.take_along_axis(dists_, idxs_, axis=1))
+        >>> engine.remove_points([idxs[0, 0]])
+        >>> idxs2, dists2 = engine.nn_index(qvecs[0:1], 1)
+        >>> assert idxs2[0] == idxs[0, 1]
+    """
+
+    persistent = False
+
+    def __init__(self, chunksize=2 ** 22):
+        self.chunksize = chunksize
+        self._data = None
+        self._sqrd_norms = None
+        self._removed = None
+
+    def __len__(self):
+        return 0 if self._data is None else len(self._data)
+
+    def get_indexed_shape(self):
+        return self._data.shape
+
+    def get_indexed_data(self):
+        return self._data, []
+
+    def build_index(self, pts, **kwargs):
+        """ kwargs are the flann params and are ignored """
+        self._data = pts
+        self._sqrd_norms = self._compute_sqrd_norms(pts)
+        self._removed = np.zeros(len(pts), dtype=np.bool_)
+        return {'algorithm': BACKEND_BRUTE}
+
+    def add_points(self, pts, rebuild_threshold=2):
+        self._data = np.vstack((self._data, pts))
+        self._sqrd_norms = np.hstack((self._sqrd_norms, self._compute_sqrd_norms(pts)))
+        self._removed = np.hstack((self._removed, np.zeros(len(pts), dtype=np.bool_)))
+
+    def remove_points(self, id_list):
+        self._removed[id_list] = True
+
+    def save_index(self, filename):
+        # There is no search structure to save
+        pass
+
+    def load_index(self, filename, pts):
+        self.build_index(pts)
+
+    @staticmethod
+    def _compute_sqrd_norms(pts):
+        pts_ = pts.astype(np.float32)
+        return np.einsum('ij,ij->i', pts_, pts_)
+
+    @profile
+    def nn_index(self, qpts, num_neighbors=1, **kwargs):
+        """
+        Returns the indices and squared distances of the num_neighbors
+        nearest indexed vectors (like pyflann, 1d arrays when K=1)
+        """
+        if self._data is None:
+            raise ValueError('build_index(...) method not called first')
+        K = num_neighbors
+        qpts = np.atleast_2d(qpts)
+        num_data = len(self._data)
+        num_valid = num_data - self._removed.sum()
+        assert num_valid >= K, 'more neighbors than there are points'
+        num_query = len(qpts)
+        qfx2_idx = np.empty((num_query, K), dtype=np.int32)
+        qfx2_dist = np.empty((num_query, K), dtype=np.float32)
+        # Bound memory to chunksize distances per block
+        qchunk = max(1, min(num_query, 1024))
+        dchunk = max(K, self.chunksize // qchunk)
+        has_removed = self._removed.any()
+        for qsl in ut.ichunk_slices(num_query, qchunk):
+            qvecs = qpts[qsl].astype(np.float32)
+            q_sqrd_norms = np.einsum('ij,ij->i', qvecs, qvecs)
+            best_idx = np.empty((len(qvecs), 0), dtype=np.int32)
+            best_dist = np.empty((len(qvecs), 0), dtype=np.float32)
+            for dsl in ut.ichunk_slices(num_data, dchunk):
+                dvecs = self._data[dsl].astype(np.float32)
+                dist = np.dot(qvecs, dvecs.T)
+                dist *= -2
+                dist += q_sqrd_norms[:, None]
+                dist += self._sqrd_norms[None, dsl]
+                np.maximum(dist, 0, out=dist)
+                if has_removed:
+                    dist[:, self._removed[dsl]] = np.inf
+                idx = np.arange(dsl.start, dsl.start + len(dvecs), dtype=np.int32)
+                cand_dist = np.hstack((best_dist, dist))
+                cand_idx = np.hstack(
+                    (best_idx, np.broadcast_to(idx, dist.shape).astype(np.int32))
+                )
+                if cand_dist.shape[1] > K:
+                    part = np.argpartition(cand_dist, K - 1, axis=1)[:, 0:K]
+                    best_dist = np.take_along_axis(cand_dist, part, axis=1)
+                    best_idx = np.take_along_axis(cand_idx, part, axis=1)
+                else:
+                    best_dist, best_idx = cand_dist, cand_idx
+            # Order by distance and break ties by index
+            sortx = np.lexsort((best_idx, best_dist))
+            qfx2_dist[qsl] = np.take_along_axis(best_dist, sortx, axis=1)
+            qfx2_idx[qsl] = np.take_along_axis(best_idx, sortx, axis=1)
+        if K == 1:
+            return (qfx2_idx.reshape(num_query), qfx2_dist.reshape(num_query))
+        else:
+            return (qfx2_idx, qfx2_dist)
+
+
+class DeltaIndex(object):
+    r"""
+    Incremental index made of a main engine, a small delta engine over the
+    points added since the main engine was built, and a tombstone mask of
+    removed points.
+
+    add_points only rebuilds the delta (cost proportional to the number of
+    new points), remove_points only marks tombstones, and nn_index merges
+    the results of both engines. Once the delta holds more than
+    compact_thresh points the main engine is rebuilt over everything in a
+    background thread and swapped in when it is ready. Queries keep using
+    the old engines until then.
+
+    Indices are positions in the concatenation of every point ever added,
+    exactly like pyflann after add_points.
+
+    Args:
+        backend (str): engine used for the main and delta indexes
+        compact_thresh (int): number of delta points that triggers a
+            background compaction
+        build_params (dict): default params passed to build_index
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.nn_backends import *  # NOQA
+        >>> rng = np.random.RandomState(0)
+        >>> data = rng.randint(0, 255, (300, 128)).astype(np.uint8)
+        >>> qvecs = rng.randint(0, 255, (20, 128)).astype(np.uint8)
+        >>> engine = DeltaIndex('brute', compact_thresh=75)
+        >>> engine.build_index(data[0:200])
+        >>> engine.add_points(data[200:250])
+        >>> engine.remove_points([3, 210])
+        >>> idxs, dists = engine.nn_index(qvecs, 4)
+        >>> exact = BruteForceIndex()
+        >>> exact.build_index(data[0:250])
+        >>> exact.remove_points([3, 210])
+        >>> idxs_, dists_ = exact.nn_index(qvecs, 4)
+        >>> assert np.all(idxs == idxs_) and np.all(dists == dists_)
+        >>> # passing compact_thresh folds the delta into the main index
+        >>> engine.add_points(data[250:300])
+        >>> engine.wait()
+        >>> assert engine.num_delta() == 0 and engine.num_main() == 300
+        >>> exact.add_points(data[250:300])
+        >>> idxs2, dists2 = engine.nn_index(qvecs, 4)
+        >>> idxs2_, dists2_ = exact.nn_index(qvecs, 4)
+        >>> assert np.all(idxs2 == idxs2_) and np.all(dists2 == dists2_)
+    """
+
+    def __init__(self, backend=BACKEND_FLANN, compact_thresh=50000, build_params=None):
+        self.backend = backend
+        self.compact_thresh = compact_thresh
+        self.build_params = {} if build_params is None else build_params
+        # Called from the compaction thread after the new main index is swapped in
+        self.on_compact = None
+        self._main = new_ann_backend(backend)
+        self._main_data = None
+        self._delta = None
+        self._delta_data = None
+        self._removed = None
+        self._lock = threading.RLock()
+        self._compact_thread = None
+
+    @property
+    def persistent(self):
+        return is_persistent(self._main)
+
+    def __len__(self):
+        return self.num_main() + self.num_delta()
+
+    def num_main(self):
+        return 0 if self._main_data is None else len(self._main_data)
+
+    def num_delta(self):
+        return 0 if self._delta_data is None else len(self._delta_data)
+
+    def get_indexed_data(self):
+        extra_data = [self._delta_data] if self.num_delta() > 0 else []
+        return self._main_data, extra_data
+
+    def build_index(self, pts, **kwargs):
+        self.wait()
+        params = self.build_params.copy()
+        params.update(kwargs)
+        with self._lock:
+            self.build_params = params
+            result = self._main.build_index(pts, **params)
+            self._main_data = pts
+            self._removed = np.zeros(len(pts), dtype=np.bool_)
+            self._set_delta(pts[0:0])
+        return result
+
+    def save_index(self, filename):
+        # The delta is not saved, so fold it into the main index first
+        self.compact()
+        self._main.save_index(filename)
+
+    def load_index(self, filename, pts):
+        self.wait()
+        with self._lock:
+            self._main.load_index(filename, pts)
+            self._main_data = pts
+            self._removed = np.zeros(len(pts), dtype=np.bool_)
+            self._set_delta(pts[0:0])
+
+    def _set_delta(self, delta_data):
+        delta = None
+        if len(delta_data) > 0:
+            delta = new_ann_backend(self.backend)
+            delta.build_index(delta_data, **self.build_params)
+            delta_removed = np.nonzero(self._removed[self.num_main() :])[0]
+            if len(delta_removed) > 0:
+                delta.remove_points(delta_removed)
+        self._delta = delta
+        self._delta_data = delta_data
+
+    def add_points(self, pts, rebuild_threshold=None):
+        with self._lock:
+            if self.num_delta() == 0:
+                delta_data = pts
+            else:
+                delta_data = np.vstack((self._delta_data, pts))
+            new_removed = np.zeros(len(pts), dtype=np.bool_)
+            self._removed = np.hstack((self._removed, new_removed))
+            self._set_delta(delta_data)
+            needs_compact = self.num_delta() > self.compact_thresh
+        if needs_compact:
+            self.compact(background=True)
+
+    def remove_points(self, id_list):
+        id_list = np.asarray(id_list, dtype=np.int64)
+        with self._lock:
+            self._removed[id_list] = True
+            num_main = self.num_main()
+            main_ids = id_list[id_list < num_main]
+            delta_ids = id_list[id_list >= num_main] - num_main
+            if len(main_ids) > 0:
+                self._main.remove_points(main_ids)
+            if len(delta_ids) > 0:
+                self._delta.remove_points(delta_ids)
+
+    def is_compacting(self):
+        thread = self._compact_thread
+        return thread is not None and thread.is_alive()
+
+    def wait(self):
+        """ blocks until a running background compaction finishes """
+        thread = self._compact_thread
+        # on_compact runs in the compaction thread itself
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def compact(self, background=False):
+        """
+        Rebuilds the main index over all points and empties the delta.
+        Tombstoned points stay in the index data and are removed from the
+        new main engine.
+        """
+        if background:
+            if self.is_compacting():
+                return
+        else:
+            self.wait()
+        with self._lock:
+            if self.num_delta() == 0:
+                return
+            pts = np.vstack((self._main_data, self._delta_data))
+        if background:
+            self._compact_thread = ut.spawn_background_thread(self._compact, pts)
+        else:
+            self._compact(pts)
+
+    def _compact(self, pts):
+        logger.info('[nnindex] compacting delta index into %d points' % (len(pts),))
+        main = new_ann_backend(self.backend)
+        main.build_index(pts, **self.build_params)
+        with self._lock:
+            # Account for points removed and added while the index was built
+            removed_ids = np.nonzero(self._removed[0 : len(pts)])[0]
+            if len(removed_ids) > 0:
+                main.remove_points(removed_ids)
+            num_compacted = len(pts) - self.num_main()
+            delta_data = self._delta_data[num_compacted:]
+            self._main = main
+            self._main_data = pts
+            self._set_delta(delta_data)
+        if self.on_compact is not None:
+            self.on_compact()
+
+    @profile
+    def nn_index(self, qpts, num_neighbors=1, **kwargs):
+        """
+        Queries the main and delta engines and merges their results
+        (like pyflann, 1d arrays when K=1)
+        """
+        K = num_neighbors
+        qpts = np.atleast_2d(qpts)
+        num_query = len(qpts)
+        with self._lock:
+            num_main = self.num_main()
+            num_delta = self.num_delta()
+            removed = self._removed
+            parts = [
+                (self._main, 0, num_main - removed[0:num_main].sum()),
+                (self._delta, num_main, num_delta - removed[num_main:].sum()),
+            ]
+        idx_list = []
+        dist_list = []
+        for engine, offset, num_valid in parts:
+            K_ = min(K, num_valid)
+            if engine is None or K_ == 0:
+                continue
+            idxs, dists = engine.nn_index(qpts, K_, **kwargs)
+            idx_list.append(idxs.reshape(num_query, K_) + offset)
+            dist_list.append(dists.reshape(num_query, K_))
+        assert (
+            sum(idxs.shape[1] for idxs in idx_list) >= K
+        ), 'more neighbors than there are points'
+        qfx2_idx, qfx2_dist = merge_neighbors(idx_list, dist_list, K)
+        if K == 1:
+            return (qfx2_idx.reshape(num_query), qfx2_dist.reshape(num_query))
+        else:
+            return (qfx2_idx, qfx2_dist)
+
+
+class ShardedIndex(object):
+    r"""
+    Searches the engines of several shards in parallel and merges their
+    neighbors. Shard i covers the global indices
+    ``offsets[i]:offsets[i] + num_list[i]``.
+
+    The shards are built (and cached) separately, so this engine cannot be
+    built, saved, or loaded itself.
+
+    Args:
+        engine_list (list): built engines, one per shard
+        num_list (list): number of points indexed by each engine
+        num_workers (int): threads used for the queries (default one per
+            shard). FLANN and BLAS release the GIL.
+        removed_list (list): optional boolean masks of the points already
+            removed from each engine
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.nn_backends import *  # NOQA
+        >>> rng = np.random.RandomState(0)
+        >>> data = rng.randint(0, 255, (300, 128)).astype(np.uint8)
+        >>> qvecs = rng.randint(0, 255, (20, 128)).astype(np.uint8)
+        >>> engine_list = [BruteForceIndex(), BruteForceIndex(), BruteForceIndex()]
+        >>> for engine, sl in zip(engine_list, [slice(0, 50), slice(50, 200), slice(200, 300)]):
+        ...     _ = engine.build_index(data[sl])
+        >>> engine = ShardedIndex(engine_list, [50, 150, 100])
+        >>> idxs, dists = engine.nn_index(qvecs, 4)
+        >>> exact = BruteForceIndex()
+        >>> _ = exact.build_index(data)
+        >>> idxs_, dists_ = exact.nn_index(qvecs, 4)
+        >>> assert np.all(idxs == idxs_) and np.all(dists == dists_)
+    """
+
+    persistent = False
+
+    def __init__(self, engine_list, num_list, num_workers=None, removed_list=None):
+        self.engine_list = engine_list
+        self.num_list = list(num_list)
+        self.offsets = np.cumsum([0] + self.num_list[:-1]).astype(np.int32)
+        # Points removed from each shard (the engines do not report it)
+        if removed_list is None:
+            self._removed = [np.zeros(num, dtype=np.bool_) for num in self.num_list]
+        else:
+            self._removed = [np.asarray(removed, dtype=np.bool_) for removed in removed_list]
+            assert [len(removed) for removed in self._removed] == self.num_list
+        if num_workers is None:
+            num_workers = len(engine_list)
+        self.num_workers = num_workers
+        self._executor = None
+
+    def __len__(self):
+        return sum(self.num_list)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        return state
+
+    def shutdown(self):
+        """ Stops the query threads (they are restarted on demand) """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def num_valid_list(self):
+        """ Number of points of each shard that are not removed """
+        return [
+            num - removed.sum() for num, removed in zip(self.num_list, self._removed)
+        ]
+
+    def get_indexed_data(self):
+        return None, [engine.get_indexed_data()[0] for engine in self.engine_list]
+
+    def build_index(self, pts, **kwargs):
+        raise NotImplementedError('shards are built separately')
+
+    def add_points(self, pts, rebuild_threshold=None):
+        raise NotImplementedError('shards are built separately')
+
+    def remove_points(self, id_list):
+        id_list = np.asarray(id_list, dtype=np.int64)
+        shardx_list = np.searchsorted(self.offsets, id_list, side='right') - 1
+        for shardx, engine in enumerate(self.engine_list):
+            local_ids = id_list[shardx_list == shardx] - self.offsets[shardx]
+            if len(local_ids) > 0:
+                engine.remove_points(local_ids)
+                self._removed[shardx][local_ids] = True
+
+    def _query_shard(self, shardx, qpts, K_, kwargs):
+        idxs, dists = self.engine_list[shardx].nn_index(qpts, K_, **kwargs)
+        idxs = idxs.reshape(len(qpts), K_) + self.offsets[shardx]
+        dists = dists.reshape(len(qpts), K_)
+        return idxs, dists
+
+    @profile
+    def nn_index(self, qpts, num_neighbors=1, **kwargs):
+        """
+        Returns the merged global indices and squared distances
+        (like pyflann, 1d arrays when K=1)
+        """
+        K = num_neighbors
+        qpts = np.atleast_2d(qpts)
+        num_query = len(qpts)
+        num_valid_list = self.num_valid_list()
+        assert sum(num_valid_list) >= K, 'more neighbors than there are points'
+        shardx_list = [shardx for shardx, num in enumerate(num_valid_list) if num > 0]
+        args_list = [
+            (shardx, qpts, min(K, num_valid_list[shardx]), kwargs)
+            for shardx in shardx_list
+        ]
+        if self.num_workers > 1 and len(shardx_list) > 1:
+            if self._executor is None:
+                self._executor = futures.ThreadPoolExecutor(self.num_workers)
+            future_list = [
+                self._executor.submit(self._query_shard, *args) for args in args_list
+            ]
+            result_list = [future.result() for future in future_list]
+        else:
+            result_list = [self._query_shard(*args) for args in args_list]
+        idx_list = [idxs for idxs, dists in result_list]
+        dist_list = [dists for idxs, dists in result_list]
+        qfx2_idx, qfx2_dist = merge_neighbors(idx_list, dist_list, K)
+        if K == 1:
+            return (qfx2_idx.reshape(num_query), qfx2_dist.reshape(num_query))
+        else:
+            return (qfx2_idx, qfx2_dist)
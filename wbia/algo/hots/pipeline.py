@@ -41,16 +41,19 @@ TODO:
     * Don't preload the nn-indexer in case the nearest neighbors have already
     been computed?
 """
+import contextlib
 import logging
 from six.moves import zip, range, map
 import numpy as np
 import vtool as vt
 from wbia.algo.hots import hstypes
 from wbia.algo.hots import chip_match
+from wbia.algo.hots import neighbor_cache
 from wbia.algo.hots import nn_weights
 from wbia.algo.hots import scoring
+from wbia.algo.hots import sver_batch
 from wbia.algo.hots import _pipeline_helpers as plh  # NOQA
-from collections import namedtuple
+from collections import namedtuple, deque
 import utool as ut
 
 print, rrr, profile = ut.inject2(__name__)
@@ -70,12 +73,12 @@ VERB_PIPELINE = NOT_QUIET and (
 VERYVERBOSE_PIPELINE = ut.get_argflag(('--very-verbose-pipeline', '--very-verb-pipe'))
 
 USE_HOTSPOTTER_CACHE = not ut.get_argflag('--nocache-hs') and ut.USE_CACHE
+# Disk cache of step 1 neighbors (see neighbor_cache.NN_CACHE_BUDGET)
 USE_NN_MID_CACHE = (
-    (True and ut.is_developer())
+    ut.get_argflag('--nn-cache')
     and not ut.get_argflag('--nocache-nnmid')
     and USE_HOTSPOTTER_CACHE
 )
-USE_NN_MID_CACHE = False
 
 
 NN_LBL = 'Assign NN:       '
@@ -561,6 +564,8 @@ def cachemiss_nn_compute_fn(
                 qvec_iter, num_neighbors_list, Kpad_list, impossible_daids_list
             )
         ]
+    elif qreq_.qparams.batch_knn and len(qvecs_list) > 1:
+        idx_dist_list = batched_knn(qreq_.indexer, qvecs_list, num_neighbors_list)
     else:
         qvec_iter = ut.ProgressIter(qvecs_list, lbl=NN_LBL, prog_hook=prog_hook, **PROGKW)
         idx_dist_list = [
@@ -578,6 +583,52 @@ def cachemiss_nn_compute_fn(
     return nns_list
 
 
+@profile
+def batched_knn(indexer, qvecs_list, num_neighbors_list):
+    """
+    Finds the neighbors of several queries with a single knn call.
+
+    The query vectors are stacked and searched with the largest number of
+    neighbors.  The results are sliced back into one (idxs, dists) pair per
+    query and truncated to that query's number of neighbors.
+
+    Args:
+        indexer (NeighborIndex):
+        qvecs_list (list): query vectors of each query
+        num_neighbors_list (list): number of neighbors of each query
+
+    Returns:
+        list: idx_dist_list
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.pipeline import *  # NOQA
+        >>> import wbia
+        >>> qreq_ = wbia.testdata_qreq_(defaultdb='testdb1', qaid_override=[1, 2, 3])
+        >>> qreq_.load_indexer()
+        >>> qvecs_list = qreq_.internal_qannots.vecs
+        >>> num_neighbors_list = [5, 6, 7]
+        >>> idx_dist_list = batched_knn(qreq_.indexer, qvecs_list, num_neighbors_list)
+        >>> for qvecs, num, (idxs, dists) in zip(qvecs_list, num_neighbors_list, idx_dist_list):
+        >>>     assert idxs.shape == dists.shape == (len(qvecs), num)
+    """
+    max_neighbors = max(num_neighbors_list)
+    if max_neighbors > indexer.num_indexed:
+        # knn clips K to the database size, keep the per-query behavior
+        return [
+            indexer.knn(qfx2_vec, num_neighbors)
+            for qfx2_vec, num_neighbors in zip(qvecs_list, num_neighbors_list)
+        ]
+    offsets = np.cumsum([0] + [len(qfx2_vec) for qfx2_vec in qvecs_list])
+    qvecs_stack = np.vstack(qvecs_list)
+    idxs_stack, dists_stack = indexer.knn(qvecs_stack, max_neighbors)
+    idx_dist_list = [
+        (idxs_stack[start:stop, 0:num], dists_stack[start:stop, 0:num])
+        for start, stop, num in zip(offsets[:-1], offsets[1:], num_neighbors_list)
+    ]
+    return idx_dist_list
+
+
 @profile
 def nearest_neighbors(
     qreq_, Kpad_list, impossible_daids_list=None, verbose=VERB_PIPELINE
@@ -700,28 +751,42 @@ def nearest_neighbors(
     # Find the nearest neighbors of each descriptor vector
     # USE_NN_MID_CACHE = ut.is_developer()
 
-    use_cache = USE_NN_MID_CACHE
-    if use_cache:
-        nn_cachedir, nn_mid_cacheid_list = nearest_neighbor_cacheid2(qreq_, Kpad_list)
-    else:
-        # hacks
-        nn_mid_cacheid_list = [None] * len(qreq_.get_internal_qaids())
-        nn_cachedir = None
-
-    nns_list = ut.tryload_cache_list_with_compute(
-        use_cache,
-        nn_cachedir,
-        'neighbs4',
-        nn_mid_cacheid_list,
-        cachemiss_nn_compute_fn,
-        qreq_,
-        Kpad_list,
-        impossible_daids_list,
-        K,
-        Knorm,
-        requery,
-        verbose,
-    )
+    nn_args = (qreq_, Kpad_list, impossible_daids_list, K, Knorm, requery, verbose)
+    if not USE_NN_MID_CACHE:
+        ismiss_list = [True] * len(qreq_.get_internal_qaids())
+        nns_list = cachemiss_nn_compute_fn(ismiss_list, *nn_args)
+        return nns_list
+
+    nn_cachedir, nn_mid_cacheid_list = nearest_neighbor_cacheid2(qreq_, Kpad_list)
+    # The cached indices are positions in the indexer, they are only valid
+    # for an indexer that stores the same (aid, fx) at the same positions
+    layout_cfgstr = qreq_.indexer.get_layout_cfgstr()
+    nn_mid_cacheid_list = [cacheid + layout_cfgstr for cacheid in nn_mid_cacheid_list]
+    nn_cache = neighbor_cache.get_neighbor_cache(nn_cachedir)
+    cached_list = nn_cache.load_many(nn_mid_cacheid_list)
+    internal_qaids = qreq_.get_internal_qaids()
+    nns_list = [
+        None if cached is None else Neighbors(qaid, cached[0], cached[1], cached[2])
+        for qaid, cached in zip(internal_qaids, cached_list)
+    ]
+    ismiss_list = [nn is None for nn in nns_list]
+    if any(ismiss_list):
+        newnns_list = cachemiss_nn_compute_fn(ismiss_list, *nn_args)
+        index_list = ut.list_where(ismiss_list)
+        for index, nn in zip(index_list, newnns_list):
+            nn_cache.save(
+                nn_mid_cacheid_list[index], nn.neighb_idxs, nn.neighb_dists, nn.qfx_list
+            )
+            nns_list[index] = nn
+    if verbose:
+        logger.info(
+            '[hs] %d/%d neighbor cache hits (%s)'
+            % (
+                ismiss_list.count(False),
+                len(ismiss_list),
+                ut.repr2(nn_cache.get_stats(), precision=2),
+            )
+        )
     return nns_list
 
 
@@ -1334,19 +1399,155 @@ def _spatial_verification(qreq_, cm_list, verbose=VERB_PIPELINE):
         qreq_, cm_list, nNameShortList, nAnnotPerName, score_method
     )
     prog_hook = None if qreq_.prog_hook is None else qreq_.prog_hook.next_subhook()
-    cm_progiter = ut.ProgressIter(
-        cm_shortlist,
-        length=len(cm_shortlist),
-        prog_hook=prog_hook,
-        lbl=SVER_LVL,
-        **PROGKW,
+    cm_list_SVER = list(
+        ut.ProgressIter(
+            iter_spatial_verification(qreq_, cm_shortlist),
+            length=len(cm_shortlist),
+            prog_hook=prog_hook,
+            lbl=SVER_LVL,
+            **PROGKW,
+        )
     )
-
-    cm_list_SVER = [sver_single_chipmatch(qreq_, cm) for cm in cm_progiter]
     # rescore after verification?
     return cm_list_SVER
 
 
+def iter_spatial_verification(qreq_, cm_shortlist, verbose=False):
+    r"""
+    Generates spatially verified chipmatches in the same order as the input
+    shortlist.
+
+    The executor is selected with the ``sv_executor`` query param. In
+    ``'thread'`` or ``'process'`` mode the shortlist is verified in batches of
+    ``sv_chunksize`` chipmatches by ``sv_workers`` workers. Keypoints and
+    weights are read in this process, only the RANSAC runs in the workers,
+    and the results are identical to the serial path. The workers of
+    :func:`sver_executor_context` are used when it is active, otherwise a
+    pool is started for this call.
+
+    Args:
+        qreq_ (QueryRequest):  query request object with hyper-parameters
+        cm_shortlist (list): list of ChipMatch objects
+
+    Yields:
+        wbia.ChipMatch: cmSV
+
+    CommandLine:
+        python -m wbia.algo.hots.pipeline --test-iter_spatial_verification
+
+    Example:
+        >>> # DISABLE_DOCTEST
+        >>> from wbia.algo.hots.pipeline import *  # NOQA
+        >>> ibs, qreq_, cm_list = plh.testdata_pre_sver('PZ_MTEST', qaid_list=[18, 19, 20])
+        >>> cm_list_serial = list(iter_spatial_verification(qreq_, cm_list))
+        >>> qreq_.qparams.sv_executor = 'process'
+        >>> qreq_.qparams.sv_chunksize = 1
+        >>> cm_list_par = list(iter_spatial_verification(qreq_, cm_list))
+        >>> for cm1, cm2 in zip(cm_list_serial, cm_list_par):
+        >>>     assert np.all(cm1.daid_list == cm2.daid_list)
+        >>>     assert all(ut.lmap(np.array_equal, cm1.fm_list, cm2.fm_list))
+    """
+    sv_executor = qreq_.qparams.sv_executor
+    if sv_executor == 'serial' or qreq_.ibs.force_serial or len(cm_shortlist) <= 1:
+        for cm in cm_shortlist:
+            yield sver_single_chipmatch(qreq_, cm, verbose=verbose)
+        return
+
+    nworkers = _sver_num_workers(qreq_)
+    chunksize = max(1, qreq_.qparams.sv_chunksize)
+    executor = getattr(qreq_, 'sver_executor', None)
+    own_executor = executor is None
+    if own_executor:
+        executor = _make_sver_executor(qreq_)
+
+    # Keep a bounded number of batches in flight so the results can be
+    # streamed back without preparing the entire shortlist up front.
+    max_inflight = 2 * nworkers
+    pending = deque()
+    cm_chunk_iter = iter(ut.ichunks(cm_shortlist, chunksize))
+    try:
+        while True:
+            while len(pending) < max_inflight:
+                cm_chunk = next(cm_chunk_iter, None)
+                if cm_chunk is None:
+                    break
+                args_chunk = [_sver_chipmatch_args(qreq_, cm) for cm in cm_chunk]
+                future = executor.submit(_sver_svtup_batch, args_chunk)
+                pending.append((cm_chunk, args_chunk, future))
+            if len(pending) == 0:
+                break
+            cm_chunk, args_chunk, future = pending.popleft()
+            svtups_chunk = future.result()
+            for cm, svtup_args, svtup_list in zip(cm_chunk, args_chunk, svtups_chunk):
+                top_dlen_sqrd_list = svtup_args[3]
+                yield _sver_finalize_chipmatch(qreq_, cm, svtup_list, top_dlen_sqrd_list)
+    finally:
+        for cm_chunk, args_chunk, future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+def _sver_num_workers(qreq_):
+    nworkers = qreq_.qparams.sv_workers
+    if nworkers is None:
+        nworkers = ut.num_cpus()
+    return nworkers
+
+
+def _make_sver_executor(qreq_):
+    """ Starts the spatial verification workers of the sv_executor param """
+    from concurrent import futures
+
+    sv_executor = qreq_.qparams.sv_executor
+    nworkers = _sver_num_workers(qreq_)
+    if sv_executor == 'process':
+        return futures.ProcessPoolExecutor(nworkers)
+    elif sv_executor == 'thread':
+        return futures.ThreadPoolExecutor(nworkers)
+    else:
+        raise ValueError('Unknown sv_executor=%r' % (sv_executor,))
+
+
+@contextlib.contextmanager
+def sver_executor_context(qreq_):
+    r"""
+    Shares one pool of spatial verification workers between every pipeline
+    run of ``qreq_`` and of its shallow copies (e.g. the query chunks of
+    match_chips4), instead of starting a pool for every run.
+
+    Example:
+        >>> # DISABLE_DOCTEST
+        >>> from wbia.algo.hots.pipeline import *  # NOQA
+        >>> ibs, qreq_, cm_list = plh.testdata_pre_sver('PZ_MTEST', qaid_list=[18, 19])
+        >>> qreq_.qparams.sv_executor = 'thread'
+        >>> with sver_executor_context(qreq_) as executor:
+        >>>     sub_qreq_ = qreq_.shallowcopy(qaids=[18])
+        >>>     assert sub_qreq_.sver_executor is executor
+        >>> assert qreq_.sver_executor is None
+    """
+    executor = getattr(qreq_, 'sver_executor', None)
+    if executor is not None:
+        # An outer context already shares its workers
+        yield executor
+        return
+    qparams = qreq_.qparams
+    if (
+        qparams.sv_on
+        and qparams.xy_thresh is not None
+        and qparams.sv_executor != 'serial'
+        and not qreq_.ibs.force_serial
+    ):
+        executor = _make_sver_executor(qreq_)
+    qreq_.sver_executor = executor
+    try:
+        yield executor
+    finally:
+        qreq_.sver_executor = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
 # @profile
 def sver_single_chipmatch(qreq_, cm, verbose=False):
     r"""
@@ -1452,6 +1653,23 @@ def sver_single_chipmatch(qreq_, cm, verbose=False):
         >>>                    refine_method=refine_method)
         >>> ut.show_if_requested()
     """
+    svtup_args = _sver_chipmatch_args(qreq_, cm)
+    svtup_list = _sver_svtup_list(*svtup_args, verbose=verbose)
+
+    # <SENTINAL>
+
+    top_dlen_sqrd_list = svtup_args[3]
+    cmSV = _sver_finalize_chipmatch(qreq_, cm, svtup_list, top_dlen_sqrd_list)
+    return cmSV
+
+
+def _sver_chipmatch_args(qreq_, cm):
+    """
+    Gathers everything needed to spatially verify the shortlist of a single
+    chipmatch. This reads from the database, so it must run in the process
+    that owns ``qreq_``. The result only contains arrays and scalars and can
+    be sent to a worker process.
+    """
     qaid = cm.qaid
     use_chip_extent = qreq_.qparams.use_chip_extent
     xy_thresh = qreq_.qparams.xy_thresh
@@ -1460,7 +1678,6 @@ def sver_single_chipmatch(qreq_, cm, verbose=False):
     min_nInliers = qreq_.qparams.min_nInliers
     full_homog_checks = qreq_.qparams.full_homog_checks
     refine_method = qreq_.qparams.refine_method
-    sver_output_weighting = qreq_.qparams.sver_output_weighting
     # Precompute sver cmtup_old
     kpts1 = qreq_.get_qreq_qannot_kpts(qaid).astype(np.float64)
     kpts2_list = qreq_.get_qreq_dannot_kpts(cm.daid_list)
@@ -1484,43 +1701,76 @@ def sver_single_chipmatch(qreq_, cm, verbose=False):
         match_weight_list = [qweights.take(fm.T[0]) for fm in cm.fm_list]
     else:
         match_weight_list = [np.ones(len(fm), dtype=np.float64) for fm in cm.fm_list]
-
-    # Make an svtup for every daid in the shortlist
-    _iter1 = zip(
-        cm.daid_list,
-        cm.fm_list,
-        cm.fsv_list,
+    sver_params = dict(
+        sv_method=qreq_.qparams.sv_method,
+        xy_thresh=xy_thresh,
+        scale_thresh=scale_thresh,
+        ori_thresh=ori_thresh,
+        min_nInliers=min_nInliers,
+        full_homog_checks=full_homog_checks,
+        refine_method=refine_method,
+    )
+    svtup_args = (
+        kpts1,
         kpts2_list,
+        cm.fm_list,
         top_dlen_sqrd_list,
         match_weight_list,
+        sver_params,
     )
-    if verbose:
-        _iter1 = ut.ProgIter(
-            _iter1, length=len(cm.daid_list), lbl='sver shortlist', freq=1
+    return svtup_args
+
+
+def _sver_svtup_batch(svtup_args_list):
+    """ worker function for the parallel spatial verification executors """
+    return [_sver_svtup_list(*svtup_args) for svtup_args in svtup_args_list]
+
+
+def _sver_svtup_list(
+    kpts1,
+    kpts2_list,
+    fm_list,
+    top_dlen_sqrd_list,
+    match_weight_list,
+    sver_params,
+    verbose=False,
+):
+    """
+    Runs spatial verification for every daid in a shortlist.  Does not touch
+    the database.
+    """
+    xy_thresh = sver_params['xy_thresh']
+    scale_thresh = sver_params['scale_thresh']
+    ori_thresh = sver_params['ori_thresh']
+    min_nInliers = sver_params['min_nInliers']
+    full_homog_checks = sver_params['full_homog_checks']
+    refine_method = sver_params['refine_method']
+    if sver_params['sv_method'] == 'batch':
+        # Score the affine hypotheses of the whole shortlist at once
+        svtup_list = sver_batch.batch_spatially_verify_kpts(
+            kpts1,
+            kpts2_list,
+            fm_list,
+            top_dlen_sqrd_list,
+            match_weight_list,
+            xy_thresh=xy_thresh,
+            scale_thresh=scale_thresh,
+            ori_thresh=ori_thresh,
+            min_nInliers=min_nInliers,
+            full_homog_checks=full_homog_checks,
+            refine_method=refine_method,
         )
+        return svtup_list
+    # Make an svtup for every daid in the shortlist
+    _iter1 = zip(fm_list, kpts2_list, top_dlen_sqrd_list, match_weight_list)
+    if verbose:
+        _iter1 = ut.ProgIter(_iter1, length=len(fm_list), lbl='sver shortlist', freq=1)
     svtup_list = []
-    for daid, fm, fsv, kpts2, dlen_sqrd2, match_weights in _iter1:
+    for fm, kpts2, dlen_sqrd2, match_weights in _iter1:
         if len(fm) == 0:
             # skip results without any matches
             sv_tup = None
         else:
-
-            # sver_testdata = dict(
-            #     kpts1=kpts1,
-            #     kpts2=kpts2,
-            #     fm=fm,
-            #     xy_thresh=xy_thresh,
-            #     scale_thresh=scale_thresh,
-            #     ori_thresh=ori_thresh,
-            #     dlen_sqrd2=dlen_sqrd2,
-            #     min_nInliers=min_nInliers,
-            #     match_weights=match_weights,
-            #     full_homog_checks=full_homog_checks,
-            #     refine_method=refine_method
-            # )
-
-            # locals().update(ut.load_data('sver_testdata.pkl'))
-
             try:
                 # Compute homography from chip2 to chip1 returned homography
                 # maps image1 space into image2 space image1 is a query chip
@@ -1555,8 +1805,16 @@ def sver_single_chipmatch(qreq_, cm, verbose=False):
                 )
                 sv_tup = None
         svtup_list.append(sv_tup)
+    return svtup_list
 
-    # <SENTINAL>
+
+def _sver_finalize_chipmatch(qreq_, cm, svtup_list, top_dlen_sqrd_list):
+    """
+    Builds the spatially verified chipmatch from the sver tuples of each daid
+    in the shortlist of ``cm``.
+    """
+    xy_thresh = qreq_.qparams.xy_thresh
+    sver_output_weighting = qreq_.qparams.sver_output_weighting
 
     # New way
     inliers_list = []
@@ -1578,6 +1836,8 @@ def sver_single_chipmatch(qreq_, cm, verbose=False):
     cmSV.H_list = H_list_SV
 
     if sver_output_weighting:
+        # NOTE: this uses the extent of the last daid in the shortlist
+        dlen_sqrd2 = top_dlen_sqrd_list[-1]
         homog_err_weight_list = []
         xy_thresh_sqrd = dlen_sqrd2 * xy_thresh
         for sv_tup in svtup_list_:
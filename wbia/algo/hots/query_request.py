@@ -339,6 +339,8 @@ class QueryRequest(ut.NiceRepr):
             qreq_.ibs = wbia.IBEISController()
 
         qreq_.indexer = None  # The nearest neighbor mechanism
+        # Spatial verification workers (see pipeline.sver_executor_context)
+        qreq_.sver_executor = None
         qreq_.normalizer = None  # The scoring normalization mechanism
         qreq_.dstcnvs_normer = None
         qreq_.hasloaded = False
@@ -592,6 +594,7 @@ class QueryRequest(ut.NiceRepr):
         # state['ibs'] = None
         state['prog_hook'] = None
         state['indexer'] = None
+        state['sver_executor'] = None
         state['normalizer'] = None
         state['dstcnvs_normer'] = None
         state['hasloaded'] = False
@@ -1204,7 +1207,7 @@ class QueryRequest(ut.NiceRepr):
         qreq_.qannots.preload('kpts', 'vecs')
         if prog_hook is not None:
             prog_hook(2, 3, 'ensure database features')
-        qreq_.dannots.preload('kpts')
+        neighbor_index_cache.preload_resident_dannots(qreq_, 'kpts')
         if prog_hook is not None:
             prog_hook(3, 3, 'computed features')
 
@@ -1214,7 +1217,7 @@ class QueryRequest(ut.NiceRepr):
         if verbose:
             logger.info('[qreq] ensure_featweights')
         qreq_.qannots.preload('fgweights')
-        qreq_.dannots.preload('fgweights')
+        neighbor_index_cache.preload_resident_dannots(qreq_, 'fgweights')
 
     @profile
     def load_indexer(qreq_, verbose=ut.NOT_QUIET, force=False, prog_hook=None):
@@ -1236,6 +1239,12 @@ class QueryRequest(ut.NiceRepr):
                     prog_hook=prog_hook,
                     **qreq_._indexer_request_params,
                 )
+            elif index_method == 'sharded':
+                if ut.VERYVERBOSE or verbose:
+                    logger.info('[qreq] loading sharded indexer')
+                indexer = neighbor_index_cache.request_sharded_wbia_nnindexer(
+                    qreq_, verbose=verbose, prog_hook=prog_hook
+                )
             # elif index_method == 'multi':
             #    if ut.VERYVERBOSE or verbose:
             #        logger.info('[qreq] loading multi indexer normalizer')
@@ -1328,6 +1337,33 @@ class QueryRequest(ut.NiceRepr):
             )
         return cm_list
 
+    def execute_iter(qreq_, qaids=None, prog_hook=None, use_cache=None):
+        r"""
+        Runs the hotspotter pipeline and yields chip match objects as soon as
+        each chunk of queries finishes.  Unlike execute, the results are not
+        in the order of qreq_.qaids and are never held together in memory.
+
+        Example:
+            >>> # SLOW_DOCTEST
+            >>> # xdoctest: +SKIP
+            >>> from wbia.algo.hots.query_request import *  # NOQA
+            >>> import wbia
+            >>> qreq_ = wbia.testdata_qreq_()
+            >>> qaid2_cm = {cm.qaid: cm for cm in qreq_.execute_iter()}
+            >>> assert set(qaid2_cm.keys()) == set(qreq_.qaids)
+        """
+        from wbia.algo.hots import match_chips4 as mc4
+
+        if qaids is not None:
+            qreq_ = qreq_.shallowcopy(qaids=qaids)
+        qreq_.prog_hook = prog_hook
+        return mc4.submit_query_request_iter(
+            qreq_,
+            use_cache=use_cache,
+            verbose=True,
+            save_qcache=use_cache,
+        )
+
 
 def cfg_deepcopy_test():
     """
@@ -4,6 +4,7 @@ import numpy as np
 import vtool as vt
 import utool as ut
 from wbia.algo.hots import _pipeline_helpers as plh  # NOQA
+from wbia.algo.hots import name_scoring
 
 print, rrr, profile = ut.inject2(__name__)
 logger = logging.getLogger('wbia')
@@ -57,7 +58,15 @@ def score_chipmatch_list(qreq_, cm_list, score_method, progkw=None):
             cm.score_name_maxcsum(qreq_)
     elif score_method == 'nsum':
         for cm in ut.ProgressIter(cm_list, lbl=lbl, **progkw):
-            cm.score_name_nsum(qreq_)
+            cm.evaluate_csum_annot_score(qreq_)
+            cm.evaluate_dnids(qreq_)
+        # Score the names of all chipmatches in one vectorized pass
+        fmech_scores_list = name_scoring.compute_fmech_score_list(cm_list, qreq_=qreq_)
+        for cm, fmech_scores in zip(cm_list, fmech_scores_list):
+            cm.algo_name_scores['nsum'] = fmech_scores
+            cm.set_cannonical_name_score(
+                cm.algo_annot_scores['csum'], cm.algo_name_scores['nsum']
+            )
     else:
         raise NotImplementedError('[hs] unknown scoring method:' + score_method)
 
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+Batched spatial verification kernel.
+
+The per-pair path (:func:`vtool.spatially_verify_kpts`) enumerates one affine
+hypothesis per feature correspondence and tests it against every other
+correspondence of the same annotation pair. On a shortlist most of that time
+is python overhead per pair rather than arithmetic.
+
+Here the correspondences of many pairs are stacked into padded arrays and the
+affine hypotheses of all pairs are scored at once. Only the refinement of the
+best hypothesis (homography estimation) is done pair by pair.
+
+CommandLine:
+    python wbia/algo/hots/tests/bench.py benchmark_sver_batch
+"""
+import logging
+import numpy as np
+import vtool as vt
+import utool as ut
+
+(print, rrr, profile) = ut.inject2(__name__)
+logger = logging.getLogger('wbia')
+
+
+TAU = 2 * np.pi  # References: tauday.com
+
+# Upper bound on the number of (pair, hypothesis, correspondence) elements
+# that are scored at once. Each element costs about 64 bytes of scratch space.
+SV_BATCH_ELEMS = 2 ** 20
+
+# Padding keypoint with an invertible unit shape
+_PAD_KPT = np.array([0.0, 0.0, 1.0, 0.0, 1.0, 0.0], dtype=np.float64)
+
+
+def batch_spatially_verify_kpts(
+    kpts1,
+    kpts2_list,
+    fm_list,
+    dlen_sqrd2_list,
+    match_weight_list,
+    xy_thresh=0.01,
+    scale_thresh=2.0,
+    ori_thresh=TAU / 4.0,
+    min_nInliers=4,
+    full_homog_checks=True,
+    refine_method='homog',
+    max_nInliers=5000,
+    batch_elems=SV_BATCH_ELEMS,
+):
+    r"""
+    Spatially verifies one query annotation against a shortlist of database
+    annotations.
+
+    Equivalent to calling :func:`vtool.spatially_verify_kpts` with
+    ``returnAff=True`` on each pair, but the affine hypothesis search is done
+    for all pairs at once.
+
+    Args:
+        kpts1 (ndarray): keypoints of the query annotation
+        kpts2_list (list): keypoints of each database annotation
+        fm_list (list): feature matches of each pair
+        dlen_sqrd2_list (list): squared diagonal length of each database chip
+        match_weight_list (list): inlier weights of each pair
+        batch_elems (int): memory bound on the number of scored elements
+
+    Returns:
+        list: svtup_list - for each pair either None or a tuple
+            (refined_inliers, refined_errors, H, aff_inliers, aff_errors, Aff)
+
+    CommandLine:
+        python -m wbia.algo.hots.sver_batch batch_spatially_verify_kpts
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.sver_batch import *  # NOQA
+        >>> import vtool as vt
+        >>> kpts1, kpts2, fm, fs, rchip1, rchip2 = vt.testdata_ratio_matches()
+        >>> kpts2_list = [kpts2, kpts2[::-1], kpts2]
+        >>> fm_list = [fm, fm[0:0], fm[::2]]
+        >>> dlen_sqrd2_list = [rchip2.shape[0] ** 2 + rchip2.shape[1] ** 2] * 3
+        >>> match_weight_list = [np.ones(len(fm_)) for fm_ in fm_list]
+        >>> svtup_list = batch_spatially_verify_kpts(
+        >>>     kpts1, kpts2_list, fm_list, dlen_sqrd2_list, match_weight_list)
+        >>> assert svtup_list[1] is None
+        >>> for fm_, dlen_sqrd2, svtup in zip(fm_list, dlen_sqrd2_list, svtup_list):
+        >>>     if len(fm_) == 0:
+        >>>         continue
+        >>>     svtup_ = vt.spatially_verify_kpts(
+        >>>         kpts1, kpts2, fm_, dlen_sqrd2=dlen_sqrd2,
+        >>>         match_weights=np.ones(len(fm_)), returnAff=True)
+        >>>     assert (svtup is None) == (svtup_ is None)
+        >>>     if svtup is not None:
+        >>>         assert np.all(svtup[3] == svtup_[3])
+        >>>         assert np.allclose(svtup[5], svtup_[5])
+    """
+    num_pairs = len(fm_list)
+    svtup_list = [None] * num_pairs
+    # Cast keypoints to float64 to avoid numerical issues
+    kpts1 = kpts1.astype(np.float64, casting='same_kind', copy=False)
+    kpts2_list = [
+        kpts2.astype(np.float64, casting='same_kind', copy=False)
+        for kpts2 in kpts2_list
+    ]
+    xy_thresh_sqrd_list = [dlen_sqrd2 * xy_thresh for dlen_sqrd2 in dlen_sqrd2_list]
+
+    # Group pairs of similar size together to keep the padding small
+    px_list = [px for px in range(num_pairs) if len(fm_list[px]) > 0]
+    size_list = [len(fm_list[px]) for px in px_list]
+    px_list = ut.take(px_list, ut.argsort(size_list))
+    for px_chunk in _chunk_pairs_by_size(px_list, fm_list, batch_elems):
+        kpts1_m_list = [kpts1.take(fm_list[px].T[0], axis=0) for px in px_chunk]
+        kpts2_m_list = [
+            kpts2_list[px].take(fm_list[px].T[1], axis=0) for px in px_chunk
+        ]
+        aff_tup_list = batch_best_affine_inliers(
+            kpts1_m_list,
+            kpts2_m_list,
+            ut.take(match_weight_list, px_chunk),
+            ut.take(xy_thresh_sqrd_list, px_chunk),
+            scale_thresh,
+            ori_thresh,
+        )
+        for px, aff_tup in zip(px_chunk, aff_tup_list):
+            svtup_list[px] = _refine_affine_hypothesis(
+                kpts1,
+                kpts2_list[px],
+                fm_list[px],
+                aff_tup,
+                xy_thresh_sqrd_list[px],
+                scale_thresh,
+                ori_thresh,
+                min_nInliers,
+                full_homog_checks,
+                refine_method,
+                max_nInliers,
+            )
+    return svtup_list
+
+
+def _chunk_pairs_by_size(px_list, fm_list, batch_elems):
+    """
+    Greedily groups pairs (sorted by number of matches) so that
+    ``len(chunk) * max_matches ** 2`` stays under ``batch_elems``.
+
+    A pair is never split, because all hypotheses of a pair are needed to
+    pick its best one. A pair with more than ``sqrt(batch_elems)`` matches
+    gets a chunk of its own, which goes over the bound (``num_matches ** 2``
+    elements).
+    """
+    px_chunk = []
+    for px in px_list:
+        num = len(fm_list[px])
+        if px_chunk and (len(px_chunk) + 1) * num * num > batch_elems:
+            yield px_chunk
+            px_chunk = []
+        px_chunk.append(px)
+    if px_chunk:
+        yield px_chunk
+
+
+def _pad_stack(arr_list, pad_row, num_rows):
+    """ stacks 2d arrays with a variable number of rows into a 3d array """
+    pad_row = np.asarray(pad_row, dtype=np.float64)
+    stacked = np.empty((len(arr_list), num_rows, len(pad_row)), dtype=np.float64)
+    stacked[:] = pad_row
+    for px, arr in enumerate(arr_list):
+        stacked[px, 0 : len(arr)] = arr
+    return stacked
+
+
+def batch_best_affine_inliers(
+    kpts1_m_list,
+    kpts2_m_list,
+    weights_list,
+    xy_thresh_sqrd_list,
+    scale_thresh,
+    ori_thresh,
+):
+    r"""
+    Scores every affine hypothesis of every pair and keeps the best one.
+
+    Each correspondence of a pair defines the hypothesis that maps its query
+    keypoint onto its database keypoint. The hypothesis with the largest sum
+    of inlier weights wins, exactly as in
+    :func:`vtool.get_best_affine_inliers`.
+
+    Args:
+        kpts1_m_list (list): matching query keypoints of each pair
+        kpts2_m_list (list): matching database keypoints of each pair
+        weights_list (list): inlier weights of each pair
+        xy_thresh_sqrd_list (list): squared distance threshold of each pair
+        scale_thresh (float):
+        ori_thresh (float):
+
+    Returns:
+        list: aff_tup_list - (aff_inliers, aff_errors, Aff) for each pair
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.algo.hots.sver_batch import *  # NOQA
+        >>> import vtool as vt
+        >>> kpts1, kpts2, fm, fs, rchip1, rchip2 = vt.testdata_ratio_matches()
+        >>> xy_thresh_sqrd = (rchip2.shape[0] ** 2 + rchip2.shape[1] ** 2) * .01
+        >>> fs = np.ones(len(fm))
+        >>> kpts1_m = kpts1.take(fm.T[0], axis=0).astype(np.float64)
+        >>> kpts2_m = kpts2.take(fm.T[1], axis=0).astype(np.float64)
+        >>> aff_tup_list = batch_best_affine_inliers(
+        >>>     [kpts1_m, kpts1_m[:5]], [kpts2_m, kpts2_m[:5]], [fs, fs[:5]],
+        >>>     [xy_thresh_sqrd] * 2, 2.0, TAU / 4)
+        >>> aff_tup = vt.get_best_affine_inliers(
+        >>>     kpts1.astype(np.float64), kpts2.astype(np.float64), fm, fs,
+        >>>     xy_thresh_sqrd, 2.0, TAU / 4, forcepy=True)
+        >>> assert np.all(aff_tup_list[0][0] == aff_tup[0])
+        >>> assert np.allclose(aff_tup_list[0][2], aff_tup[2])
+    """
+    num_pairs = len(kpts1_m_list)
+    len_arr = np.array([len(kpts1_m) for kpts1_m in kpts1_m_list])
+    num_rows = len_arr.max()
+    # (P, M) mask of real (non-padded) correspondences
+    valid = np.arange(num_rows)[None, :] < len_arr[:, None]
+
+    ncols = kpts1_m_list[0].shape[1]
+    pad_kpt = _PAD_KPT[0:ncols]
+    kpts1_pad = _pad_stack(kpts1_m_list, pad_kpt, num_rows).reshape(-1, ncols)
+    kpts2_pad = _pad_stack(kpts2_m_list, pad_kpt, num_rows).reshape(-1, ncols)
+    weights = np.zeros((num_pairs, num_rows), dtype=np.float64)
+    weights[valid] = np.hstack(weights_list)
+    xy_thresh_sqrd = np.asarray(xy_thresh_sqrd_list, dtype=np.float64)
+
+    # Shapes of the keypoints in matrix form, (P, M, 3, 3)
+    invVR1s = vt.get_invVR_mats3x3(kpts1_pad)
+    invVR2s = vt.get_invVR_mats3x3(kpts2_pad)
+    RV1s = vt.invert_invV_mats(invVR1s)
+    # BUILD ALL HYPOTHESIS TRANSFORMS: The transform from kp1 to kp2 is:
+    Aff_mats = np.matmul(invVR2s, RV1s).reshape(num_pairs, num_rows, 3, 3)
+    invVR1s = invVR1s.reshape(num_pairs, num_rows, 3, 3)
+    # Components to test projections against, (P, 1, M)
+    xy2 = vt.get_xys(kpts2_pad).reshape(2, num_pairs, 1, num_rows)
+    det2 = vt.get_sqrd_scales(kpts2_pad).reshape(num_pairs, 1, num_rows)
+    ori2 = vt.get_oris(kpts2_pad).reshape(num_pairs, 1, num_rows)
+
+    # Hypothesis components, (P, H, 1)
+    a00, a01, a02 = [Aff_mats[:, :, 0, c, None] for c in range(3)]
+    a10, a11, a12 = [Aff_mats[:, :, 1, c, None] for c in range(3)]
+    # Query keypoint components, (P, 1, M)
+    b00, b01, b02 = [invVR1s[:, None, :, 0, c] for c in range(3)]
+    b10, b11, b12 = [invVR1s[:, None, :, 1, c] for c in range(3)]
+
+    # Map the query keypoints onto the database chip under every hypothesis.
+    # Only the components needed for the error tests are computed, (P, H, M)
+    x1_mt = a00 * b02 + a01 * b12 + a02
+    y1_mt = a10 * b02 + a11 * b12 + a12
+    xy_err = (xy2[0] - x1_mt) ** 2
+    xy_err += (xy2[1] - y1_mt) ** 2
+    del x1_mt, y1_mt
+    det_aff = a00 * a11 - a01 * a10
+    det1 = b00 * b11 - b01 * b10
+    scale_err = (det_aff * det1) / det2
+    np.maximum(scale_err, np.reciprocal(scale_err), out=scale_err)
+    m00 = a00 * b00 + a01 * b10
+    m01 = a00 * b01 + a01 * b11
+    ori1_mt = np.mod(-np.arctan2(m01, m00), TAU)
+    del m00, m01
+    ori_err = np.abs(ori1_mt - ori2)
+    np.mod(ori_err, TAU, out=ori_err)
+    np.minimum(ori_err, TAU - ori_err, out=ori_err)
+    del ori1_mt
+
+    # Mark keypoints which are inliers to each hypothesis
+    inlier_flags = xy_err < xy_thresh_sqrd[:, None, None]
+    np.logical_and(inlier_flags, ori_err < ori_thresh, out=inlier_flags)
+    np.logical_and(inlier_flags, scale_err < scale_thresh, out=inlier_flags)
+    np.logical_and(inlier_flags, valid[:, None, :], out=inlier_flags)
+
+    # Determine the best hypothesis of each pair
+    hypo_weights = np.matmul(inlier_flags.astype(np.float64), weights[:, :, None])[
+        :, :, 0
+    ]
+    hypo_weights[~valid] = -np.inf
+    best_hxs = hypo_weights.argmax(axis=1)
+
+    aff_tup_list = []
+    for px, (hx, num) in enumerate(zip(best_hxs, len_arr)):
+        aff_inliers = np.where(inlier_flags[px, hx, 0:num])[0]
+        aff_errors = (
+            xy_err[px, hx, 0:num],
+            ori_err[px, hx, 0:num],
+            scale_err[px, hx, 0:num],
+        )
+        Aff = Aff_mats[px, hx]
+        aff_tup_list.append((aff_inliers, aff_errors, Aff))
+    return aff_tup_list
+
+
+def _refine_affine_hypothesis(
+    kpts1,
+    kpts2,
+    fm,
+    aff_tup,
+    xy_thresh_sqrd,
+    scale_thresh,
+    ori_thresh,
+    min_nInliers,
+    full_homog_checks,
+    refine_method,
+    max_nInliers,
+):
+    """
+    Second half of :func:`vtool.spatially_verify_kpts` given the best affine
+    hypothesis of a pair.
+    """
+    aff_inliers, aff_errors, Aff = aff_tup
+    # Return if there are not enough inliers to compute homography
+    if len(aff_inliers) < min_nInliers:
+        return None
+    if (refine_method.endswith('homog') and len(aff_inliers) < 7) or len(
+        aff_inliers
+    ) < 4:
+        # need to have 4 or more inliers to comopute an affine
+        # and need at least 7 to compute a homography
+        return None
+    if len(aff_inliers) >= max_nInliers:
+        # If there are a very large number of affine inliers, then the affine
+        # matrix is probably good enough.
+        return (aff_inliers, aff_errors, Aff, aff_inliers, aff_errors, Aff)
+    # Refine inliers using a projective transformation (homography)
+    try:
+        refined_inliers, refined_errors, H = vt.refine_inliers(
+            kpts1,
+            kpts2,
+            fm,
+            aff_inliers,
+            xy_thresh_sqrd,
+            scale_thresh,
+            ori_thresh,
+            full_homog_checks,
+            refine_method=refine_method,
+        )
+    except (np.linalg.LinAlgError, ValueError) as ex:
+        if ut.VERYVERBOSE and ut.SUPER_STRICT:
+            ut.printex(ex, 'numeric error in homog estimation.', iswarning=True)
+        return None
+    except IndexError:
+        raise
+    except Exception as ex:
+        ut.printex(
+            ex,
+            'Unknown error in homog estimation.',
+            keys=['fm.shape', 'kpts1.shape', 'kpts2.shape', (len, 'aff_inliers')],
+        )
+        if ut.SUPER_STRICT:
+            raise
+        return None
+    svtup = (refined_inliers, refined_errors, H, aff_inliers, aff_errors, Aff)
+    return svtup
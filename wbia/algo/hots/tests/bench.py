@@ -35,3 +35,60 @@ def benchmark_knn():
     nns_list1 = nearest_neighbors(  # NOQA
         qreq_, Kpad_list, impossible_daids_list, verbose=verbose
     )
+
+
+def benchmark_sver_batch():
+    r"""
+    Compares the per-pair spatial verification path with the batched kernel
+    on the shortlists of a vsmany query.
+
+    CommandLine:
+        python ~/code/wbia/wbia/algo/hots/tests/bench.py benchmark_sver_batch
+
+    Example:
+        >>> # DISABLE_DOCTEST
+        >>> from bench import *  # NOQA
+        >>> result = benchmark_sver_batch()
+        >>> print(result)
+    """
+    import numpy as np
+    from wbia.algo.hots import _pipeline_helpers as plh
+    from wbia.algo.hots import pipeline
+    from wbia.algo.hots import scoring
+
+    ibs, qreq_, cm_list = plh.testdata_pre_sver('PZ_MTEST', qaid_list=list(range(1, 21)))
+    scoring.score_chipmatch_list(qreq_, cm_list, qreq_.qparams.prescore_method)
+    cm_shortlist = scoring.make_chipmatch_shortlists(
+        qreq_,
+        cm_list,
+        qreq_.qparams.nNameShortlistSVER,
+        qreq_.qparams.nAnnotPerNameSVER,
+        qreq_.qparams.score_method,
+    )
+    # Load features up front so only verification is timed
+    svtup_args_list = [pipeline._sver_chipmatch_args(qreq_, cm) for cm in cm_shortlist]
+
+    def _run(sv_method):
+        svtups_list = []
+        for svtup_args in svtup_args_list:
+            svtup_args = list(svtup_args)
+            svtup_args[-1] = ut.dict_union(svtup_args[-1], {'sv_method': sv_method})
+            svtups_list.append(pipeline._sver_svtup_list(*svtup_args))
+        return svtups_list
+
+    results = {}
+    for sv_method in ['pairwise', 'batch']:
+        for timer in ut.Timerit(3, label=sv_method, verbose=1):
+            with timer:
+                results[sv_method] = _run(sv_method)
+
+    num_pairs = 0
+    num_agree = 0
+    for svtups1, svtups2 in zip(results['pairwise'], results['batch']):
+        for svtup1, svtup2 in zip(svtups1, svtups2):
+            num_pairs += 1
+            if svtup1 is None or svtup2 is None:
+                num_agree += svtup1 is svtup2
+            else:
+                num_agree += np.all(svtup1[0] == svtup2[0])
+    return 'inlier agreement: %d / %d pairs' % (num_agree, num_pairs)
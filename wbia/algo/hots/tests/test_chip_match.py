@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import numpy as np
+
+from wbia.algo.hots.chip_match import ChipMatch
+
+
+def _make_chipmatch():
+    fm_list = [
+        np.array([[0, 1], [2, 3]], dtype=np.int32),
+        np.empty((0, 2), dtype=np.int32),
+        np.array([[4, 5]], dtype=np.int32),
+    ]
+    fsv_list = [
+        np.array([[0.5], [0.25]], dtype=np.float32),
+        np.empty((0, 1), dtype=np.float32),
+        np.array([[0.125]], dtype=np.float32),
+    ]
+    return ChipMatch(
+        qaid=1,
+        daid_list=np.array([2, 3, 4], dtype=np.int32),
+        fm_list=fm_list,
+        fsv_list=fsv_list,
+        score_list=np.array([0.75, 0.0, 0.125]),
+        fsv_col_lbls=['lnbnn'],
+        filtnorm_aids=[None],
+        filtnorm_fxs=[None],
+    )
+
+
+def _save_load(cm, tmp_path):
+    fpath = str(tmp_path / 'chipmatch.cPkl')
+    cm.save_to_fpath(fpath)
+    return ChipMatch.load_from_fpath(fpath)
+
+
+def test_columnar_round_trip(tmp_path):
+    cm = _make_chipmatch()
+    cm2 = _save_load(cm, tmp_path)
+    assert 'fm_list' not in cm2.__dict__
+    assert np.all(cm2.daid_list == cm.daid_list)
+    assert np.all(cm2.score_list == cm.score_list)
+    assert len(cm2.fm_list) == len(cm.fm_list)
+    for fm, fm2 in zip(cm.fm_list, cm2.fm_list):
+        assert fm2.dtype == fm.dtype and np.all(fm2 == fm)
+    for fsv, fsv2 in zip(cm.fsv_list, cm2.fsv_list):
+        assert fsv2.shape == fsv.shape and np.all(fsv2 == fsv)
+    assert cm2.filtnorm_aids == [None]
+    assert '_lazy_buffer' not in cm2.__dict__
+    # A loaded chipmatch can be saved and loaded again
+    cm3 = _save_load(cm2, tmp_path)
+    assert cm3 == cm
+
+
+def test_columnar_assign_before_access(tmp_path):
+    cm2 = _save_load(_make_chipmatch(), tmp_path)
+    new_fm_list = [np.zeros((1, 2), dtype=np.int32)] * 3
+    cm2.fm_list = new_fm_list
+    # Decoding the other lazy attributes keeps the assigned value
+    fsv_list = cm2.fsv_list
+    assert len(fsv_list) == 3
+    assert cm2.fm_list is new_fm_list
+
+
+def test_columnar_concurrent_access(tmp_path):
+    cm2 = _save_load(_make_chipmatch(), tmp_path)
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def access():
+        try:
+            barrier.wait()
+            assert len(cm2.fm_list) == 3
+            assert len(cm2.fsv_list) == 3
+        except Exception as ex:
+            errors.append(ex)
+
+    thread_list = [threading.Thread(target=access) for _ in range(8)]
+    for thread in thread_list:
+        thread.start()
+    for thread in thread_list:
+        thread.join()
+    assert errors == []
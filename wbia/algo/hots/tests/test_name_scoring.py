@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import copy
+
+import numpy as np
+import utool as ut
+
+from wbia.algo.hots import hstypes
+from wbia.algo.hots import name_scoring
+from wbia.algo.hots import scoring
+from wbia.algo.hots.chip_match import ChipMatch
+
+
+class _FakeQueryRequest(object):
+    """ Just enough of a query request to look up the name of an annotation """
+
+    def __init__(self, aid_to_nid):
+        self.aid_to_nid = aid_to_nid
+
+    def get_qreq_annot_nids(self, aids):
+        if ut.isiterable(aids):
+            return [self.aid_to_nid[aid] for aid in aids]
+        return self.aid_to_nid[aids]
+
+
+def _make_chipmatch(rng, qaid, daid_list, num_list):
+    fm_list = [rng.randint(0, 40, (num, 2)).astype(hstypes.FM_DTYPE) for num in num_list]
+    # Ties between the matches of one query feature are likely
+    fsv_list = [
+        (rng.randint(1, 5, (num, 2)) / 4).astype(hstypes.FS_DTYPE) for num in num_list
+    ]
+    return ChipMatch(
+        qaid=qaid,
+        daid_list=np.array(daid_list, dtype=hstypes.INDEX_TYPE),
+        fm_list=fm_list,
+        fsv_list=fsv_list,
+        fsv_col_lbls=['lnbnn', 'fg'],
+    )
+
+
+def test_score_chipmatch_list_nsum_matches_per_chipmatch():
+    rng = np.random.RandomState(0)
+    # Annotations 1-30 belong to 8 names
+    aid_to_nid = {aid: 1 + (aid % 8) for aid in range(1, 31)}
+    qreq_ = _FakeQueryRequest(aid_to_nid)
+    cm_list = []
+    for qaid in range(1, 21):
+        daid_list = rng.choice(np.arange(1, 31), rng.randint(1, 20), replace=False)
+        num_list = rng.randint(0, 30, len(daid_list))
+        cm_list.append(_make_chipmatch(rng, qaid, daid_list, num_list))
+    # A name (nid 2) whose annotations have no feature matches
+    cm_list.append(_make_chipmatch(rng, 21, [1, 9, 2, 3], [0, 0, 5, 7]))
+    # Only empty feature matches
+    cm_list.append(_make_chipmatch(rng, 22, [4, 5], [0, 0]))
+    # No database annotations at all
+    cm_list.append(_make_chipmatch(rng, 23, [], []))
+
+    expected_list = copy.deepcopy(cm_list)
+    for cm in expected_list:
+        cm.score_name_nsum(qreq_)
+    scoring.score_chipmatch_list(qreq_, cm_list, 'nsum')
+
+    for cm, cm_ in zip(cm_list, expected_list):
+        assert np.all(cm.unique_nids == cm_.unique_nids)
+        assert cm.name_score_list.dtype == cm_.name_score_list.dtype
+        assert cm.algo_name_scores['nsum'].dtype == hstypes.FS_DTYPE
+        assert np.allclose(cm.algo_name_scores['nsum'], cm_.algo_name_scores['nsum'])
+        assert np.allclose(cm.name_score_list, cm_.name_score_list)
+        assert np.allclose(cm.annot_score_list, cm_.annot_score_list)
+        assert np.allclose(cm.score_list, cm_.score_list)
+    # The name without feature matches scores zero
+    nidx = cm_list[-3].nid2_nidx[2]
+    assert cm_list[-3].name_score_list[nidx] == 0
+    assert np.all(cm_list[-2].name_score_list == 0)
+    assert len(cm_list[-1].name_score_list) == 0
+
+
+def test_nonvoting_feature_flags_list_matches_per_chipmatch():
+    rng = np.random.RandomState(1)
+    aid_to_nid = {aid: 1 + (aid % 5) for aid in range(1, 21)}
+    qreq_ = _FakeQueryRequest(aid_to_nid)
+    cm_list = []
+    for qaid in range(1, 11):
+        daid_list = rng.choice(np.arange(1, 21), rng.randint(1, 12), replace=False)
+        num_list = rng.randint(0, 20, len(daid_list))
+        cm_list.append(_make_chipmatch(rng, qaid, daid_list, num_list))
+    # Annotations 1 and 6 share a name and tie on every query feature
+    cm = _make_chipmatch(rng, 11, [1, 6, 2], [6, 6, 3])
+    cm.fm_list[1][:, 0] = cm.fm_list[0][:, 0]
+    cm.fsv_list[1][:] = cm.fsv_list[0]
+    cm_list.append(cm)
+    cm_list.append(_make_chipmatch(rng, 12, [4, 5], [0, 0]))
+    cm_list.append(_make_chipmatch(rng, 13, [], []))
+    for cm in cm_list:
+        cm.evaluate_dnids(qreq_)
+
+    featflag_lists = name_scoring.get_chipmatch_namescore_nonvoting_feature_flags_list(
+        cm_list
+    )
+    assert len(featflag_lists) == len(cm_list)
+    for cm, featflag_list in zip(cm_list, featflag_lists):
+        expected_list = name_scoring.get_chipmatch_namescore_nonvoting_feature_flags(cm)
+        assert len(featflag_list) == len(expected_list)
+        for flags, expected in zip(featflag_list, expected_list):
+            assert np.all(flags == expected)
+    # Every tied match can vote, not just one of them
+    tie_flags = featflag_lists[-3]
+    assert np.all(tie_flags[0] == tie_flags[1])
+    assert np.any(tie_flags[0])
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from wbia.algo.hots.neighbor_index import NeighborIndex, ShardedNeighborIndex
+
+
+def _make_shard(aid_list, vecs_list, fxs_list):
+    shard = NeighborIndex({'backend': 'brute'}, None)
+    shard.init_support(aid_list, vecs_list, None, fxs_list, verbose=False)
+    shard.reindex(verbose=False)
+    return shard
+
+
+def _make_sharded(rng, num_workers=2):
+    vecs_list = [rng.randint(0, 255, (n, 32)).astype(np.uint8) for n in [6, 8, 5, 7]]
+    fxs_list = [np.arange(len(vecs)) for vecs in vecs_list]
+    shard_list = [
+        _make_shard([1, 2], vecs_list[0:2], fxs_list[0:2]),
+        _make_shard([3, 4], vecs_list[2:4], fxs_list[2:4]),
+    ]
+    return ShardedNeighborIndex(shard_list, num_workers=num_workers), vecs_list
+
+
+def test_sharded_remove_support_hides_removed_aids():
+    rng = np.random.RandomState(0)
+    nnindexer, vecs_list = _make_sharded(rng)
+    old_flann = nnindexer.flann
+    # Query with the removed descriptors so they would be their own neighbors
+    qfx2_vec = np.vstack([vecs_list[1], vecs_list[2]])
+    nnindexer.knn(qfx2_vec, 3)
+    nnindexer.remove_support([2, 3], verbose=False)
+    assert old_flann._executor is None
+    assert nnindexer.flann.num_valid_list() == [6, 7]
+    qfx2_idx, qfx2_dist = nnindexer.knn(qfx2_vec, 13)
+    qfx2_aid = nnindexer.get_nn_aids(qfx2_idx)
+    assert set(np.unique(qfx2_aid)) == {1, 4}
+
+
+def test_sharded_add_support_after_remove():
+    rng = np.random.RandomState(1)
+    nnindexer, vecs_list = _make_sharded(rng)
+    nnindexer.remove_support([1], verbose=False)
+    new_vecs = rng.randint(0, 255, (4, 32)).astype(np.uint8)
+    nnindexer.add_support([5], [new_vecs], None, [np.arange(4)], verbose=False)
+    last_shard = nnindexer.shard_list[-1]
+    assert last_shard.num_indexed == len(last_shard.idx2_ax) == 16
+    assert nnindexer.flann.num_list == [14, 16]
+    assert nnindexer.flann.num_valid_list() == [8, 16]
+    qfx2_idx, qfx2_dist = nnindexer.knn(new_vecs, 1)
+    assert np.all(nnindexer.get_nn_aids(qfx2_idx) == 5)
+    assert np.all(qfx2_dist == 0)
+    qfx2_idx, qfx2_dist = nnindexer.knn(vecs_list[0], 24)
+    assert 1 not in nnindexer.get_nn_aids(qfx2_idx)
+
+
+def test_neighbor_cache_misses_after_layout_change(tmp_path):
+    from wbia.algo.hots.neighbor_cache import NeighborCache
+
+    rng = np.random.RandomState(2)
+    vecs_list = [rng.randint(0, 255, (n, 32)).astype(np.uint8) for n in [6, 8, 5]]
+    fxs_list = [np.arange(len(vecs)) for vecs in vecs_list]
+    qfx2_vec = vecs_list[1]
+    cache = NeighborCache(str(tmp_path), budget=1.0)
+    cacheid = 'nnobj_query'
+
+    nnindexer = _make_shard([1, 2, 3], vecs_list, fxs_list)
+    qfx2_idx, qfx2_dist = nnindexer.knn(qfx2_vec, 2)
+    qfxs = np.arange(len(qfx2_vec))
+    cache.save(cacheid + nnindexer.get_layout_cfgstr(), qfx2_idx, qfx2_dist, qfxs)
+
+    # Same annotations in the same order: the cached indices are still valid
+    same_indexer = _make_shard([1, 2, 3], vecs_list, fxs_list)
+    cached = cache.load(cacheid + same_indexer.get_layout_cfgstr())
+    assert cached is not None
+    assert np.all(
+        same_indexer.get_nn_aids(cached[0]) == nnindexer.get_nn_aids(qfx2_idx)
+    )
+
+    # The same annotations stacked in another order move every index
+    order = [2, 0, 1]
+    moved_indexer = _make_shard(
+        [3, 1, 2], [vecs_list[x] for x in order], [fxs_list[x] for x in order]
+    )
+    assert cache.load(cacheid + moved_indexer.get_layout_cfgstr()) is None
+    # Removing support keeps the positions but invalidates some of them
+    same_indexer.remove_support([2], verbose=False)
+    assert cache.load(cacheid + same_indexer.get_layout_cfgstr()) is None
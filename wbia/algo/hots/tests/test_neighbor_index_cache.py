@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from wbia.algo.hots.neighbor_index_cache import _resident_nbytes
+
+
+class _Engine(object):
+    def __init__(self, pts):
+        self._data = pts
+
+
+class _Indexer(object):
+    def __init__(self, idx2_vec):
+        self.idx2_vec = idx2_vec
+        self.flann = _Engine(idx2_vec)
+        self.flann_params = {'trees': 4}
+        self.ax2_aid = np.arange(10, dtype=np.int64)
+
+
+def test_resident_nbytes_counts_shared_vectors_once():
+    idx2_vec = np.zeros((1000, 128), dtype=np.uint8)
+    nnindexer = _Indexer(idx2_vec)
+    tree_nbytes = len(idx2_vec) * 4 * 4
+    expected = idx2_vec.nbytes + nnindexer.ax2_aid.nbytes + tree_nbytes
+    assert _resident_nbytes(nnindexer) == expected
+    # Views are counted as their base array
+    assert _resident_nbytes([idx2_vec, idx2_vec[0:10]]) == idx2_vec.nbytes
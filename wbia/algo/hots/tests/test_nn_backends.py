@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from wbia.algo.hots.nn_backends import BruteForceIndex, ShardedIndex
+
+
+def _make_sharded(data, num_list, num_workers=None):
+    engine_list = []
+    start = 0
+    for num in num_list:
+        engine = BruteForceIndex()
+        engine.build_index(data[start : start + num])
+        engine_list.append(engine)
+        start += num
+    return ShardedIndex(engine_list, num_list, num_workers=num_workers)
+
+
+@pytest.mark.parametrize('num_workers', [1, 3])
+def test_sharded_index_query_after_remove(num_workers):
+    rng = np.random.RandomState(0)
+    data = rng.randint(0, 255, (30, 16)).astype(np.uint8)
+    qvecs = rng.randint(0, 255, (5, 16)).astype(np.uint8)
+    engine = _make_sharded(data, [10, 5, 15], num_workers=num_workers)
+    # Leave one live point in the first shard and none in the second
+    removed_ids = np.hstack([np.arange(0, 9), np.arange(10, 15)])
+    engine.remove_points(removed_ids)
+    assert engine.num_valid_list() == [1, 0, 15]
+
+    K = 8
+    idxs, dists = engine.nn_index(qvecs, K)
+
+    exact = BruteForceIndex()
+    exact.build_index(data)
+    exact.remove_points(removed_ids)
+    idxs_, dists_ = exact.nn_index(qvecs, K)
+    assert not np.any(np.isin(idxs, removed_ids))
+    assert np.all(idxs == idxs_)
+    assert np.all(dists == dists_)
+
+    # All 16 live points can be returned, but not more
+    idxs, dists = engine.nn_index(qvecs, 16)
+    assert set(idxs.ravel()) == set(range(30)) - set(removed_ids)
+    with pytest.raises(AssertionError):
+        engine.nn_index(qvecs, 17)
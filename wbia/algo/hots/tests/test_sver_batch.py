@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from wbia.algo.hots.sver_batch import _chunk_pairs_by_size
+
+
+def _chunks(num_list, batch_elems):
+    fm_list = [np.zeros((num, 2), dtype=np.int32) for num in num_list]
+    px_list = list(np.argsort(num_list, kind='stable'))
+    return list(_chunk_pairs_by_size(px_list, fm_list, batch_elems))
+
+
+def test_chunk_pairs_by_size_boundary():
+    # Three pairs of 4 matches use exactly 3 * 4 ** 2 = 48 elements
+    assert _chunks([4, 4, 4], 48) == [[0, 1, 2]]
+    # One element less and the last pair moves to the next chunk
+    assert _chunks([4, 4, 4], 47) == [[0, 1], [2]]
+    # The chunk is bounded by its largest pair
+    assert _chunks([2, 3, 5], 50) == [[0, 1], [2]]
+
+
+def test_chunk_pairs_by_size_oversized_pair():
+    # A pair larger than the bound is not split, it gets a chunk of its own
+    chunks = _chunks([2, 10, 3], 16)
+    assert chunks == [[0], [2], [1]]
+    assert len(chunks[-1]) * 10 ** 2 > 16
+    # Every pair is in exactly one chunk
+    assert _chunks([50], 1) == [[0]]
+    assert _chunks([], 10) == []
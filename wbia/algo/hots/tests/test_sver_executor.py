@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import logging
+import utool as ut
+
+(print, rrr, profile) = ut.inject2(__name__)
+logger = logging.getLogger('wbia')
+
+
+def _assert_same_chipmatches(cm_list1, cm_list2):
+    import numpy as np
+
+    assert len(cm_list1) == len(cm_list2)
+    for cm1, cm2 in zip(cm_list1, cm_list2):
+        assert cm1.qaid == cm2.qaid
+        assert np.all(cm1.daid_list == cm2.daid_list)
+        for fm1, fm2 in zip(cm1.fm_list, cm2.fm_list):
+            assert np.all(fm1 == fm2)
+        for fsv1, fsv2 in zip(cm1.fsv_list, cm2.fsv_list):
+            assert np.allclose(fsv1, fsv2)
+        for H1, H2 in zip(cm1.H_list, cm2.H_list):
+            assert np.allclose(H1, H2)
+
+
+def test_parallel_sver_matches_serial_and_shares_one_pool(monkeypatch):
+    from concurrent import futures
+    from wbia.algo.hots import _pipeline_helpers as plh
+    from wbia.algo.hots import pipeline
+
+    ibs, qreq_, cm_list = plh.testdata_pre_sver('PZ_MTEST', qaid_list=[18, 19, 20, 21])
+    qreq_.qparams.sv_executor = 'serial'
+    cm_list_serial = list(pipeline.iter_spatial_verification(qreq_, cm_list))
+
+    num_pools = []
+    ProcessPoolExecutor = futures.ProcessPoolExecutor
+
+    def _counting_pool(*args, **kwargs):
+        num_pools.append(1)
+        return ProcessPoolExecutor(*args, **kwargs)
+
+    monkeypatch.setattr(futures, 'ProcessPoolExecutor', _counting_pool)
+    qreq_.qparams.sv_executor = 'process'
+    qreq_.qparams.sv_workers = 2
+    qreq_.qparams.sv_chunksize = 1
+
+    cm_list_par = []
+    with pipeline.sver_executor_context(qreq_):
+        # Each query chunk is verified by a shallow copy, as in match_chips4
+        for cm_chunk in ut.ichunks(cm_list, 2):
+            sub_qreq_ = qreq_.shallowcopy(qaids=[cm.qaid for cm in cm_chunk])
+            cm_list_par.extend(pipeline.iter_spatial_verification(sub_qreq_, cm_chunk))
+
+    assert len(num_pools) == 1
+    assert qreq_.sver_executor is None
+    _assert_same_chipmatches(cm_list_serial, cm_list_par)
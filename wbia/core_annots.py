@@ -1588,6 +1588,10 @@ class IndexerConfig(dtool.Config):
         ut.ParamInfo('random_seed', 42, 'seed'),
         ut.ParamInfo('trees', 4, hideif=lambda cfg: cfg['algorithm'] != 'kdtree'),
         ut.ParamInfo('version', 1),
+        ut.ParamInfo(
+            'backend', 'flann', hideif='flann', valid_values=['flann', 'brute']
+        ),
+        ut.ParamInfo('mmap_support', False, hideif=False),
     ]
     _sub_config_list = [
         # FeatConfig,
@@ -1598,6 +1602,8 @@ class IndexerConfig(dtool.Config):
     def get_flann_params(self):
         default_params = vt.get_flann_params(self['algorithm'])
         flann_params = ut.update_existing(default_params, self.asdict())
+        flann_params['backend'] = self['backend']
+        flann_params['mmap_support'] = self['mmap_support']
         return flann_params
 
 
@@ -11,6 +11,7 @@ from six.moves import zip
 from wbia.dtool import sql_control
 from wbia.dtool import depcache_table
 from wbia.dtool import base
+from wbia.dtool.row_cache import RowCache
 from collections import defaultdict
 
 (print, rrr, profile) = ut.inject2(__name__)
@@ -34,6 +35,14 @@ Args:
     docstr (str): (default = None)
     fname (str):  file name(default = None)
     asobject (bool): hacky dont use (default = False)
+    extern_storage (str): 'files' or 'packed' storage of external columns.
+        (default = --depc-extern-storage or 'files')
+    extern_read_workers (int): threads that read external columns.
+        (default = --depc-read-workers or 8)
+    compute_workers (int): forked processes that compute chunks of rows.
+        (default = --depc-compute-workers or 1)
+    write_behind (bool): insert computed chunks from a writer thread.
+        (default = --depc-write-behind or False)
 
 SeeAlso:
     depcache_table.DependencyCacheTable
@@ -83,6 +92,30 @@ def make_depcache_decors(root_tablename):
     return _depcdecors
 
 
+def _plan_table_rows(plan, table, parent_rowids, rowids):
+    """
+    Adds the cached and dirty rows of one table lookup to a plan.  Rows with a
+    missing parent can not be told apart, so they are counted individually.
+    """
+    cached_rowids = set()
+    dirty_keys = set()
+    num_orphans = 0
+    for parent_ids, rowid in zip(parent_rowids, rowids):
+        if rowid is not None:
+            cached_rowids.add(rowid)
+        elif parent_ids is None or any(ut.flag_None_items(parent_ids)):
+            num_orphans += 1
+        else:
+            dirty_keys.add(
+                tuple(
+                    tuple(ids_) if isinstance(ids_, list) else ids_ for ids_ in parent_ids
+                )
+            )
+    entry = plan['tables'].setdefault(table.tablename, {'num_cached': 0, 'num_dirty': 0})
+    entry['num_cached'] += len(cached_rowids)
+    entry['num_dirty'] += len(dirty_keys) + num_orphans
+
+
 class DependencyCache:
     def __init__(
         self,
@@ -134,6 +167,8 @@ class DependencyCache:
 
         self.get_root_uuid = get_root_uuid
         self.delete_exclude_tables = {}
+        # Rows read by get_row_data, see row_cache.ROW_CACHE_BUDGET
+        self.row_cache = RowCache()
         # BBB (25-Sept-12020) `_debug` remains around to be backwards compatible
         self._debug = False
 
@@ -242,6 +277,10 @@ class DependencyCache:
 
     def close(self):
         """Close all managed SQL databases"""
+        for table in self.cachetable_dict.values():
+            table.shutdown_extern_readers()
+            if table.db is not None:
+                table.flush_stats()
         for db_inst in self._db_by_name.values():
             db_inst.close()
 
@@ -270,6 +309,7 @@ class DependencyCache:
             db = sql_control.SQLDatabaseController(uri, normalized_name)
             # ??? This seems out of place. Shouldn't this be within the depcachetable instance?
             depcache_table.ensure_config_table(db)
+            depcache_table.ensure_stats_table(db)
             self._db_by_name[name] = db
 
         for table in self.cachetable_dict.values():
@@ -523,6 +563,7 @@ class DependencyCache:
         _kwargs = kwargs.copy()
         _recompute = _kwargs.pop('recompute_all', False)
         _hack_rootmost = _kwargs.pop('_hack_rootmost', False)
+        _plan = _kwargs.pop('_plan', None)
         if config is None:
             config = {}
 
@@ -636,6 +677,8 @@ class DependencyCache:
                     _parent_rowids, config=config_, recompute=_recompute, **_kwargs
                 )
                 rowid_dict[output_node] = output_rowids
+                if _plan is not None:
+                    _plan_table_rows(_plan, table, _parent_rowids, output_rowids)
                 # table.get_model_inputs(table.get_model_uuid(output_rowids)[0])
             else:
                 # We are only computing up to the parents of the table here.
@@ -644,6 +687,88 @@ class DependencyCache:
         # rowids = rowid_dict[output_node]
         return parent_rowids
 
+    def plan(self, tablename, input_tuple, config=None, _hack_rootmost=False):
+        """
+        Reports how many rows of each table a request would compute, without
+        computing anything.
+
+        Follows the same dependency edges as ``get_rowids`` but only looks up
+        rows that already exist.  A row is dirty if it or one of its ancestors
+        is missing.  Rows below a missing ancestor are not deduplicated, so
+        ``num_dirty`` is an upper bound.  The estimate uses the per-row time in
+        the stats table (``get_seconds_per_row``).  Dirty rows of tables
+        without a recorded time are counted in ``num_unestimated`` instead.
+
+        Returns:
+            dict: ``tables`` maps each table in compute order to its counts
+
+        Example:
+            >>> # ENABLE_DOCTEST
+            >>> from wbia.dtool.depcache_control import *  # NOQA
+            >>> from wbia.dtool.example_depcache2 import testdata_depc3
+            >>> depc = testdata_depc3()
+            >>> depc.clear_all()
+            >>> _ = depc.get('labeler', [1, 2], 'data')
+            >>> plan = depc.plan('meta_labeler', [1, 2, 3, 3])
+            >>> counts = {key: ut.dict_subset(entry, ['num_cached', 'num_dirty'])
+            >>>           for key, entry in plan['tables'].items()}
+            >>> print(ut.repr2(counts, nl=1))
+            {
+                'labeler': {'num_cached': 2, 'num_dirty': 1},
+                'meta_labeler': {'num_cached': 0, 'num_dirty': 4},
+            }
+            >>> assert plan['tables']['labeler']['seconds_per_row'] is not None
+            >>> assert plan['num_unestimated'] == 4
+            >>> assert depc.get_rowids('meta_labeler', [3], ensure=False) == [None]
+        """
+        if config is None:
+            config = {}
+        plan = {'tablename': tablename, 'tables': ut.odict()}
+        parent_rowids = self.get_parent_rowids(
+            tablename,
+            input_tuple,
+            config=config,
+            ensure=False,
+            _hack_rootmost=_hack_rootmost,
+            _plan=plan,
+        )
+        table = self[tablename]
+        config_ = self._ensure_config(tablename, config)
+        rowids = table.get_rowid(parent_rowids, config=config_, ensure=False)
+        _plan_table_rows(plan, table, parent_rowids, rowids)
+
+        num_dirty = 0
+        num_unestimated = 0
+        est_seconds = 0.0
+        for tablekey, entry in plan['tables'].items():
+            seconds_per_row = self[tablekey].get_seconds_per_row()
+            entry['seconds_per_row'] = seconds_per_row
+            if seconds_per_row is None:
+                entry['est_seconds'] = None
+                num_unestimated += entry['num_dirty']
+            else:
+                entry['est_seconds'] = seconds_per_row * entry['num_dirty']
+                est_seconds += entry['est_seconds']
+            num_dirty += entry['num_dirty']
+        plan['num_dirty'] = num_dirty
+        plan['num_unestimated'] = num_unestimated
+        plan['est_seconds'] = est_seconds
+        return plan
+
+    def get_stats(self):
+        """
+        Returns the timings recorded by each table as a dict mapping table
+        names to dicts mapping keys of ``depcache_table.STATS_KEYS`` to
+        ``[num_calls, num_rows, seconds]``.  The timings are kept in the stats
+        table of each database, so they include other processes.
+        """
+        stats = {}
+        for tablename, table in self.cachetable_dict.items():
+            table_stats = table.get_stats()
+            if len(table_stats) > 0:
+                stats[tablename] = table_stats
+        return stats
+
     def check_rowids(self, tablename, input_tuple, config={}):
         """
         Returns a list of flags where True means the row has been computed and
@@ -893,7 +1018,9 @@ class DependencyCache:
                     raise
             else:
                 break
-        logger.debug('* return prop_list=%s' % (ut.trunc_repr(prop_list),))
+        if logger.isEnabledFor(logging.DEBUG):
+            # Formatting the returned data costs more than a cached read
+            logger.debug('* return prop_list=%s' % (ut.trunc_repr(prop_list),))
         return prop_list
 
     def get_native(
@@ -1550,6 +1677,11 @@ class DependencyCache:
         # TODO; remove invalidated properties
         if force_delete:
             self.delete_root(root_rowids, prop=prop)
+        elif len(self.row_cache) > 0:
+            rowid_dict = self.get_allconfig_descendant_rowids(root_rowids)
+            for tablename, table_rowids in rowid_dict.items():
+                if tablename != self.root:
+                    self.row_cache.invalidate(tablename, table_rowids)
 
     def clear_all(self):
         logger.info('Clearning all cached data in %r' % (self,))
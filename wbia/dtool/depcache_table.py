@@ -20,19 +20,34 @@ FIXME:
 
 
 """
+import collections
+import contextlib
 import logging
+import multiprocessing
+import os
+import queue
 import re
+import threading
+import weakref
 import itertools as it
+from concurrent import futures
 from os.path import join, exists
 
 import networkx as nx
 import six
+import sqlalchemy
 import utool as ut
 import ubelt as ub
 from six.moves import zip, range
 
 from wbia.dtool import sqlite3 as lite
-from wbia.dtool.sql_control import SQLDatabaseController, compare_coldef_lists
+from wbia.dtool import row_cache as row_cache_mod
+from wbia.dtool.extern_storage import PackedExternStore, PACKED_WRITE_BATCH_SIZE
+from wbia.dtool.sql_control import (
+    SQLDatabaseController,
+    compare_coldef_lists,
+    get_shared_engines,
+)
 from wbia.dtool.types import TYPE_TO_SQLTYPE
 
 import time
@@ -52,12 +67,48 @@ CONFIG_TABLENAME = 'config_tablename'  # tablename associated with config
 CONFIG_STRID = 'config_strid'
 CONFIG_DICT = 'config_dict'
 
+STATS_TABLE = 'table_stats'
+STATS_TABLENAME = 'stats_tablename'  # tablename the statistics are about
+STATS_KEY = 'stats_key'
+STATS_NUM_CALLS = 'stats_num_calls'
+STATS_NUM_ROWS = 'stats_num_rows'
+STATS_SECONDS = 'stats_seconds'
+# Timed operations: preproc calls, extern writes / reads and SQL writes / reads
+STATS_KEYS = ('compute', 'extern_write', 'sql_write', 'sql_read', 'extern_read')
+# Seconds between writes of statistics recorded by reads
+STATS_FLUSH_SECONDS = 60
+
 
 # if ut.is_developer():
 #     GRACE_PERIOD = 10
 # else:
 GRACE_PERIOD = ut.get_argval('--grace', type_=int, default=0)
 
+# How external columns are stored: 'files' writes one file per value,
+# 'packed' appends values to segment files (see extern_storage)
+EXTERN_STORAGE_MODES = ('files', 'packed')
+EXTERN_STORAGE = ut.get_argval('--depc-extern-storage', type_=str, default='files')
+# Threads that read and decode external files in get_row_data (1 reads serially)
+EXTERN_READ_WORKERS = ut.get_argval('--depc-read-workers', type_=int, default=8)
+# Processes that run preproc functions on chunks of dirty rows (1 computes in-process)
+COMPUTE_WORKERS = ut.get_argval('--depc-compute-workers', type_=int, default=1)
+# Chunks per compute process when a table does not set a chunksize
+COMPUTE_CHUNKS_PER_WORKER = 4
+# Insert computed chunks from a writer thread while the next chunks compute
+WRITE_BEHIND = ut.get_argflag('--depc-write-behind')
+# Computed chunks that may wait for the writer before compute blocks
+WRITE_BEHIND_QUEUE_SIZE = 4
+# Rows of queued chunks the writer merges into one insert
+WRITE_BEHIND_BATCH_ROWS = 4096
+
+# Tables being computed by a process pool, by job id.  Pool processes are
+# forked while the job is registered, so they look the table up here instead
+# of unpickling the depcache and its database connections.
+_COMPUTE_JOBS = {}
+
+# Tables (of any depcache) that have started reader threads
+_EXTERN_READER_TABLES = weakref.WeakSet()
+
 
 class TableOutOfSyncError(Exception):
     """Raised when the code's table definition doesn't match the defition in the database"""
@@ -132,6 +183,154 @@ def predrop_grace_period(tablename, seconds=None):
     return ut.grace_period(warnmsg, seconds)
 
 
+def _reset_forked_engine(engine):
+    """ Makes a forked engine open its own connections """
+    try:
+        # Leaves the parent's connections alone (SQLAlchemy >= 1.4.33)
+        engine.dispose(close=False)
+    except TypeError:
+        engine.pool = engine.pool.recreate()
+
+
+def _init_compute_worker(engine_list, reader_table_list):
+    """
+    Runs once in each forked compute process. The parent passes the engines
+    and tables it shares with the process (fork does not pickle them).
+    """
+    # Pooled database connections belong to the parent, open new ones. The
+    # connection of an in-memory database is the database, those engines
+    # are not shared and are kept.
+    for engine in engine_list:
+        _reset_forked_engine(engine)
+    # Reader threads are not forked, including those of the tables of other
+    # depcaches
+    for table in reader_table_list:
+        table._extern_read_executor = None
+        # A parent thread may have held the lock when the process forked
+        table._extern_read_lock = threading.Lock()
+
+
+def _write_blob_if_changed(fpath, blob):
+    """
+    Writes ``blob`` to ``fpath`` unless the file already holds it. A file
+    left from an older value of the record is replaced atomically, so
+    concurrent readers see either the old or the new bytes.
+    """
+    try:
+        if os.path.getsize(fpath) == len(blob):
+            with open(fpath, 'rb') as file_:
+                if file_.read() == blob:
+                    return
+    except OSError:
+        pass
+    temp_fpath = '%s.%d.%d.tmp' % (fpath, os.getpid(), threading.get_ident())
+    with open(temp_fpath, 'wb') as file_:
+        file_.write(blob)
+    os.replace(temp_fpath, fpath)
+
+
+def _compute_chunk_worker(job_id, dirty_parent_ids, dirty_preproc_args):
+    table, config_rowid, config = _COMPUTE_JOBS[job_id]
+    dirty_params = table._compute_dirty_rows(
+        dirty_parent_ids, dirty_preproc_args, config_rowid, config
+    )
+    # Timings recorded in this process are added to the parent's
+    return dirty_params, table._pop_pending_stats()
+
+
+class _ChunkWriter(object):
+    """
+    Inserts computed chunks into a table from a writer thread.
+
+    Chunks wait in a bounded queue, so compute blocks when the writer falls
+    behind. Chunks that are queued together are merged into one insert. Rows
+    that were never inserted are dirty on the next request and recomputed.
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.dtool.depcache_table import *  # NOQA
+        >>> from wbia.dtool.depcache_table import _ChunkWriter
+        >>> dpath = ut.ensure_app_resource_dir('dtool', 'test_chunk_writer')
+        >>> fpath = ut.unixjoin(dpath, 'writer.sqlite')
+        >>> ut.delete(fpath, verbose=False)
+        >>> db = SQLDatabaseController('sqlite:///' + fpath, 'testing')
+        >>> db.add_table('writer_table', (
+        >>>     ('writer_rowid',        'INTEGER PRIMARY KEY'),
+        >>>     ('key',                 'TEXT'),
+        >>> ), superkeys=[('key',)], docstr='')
+        >>> writer = _ChunkWriter(db, 'writer_table')
+        >>> for chunk in ut.ichunks(range(10), 3):
+        >>>     writer.put(('key',), [('k%d' % (i,),) for i in chunk])
+        >>> writer.close()
+        >>> print(db.get_row_count('writer_table'))
+        10
+    """
+
+    def __init__(self, db, tablename, maxsize=None, batch_rows=None, record_stat=None):
+        if maxsize is None:
+            maxsize = WRITE_BEHIND_QUEUE_SIZE
+        if batch_rows is None:
+            batch_rows = WRITE_BEHIND_BATCH_ROWS
+        self.db = db
+        self.tablename = tablename
+        self.batch_rows = batch_rows
+        self.record_stat = record_stat
+        self.error = None
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(
+            target=self._run, name='depc-writer-%s' % (tablename,), daemon=True
+        )
+        self._thread.start()
+
+    def put(self, colnames, params_list):
+        """ Queues a chunk, raises early if an earlier insert failed """
+        if self.error is not None:
+            raise self.error
+        self._queue.put((colnames, list(params_list)))
+
+    def close(self, reraise=True):
+        """ Waits for the queued chunks to be inserted """
+        self._queue.put(None)
+        self._thread.join()
+        if reraise and self.error is not None:
+            raise self.error
+
+    def _insert(self, colnames, params_list):
+        # After an error the queue is still drained so put never blocks
+        if self.error is None and len(params_list) > 0:
+            tt = time.time()
+            try:
+                self.db._add(
+                    self.tablename, colnames, params_list, nInput=len(params_list)
+                )
+            except Exception as ex:
+                self.error = ex
+            else:
+                if self.record_stat is not None:
+                    self.record_stat('sql_write', len(params_list), time.time() - tt)
+
+    def _run(self):
+        # None is the close signal, so an empty queue is marked separately
+        empty = object()
+        item = self._queue.get()
+        while item is not None:
+            colnames, params_list = item
+            item = empty
+            while len(params_list) < self.batch_rows:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = empty
+                    break
+                if item is None or item[0] != colnames:
+                    break
+                params_list.extend(item[1])
+                item = empty
+            self._insert(colnames, params_list)
+            if item is empty:
+                item = self._queue.get()
+
+
 def make_extern_io_funcs(table, cls):
     """ Hack in read/write defaults for pickleable classes """
 
@@ -191,6 +390,111 @@ def ensure_config_table(db):
             )
 
 
+def ensure_stats_table(db):
+    """ SQL definition of the table of timing statistics. """
+    stats_addtable_kw = ut.odict(
+        [
+            ('tablename', STATS_TABLE),
+            (
+                'coldef_list',
+                [
+                    ('stats_rowid', 'INTEGER PRIMARY KEY'),
+                    (STATS_TABLENAME, 'TEXT'),
+                    (STATS_KEY, 'TEXT'),
+                    (STATS_NUM_CALLS, 'INTEGER'),
+                    (STATS_NUM_ROWS, 'INTEGER'),
+                    (STATS_SECONDS, 'REAL'),
+                ],
+            ),
+            ('docstr', 'table for compute and storage timings of each table'),
+            ('superkeys', [(STATS_TABLENAME, STATS_KEY)]),
+            ('dependson', []),
+        ]
+    )
+    if not db.has_table(STATS_TABLE):
+        db.add_table(**stats_addtable_kw)
+    else:
+        current_state = db.get_table_autogen_dict(STATS_TABLE)
+        new_state = stats_addtable_kw
+        results = compare_coldef_lists(
+            current_state['coldef_list'], new_state['coldef_list']
+        )
+        if results:
+            current_coldef, new_coldef = results
+            raise TableOutOfSyncError(
+                db,
+                STATS_TABLE,
+                f'Current schema: {current_coldef} Expected schema: {new_coldef}',
+            )
+
+
+def add_table_stats(db, tablename, stats):
+    """
+    Adds timings to the statistics of a table.
+
+    Args:
+        stats (dict): maps keys of STATS_KEYS to ``[num_calls, num_rows, seconds]``
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.dtool.depcache_table import *  # NOQA
+        >>> db = SQLDatabaseController('sqlite:///', 'testing')
+        >>> ensure_stats_table(db)
+        >>> add_table_stats(db, 'chip', {'compute': [1, 10, 2.0]})
+        >>> add_table_stats(db, 'chip', {'compute': [2, 5, 1.0], 'sql_write': [1, 15, 0.5]})
+        >>> print(ut.repr2(get_table_stats(db, 'chip'), nl=2))
+        {
+            'chip': {
+                'compute': [3, 15, 3.0],
+                'sql_write': [1, 15, 0.5],
+            },
+        }
+    """
+    value_colnames = (STATS_NUM_CALLS, STATS_NUM_ROWS, STATS_SECONDS)
+    assignments = ', '.join(
+        f'{colname} = {STATS_TABLE}.{colname} + excluded.{colname}'
+        for colname in value_colnames
+    )
+    operation = sqlalchemy.text(
+        f'INSERT INTO {STATS_TABLE} ({STATS_TABLENAME}, {STATS_KEY}, '
+        f'{", ".join(value_colnames)}) '
+        'VALUES (:tablename, :key, :num_calls, :num_rows, :seconds) '
+        f'ON CONFLICT ({STATS_TABLENAME}, {STATS_KEY}) DO UPDATE SET {assignments}'
+    )
+    params = [
+        {
+            'tablename': tablename,
+            'key': key,
+            'num_calls': num_calls,
+            'num_rows': num_rows,
+            'seconds': seconds,
+        }
+        for key, (num_calls, num_rows, seconds) in stats.items()
+    ]
+    with db.connect() as conn, conn.begin():
+        conn.execute(operation, params)
+
+
+def get_table_stats(db, tablename=None):
+    """
+    Returns the statistics stored in a database as a dict mapping table names
+    to dicts mapping keys of STATS_KEYS to ``[num_calls, num_rows, seconds]``
+    """
+    operation = (
+        f'SELECT {STATS_TABLENAME}, {STATS_KEY}, {STATS_NUM_CALLS}, '
+        f'{STATS_NUM_ROWS}, {STATS_SECONDS} FROM {STATS_TABLE}'
+    )
+    params = {}
+    if tablename is not None:
+        operation += f' WHERE {STATS_TABLENAME} = :tablename'
+        params['tablename'] = tablename
+    stats_dict = ut.ddict(dict)
+    with db.connect() as conn:
+        for row in conn.execute(sqlalchemy.text(operation), params):
+            stats_dict[row[0]][row[1]] = [row[2], row[3], row[4]]
+    return dict(stats_dict)
+
+
 @ut.reloadable_class
 class _TableConfigHelper(object):
     """ helper for configuration table """
@@ -1024,6 +1328,81 @@ class _TableGeneralHelper(ub.NiceRepr):
         extern_dpath = join(cache_dpath, extern_dname)
         return extern_dpath
 
+    def _init_extern_storage(self, extern_storage, extern_read_workers=None):
+        if extern_storage is None:
+            extern_storage = EXTERN_STORAGE
+        if extern_storage not in EXTERN_STORAGE_MODES:
+            raise ValueError(
+                'extern_storage=%r must be one of %r'
+                % (extern_storage, EXTERN_STORAGE_MODES)
+            )
+        self.extern_storage = extern_storage
+        self._packed_store = None
+        self._extern_read_workers = extern_read_workers
+        self._extern_read_executor = None
+        # Guards starting and stopping the reader threads
+        self._extern_read_lock = threading.Lock()
+
+    @property
+    def extern_read_workers(self):
+        """
+        Number of threads used to read external columns. Defaults to
+        ``--depc-read-workers``, except for pickled class columns whose read
+        functions call back into the depcache, which are read serially.
+        """
+        if self._extern_read_workers is not None:
+            return self._extern_read_workers
+        if any(ut.dict_take_column(self.data_col_attrs, 'is_external_class', False)):
+            return 1
+        return EXTERN_READ_WORKERS
+
+    def _map_extern_reads(self, func, items):
+        """ Ordered ``map`` of ``func`` on a bounded pool of reader threads """
+        max_workers = self.extern_read_workers
+        if min(max_workers, len(items)) <= 1:
+            return list(map(func, items))
+        old_executor = None
+        with self._extern_read_lock:
+            if self._extern_read_executor is None or (
+                self._extern_read_executor[0] != max_workers
+            ):
+                if self._extern_read_executor is not None:
+                    old_executor = self._extern_read_executor[1]
+                executor = futures.ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix='depc_read_%s' % (self.tablename,),
+                )
+                self._extern_read_executor = (max_workers, executor)
+                _EXTERN_READER_TABLES.add(self)
+            executor = self._extern_read_executor[1]
+            # map submits every item right away, so a concurrent shutdown
+            # waits for these reads instead of refusing them
+            result_iter = executor.map(func, items)
+        if old_executor is not None:
+            old_executor.shutdown(wait=True)
+        return list(result_iter)
+
+    def shutdown_extern_readers(self):
+        """ Stops the reader threads, they are restarted by the next read """
+        with self._extern_read_lock:
+            if self._extern_read_executor is None:
+                return
+            executor = self._extern_read_executor[1]
+            self._extern_read_executor = None
+        executor.shutdown(wait=True)
+
+    @property
+    def packed_store(self):
+        """
+        The segment store of the external columns when ``extern_storage`` is
+        'packed', otherwise None.
+        """
+        if self.extern_storage != 'packed':
+            return None
+        if self._packed_store is None:
+            self._packed_store = PackedExternStore(join(self.extern_dpath, 'packed'))
+        return self._packed_store
+
     @property
     def dpath(self):
         # assert table.ismulti, 'only valid for models'
@@ -1535,6 +1914,10 @@ class _TableComputeHelper(object):
     ):
         """
         Writes external data to disk if write function is specified.
+
+        With packed extern storage the values of up to
+        ``PACKED_WRITE_BATCH_SIZE`` rows are appended to the segment store in
+        one transaction before the rows are yielded.
         """
         internal_data_col_attrs = self.internal_data_col_attrs
         writable_flags = ut.dict_take_column(internal_data_col_attrs, 'write_func', False)
@@ -1562,10 +1945,28 @@ class _TableComputeHelper(object):
         #     [join(extern_dpath, fname) for fname in fnames]
         #     for fnames in extern_fnames_list
         # ]
+        packed_store = self.packed_store
+        packed_items = []
+        packed_rows = []
+        # Timings are recorded before rows are yielded, the consumer may stop
+        # after the last row without resuming this generator
+        num_written = 0
+        write_seconds = 0.0
 
         for data, extern_fpaths in zip(proptup_gen, extern_fnames_list):
+            if len(packed_rows) >= PACKED_WRITE_BATCH_SIZE:
+                tt = time.time()
+                packed_store.put_many(packed_items)
+                write_seconds += time.time() - tt
+                self._record_stat('extern_write', num_written, write_seconds)
+                num_written, write_seconds = 0, 0.0
+                yield from packed_rows
+                packed_items, packed_rows = [], []
             if data is None:
-                yield None
+                if packed_store is not None:
+                    packed_rows.append(None)
+                else:
+                    yield None
                 continue
             normal_data = ut.take(data, idxs2)
             try:
@@ -1574,9 +1975,14 @@ class _TableComputeHelper(object):
                 ut.printex(ex, 'Did you forget to return/yeild your data as a tuple?')
                 raise
             # Write external data to disk
+            tt = time.time()
             try:
                 _iter = zip(extern_data, extern_fpaths, extern_writers)
                 for obj, fpath, write_func in _iter:
+                    if packed_store is not None:
+                        blob = packed_store.dumps(write_func, fpath, obj)
+                        packed_items.append((fpath, blob))
+                        continue
                     abs_fpath = join(extern_dpath, fpath)
                     # logger.info('WRITE fpath = %r, abs_fpath = %r' % (fpath, abs_fpath, ))
                     write_func(abs_fpath, obj)
@@ -1584,11 +1990,24 @@ class _TableComputeHelper(object):
             except Exception as ex:
                 ut.printex(ex, 'external write', keys=['config_rowid', 'data'])
                 raise
+            write_seconds += time.time() - tt
+            num_written += 1
             # Return path instead of data
             grouped_items = [extern_fpaths, normal_data]
             groupxs = [idxs1, idxs2]
             data_new = tuple(ut.ungroup(grouped_items, groupxs, nCols - 1))
-            yield data_new
+            if packed_store is not None:
+                packed_rows.append(data_new)
+            else:
+                self._record_stat('extern_write', num_written, write_seconds)
+                num_written, write_seconds = 0, 0.0
+                yield data_new
+        if len(packed_rows) > 0:
+            tt = time.time()
+            packed_store.put_many(packed_items)
+            write_seconds += time.time() - tt
+            self._record_stat('extern_write', num_written, write_seconds)
+            yield from packed_rows
 
     def get_extern_fnames(self, parent_rowids, config, extern_col_index=0):
         """
@@ -1687,6 +2106,7 @@ class _TableComputeHelper(object):
         config_ = config.config if hasattr(config, 'config') else config
 
         # call registered worker function
+        tt = time.time()
         if self.vectorized:
             # Function is written in a way that only accepts multiple inputs at
             # once and generates output
@@ -1709,6 +2129,7 @@ class _TableComputeHelper(object):
                 num_output,
                 nInput,
             )
+        self._record_stat('compute', nInput, time.time() - tt)
         # Append rowids and rectify nested and external columns
         dirty_params_iter = self.prepare_storage(
             dirty_parent_ids, proptup_gen, dirty_preproc_args, config_rowid, config_
@@ -1726,6 +2147,10 @@ class _TableComputeHelper(object):
         Executes registered functions, does external storage and yeilds results
         to be stored internally in SQL.
 
+        With more than one compute worker the chunks are computed in a pool of
+        forked processes. Chunks are yielded in order as they finish, so the
+        caller writes chunk i to SQL while the next chunks are computed.
+
         CommandLine:
             python -m dtool.depcache_table _chunk_compute_dirty_rows
 
@@ -1740,7 +2165,13 @@ class _TableComputeHelper(object):
             >>> depc.print_all_tables()
         """
         nInput = len(dirty_parent_ids)
-        chunksize = nInput if self.chunksize is None else self.chunksize
+        num_workers = self._num_compute_workers()
+        if self.chunksize is not None:
+            chunksize = self.chunksize
+        elif num_workers > 1:
+            chunksize = max(1, -(-nInput // (num_workers * COMPUTE_CHUNKS_PER_WORKER)))
+        else:
+            chunksize = nInput
 
         logger.info(
             '[deptbl.compute] nInput={}, chunksize={}, tbl={}'.format(
@@ -1761,18 +2192,23 @@ class _TableComputeHelper(object):
         # CALL EXTERNAL PREPROCESSING / GENERATION FUNCTION
         try:
             # prog_iter = list(prog_iter)
-            for dirty_chunk in prog_iter:
-                nChunkInput = len(dirty_chunk)
-                if nChunkInput == 0:
-                    return
-                dirty_parent_ids_chunk, dirty_preproc_args_chunk = zip(*dirty_chunk)
-
-                dirty_params_iter = self._compute_dirty_rows(
-                    dirty_parent_ids_chunk,
-                    dirty_preproc_args_chunk,
-                    config_rowid,
-                    config,
+            if num_workers > 1 and nInput > chunksize:
+                computed_iter = self._pool_compute_chunks(
+                    prog_iter, num_workers, config_rowid, config
                 )
+            else:
+                computed_iter = (
+                    (
+                        dirty_chunk,
+                        self._compute_dirty_rows(
+                            *zip(*dirty_chunk), config_rowid, config
+                        ),
+                    )
+                    for dirty_chunk in prog_iter
+                    if len(dirty_chunk) > 0
+                )
+            for dirty_chunk, dirty_params_iter in computed_iter:
+                nChunkInput = len(dirty_chunk)
 
                 DEBUG_LIST_MODE = True
                 if DEBUG_LIST_MODE:
@@ -1800,6 +2236,141 @@ class _TableComputeHelper(object):
             )
             raise
 
+    def _record_stat(self, key, num_rows, seconds):
+        self._merge_stats({key: [1, num_rows, seconds]})
+
+    @contextlib.contextmanager
+    def _timed_stat(self, key, num_rows):
+        tt = time.time()
+        yield
+        self._record_stat(key, num_rows, time.time() - tt)
+
+    def _merge_stats(self, stats):
+        with self._stats_lock:
+            for key, values in stats.items():
+                totals = self._pending_stats.setdefault(key, [0, 0, 0.0])
+                for index, value in enumerate(values):
+                    totals[index] += value
+
+    def _pop_pending_stats(self):
+        with self._stats_lock:
+            stats = self._pending_stats
+            self._pending_stats = {}
+            self._stats_flush_time = time.time()
+        return stats
+
+    def flush_stats(self):
+        """ Adds the timings recorded since the last flush to the stats table """
+        stats = self._pop_pending_stats()
+        if len(stats) > 0:
+            try:
+                add_table_stats(self.db, self.tablename, stats)
+            except Exception as ex:
+                # Statistics are advisory, keep them for the next flush
+                logger.warning(
+                    '[deptbl.stats] could not store stats of %s: %r'
+                    % (self.tablename, ex)
+                )
+                self._merge_stats(stats)
+
+    def _maybe_flush_stats(self):
+        if time.time() - self._stats_flush_time > STATS_FLUSH_SECONDS:
+            self.flush_stats()
+
+    def get_stats(self):
+        """
+        Returns the stored and pending timings of this table as a dict mapping
+        keys of STATS_KEYS to ``[num_calls, num_rows, seconds]``
+        """
+        stats = get_table_stats(self.db, self.tablename).get(self.tablename, {})
+        with self._stats_lock:
+            for key, values in self._pending_stats.items():
+                totals = stats.setdefault(key, [0, 0, 0.0])
+                stats[key] = [a + b for a, b in zip(totals, values)]
+        return stats
+
+    def get_seconds_per_row(self):
+        """
+        Average seconds spent computing, writing external data and inserting a
+        row of this table, or None if no rows were computed yet.
+        """
+        stats = self.get_stats()
+        num_rows = stats.get('compute', [0, 0, 0.0])[1]
+        if num_rows == 0:
+            return None
+        seconds = sum(
+            stats[key][2]
+            for key in ('compute', 'extern_write', 'sql_write')
+            if key in stats
+        )
+        return seconds / num_rows
+
+    def _make_chunk_writer(self):
+        """
+        Returns a writer thread for computed chunks if write-behind is
+        enabled, otherwise None and the chunks are inserted in order.
+        """
+        write_behind = self.write_behind
+        if write_behind is None:
+            write_behind = WRITE_BEHIND
+        if not write_behind:
+            return None
+        database = self.db._engine.url.database
+        if self.db.is_using_sqlite and database in (None, '', ':memory:'):
+            # Each thread gets its own in-memory database
+            return None
+        return _ChunkWriter(self.db, self.tablename, record_stat=self._record_stat)
+
+    def _num_compute_workers(self):
+        num_workers = self.compute_workers
+        if num_workers is None:
+            num_workers = COMPUTE_WORKERS
+        if num_workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            logger.warning(
+                '[deptbl.compute] process pools need fork, computing in-process'
+            )
+            num_workers = 1
+        return num_workers
+
+    def _pool_compute_chunks(self, chunk_iter, num_workers, config_rowid, config):
+        """
+        Computes chunks of dirty rows in forked processes and yields
+        ``(chunk, dirty_params)`` in order. Every process has a chunk and one
+        more is queued while the caller stores the chunk that finished.
+        """
+        if len(self.extern_columns) > 0:
+            # The workers write external files and would race to create it
+            ut.ensuredir(self.extern_dpath)
+        job_id = ut.random_nonce(16)
+        _COMPUTE_JOBS[job_id] = (self, config_rowid, config)
+        chunk_iter = (chunk for chunk in chunk_iter if len(chunk) > 0)
+        try:
+            executor = futures.ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_init_compute_worker,
+                initargs=(get_shared_engines(), list(_EXTERN_READER_TABLES)),
+            )
+            with executor:
+                pending = collections.deque()
+
+                def _submit(num):
+                    for dirty_chunk in it.islice(chunk_iter, num):
+                        future = executor.submit(
+                            _compute_chunk_worker, job_id, *zip(*dirty_chunk)
+                        )
+                        pending.append((dirty_chunk, future))
+
+                _submit(num_workers + 1)
+                while pending:
+                    dirty_chunk, future = pending.popleft()
+                    dirty_params_iter, stats = future.result()
+                    self._merge_stats(stats)
+                    _submit(1)
+                    yield dirty_chunk, dirty_params_iter
+        finally:
+            del _COMPUTE_JOBS[job_id]
+
 
 @ut.reloadable_class
 class DependencyCacheTable(
@@ -1866,6 +2437,10 @@ class DependencyCacheTable(
         rm_extern_on_delete=False,
         vectorized=True,
         taggable=False,
+        extern_storage=None,
+        extern_read_workers=None,
+        compute_workers=None,
+        write_behind=None,
     ):
         """
         recieves kwargs from depc._register_prop
@@ -1901,9 +2476,14 @@ class DependencyCacheTable(
         # self.store_delete_time = True
 
         self.chunksize = chunksize
+        #: Processes that compute dirty rows, None uses ``--depc-compute-workers``
+        self.compute_workers = compute_workers
+        #: Insert computed chunks from a thread, None uses ``--depc-write-behind``
+        self.write_behind = write_behind
         # SQL Internals
         self.sqldb_fpath = None
         self.rm_extern_on_delete = rm_extern_on_delete
+        self._init_extern_storage(extern_storage, extern_read_workers)
         # Update internals
         self.parent_col_attrs = self._infer_parentcol()
         self.data_col_attrs = self._infer_datacol()
@@ -1915,6 +2495,10 @@ class DependencyCacheTable(
 
         # ??? Clearly a hack, but to what end?
         self._hack_chunk_cache = None
+        # Timings not yet added to the stats table, see STATS_KEYS
+        self._pending_stats = {}
+        self._stats_lock = threading.Lock()
+        self._stats_flush_time = time.time()
 
     @classmethod
     def from_name(
@@ -1933,6 +2517,10 @@ class DependencyCacheTable(
         rm_extern_on_delete=False,
         vectorized=True,
         taggable=False,
+        extern_storage=None,
+        extern_read_workers=None,
+        compute_workers=None,
+        write_behind=None,
     ):
         """Build the instance based on a database and table name."""
         self = cls.__new__(cls)
@@ -1955,6 +2543,10 @@ class DependencyCacheTable(
         self.preproc_func = preproc_func
         #: Optional specification of the amount of blobs to modify in one SQL operation
         self.chunksize = chunksize
+        #: Processes that compute dirty rows, None uses ``--depc-compute-workers``
+        self.compute_workers = compute_workers
+        #: Insert computed chunks from a thread, None uses ``--depc-write-behind``
+        self.write_behind = write_behind
 
         # FIXME (20-Oct-12020) This definition of behavior by external means is a scope issue
         #       Another object should not be directly manipulating this object.
@@ -1968,6 +2560,8 @@ class DependencyCacheTable(
         self.taggable = taggable
         #: Flag to enable the deletion of external files on associated SQL row deletion.
         self.rm_extern_on_delete = rm_extern_on_delete
+        #: Either 'files' or 'packed' and the number of extern read threads
+        self._init_extern_storage(extern_storage, extern_read_workers)
 
         # XXX (20-Oct-12020) It's not clear if these attributes are absolutely necessary.
         # Update internals
@@ -1984,6 +2578,10 @@ class DependencyCacheTable(
 
         # ??? Clearly a hack, but to what end?
         self._hack_chunk_cache = None
+        # Timings not yet added to the stats table, see STATS_KEYS
+        self._pending_stats = {}
+        self._stats_lock = threading.Lock()
+        self._stats_flush_time = time.time()
 
         return self
 
@@ -2173,13 +2771,26 @@ class DependencyCacheTable(
                 """
                 colnames, dirty_params_iter, nChunkInput = next(gen)
                 """
-                for colnames, dirty_params_iter, nChunkInput in gen:
-                    self.db._add(
-                        self.tablename,
-                        colnames,
-                        dirty_params_iter,
-                        nInput=nChunkInput,
-                    )
+                writer = self._make_chunk_writer()
+                if writer is None:
+                    for colnames, dirty_params_iter, nChunkInput in gen:
+                        with self._timed_stat('sql_write', nChunkInput):
+                            self.db._add(
+                                self.tablename,
+                                colnames,
+                                dirty_params_iter,
+                                nInput=nChunkInput,
+                            )
+                else:
+                    try:
+                        for colnames, dirty_params_iter, nChunkInput in gen:
+                            writer.put(colnames, dirty_params_iter)
+                    except Exception:
+                        writer.close(reraise=False)
+                        raise
+                    # Rowids are looked up below, wait for the inserts
+                    writer.close()
+                self.flush_stats()
 
                 # Remove cache when main add is done
                 self._hack_chunk_cache = None
@@ -2453,6 +3064,7 @@ class DependencyCacheTable(
         """
         # TODO: need to clear one-to-one dependencies as well
         logger.info('Clearing data in %r' % (self,))
+        self.depc.row_cache.invalidate_table(self.tablename)
         self.db.drop_table(self.tablename)
         self.db.add_table(**self._get_addtable_kw())
 
@@ -2495,6 +3107,8 @@ class DependencyCacheTable(
         # from wbia.dtool.algo.preproc import preproc_feat
         if self.on_delete is not None and not dry:
             self.on_delete()
+        if not dry:
+            self.depc.row_cache.invalidate(self.tablename, rowid_list)
         if delete_extern is None:
             delete_extern = self.rm_extern_on_delete
         if verbose is None:
@@ -2523,18 +3137,23 @@ class DependencyCacheTable(
                 eager=True,
                 keepwrap=False,
             )
-            absuris = []
+            reluris = []
             for uri in it.chain.from_iterable(uris):
                 if not isinstance(uri, tuple):
                     uri = [uri]
-                for uri_ in uri:
-                    absuris.append(join(self.extern_dpath, uri_))
+                reluris.extend(uri)
+            absuris = [join(self.extern_dpath, uri_) for uri_ in reluris]
             fpaths = [fpath for fpath in absuris if exists(fpath)]
             if delete_extern:
                 if ut.VERBOSE or len(fpaths) > 0:
                     logger.info('deleting {} existing internal files'.format(len(fpaths)))
                 if not dry:
                     ut.remove_fpaths(fpaths, verbose=verbose)
+                packed_store = self.packed_store
+                if packed_store is not None and not dry:
+                    num_deleted = packed_store.delete_many(reluris)
+                    logger.info('deleting {} packed values'.format(num_deleted))
+                    packed_store.compact()
             else:
                 if ut.VERBOSE or len(fpaths) > 0:
                     logger.info('Leaving {} dangling filepaths'.format(len(fpaths)))
@@ -2640,11 +3259,16 @@ class DependencyCacheTable(
         delete_on_fail=True,
         showprog=False,
         unpack_columns=None,
+        use_cache=True,
     ):
         r"""
         FIXME: unpacking is confusing with sql controller
         TODO: Clean up and allow for eager=False
 
+        Eager requests are served from the depcache row cache when it is
+        enabled (see ``row_cache.ROW_CACHE_BUDGET``), unless ``use_cache`` is
+        False.
+
         colnames = ('mask', 'size')
 
         CommandLine:
@@ -2714,6 +3338,20 @@ class DependencyCacheTable(
         else:
             requested_colnames = colnames
 
+        if use_cache and eager and self.depc.row_cache.enabled:
+            prop_list = self._get_cached_row_data(
+                tbl_rowids,
+                tuple(requested_colnames),
+                read_extern=read_extern,
+                num_retries=num_retries,
+                ensure=ensure,
+                delete_on_fail=delete_on_fail,
+                showprog=showprog,
+            )
+            if unpack_columns:
+                prop_list = [None if p is None else p[0] for p in prop_list]
+            return prop_list
+
         logger.debug('requested_colnames = %r' % (requested_colnames,))
         tup = self._resolve_requested_columns(requested_colnames)
         nesting_xs, extern_resolve_tups, flat_intern_colnames = tup
@@ -2733,6 +3371,7 @@ class DependencyCacheTable(
 
         generator_version = not eager
 
+        tt = time.time()
         raw_prop_list = self.get_internal_columns(
             nonNone_tbl_rowids,
             flat_intern_colnames,
@@ -2742,6 +3381,8 @@ class DependencyCacheTable(
             keepwrap=True,
             showprog=showprog,
         )
+        if eager:
+            self._record_stat('sql_read', len(nonNone_tbl_rowids), time.time() - tt)
 
         def tup_unflat_take(items_list, unflat_index_list):
             r"""
@@ -2768,7 +3409,7 @@ class DependencyCacheTable(
             if generator_version:
 
                 def _generator_resolve_all():
-                    extern_dpath = self.extern_dpath
+                    packed_store = self.packed_store
                     for rawprop in raw_prop_list:
                         if rawprop is None:
                             raise Exception(
@@ -2780,13 +3421,12 @@ class DependencyCacheTable(
                         # Modify prop with external data
                         for extern_colx, read_func in extern_resolve_tups:
                             uri = exprop[extern_colx]
-                            uri_full = join(extern_dpath, uri)
-                            if read_extern:
-                                data = read_func(uri_full)
-                            else:
-                                data = uri_full
-                                if ensure:
-                                    ut.assertpath(uri_full)
+                            blob = None
+                            if packed_store is not None:
+                                blob = packed_store.get_many([uri])[0]
+                            data = self._load_extern_data(
+                                read_func, uri, blob, read_extern, ensure
+                            )
                             exprop[extern_colx] = data
                         # nestprop = ut.unflat_take(exprop, nesting_xs)
                         nestprop = tup_unflat_take(exprop, nesting_xs)
@@ -2839,6 +3479,47 @@ class DependencyCacheTable(
             prop_list = ut.ungroup(
                 [prop_list, [None] * len(idxs2)], [idxs1, idxs2], len(tbl_rowids) - 1
             )
+        self._maybe_flush_stats()
+        return prop_list
+
+    def _get_cached_row_data(self, tbl_rowids, requested_colnames, read_extern, **kwargs):
+        """
+        Returns the packed rows of ``get_row_data``, reading only the rows that
+        are not in the row cache and caching them.
+        """
+        row_cache = self.depc.row_cache
+        keys = [
+            None if rowid is None else (self.tablename, rowid, requested_colnames, read_extern)
+            for rowid in tbl_rowids
+        ]
+        prop_list = row_cache.get_many([key for key in keys if key is not None])
+        prop_iter = iter(prop_list)
+        prop_list = [None if key is None else next(prop_iter) for key in keys]
+        miss_rowids = ut.unique(
+            [
+                rowid
+                for rowid, prop in zip(tbl_rowids, prop_list)
+                if prop is row_cache_mod.MISSING
+            ]
+        )
+        if len(miss_rowids) > 0:
+            miss_props = self.get_row_data(
+                miss_rowids,
+                requested_colnames,
+                read_extern=read_extern,
+                unpack_columns=False,
+                use_cache=False,
+                **kwargs,
+            )
+            rowid_to_prop = dict(zip(miss_rowids, miss_props))
+            for rowid, prop in rowid_to_prop.items():
+                if prop is not None:
+                    key = (self.tablename, rowid, requested_colnames, read_extern)
+                    row_cache.put(key, prop)
+            prop_list = [
+                rowid_to_prop[rowid] if prop is row_cache_mod.MISSING else prop
+                for rowid, prop in zip(tbl_rowids, prop_list)
+            ]
         return prop_list
 
     def _resolve_any_external_data(
@@ -2854,6 +3535,7 @@ class DependencyCacheTable(
         ####
         # Read data specified by any external columns
         extern_dpath = self.extern_dpath
+        packed_store = self.packed_store
         try:
             prop_listT = list(zip(*raw_prop_list))
         except TypeError as ex:
@@ -2864,16 +3546,30 @@ class DependencyCacheTable(
             logger.debug('[deptbl.get_row_data] read_func = %r' % (read_func,))
             data_list = []
             failed_list = []
-            for uri in prop_listT[extern_colx]:
-                uri_full = join(extern_dpath, uri)
+            uri_list = prop_listT[extern_colx]
+            tt = time.time()
+            if packed_store is not None:
+                # One batched, offset ordered read for the whole column
+                blob_list = packed_store.get_many(uri_list)
+            else:
+                blob_list = [None] * len(uri_list)
+
+            def _read_item(item, read_func=read_func):
+                # Errors are handled in order below, on the calling thread
                 try:
-                    if read_extern:
-                        data = read_func(uri_full)
-                    else:
-                        if ensure:
-                            ut.assertpath(uri_full)
-                        data = uri_full
+                    data = self._load_extern_data(read_func, *item, read_extern, ensure)
                 except Exception as ex:
+                    return None, ex
+                return data, None
+
+            # Image decoders release the GIL, so files are read concurrently
+            read_results = self._map_extern_reads(
+                _read_item, list(zip(uri_list, blob_list))
+            )
+            self._record_stat('extern_read', len(uri_list), time.time() - tt)
+            for uri, (data, ex) in zip(uri_list, read_results):
+                uri_full = join(extern_dpath, uri)  # NOQA, reported by printex
+                if ex is not None:
                     ut.printex(
                         ex,
                         'failed to load external data',
@@ -2887,7 +3583,7 @@ class DependencyCacheTable(
                         ],
                     )
                     if tries_left == 0:
-                        raise
+                        raise ex
                     failed_list.append(True)
                     data = None
                 else:
@@ -2913,6 +3609,24 @@ class DependencyCacheTable(
             prop_listT[extern_colx] = data_list
         return prop_listT
 
+    def _load_extern_data(self, read_func, uri, blob, read_extern, ensure):
+        """
+        Resolves one external value. ``blob`` holds the bytes of a packed
+        value, otherwise ``uri`` is read as a file in ``extern_dpath``.
+        """
+        uri_full = join(self.extern_dpath, uri)
+        if blob is not None:
+            if read_extern:
+                return self.packed_store.loads(read_func, uri, blob)
+            # Callers asking for paths get the packed value as a file
+            _write_blob_if_changed(uri_full, blob)
+            return uri_full
+        if read_extern:
+            return read_func(uri_full)
+        if ensure:
+            ut.assertpath(uri_full)
+        return uri_full
+
     def _recompute_external_storage(self, tbl_rowids):
         """
         Recomputes the external file stored for this row.
@@ -2948,6 +3662,7 @@ class DependencyCacheTable(
         logger.info('Recomputing external data (_recompute_and_store)')
         if len(tbl_rowids) == 0:
             return
+        self.depc.row_cache.invalidate(self.tablename, tbl_rowids)
         parent_rowids = self.get_parent_rowids(tbl_rowids)
         parent_rowargs = self.get_parent_rowargs(tbl_rowids)
         # configs = self.get_row_configs(tbl_rowids)
@@ -3015,6 +3730,9 @@ class DependencyCacheTable(
         """
         Access data in this table using the table PRIMARY KEY rowids (not
         depc PRIMARY ids)
+
+        The rowid column is unique, so rows are read with the set-based bulk
+        getter, which also decodes NDARRAY columns in one pass.
         """
         prop_list = self.db.get(
             self.tablename,
@@ -3022,6 +3740,7 @@ class DependencyCacheTable(
             tbl_rowids,
             id_colname=self.rowid_colname,
             eager=eager,
+            assume_unique=True,
             nInput=nInput,
             unpack_scalars=unpack_scalars,
             keepwrap=keepwrap,
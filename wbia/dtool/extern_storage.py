@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Packed storage for the external columns of depcache tables.
+
+By default every external value (chips, probchips, pickled objects) is
+written to its own file in the table's ``extern_dpath``.  On network
+filesystems holding millions of small files the metadata operations (open,
+stat, unlink) dominate the cost of reading them back.
+
+A :class:`PackedExternStore` instead appends the serialized values to a few
+large segment files and keeps an offset index in a sqlite database next to
+them.  The index is keyed by the same extern file name the table stores in
+its ``*_extern_uri`` column, so the SQL tables are identical in both modes and
+rows written as loose files are still found on disk.  Reads are grouped by
+segment and served in offset order from a memory map.  Deleted and replaced
+values leave dead bytes behind; :func:`PackedExternStore.compact` rewrites
+segments whose dead fraction passes a threshold.
+
+Values are converted to and from bytes with the column's own ``write_func``
+and ``read_func`` through a file in a local scratch directory, so any
+external column type can be packed without new serializers.
+"""
+import contextlib
+import logging
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+from os.path import basename, exists, join
+import utool as ut
+
+(print, rrr, profile) = ut.inject2(__name__)
+logger = logging.getLogger('wbia')
+
+
+PACKED_INDEX_FNAME = 'index.sqlite3'
+PACKED_SEGMENT_FMT = 'segment_{:06d}.bin'
+# Start a new segment file once the current one passes this size
+PACKED_SEGMENT_MAX_BYTES = 256 * 2 ** 20
+# Rewrite a segment once this fraction of its bytes belong to deleted values
+PACKED_COMPACT_DEAD_FRACTION = 0.5
+# Number of keys per index query
+PACKED_INDEX_BATCH_SIZE = 500
+# Number of computed rows whose values are appended in one transaction
+PACKED_WRITE_BATCH_SIZE = 64
+# Local directory used to convert values with path based read / write funcs
+PACKED_SCRATCH_DPATH = ut.get_argval('--depc-packed-scratch', type_=str, default=None)
+
+PACKED_INDEX_SCHEMAS = [
+    """
+    CREATE TABLE IF NOT EXISTS records (
+        key     TEXT PRIMARY KEY,
+        segment INTEGER NOT NULL,
+        offset  INTEGER NOT NULL,
+        nbytes  INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS segments (
+        segment      INTEGER PRIMARY KEY,
+        nbytes       INTEGER NOT NULL DEFAULT 0,
+        dead_nbytes  INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS records_segment_idx ON records (segment, offset)',
+]
+
+
+class PackedExternStore(object):
+    """
+    Segment files plus an offset index holding the external values of a table.
+
+    Args:
+        dpath (str): directory of the segment files and the index
+        segment_max_bytes (int): size at which a new segment is started
+        timeout (float): seconds to wait on a locked index
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.dtool.extern_storage import *  # NOQA
+        >>> dpath = ut.ensure_app_resource_dir('wbia', 'test_packed_extern')
+        >>> ut.delete(dpath, verbose=False)
+        >>> store = PackedExternStore(dpath, segment_max_bytes=10)
+        >>> store.put_many([('a.txt', b'spam'), ('b.txt', b'eggs'), ('c.txt', b'ham')])
+        >>> store.get_many(['c.txt', 'x.txt', 'a.txt'])
+        [b'ham', None, b'spam']
+        >>> store.put_many([('a.txt', b'SPAM')])
+        >>> store.delete_many(['b.txt'])
+        >>> stats = store.get_stats()
+        >>> print(ut.repr2(ut.dict_subset(stats, ['num_records', 'dead_nbytes'])))
+        {'num_records': 2, 'dead_nbytes': 8}
+        >>> # The first segment is mostly dead, its live value is moved
+        >>> store.compact()
+        1
+        >>> store.get_many(['a.txt', 'b.txt', 'c.txt'])
+        [b'SPAM', None, b'ham']
+        >>> print(store.get_stats()['dead_nbytes'])
+        0
+        >>> store.close()
+    """
+
+    def __init__(self, dpath, segment_max_bytes=None, timeout=60.0):
+        if segment_max_bytes is None:
+            segment_max_bytes = PACKED_SEGMENT_MAX_BYTES
+        self.dpath = dpath
+        self.segment_max_bytes = segment_max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+        self._scratch_dpath = None
+        ut.ensuredir(dpath)
+        with self._transaction() as cur:
+            for schema in PACKED_INDEX_SCHEMAS:
+                cur.execute(schema)
+
+    @property
+    def connection(self):
+        """ One index connection per thread and process """
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != pid:
+            fpath = join(self.dpath, PACKED_INDEX_FNAME)
+            # No WAL, it needs shared memory and the cache may be on NFS
+            conn = sqlite3.connect(fpath, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+        if self._scratch_dpath is not None:
+            ut.delete(self._scratch_dpath, verbose=False)
+            self._scratch_dpath = None
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE also serializes segment appends between processes
+        cur = self.connection.cursor()
+        cur.execute('BEGIN IMMEDIATE')
+        try:
+            yield cur
+        except Exception:
+            cur.execute('ROLLBACK')
+            raise
+        else:
+            cur.execute('COMMIT')
+        finally:
+            cur.close()
+
+    def segment_fpath(self, segment):
+        return join(self.dpath, PACKED_SEGMENT_FMT.format(segment))
+
+    def _lookup(self, keys, cur=None):
+        """ Returns a dict mapping the stored keys to (segment, offset, nbytes) """
+        if cur is None:
+            cur = self.connection.cursor()
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), PACKED_INDEX_BATCH_SIZE):
+            chunk = keys[start : start + PACKED_INDEX_BATCH_SIZE]
+            cur.execute(
+                'SELECT key, segment, offset, nbytes FROM records WHERE key IN (%s)'
+                % (', '.join(['?'] * len(chunk)),),
+                chunk,
+            )
+            for key, segment, offset, nbytes in cur.fetchall():
+                found[key] = (segment, offset, nbytes)
+        return found
+
+    def _current_segment(self, cur):
+        cur.execute('SELECT segment, nbytes FROM segments ORDER BY segment DESC LIMIT 1')
+        row = cur.fetchone()
+        if row is not None and row[1] < self.segment_max_bytes:
+            return row[0]
+        return self._new_segment(cur, None if row is None else row[0])
+
+    def _new_segment(self, cur, last_segment=None):
+        if last_segment is None:
+            cur.execute('SELECT MAX(segment) FROM segments')
+            last_segment = cur.fetchone()[0]
+        segment = 0 if last_segment is None else last_segment + 1
+        cur.execute('INSERT INTO segments (segment) VALUES (?)', (segment,))
+        return segment
+
+    def _append(self, cur, segment, items):
+        """ Appends (key, blob) items to ``segment`` and indexes them """
+        records = []
+        with open(self.segment_fpath(segment), 'ab') as file_:
+            file_.seek(0, os.SEEK_END)
+            offset = file_.tell()
+            for key, blob in items:
+                file_.write(blob)
+                records.append((key, segment, offset, len(blob)))
+                offset += len(blob)
+        # Replaced values become dead bytes in their old segment
+        replaced = self._lookup([record[0] for record in records], cur)
+        cur.executemany(
+            'UPDATE segments SET dead_nbytes = dead_nbytes + ? WHERE segment = ?',
+            [(nbytes, old_segment) for old_segment, _, nbytes in replaced.values()],
+        )
+        cur.executemany(
+            'INSERT OR REPLACE INTO records (key, segment, offset, nbytes) '
+            'VALUES (?, ?, ?, ?)',
+            records,
+        )
+        cur.execute(
+            'UPDATE segments SET nbytes = nbytes + ? WHERE segment = ?',
+            (sum(record[3] for record in records), segment),
+        )
+
+    def put_many(self, items):
+        """
+        Stores (key, bytes) items, replacing any existing values of the keys.
+        """
+        items = list(items)
+        if len(items) == 0:
+            return
+        with self._transaction() as cur:
+            segment = self._current_segment(cur)
+            self._append(cur, segment, items)
+
+    def get_many(self, keys):
+        """
+        Returns the stored bytes of each key, or None for unknown keys.
+
+        Reads are grouped by segment and done in offset order on a memory map
+        of each segment file.
+        """
+        keys = list(keys)
+        try:
+            blobs = self._read_blobs(keys)
+        except FileNotFoundError:
+            # A compaction in another process moved the values, look them up again
+            blobs = self._read_blobs(keys)
+        return [blobs.get(key, None) for key in keys]
+
+    def _read_blobs(self, keys):
+        found = self._lookup(set(keys))
+        blobs = {}
+        grouped = ut.group_items(list(found.items()), [loc[0] for loc in found.values()])
+        for segment, segment_items in grouped.items():
+            segment_items = sorted(segment_items, key=lambda item: item[1][1])
+            with open(self.segment_fpath(segment), 'rb') as file_:
+                with mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    for key, (_, offset, nbytes) in segment_items:
+                        blobs[key] = buf[offset : offset + nbytes]
+        return blobs
+
+    def contains_many(self, keys):
+        keys = list(keys)
+        found = self._lookup(set(keys))
+        return [key in found for key in keys]
+
+    def delete_many(self, keys):
+        """ Removes keys from the index, their bytes are reclaimed by compact """
+        keys = list(keys)
+        with self._transaction() as cur:
+            found = self._lookup(keys, cur)
+            cur.executemany(
+                'UPDATE segments SET dead_nbytes = dead_nbytes + ? WHERE segment = ?',
+                [(nbytes, segment) for segment, _, nbytes in found.values()],
+            )
+            cur.executemany(
+                'DELETE FROM records WHERE key = ?', [(key,) for key in found.keys()]
+            )
+        return len(found)
+
+    def compact(self, dead_fraction=None):
+        """
+        Rewrites the live values of segments whose dead fraction is at least
+        ``dead_fraction`` into a new segment and removes the old files.
+
+        Readers in other processes that looked up a value in a removed segment
+        look it up again in the index.
+
+        Returns:
+            int: number of values moved
+        """
+        if dead_fraction is None:
+            dead_fraction = PACKED_COMPACT_DEAD_FRACTION
+        num_moved = 0
+        removed_segments = []
+        with self._transaction() as cur:
+            cur.execute(
+                'SELECT segment FROM segments '
+                'WHERE dead_nbytes > 0 AND dead_nbytes >= ? * nbytes ORDER BY segment',
+                (dead_fraction,),
+            )
+            victims = [row[0] for row in cur.fetchall()]
+            if len(victims) == 0:
+                return 0
+            target = None
+            for segment in victims:
+                cur.execute(
+                    'SELECT key, offset, nbytes FROM records WHERE segment = ? '
+                    'ORDER BY offset',
+                    (segment,),
+                )
+                live = cur.fetchall()
+                if len(live) > 0:
+                    with open(self.segment_fpath(segment), 'rb') as file_:
+                        items = []
+                        for key, offset, nbytes in live:
+                            file_.seek(offset)
+                            items.append((key, file_.read(nbytes)))
+                    if target is None:
+                        target = self._new_segment(cur)
+                    # Moved values are not dead in the victim, drop it first
+                    cur.execute('DELETE FROM records WHERE segment = ?', (segment,))
+                    self._append(cur, target, items)
+                    num_moved += len(items)
+                cur.execute('DELETE FROM segments WHERE segment = ?', (segment,))
+                removed_segments.append(segment)
+        for segment in removed_segments:
+            ut.delete(self.segment_fpath(segment), verbose=False)
+        logger.info(
+            '[packed] compacted %d segments of %s, moved %d values'
+            % (len(removed_segments), self.dpath, num_moved)
+        )
+        return num_moved
+
+    def get_stats(self):
+        conn = self.connection
+        num_records = conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+        num_segments, nbytes, dead_nbytes = conn.execute(
+            'SELECT COUNT(*), TOTAL(nbytes), TOTAL(dead_nbytes) FROM segments'
+        ).fetchone()
+        return {
+            'num_records': num_records,
+            'num_segments': num_segments,
+            'nbytes': int(nbytes),
+            'dead_nbytes': int(dead_nbytes),
+        }
+
+    @property
+    def scratch_dpath(self):
+        """ Local directory for converting values with path based functions """
+        if self._scratch_dpath is None or not exists(self._scratch_dpath):
+            self._scratch_dpath = tempfile.mkdtemp(
+                prefix='wbia_packed_', dir=PACKED_SCRATCH_DPATH
+            )
+        return self._scratch_dpath
+
+    def _scratch_fpath(self, key):
+        # Keep the file name, and its extension, for the read / write funcs
+        prefix = '%d_%d_' % (os.getpid(), threading.get_ident())
+        return join(self.scratch_dpath, prefix + basename(key))
+
+    def dumps(self, write_func, key, data):
+        """ Serializes ``data`` with a column ``write_func`` """
+        fpath = self._scratch_fpath(key)
+        try:
+            write_func(fpath, data)
+            with open(fpath, 'rb') as file_:
+                return file_.read()
+        finally:
+            if exists(fpath):
+                os.remove(fpath)
+
+    def loads(self, read_func, key, blob):
+        """ Deserializes ``blob`` with a column ``read_func`` """
+        fpath = self._scratch_fpath(key)
+        try:
+            with open(fpath, 'wb') as file_:
+                file_.write(blob)
+            return read_func(fpath)
+        finally:
+            if exists(fpath):
+                os.remove(fpath)
+
+    def extract(self, key, fpath):
+        """ Writes the stored value of ``key`` to ``fpath``, returns False if unknown """
+        blob = self.get_many([key])[0]
+        if blob is None:
+            return False
+        with open(fpath, 'wb') as file_:
+            file_.write(blob)
+        return True
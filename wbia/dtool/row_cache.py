@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+In-process LRU of rows read by ``DependencyCacheTable.get_row_data``.
+
+Rows are keyed by table, rowid and the requested columns.  A rowid already
+identifies the parents and the config of a row, so repeated requests for the
+same features skip the SQL lookup and the decoding of external data.  The
+cache keeps read-only copies of the numpy arrays of a row because every
+later caller shares them; the arrays of the caller that stored the row are
+left alone.
+"""
+import collections
+import copy
+import logging
+import sys
+import threading
+import numpy as np
+import utool as ut
+
+(print, rrr, profile) = ut.inject2(__name__)
+logger = logging.getLogger('wbia')
+
+
+# Memory budget (in MB) of the row cache of each depcache.  Zero disables it.
+ROW_CACHE_BUDGET = ut.get_argval('--depc-row-cache-budget', type_=float, default=0.0)
+
+#: Returned by ``RowCache.get_many`` for keys that are not cached
+MISSING = object()
+
+
+def _value_nbytes(value, _depth=0):
+    """ Rough number of bytes a cached value keeps in memory """
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return sum(_value_nbytes(item, _depth + 1) for item in value.ravel())
+        return value.nbytes
+    if isinstance(value, (list, tuple)) and _depth < 6:
+        return sys.getsizeof(value) + sum(
+            _value_nbytes(item, _depth + 1) for item in value
+        )
+    if isinstance(value, dict) and _depth < 6:
+        return sys.getsizeof(value) + sum(
+            _value_nbytes(item, _depth + 1) for item in value.values()
+        )
+    return sys.getsizeof(value)
+
+
+def _freeze(value, _depth=0):
+    """
+    Returns a copy of a row where every array (also inside lists, tuples,
+    dicts and object arrays) is a read-only copy. ``value`` is not modified.
+    """
+    if isinstance(value, np.ndarray):
+        frozen = value.copy()
+        if frozen.dtype == object and _depth < 6:
+            for index, item in enumerate(frozen.flat):
+                frozen.flat[index] = _freeze(item, _depth + 1)
+        frozen.flags.writeable = False
+        return frozen
+    if _depth >= 6:
+        return value
+    if isinstance(value, list):
+        return [_freeze(item, _depth + 1) for item in value]
+    if isinstance(value, tuple):
+        items = [_freeze(item, _depth + 1) for item in value]
+        # namedtuples are rebuilt with their own type
+        return value._make(items) if hasattr(value, '_make') else tuple(items)
+    if isinstance(value, dict):
+        frozen = copy.copy(value)
+        for key, item in value.items():
+            frozen[key] = _freeze(item, _depth + 1)
+        return frozen
+    return value
+
+
+class RowCache(object):
+    """
+    Size-aware LRU of depcache rows, keyed by
+    ``(tablename, rowid, colnames, read_extern)``.
+
+    Least recently used rows are evicted when the estimated size is over
+    ``budget`` megabytes.  Rows are invalidated by table and rowid, which the
+    tables do when rows are deleted or recomputed.
+
+    Args:
+        budget (float): memory budget in megabytes (0 disables the cache)
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.dtool.row_cache import *  # NOQA
+        >>> cache = RowCache(budget=1.0)
+        >>> vecs = np.zeros((1000, 128), dtype=np.uint8)
+        >>> cache.put(('feat', 1, ('vecs',), True), (vecs,))
+        >>> cache.put(('feat', 2, ('vecs',), True), (vecs.copy(),))
+        >>> keys = [('feat', 1, ('vecs',), True), ('feat', 3, ('vecs',), True)]
+        >>> values = cache.get_many(keys)
+        >>> hits = [value is not MISSING for value in values]
+        >>> print(hits)
+        [True, False]
+        >>> # The cache holds its own read-only copy
+        >>> assert vecs.flags.writeable and not values[0][0].flags.writeable
+        >>> cache.invalidate('feat', [1])
+        >>> cache.put(('feat', 4, ('vecs',), True), (np.zeros((1000, 1000), np.uint8),))
+        >>> stats = cache.get_stats()
+        >>> print(ut.repr2(ut.dict_subset(stats, [
+        >>>     'hits', 'misses', 'evictions', 'invalidations', 'num_entries'])))
+        {'hits': 1, 'misses': 1, 'evictions': 1, 'invalidations': 1, 'num_entries': 1}
+    """
+
+    def __init__(self, budget=None):
+        if budget is None:
+            budget = ROW_CACHE_BUDGET
+        self.budget = budget
+        # key -> (value, nbytes)
+        self._entries = collections.OrderedDict()
+        # (tablename, rowid) -> keys of all cached column sets of the row
+        self._row_keys = {}
+        self._nbytes = 0
+        self._lock = threading.RLock()
+        self.reset_stats()
+
+    @property
+    def enabled(self):
+        return bool(self.budget)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def reset_stats(self):
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    def configure(self, budget=None):
+        """ Changes the budget of a live cache, evicting as needed """
+        with self._lock:
+            if budget is not None:
+                self.budget = budget
+            if not self.enabled:
+                self.clear()
+            self._evict()
+
+    def _remove(self, key):
+        value, nbytes = self._entries.pop(key)
+        self._nbytes -= nbytes
+        row_key = key[0:2]
+        keys = self._row_keys.get(row_key, None)
+        if keys is not None:
+            keys.discard(key)
+            if len(keys) == 0:
+                del self._row_keys[row_key]
+
+    def _evict(self):
+        budget_bytes = int(self.budget * (2 ** 20))
+        while len(self._entries) > 0 and self._nbytes > budget_bytes:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.stats['evictions'] += 1
+
+    def get_many(self, keys):
+        """ Returns the cached value of each key or ``MISSING`` """
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key, None)
+                if entry is None:
+                    self.stats['misses'] += 1
+                    values.append(MISSING)
+                else:
+                    self.stats['hits'] += 1
+                    self._entries.move_to_end(key)
+                    values.append(entry[0])
+        return values
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        nbytes = _value_nbytes(value)
+        if nbytes > self.budget * (2 ** 20):
+            # Would evict everything else and then itself
+            return
+        value = _freeze(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, nbytes)
+            self._nbytes += nbytes
+            self._row_keys.setdefault(key[0:2], set()).add(key)
+            self._evict()
+
+    def invalidate(self, tablename, rowids):
+        """ Drops every cached column set of the given rows """
+        with self._lock:
+            for rowid in rowids:
+                for key in list(self._row_keys.get((tablename, rowid), [])):
+                    self._remove(key)
+                    self.stats['invalidations'] += 1
+
+    def invalidate_table(self, tablename):
+        with self._lock:
+            row_keys = [row_key for row_key in self._row_keys if row_key[0] == tablename]
+            for row_key in row_keys:
+                self.invalidate(tablename, [row_key[1]])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._row_keys.clear()
+            self._nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self):
+        """ Returns the counters together with the current occupancy """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['num_entries'] = len(self._entries)
+            stats['nbytes'] = self._nbytes
+            stats['budget'] = self.budget
+            num_requests = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / num_requests if num_requests else None
+        return stats
@@ -26,7 +26,7 @@ from sqlalchemy.sql import bindparam, text, ClauseElement
 
 from wbia.dtool import lite
 from wbia.dtool.dump import dumps
-from wbia.dtool.types import Integer, TYPE_TO_SQLTYPE
+from wbia.dtool.types import Integer, NDArray, NPY_MAGIC, TYPE_TO_SQLTYPE
 from wbia.dtool.types import initialize_postgresql_types
 
 import tqdm
@@ -47,6 +47,16 @@ TIMEOUT = 600  # Wait for up to 600 seconds for the database to return from a lo
 
 BATCH_SIZE = int(1e4)
 
+# Rows per multi-row INSERT / UPDATE statement and per DBAPI executemany call
+EXECUTE_BATCH_SIZE = ut.get_argval('--sql-batch-size', type_=int, default=1000)
+# Upper bound on bind parameters in one statement (SQLITE_MAX_VARIABLE_NUMBER)
+MAX_BIND_PARAMS = 32766 if lite.sqlite_version_info >= (3, 32, 0) else 999
+
+# Lookups of at least this many ids on a unique key use the bulk getter
+BULK_GET_MIN_IDS = 1000
+# Name of the connection-local table the bulk getter loads ids into
+BULK_GET_TEMP_TABLE = '_bulk_get_ids'
+
 SQLColumnRichInfo = collections.namedtuple(
     'SQLColumnRichInfo', ('column_id', 'name', 'type_', 'notnull', 'dflt_value', 'pk')
 )
@@ -73,7 +83,11 @@ METADATA_TABLE_COLUMNS = {
 METADATA_TABLE_COLUMN_NAMES = list(METADATA_TABLE_COLUMNS.keys())
 
 
-def create_engine(uri, POSTGRESQL_POOL_SIZE=20, ENGINES={}, timeout=TIMEOUT):
+# Engines shared by the controllers of this process (see create_engine)
+ENGINES = {}
+
+
+def create_engine(uri, POSTGRESQL_POOL_SIZE=20, ENGINES=ENGINES, timeout=TIMEOUT):
     pid = os.getpid()
     if ENGINES.get('pid') != pid:
         # ENGINES contains engines from the parent process that the
@@ -101,6 +115,13 @@ def create_engine(uri, POSTGRESQL_POOL_SIZE=20, ENGINES={}, timeout=TIMEOUT):
     return ENGINES[uri]
 
 
+def get_shared_engines():
+    """ The engines create_engine made in this process (not in-memory ones) """
+    if ENGINES.get('pid') != os.getpid():
+        return []
+    return [engine for key, engine in ENGINES.items() if key != 'pid']
+
+
 def compare_coldef_lists(coldef_list1, coldef_list2):
     def normalize(coldef_list):
         for name, coldef in coldef_list:
@@ -134,6 +155,19 @@ def compare_coldef_lists(coldef_list1, coldef_list2):
     return
 
 
+def _is_batchable_operation(operation):
+    """
+    True for UPDATE and DELETE statements without RETURNING, which produce no
+    result per parameter set and can be sent with DBAPI ``executemany``
+    """
+    if isinstance(operation, (sqlalchemy.sql.Update, sqlalchemy.sql.Delete)):
+        return not operation._returning
+    if isinstance(operation, sqlalchemy.sql.elements.TextClause):
+        sql = operation.text.strip().upper()
+        return sql.startswith(('UPDATE', 'DELETE')) and 'RETURNING' not in sql
+    return False
+
+
 def _unpacker(results):
     """ HELPER: Unpacks results if unpack_scalars is True. """
     if not results:  # Check for None or empty list
@@ -526,6 +560,8 @@ class SQLDatabaseController(object):
         self._sa_metadata.reflect(bind=self._engine)
 
         self._tablenames = None
+        # Maps (tblname, colname) to whether the column is a unique key
+        self._unique_column_cache = {}
 
         if not self.readonly:
             # Ensure the metadata table is initialized.
@@ -748,6 +784,82 @@ class SQLDatabaseController(object):
         self.shrink_memory()
         self.vacuum()
 
+    def reencode_ndarray_columns(self, tablenames=None, batch_size=EXECUTE_BATCH_SIZE):
+        """
+        Rewrites NDARRAY values stored with ``np.save`` in the compact encoding.
+
+        Both encodings are always readable, so this is only needed to get the
+        faster decoding for existing rows. Arrays that can only be stored with
+        ``np.save`` (object and structured dtypes) are left as they are.
+
+        Args:
+            tablenames (list): tables to migrate (default: all tables)
+            batch_size (int): rows read and rewritten per transaction
+
+        Returns:
+            int: number of re-encoded values
+
+        Example:
+            >>> # ENABLE_DOCTEST
+            >>> from wbia.dtool.sql_control import *  # NOQA
+            >>> import numpy as np
+            >>> from wbia.dtool.types import NPY_MAGIC, _encode_npy
+            >>> db = SQLDatabaseController('sqlite:///', 'testing')
+            >>> db.add_table('legacy_table', (
+            >>>     ('legacy_rowid',        'INTEGER PRIMARY KEY'),
+            >>>     ('arr',                 'NDARRAY'),
+            >>> ), docstr='')
+            >>> arrs = [np.arange(i, dtype=np.float32) for i in range(5)]
+            >>> with db.connect() as conn:
+            >>>     for arr in arrs:
+            >>>         conn.execute(
+            >>>             text('INSERT INTO legacy_table (arr) VALUES (:arr)'),
+            >>>             arr=_encode_npy(arr))
+            >>> print(db.reencode_ndarray_columns(batch_size=2))
+            5
+            >>> print(db.reencode_ndarray_columns())
+            0
+            >>> got = db.get('legacy_table', ('arr',), [1, 2, 3, 4, 5])
+            >>> assert all(np.all(a == b) for a, b in zip(got, arrs))
+        """
+        if tablenames is None:
+            tablenames = sorted(self.get_table_names())
+        num_reencoded = 0
+        for tablename in tablenames:
+            table = self._reflect_table(tablename)
+            id_column = self._table_column(table, 'rowid')
+            for column in table.columns:
+                if not isinstance(column.type, NDArray):
+                    continue
+                # Page by rowid, arrays that stay in np.save format still match
+                stmt = (
+                    sqlalchemy.select([id_column])
+                    .where(id_column > bindparam('last_rowid'))
+                    .where(sqlalchemy.func.substr(column, 1, len(NPY_MAGIC)) == NPY_MAGIC)
+                    .order_by(id_column)
+                    .limit(batch_size)
+                )
+                last_rowid = -1
+                while True:
+                    with self.connect() as conn:
+                        rows = conn.execute(stmt, last_rowid=last_rowid).fetchall()
+                    if len(rows) == 0:
+                        break
+                    rowids = [row[0] for row in rows]
+                    last_rowid = rowids[-1]
+                    arrs = self.get_bulk(tablename, (column.name,), rowids)
+                    flags = [
+                        not arr.dtype.hasobject and arr.dtype.fields is None
+                        for arr in arrs
+                    ]
+                    rowids = ut.compress(rowids, flags)
+                    self.set(tablename, (column.name,), ut.compress(arrs, flags), rowids)
+                    num_reencoded += len(rowids)
+                logger.info(
+                    '[sql] re-encoded NDARRAY column %s.%s' % (tablename, column.name)
+                )
+        return num_reencoded
+
     def _reflect_table(self, table_name):
         """Produces a SQLAlchemy Table object from the given ``table_name``"""
         # Note, this on introspects once. Repeated calls will pull the Table object
@@ -820,22 +932,158 @@ class SQLDatabaseController(object):
         exists_list = [rowid is not None for rowid in rowid_list1]
         return exists_list
 
-    def _add(self, tblname, colnames, params_iter, unpack_scalars=True, **kwargs):
-        """ ADDER NOTE: use add_cleanly """
-        parameterized_values = [
-            {col: val for col, val in zip(colnames, params)} for params in params_iter
-        ]
+    @property
+    def supports_returning(self):
+        """ True if INSERT ... RETURNING is available (sqlite >= 3.35) """
+        if self.is_using_sqlite:
+            return lite.sqlite_version_info >= (3, 35, 0)
+        return self.is_using_postgres
+
+    def _table_column(self, table, colname):
+        """ Column object for ``colname``, including sqlite's implicit rowid """
+        if colname == 'rowid':  # rowid isn't an actual column in sqlite
+            return sqlalchemy.sql.column('rowid', Integer)
         if self.is_using_postgres:
             # postgresql column names are lowercase
-            parameterized_values = [
-                {col.lower(): val for col, val in params.items()}
-                for params in parameterized_values
-            ]
+            colname = colname.lower()
+        return table.c[colname]
+
+    def _bind_rows(self, columns, rows):
+        """
+        Converts rows of python values to DBAPI parameters one column at a
+        time using each column type's bind processor
+        """
+        dialect = self._engine.dialect
+        bound_columns = []
+        for column, values in zip(columns, zip(*rows)):
+            if isinstance(column.type, Integer):
+                # Cast numpy.integer* values, allowing for None
+                values = [None if v is None else int(v) for v in values]
+            else:
+                bind_processor = column.type.bind_processor(dialect)
+                if bind_processor is not None:
+                    values = [bind_processor(v) for v in values]
+            bound_columns.append(values)
+        return list(zip(*bound_columns))
+
+    @staticmethod
+    def _rows_per_statement(num_params_per_row, batch_size):
+        return max(1, min(batch_size, MAX_BIND_PARAMS // max(num_params_per_row, 1)))
+
+    def _add(
+        self,
+        tblname,
+        colnames,
+        params_iter,
+        unpack_scalars=True,
+        batch_size=EXECUTE_BATCH_SIZE,
+        **kwargs,
+    ):
+        """
+        ADDER NOTE: use add_cleanly
+
+        Rows are sent as multi-row ``INSERT ... VALUES ... RETURNING``
+        statements of up to ``batch_size`` rows inside one transaction.
+
+        Example:
+            >>> # ENABLE_DOCTEST
+            >>> from wbia.dtool.sql_control import *  # NOQA
+            >>> db = SQLDatabaseController('sqlite:///', 'testing')
+            >>> db.add_table('batch_table', (
+            >>>     ('batch_rowid',        'INTEGER PRIMARY KEY'),
+            >>>     ('key',                 'TEXT'),
+            >>>     ('val',                 'INTEGER'),
+            >>> ), superkeys=[('key',)], docstr='')
+            >>> params_list = [('k%d' % (i,), i) for i in range(7)]
+            >>> rowids = db._add('batch_table', ('key', 'val'), params_list, batch_size=3)
+            >>> print(rowids)
+            [1, 2, 3, 4, 5, 6, 7]
+            >>> assert db.get('batch_table', ('key', 'val'), rowids) == params_list
+        """
+        params_list = [tuple(params) for params in params_iter]
+        if len(params_list) == 0:
+            return []
         table = self._reflect_table(tblname)
+        columns = [self._table_column(table, colname) for colname in colnames]
+        pk_columns = list(table.primary_key.columns)
+        if len(pk_columns) == 0:
+            pk_columns = [self._table_column(table, 'rowid')]
+        colname_list = [column.name for column in columns]
+        if all(pk_column.name in colname_list for pk_column in pk_columns):
+            pk_indices = [colname_list.index(pk_column.name) for pk_column in pk_columns]
+            pk_isnone = [
+                params[idx] is None for params in params_list for idx in pk_indices
+            ]
+        else:
+            pk_indices = None
+            pk_isnone = [True]
+        # Keys passed as None are generated like omitted ones
+        pk_given = not any(pk_isnone)
+        pk_type = pk_columns[0].type
+        pk_generated = (
+            len(pk_columns) == 1
+            and all(pk_isnone)
+            and isinstance(getattr(pk_type, 'impl', pk_type), sqlalchemy.types.Integer)
+        )
+        if not self.supports_returning or not (pk_given or pk_generated):
+            # Also handles a mix of given and generated keys
+            return self._add_rowwise(table, columns, params_list, unpack_scalars)
+
+        dialect = self._engine.dialect
+        quote = dialect.identifier_preparer.quote
+        placeholder = '?' if dialect.paramstyle == 'qmark' else '%s'
+        row_placeholders = '(%s)' % (', '.join([placeholder] * len(columns)),)
+        insert_fmt = 'INSERT INTO %s (%s) VALUES {values} RETURNING %s' % (
+            quote(table.name),
+            ', '.join(quote(name) for name in colname_list),
+            ', '.join(quote(pk_column.name) for pk_column in pk_columns),
+        )
+        bound_rows = self._bind_rows(columns, params_list)
+        rows_per_statement = self._rows_per_statement(len(columns), batch_size)
 
-        # It would be possible to do one insert,
-        # but SQLite is not capable of returning the primary key value after a multi-value insert.
-        # Thus, we are stuck doing several inserts... ineffecient.
+        returned_pks = []
+        with self.connect() as conn:
+            with conn.begin():  # new nested database transaction
+                cursor = conn.connection.cursor()
+                try:
+                    for start in range(0, len(bound_rows), rows_per_statement):
+                        chunk = bound_rows[start : start + rows_per_statement]
+                        operation = insert_fmt.format(
+                            values=', '.join([row_placeholders] * len(chunk))
+                        )
+                        cursor.execute(operation, [v for row in chunk for v in row])
+                        chunk_pks = [tuple(row) for row in cursor.fetchall()]
+                        if not pk_given:
+                            # RETURNING order is not defined, but generated
+                            # keys increase in the order of the VALUES rows
+                            chunk_pks = sorted(chunk_pks)
+                        returned_pks.extend(chunk_pks)
+                finally:
+                    cursor.close()
+
+        if pk_given:
+            primary_keys = [tuple(ut.take(params, pk_indices)) for params in params_list]
+        else:
+            primary_keys = returned_pks
+        if unpack_scalars:
+            # Assumption at the time of writing this is that the primary key is the SQLite rowid.
+            # Therefore, we can assume the primary key is a single column value.
+            primary_keys = [pk[0] for pk in primary_keys]
+        return primary_keys
+
+    def _add_rowwise(self, table, columns, params_list, unpack_scalars=True):
+        """ Inserts one row per statement (used when RETURNING is unavailable) """
+        # Keys passed as None are left out so they are generated and returned
+        parameterized_values = [
+            {
+                column.name: val
+                for column, val in zip(columns, params)
+                if val is not None or not column.primary_key
+            }
+            for params in params_list
+        ]
+        # SQLite before 3.35 is not capable of returning the primary key values
+        # after a multi-value insert. Thus, we are stuck doing several inserts.
         insert_stmt = sqlalchemy.insert(table)
 
         primary_keys = []
@@ -952,7 +1200,7 @@ class SQLDatabaseController(object):
             )
         # Add any unadded parameters to the database
         try:
-            self._add(tblname, colnames, dirty_params, **kwargs)
+            new_rowid_list = self._add(tblname, colnames, dirty_params, **kwargs)
         except Exception as ex:
             nInput = len(params_list)  # NOQA
             ut.printex(
@@ -966,9 +1214,20 @@ class SQLDatabaseController(object):
                 ],
             )
             raise
-        # TODO: We should only have to preform a subset of adds here
-        # (at the positions where rowid_list was None in the getter check)
-        rowid_list = get_rowid_from_superkey(*superkey_lists)
+        if kwargs.get('unpack_scalars', True):
+            # The adder returns the new rowids, so only duplicate inputs need
+            # to be resolved instead of querying every superkey again
+            superkey_list = list(zip(*superkey_lists))
+            dirty_superkeys = ut.compress(superkey_list, needsadd_list)
+            superkey_to_rowid = dict(zip(dirty_superkeys, new_rowid_list))
+            rowid_list = [
+                superkey_to_rowid.get(superkey) if rowid is None and isvalid else rowid
+                for superkey, rowid, isvalid in zip(
+                    superkey_list, rowid_list_, isvalid_list
+                )
+            ]
+        else:
+            rowid_list = get_rowid_from_superkey(*superkey_lists)
 
         # ADD_CLEANLY_4: SANITY CHECK AND RETURN
         assert len(rowid_list) == len(params_list), 'failed sanity check'
@@ -1321,103 +1580,247 @@ class SQLDatabaseController(object):
         if not isinstance(colnames, (tuple, list)):
             raise TypeError('colnames must be a sequence type of strings')
 
-        # ??? Getting a single column of unique values that is matched on rowid?
-        #     And sorts the results after the query?
-        # ??? This seems oddly specific for a generic method.
-        #     Perhaps the logic should be in its own method?
-        if (
-            assume_unique
-            and id_iter is not None
-            and id_colname == 'rowid'
-            and len(colnames) == 1
+        if id_iter is None:
+            where_clause = None
+            params_iter = []
+
+            return self.get_where(
+                tblname, colnames, params_iter, where_clause, eager=eager, **kwargs
+            )
+
+        id_iter = list(id_iter)  # id_iter could be a set
+        if assume_unique or (
+            len(id_iter) >= BULK_GET_MIN_IDS
+            and self._is_unique_column(tblname, id_colname)
         ):
-            id_iter = list(id_iter)
-            columns = ', '.join(colnames)
-            ids_listing = ', '.join(map(str, id_iter))
-            operation = f'SELECT {columns} FROM {tblname} WHERE rowid in ({ids_listing}) ORDER BY rowid ASC'
-            with self.connect() as conn:
-                results = conn.execute(operation).fetchall()
-            import numpy as np
-
-            # ??? Why order the results if they are going to be sorted here?
-            sortx = np.argsort(np.argsort(id_iter))
-            results = ut.take(results, sortx)
-            if kwargs.get('unpack_scalars', True):
-                results = ut.take_column(results, 0)
-            return results
+            # Unique keys need no per-id result buckets
+            return self.get_bulk(
+                tblname, colnames, id_iter, id_colname, batch_size=batch_size, **kwargs
+            )
+
+        table = self._reflect_table(tblname)
+        result_map = {}
+        if id_colname == 'rowid':  # rowid isn't an actual column in sqlite
+            id_column = sqlalchemy.sql.column('rowid', Integer)
         else:
-            if id_iter is None:
-                where_clause = None
-                params_iter = []
+            id_column = table.c[id_colname]
+        stmt = sqlalchemy.select([id_column] + [table.c[c] for c in colnames])
+        stmt = stmt.where(id_column.in_(bindparam('value', expanding=True)))
 
-                return self.get_where(
-                    tblname, colnames, params_iter, where_clause, eager=eager, **kwargs
-                )
+        batch_list = list(range(int(len(id_iter) / batch_size) + 1))
+        for batch in tqdm.tqdm(
+            batch_list, disable=len(batch_list) <= 1, desc='[db.get(%s)]' % (tblname,)
+        ):
+            val_list = self.executeone(
+                stmt,
+                {'value': id_iter[batch * batch_size : (batch + 1) * batch_size]},
+            )
 
-            id_iter = list(id_iter)  # id_iter could be a set
-            table = self._reflect_table(tblname)
-            result_map = {}
-            if id_colname == 'rowid':  # rowid isn't an actual column in sqlite
-                id_column = sqlalchemy.sql.column('rowid', Integer)
+            for val in val_list:
+                if not kwargs.get('keepwrap', False) and len(val[1:]) == 1:
+                    values = val[1]
+                else:
+                    values = val[1:]
+                existing = result_map.setdefault(val[0], set())
+                if isinstance(existing, set):
+                    try:
+                        existing.add(values)
+                    except TypeError:
+                        # unhashable type
+                        result_map[val[0]] = list(result_map[val[0]])
+                        if values not in result_map[val[0]]:
+                            result_map[val[0]].append(values)
+                elif values not in existing:
+                    existing.append(values)
+
+        results = []
+
+        def process(a):
+            processor = id_column.type.bind_processor(self._engine.dialect)
+            if processor:
+                a = processor(a)
+            result_processor = id_column.type.result_processor(
+                self._engine.dialect, str(id_column.type)
+            )
+            if result_processor:
+                return result_processor(a)
+            return a
+
+        if id_iter:
+            first_id = id_iter[0]
+            if isinstance(first_id, bool) or TYPE_TO_SQLTYPE.get(
+                type(first_id)
+            ) != str(id_column.type):
+                id_iter = (process(id_) for id_ in id_iter)
+
+        for id_ in id_iter:
+            result = sorted(list(result_map.get(id_, set())))
+            if kwargs.get('unpack_scalars', True) and isinstance(result, list):
+                results.append(_unpacker(result))
             else:
-                id_column = table.c[id_colname]
-            stmt = sqlalchemy.select([id_column] + [table.c[c] for c in colnames])
-            stmt = stmt.where(id_column.in_(bindparam('value', expanding=True)))
+                results.append(result)
 
-            batch_list = list(range(int(len(id_iter) / batch_size) + 1))
-            for batch in tqdm.tqdm(
-                batch_list, disable=len(batch_list) <= 1, desc='[db.get(%s)]' % (tblname,)
-            ):
-                val_list = self.executeone(
-                    stmt,
-                    {'value': id_iter[batch * batch_size : (batch + 1) * batch_size]},
-                )
+        return results
 
-                for val in val_list:
-                    if not kwargs.get('keepwrap', False) and len(val[1:]) == 1:
-                        values = val[1]
-                    else:
-                        values = val[1:]
-                    existing = result_map.setdefault(val[0], set())
-                    if isinstance(existing, set):
-                        try:
-                            existing.add(values)
-                        except TypeError:
-                            # unhashable type
-                            result_map[val[0]] = list(result_map[val[0]])
-                            if values not in result_map[val[0]]:
-                                result_map[val[0]].append(values)
-                    elif values not in existing:
-                        existing.append(values)
-
-            results = []
-
-            def process(a):
-                processor = id_column.type.bind_processor(self._engine.dialect)
-                if processor:
-                    a = processor(a)
-                result_processor = id_column.type.result_processor(
-                    self._engine.dialect, str(id_column.type)
+    def _is_unique_column(self, tblname, colname):
+        """
+        True if at most one row of ``tblname`` can match a value of ``colname``
+        (the rowid, a single column primary key, unique constraint or unique
+        index)
+        """
+        if colname == 'rowid':
+            return True
+        key = (tblname, colname)
+        if key not in self._unique_column_cache:
+            table = self._reflect_table(tblname)
+            keysets = [tuple(c.name for c in table.primary_key.columns)]
+            keysets += [
+                tuple(c.name for c in constraint.columns)
+                for constraint in table.constraints
+                if isinstance(constraint, sqlalchemy.UniqueConstraint)
+            ]
+            keysets += [
+                tuple(c.name for c in index.columns)
+                for index in table.indexes
+                if index.unique
+            ]
+            self._unique_column_cache[key] = (colname,) in keysets
+        return self._unique_column_cache[key]
+
+    def get_bulk(
+        self,
+        tblname,
+        colnames,
+        id_iter,
+        id_colname='rowid',
+        unpack_scalars=True,
+        keepwrap=False,
+        batch_size=BATCH_SIZE,
+        zero_copy=False,
+        **kwargs,
+    ):
+        """Get rows of data by a unique key with one set-based query
+
+        The ids are loaded, together with their input position, into a
+        connection-local temporary table that is joined against ``tblname``.
+        Rows come back in input order, so there is no per-id matching in
+        Python, and each column is decoded by its type in a single pass.
+
+        Args:
+            tblname (str): table name to get from
+            colnames (tuple of str): column names to grab from
+            id_iter (iterable): iterable of search keys
+            id_colname (str): search key column, must be unique in the table
+            unpack_scalars (bool): default True
+            keepwrap (bool): keep single column values wrapped in tuples
+            batch_size (int): number of ids inserted per executemany
+            zero_copy (bool): decode NDARRAY columns as read-only views on
+                the fetched buffers instead of writable copies
+
+        Example:
+            >>> # ENABLE_DOCTEST
+            >>> from wbia.dtool.example_depcache import testdata_depc
+            >>> depc = testdata_depc()
+            >>> depc.clear_all()
+            >>> rowids = depc.get_rowids('notch', [1, 2, 3])
+            >>> db = depc['notch'].db
+            >>> colnames = ('dummy_annot_rowid', 'config_rowid')
+            >>> got_data = db.get_bulk('notch', colnames, rowids[::-1] + [9999])
+            >>> assert got_data[0:3] == db.get('notch', colnames, rowids[::-1])
+            >>> assert got_data[3] is None
+        """
+        if not isinstance(colnames, (tuple, list)):
+            raise TypeError('colnames must be a sequence type of strings')
+        id_iter = list(id_iter)
+        if len(id_iter) == 0:
+            return []
+
+        dialect = self._engine.dialect
+        quote = dialect.identifier_preparer.quote
+        table = self._reflect_table(tblname)
+
+        def _column(colname):
+            if colname == 'rowid':  # rowid isn't an actual column in sqlite
+                return sqlalchemy.sql.column('rowid', Integer)
+            return table.c[colname]
+
+        def _select_expr(colname):
+            return 'tbl.rowid' if colname == 'rowid' else 'tbl.' + quote(colname)
+
+        # Bind the ids with the type of the id column (e.g. numpy ints, UUIDs)
+        id_column = _column(id_colname)
+        bind_processor = id_column.type.bind_processor(dialect)
+        if isinstance(id_column.type, Integer):
+            id_iter = [None if id_ is None else int(id_) for id_ in id_iter]
+        elif bind_processor is not None:
+            id_iter = [bind_processor(id_) for id_ in id_iter]
+        # The temporary column gets the same declared type so sqlite applies
+        # the same affinity on both sides of the join
+        id_coltype = id_column.type.compile(dialect=dialect)
+
+        temp_tblname = quote(BULK_GET_TEMP_TABLE)
+        insert_operation = text(f'INSERT INTO {temp_tblname} (pos, id) VALUES (:pos, :id)')
+        # The id column of the joined row tells found rows from missing rows
+        select_list = ', '.join(_select_expr(c) for c in (id_colname,) + tuple(colnames))
+        select_operation = text(
+            f'SELECT {select_list} FROM {temp_tblname} AS ids '
+            f'LEFT JOIN {quote(tblname)} AS tbl '
+            f'ON {_select_expr(id_colname)} = ids.id '
+            'ORDER BY ids.pos'
+        )
+        with self.connect() as conn:
+            # The DBAPI connection may be in the middle of the caller's
+            # transaction (in memory sqlite databases share one connection per
+            # thread), so nothing here may commit. The temporary table only
+            # lives on this connection and is dropped again before returning.
+            conn = conn.execution_options(autocommit=False)
+            conn.execute(text(f'DROP TABLE IF EXISTS {temp_tblname}'))
+            conn.execute(
+                text(
+                    f'CREATE TEMPORARY TABLE {temp_tblname} '
+                    f'(pos INTEGER PRIMARY KEY, id {id_coltype})'
                 )
-                if result_processor:
-                    return result_processor(a)
-                return a
+            )
+            try:
+                for start in range(0, len(id_iter), batch_size):
+                    chunk = id_iter[start : start + batch_size]
+                    conn.execute(
+                        insert_operation,
+                        [{'pos': pos, 'id': id_} for pos, id_ in enumerate(chunk, start)],
+                    )
+                rows = conn.execute(select_operation).fetchall()
+            finally:
+                conn.execute(text(f'DROP TABLE IF EXISTS {temp_tblname}'))
 
-            if id_iter:
-                first_id = id_iter[0]
-                if isinstance(first_id, bool) or TYPE_TO_SQLTYPE.get(
-                    type(first_id)
-                ) != str(id_column.type):
-                    id_iter = (process(id_) for id_ in id_iter)
-
-            for id_ in id_iter:
-                result = sorted(list(result_map.get(id_, set())))
-                if kwargs.get('unpack_scalars', True) and isinstance(result, list):
-                    results.append(_unpacker(result))
-                else:
-                    results.append(result)
+        if len(rows) != len(id_iter):
+            raise ValueError(
+                'Column %r of table %r is not unique' % (id_colname, tblname)
+            )
 
-            return results
+        # Decode one column at a time
+        flags = [row[0] is not None for row in rows]
+        columns = []
+        for colx, colname in enumerate(colnames, start=1):
+            values = [row[colx] for row in rows]
+            coltype = _column(colname).type
+            if hasattr(coltype, 'bulk_result_processor'):
+                values = coltype.bulk_result_processor(dialect, copy=not zero_copy)(
+                    values
+                )
+            else:
+                result_processor = coltype.result_processor(dialect, None)
+                if result_processor is not None:
+                    values = [None if v is None else result_processor(v) for v in values]
+            columns.append(values)
+        if len(columns) == 1 and not keepwrap:
+            values_list = columns[0]
+        else:
+            values_list = list(zip(*columns))
+
+        if unpack_scalars:
+            return [values if flag else None for flag, values in zip(flags, values_list)]
+        else:
+            return [[values] if flag else [] for flag, values in zip(flags, values_list)]
 
     def set(
         self,
@@ -1428,11 +1831,16 @@ class SQLDatabaseController(object):
         id_colname='rowid',
         duplicate_behavior='error',
         duplcate_auto_resolve=True,
+        batch_size=EXECUTE_BATCH_SIZE,
         **kwargs,
     ):
         """
         setter
 
+        Rows are updated in batches of ``batch_size`` inside one transaction
+        (``UPDATE ... FROM (VALUES ...)`` on postgresql, DBAPI executemany on
+        sqlite).
+
         CommandLine:
             python -m dtool.sql_control set
 
@@ -1544,29 +1952,79 @@ class SQLDatabaseController(object):
         if has_sequenced_ids:
             id_list = [x[0] for x in id_list]
 
-        # Execute the SQL updates for each set of values
-        id_param_name = '_identifier'
+        # Execute the SQL updates in batches of rows
         table = self._reflect_table(tblname)
-        stmt = table.update().values(
-            **{col: bindparam(f'e{i}') for i, col in enumerate(colnames)}
-        )
-        where_clause = text(id_colname + f' = :{id_param_name}')
-        if id_colname == 'rowid':
-            # Cast all item values to in, in case values are numpy.integer*
-            # Strangely allow for None values
-            id_list = [id_ if id_ is None else int(id_) for id_ in id_list]
-        else:  # b/c rowid doesn't really exist as a column
-            id_column = table.c[id_colname]
-            where_clause = where_clause.bindparams(
-                bindparam(id_param_name, type_=id_column.type)
-            )
-        stmt = stmt.where(where_clause)
+        columns = [self._table_column(table, colname) for colname in colnames]
+        id_column = self._table_column(table, id_colname)
+        bound_rows = self._bind_rows([id_column] + columns, zip(id_list, *zip(*val_list)))
+        if len(bound_rows) == 0:
+            return
+
+        dialect = self._engine.dialect
+        quote = dialect.identifier_preparer.quote
+        placeholder = '?' if dialect.paramstyle == 'qmark' else '%s'
+        tblname_ = quote(table.name)
+        id_expr = 'rowid' if id_colname == 'rowid' else quote(id_column.name)
         with self.connect() as conn:
             with conn.begin():
-                for i, id in enumerate(id_list):
-                    params = {id_param_name: id}
-                    params.update({f'e{e}': p for e, p in enumerate(val_list[i])})
-                    conn.execute(stmt, **params)
+                cursor = conn.connection.cursor()
+                try:
+                    if self.is_using_postgres:
+                        # One UPDATE ... FROM (VALUES ...) per batch. Parameters
+                        # are sent untyped, so cast them to the column types.
+                        def _cast(column, name):
+                            coltype = column.type.compile(dialect=dialect)
+                            return 'CAST(v.%s AS %s)' % (name, coltype)
+
+                        value_names = ['e%d' % (i,) for i in range(len(columns))]
+                        assignments = ', '.join(
+                            '%s = %s' % (quote(column.name), _cast(column, name))
+                            for column, name in zip(columns, value_names)
+                        )
+                        row_placeholders = '(%s)' % (
+                            ', '.join([placeholder] * (len(columns) + 1)),
+                        )
+                        update_fmt = (
+                            'UPDATE {tblname} SET {assignments} '
+                            'FROM (VALUES {{values}}) AS v (id, {value_names}) '
+                            'WHERE {tblname}.{id_expr} = {id_cast}'
+                        ).format(
+                            tblname=tblname_,
+                            assignments=assignments,
+                            value_names=', '.join(value_names),
+                            id_expr=id_expr,
+                            id_cast=_cast(id_column, 'id'),
+                        )
+                        rows_per_statement = self._rows_per_statement(
+                            len(columns) + 1, batch_size
+                        )
+                        for start in range(0, len(bound_rows), rows_per_statement):
+                            chunk = bound_rows[start : start + rows_per_statement]
+                            operation = update_fmt.format(
+                                values=', '.join([row_placeholders] * len(chunk))
+                            )
+                            cursor.execute(operation, [v for row in chunk for v in row])
+                    else:
+                        # sqlite has no round trips, one prepared statement
+                        # reused by executemany is the fastest option
+                        assignments = ', '.join(
+                            '%s = %s' % (quote(column.name), placeholder)
+                            for column in columns
+                        )
+                        operation = 'UPDATE %s SET %s WHERE %s = %s' % (
+                            tblname_,
+                            assignments,
+                            id_expr,
+                            placeholder,
+                        )
+                        # The id is the last parameter of the statement
+                        params_list = [row[1:] + row[0:1] for row in bound_rows]
+                        for start in range(0, len(params_list), batch_size):
+                            cursor.executemany(
+                                operation, params_list[start : start + batch_size]
+                            )
+                finally:
+                    cursor.close()
 
     def delete(self, tblname, id_list, id_colname='rowid', **kwargs):
         """Deletes rows from a SQL table (``tblname``) by ID,
@@ -1706,10 +2164,20 @@ class SQLDatabaseController(object):
                 return values
 
     def executemany(
-        self, operation, params_iter, unpack_scalars=True, keepwrap=False, **kwargs
+        self,
+        operation,
+        params_iter,
+        unpack_scalars=True,
+        keepwrap=False,
+        batch_size=EXECUTE_BATCH_SIZE,
+        **kwargs,
     ):
         """Executes the given ``operation`` once for each item in ``params_iter``
 
+        UPDATE and DELETE statements are sent to the DBAPI ``executemany`` in
+        batches of ``batch_size`` parameter sets. Other statements are executed
+        once per parameter set so that each gets its own results.
+
         Args:
             operation (str): SQL operation
             params_iter (sequence): a sequence of sequences
@@ -1717,6 +2185,7 @@ class SQLDatabaseController(object):
             unpack_scalars (bool): [deprecated] use to unpack a single result from each query
                                    only use with operations that return a single result for each query
                                    (default: True)
+            batch_size (int): parameter sets per DBAPI executemany call
 
         """
         if not isinstance(operation, ClauseElement):
@@ -1726,10 +2195,21 @@ class SQLDatabaseController(object):
                 f"'operation' is a '{type(operation)}'"
             )
 
+        params_list = list(params_iter)
+        if _is_batchable_operation(operation) and all(
+            isinstance(params, Mapping) for params in params_list
+        ):
+            with self.connect() as conn:
+                with conn.begin():
+                    for start in range(0, len(params_list), batch_size):
+                        conn.execute(operation, params_list[start : start + batch_size])
+            # These statements have no results
+            return [None] * len(params_list)
+
         results = []
         with self.connect() as conn:
             with conn.begin():
-                for params in params_iter:
+                for params in params_list:
                     value = self.executeone(operation, params, keepwrap=keepwrap)
                     # Should only be used when the user wants back on value.
                     # Let the error bubble up if used wrong.
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """Mapping of Python types to SQL types"""
 import io
+import struct
 import uuid
 
 import numpy as np
@@ -19,6 +20,9 @@ __all__ = (
     'Number',
     'SQL_TYPE_TO_SA_TYPE',
     'UUID',
+    'decode_ndarray',
+    'decode_ndarray_list',
+    'encode_ndarray',
 )
 
 # DDD (26-Sept-12020) Deprecated in favor of SQL_TYPE_TO_SA_TYPE
@@ -111,6 +115,114 @@ class NumPyPicklableType(UserDefinedType):
         return process
 
 
+# Compact NDArray encoding: the magic bytes, a version byte, the length of the
+# dtype string and the number of dimensions, followed by the dtype string
+# (e.g. '<f4'), the shape as little-endian int64s and the raw C-ordered buffer.
+# Values written by ``np.save`` start with ``NPY_MAGIC`` and are still read.
+NDARRAY_MAGIC = b'\x93NDA'
+NDARRAY_VERSION = 1
+NPY_MAGIC = b'\x93NUMPY'
+_NDARRAY_HEADER = struct.Struct('<4sBBB')
+_DTYPE_CACHE = {}
+
+
+def _encode_npy(value):
+    out = io.BytesIO()
+    np.save(out, value)
+    out.seek(0)
+    return out.read()
+
+
+def _decode_npy(value):
+    out = io.BytesIO(value)
+    out.seek(0)
+    arr = np.load(out, allow_pickle=True)
+    out.close()
+    return arr
+
+
+def encode_ndarray(arr):
+    """
+    Encodes an array with the compact NDArray encoding. Object and structured
+    arrays can not be stored as a raw buffer and are written with ``np.save``.
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.dtool.types import *  # NOQA
+        >>> arr = np.arange(12, dtype=np.float32).reshape(3, 4)
+        >>> value = encode_ndarray(arr)
+        >>> print(len(value) - arr.nbytes)
+        26
+        >>> decoded = decode_ndarray(value)
+        >>> assert decoded.dtype == arr.dtype and np.all(decoded == arr)
+        >>> # Values written with np.save are still readable
+        >>> legacy = decode_ndarray(encode_ndarray(np.array([{'a': 1}])))
+        >>> print(legacy)
+        [{'a': 1}]
+    """
+    dtype = arr.dtype
+    if dtype.hasobject or dtype.fields is not None:
+        return _encode_npy(arr)
+    dtype_str = dtype.str.encode('ascii')
+    header = _NDARRAY_HEADER.pack(
+        NDARRAY_MAGIC, NDARRAY_VERSION, len(dtype_str), arr.ndim
+    )
+    shape = struct.pack('<%dq' % (arr.ndim,), *arr.shape)
+    return b''.join([header, dtype_str, shape, np.ascontiguousarray(arr).tobytes()])
+
+
+def decode_ndarray(value, copy=True):
+    """
+    Decodes an array stored by :func:`encode_ndarray` or ``np.save``.
+
+    The result is a writable array that owns its data. With ``copy=False``
+    arrays in the compact encoding are returned as read-only views on
+    ``value`` instead, which saves a copy of every value.
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.dtool.types import *  # NOQA
+        >>> value = encode_ndarray(np.arange(4))
+        >>> assert decode_ndarray(value).flags.writeable
+        >>> assert not decode_ndarray(value, copy=False).flags.writeable
+    """
+    if value[:4] != NDARRAY_MAGIC:
+        return _decode_npy(value)
+    magic, version, dtype_len, ndim = _NDARRAY_HEADER.unpack_from(value)
+    if version != NDARRAY_VERSION:
+        raise ValueError('Unknown NDArray encoding version %r' % (version,))
+    offset = _NDARRAY_HEADER.size
+    dtype_str = bytes(value[offset : offset + dtype_len])
+    try:
+        dtype = _DTYPE_CACHE[dtype_str]
+    except KeyError:
+        dtype = _DTYPE_CACHE[dtype_str] = np.dtype(dtype_str.decode('ascii'))
+    offset += dtype_len
+    shape = struct.unpack_from('<%dq' % (ndim,), value, offset)
+    offset += 8 * ndim
+    count = 1
+    for dim in shape:
+        count *= dim
+    if count == 0:
+        return np.empty(shape, dtype=dtype)
+    arr = np.frombuffer(value, dtype=dtype, count=count, offset=offset).reshape(shape)
+    if copy:
+        arr = arr.copy()
+    return arr
+
+
+def decode_ndarray_list(value_list, copy=True):
+    """Decodes a column of stored arrays, passing through None values"""
+    return [
+        None if value is None else decode_ndarray(value, copy=copy)
+        for value in value_list
+    ]
+
+
+def _decode_ndarray_view_list(value_list):
+    return decode_ndarray_list(value_list, copy=False)
+
+
 class Dict(JSONCodeableType):
     base_py_type = dict
     col_spec = 'DICT'
@@ -130,9 +242,40 @@ class List(JSONCodeableType):
 
 
 class NDArray(NumPyPicklableType):
+    """
+    Arrays are stored with the compact encoding of :func:`encode_ndarray` and
+    decoded as writable copies. Only the bulk processor can return read-only
+    views (see ``SQLDatabaseController.get_bulk(zero_copy=True)``). Values
+    written with ``np.save`` by earlier versions are still decoded.
+    """
+
     base_py_types = (np.ndarray,)
     col_spec = 'NDARRAY'
 
+    def bind_processor(self, dialect):
+        def process(value):
+            if isinstance(value, self.base_py_types):
+                return encode_ndarray(value)
+            else:
+                return value
+
+        return process
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            if value is None or isinstance(value, self.base_py_types):
+                return value
+            else:
+                return decode_ndarray(value)
+
+        return process
+
+    def bulk_result_processor(self, dialect, copy=True):
+        """Returns a function that decodes a list of values from one column"""
+        if copy:
+            return decode_ndarray_list
+        return _decode_ndarray_view_list
+
 
 NP_NUMBER_TYPES = (
     np.int8,
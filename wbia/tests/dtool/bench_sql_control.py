@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for SQLDatabaseController
+
+CommandLine:
+    python -m wbia.tests.dtool.bench_sql_control --num 500000
+"""
+import logging
+import uuid
+
+import numpy as np
+import utool as ut
+from sqlalchemy.sql import text
+
+from wbia.dtool import sql_control
+from wbia.dtool.sql_control import SQLDatabaseController
+from wbia.dtool.types import _encode_npy
+
+(print, rrr, profile) = ut.inject2(__name__)
+logger = logging.getLogger('wbia')
+
+
+def _make_annot_table(ctrlr, num):
+    """ A table shaped like the annotations table """
+    ctrlr._engine.execute(
+        'CREATE TABLE annotations ('
+        'annot_rowid INTEGER PRIMARY KEY, '
+        'annot_uuid UUID NOT NULL, '
+        'annot_xtl INTEGER, annot_ytl INTEGER, '
+        'annot_width INTEGER, annot_height INTEGER, '
+        'CONSTRAINT unique_annot_uuid UNIQUE (annot_uuid))'
+    )
+    table = ctrlr._reflect_table('annotations')
+    uuid_list = [uuid.uuid4() for _ in range(num)]
+    with ctrlr.connect() as conn:
+        conn.execute(
+            table.insert(),
+            [
+                {
+                    'annot_uuid': annot_uuid,
+                    'annot_xtl': index,
+                    'annot_ytl': index,
+                    'annot_width': 10,
+                    'annot_height': 20,
+                }
+                for index, annot_uuid in enumerate(uuid_list)
+            ],
+        )
+    return uuid_list
+
+
+def benchmark_bulk_get(num=500000, uri='sqlite:///:memory:'):
+    r"""
+    Compares the per-id getter with the set-based bulk getter on lookups
+    shaped like ``get_annot_uuids``, ``get_annot_bboxes`` and
+    ``get_annot_aids_from_uuid``.
+
+    CommandLine:
+        python -m wbia.tests.dtool.bench_sql_control --num 500000
+
+    Example:
+        >>> # DISABLE_DOCTEST
+        >>> from wbia.tests.dtool.bench_sql_control import *  # NOQA
+        >>> result = benchmark_bulk_get(num=10000)
+        >>> print(result)
+    """
+    ctrlr = SQLDatabaseController(uri, 'benchmark')
+    uuid_list = _make_annot_table(ctrlr, num)
+    with ctrlr.connect() as conn:
+        result = conn.execute(text('SELECT rowid FROM annotations'))
+        rowid_list = [row[0] for row in result]
+    bbox_colnames = ('annot_xtl', 'annot_ytl', 'annot_width', 'annot_height')
+
+    lookups = [
+        ('uuids', ('annot_uuid',), rowid_list, 'rowid'),
+        ('bboxes', bbox_colnames, rowid_list, 'rowid'),
+        ('aids_from_uuid', ('annot_rowid',), uuid_list, 'annot_uuid'),
+    ]
+    results = {}
+    for name, colnames, id_list, id_colname in lookups:
+        # Force the per-id path by raising the bulk threshold
+        min_ids = sql_control.BULK_GET_MIN_IDS
+        sql_control.BULK_GET_MIN_IDS = float('inf')
+        try:
+            with ut.Timer(verbose=False) as timer:
+                expected = ctrlr.get('annotations', colnames, id_list, id_colname)
+        finally:
+            sql_control.BULK_GET_MIN_IDS = min_ids
+        per_id_time = timer.ellapsed
+        with ut.Timer(verbose=False) as timer:
+            got = ctrlr.get_bulk('annotations', colnames, id_list, id_colname)
+        bulk_time = timer.ellapsed
+        assert got == expected
+        results[name] = {
+            'per_id': per_id_time,
+            'bulk': bulk_time,
+            'speedup': per_id_time / bulk_time,
+        }
+        logger.info(
+            '[bench] %s num=%d per_id=%.3fs bulk=%.3fs (%.1fx)'
+            % (name, num, per_id_time, bulk_time, per_id_time / bulk_time)
+        )
+    return ut.repr3(results, precision=3)
+
+
+def benchmark_ndarray_decode(num=100000, uri='sqlite:///:memory:'):
+    r"""
+    Compares reading keypoint shaped NDARRAY rows stored with ``np.save`` to
+    rows stored with the compact encoding.
+
+    CommandLine:
+        python -m wbia.tests.dtool.bench_sql_control --num 100000 --ndarray
+
+    Example:
+        >>> # DISABLE_DOCTEST
+        >>> from wbia.tests.dtool.bench_sql_control import *  # NOQA
+        >>> result = benchmark_ndarray_decode(num=10000)
+        >>> print(result)
+    """
+    ctrlr = SQLDatabaseController(uri, 'benchmark')
+    ctrlr._engine.execute(
+        'CREATE TABLE feat (feat_rowid INTEGER PRIMARY KEY, '
+        'kpts NDARRAY, legacy_kpts NDARRAY)'
+    )
+    rng = np.random.RandomState(0)
+    kpts_list = [rng.rand(500, 6).astype(np.float32) for _ in range(num)]
+    ctrlr._add('feat', ('kpts',), [(kpts,) for kpts in kpts_list])
+    rowid_list = ctrlr.get_all_rowids('feat')
+    ctrlr.set(
+        'feat',
+        ('legacy_kpts',),
+        [_encode_npy(kpts) for kpts in kpts_list],
+        rowid_list,
+    )
+
+    results = {}
+    for colname in ('legacy_kpts', 'kpts'):
+        with ut.Timer(verbose=False) as timer:
+            got = ctrlr.get('feat', (colname,), rowid_list, 'feat_rowid')
+        assert all(np.all(a == b) for a, b in zip(got, kpts_list))
+        results[colname] = timer.ellapsed
+        logger.info('[bench] %s num=%d %.3fs' % (colname, num, timer.ellapsed))
+    return ut.repr3(results, precision=3)
+
+
+if __name__ == '__main__':
+    num = ut.get_argval('--num', type_=int, default=500000)
+    if ut.get_argflag('--ndarray'):
+        print(benchmark_ndarray_decode(num=num))
+    else:
+        print(benchmark_bulk_get(num=num))
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import threading
+from concurrent import futures
+
+import numpy as np
+import pytest
+import utool as ut
+
+from wbia.dtool import depcache_table
+from wbia.dtool import sql_control
+from wbia.dtool.depcache_control import DependencyCache
+from wbia.dtool.sql_control import SQLDatabaseController
+
+
+class _Controller(object):
+    """ Just enough of a controller for a depcache in a temporary directory """
+
+    def __init__(self, cache_dpath):
+        self.cache_dpath = cache_dpath
+
+    def make_cache_db_uri(self, name):
+        return 'sqlite:///%s/%s.sqlite' % (self.cache_dpath, name)
+
+    def get_cachedir(self):
+        return self.cache_dpath
+
+
+def _make_depc(cache_dpath, **kwargs):
+    """ A depcache with one table that has an internal and an external column """
+    ut.ensuredir(cache_dpath)
+    depc = DependencyCache(
+        _Controller(cache_dpath),
+        'dummy_annot',
+        ut.identity,
+        root_getters=None,
+        use_globals=False,
+    )
+
+    @depc.register_preproc(
+        'square',
+        ['dummy_annot'],
+        ['value', 'vec'],
+        [int, ('extern', np.load, np.save, '.npy')],
+        chunksize=2,
+        **kwargs
+    )
+    def compute_square(depc, aid_list, config=None):
+        for aid in aid_list:
+            yield aid * aid, np.arange(aid, dtype=np.int64)
+
+    depc.initialize()
+    return depc
+
+
+requires_fork = pytest.mark.skipif(
+    'fork' not in multiprocessing.get_all_start_methods(),
+    reason='compute pools need fork',
+)
+
+
+@requires_fork
+def test_compute_workers_match_serial(tmp_path):
+    aid_list = list(range(1, 11))
+    serial_depc = _make_depc(str(tmp_path / 'serial'), compute_workers=1)
+    pool_depc = _make_depc(str(tmp_path / 'pool'), compute_workers=3)
+    expected = serial_depc.get('square', aid_list, ('value', 'vec'))
+    got = pool_depc.get('square', aid_list, ('value', 'vec'))
+    assert len(got) == len(expected)
+    for (value, vec), (value_, vec_) in zip(got, expected):
+        assert value == value_
+        assert np.all(vec == vec_)
+    # The rows computed by the pool are stored in the parent's database
+    rowid_list = pool_depc.get_rowids('square', aid_list, ensure=False)
+    assert None not in rowid_list
+
+
+# Set before the pool forks, so the workers inherit it
+_FORKED_TABLES = []
+
+
+def _forked_worker_state():
+    table1 = _FORKED_TABLES[0]
+    rowid_list = table1.depc.get_rowids('square', [1, 2, 3], ensure=False)
+    return (
+        [table._extern_read_executor for table in _FORKED_TABLES],
+        id(table1.db._engine.pool),
+        table1.get_row_data(rowid_list, 'value'),
+    )
+
+
+@requires_fork
+def test_init_compute_worker_resets_every_reader_pool(tmp_path):
+    depc1 = _make_depc(str(tmp_path / 'depc1'))
+    depc2 = _make_depc(str(tmp_path / 'depc2'))
+    table1, table2 = depc1['square'], depc2['square']
+    # Start the reader threads of both tables
+    for depc, table in [(depc1, table1), (depc2, table2)]:
+        table._extern_read_workers = 2
+        depc.get('square', [1, 2, 3], 'vec')
+        assert table._extern_read_executor is not None
+    engine = table1.db._engine
+    assert engine in sql_control.get_shared_engines()
+    parent_pool_id = id(engine.pool)
+    _FORKED_TABLES[:] = [table1, table2]
+    try:
+        executor = futures.ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=depcache_table._init_compute_worker,
+            initargs=(
+                sql_control.get_shared_engines(),
+                list(depcache_table._EXTERN_READER_TABLES),
+            ),
+        )
+        with executor:
+            executor_list, pool_id, value_list = executor.submit(
+                _forked_worker_state
+            ).result()
+    finally:
+        _FORKED_TABLES[:] = []
+    # Tables of other depcaches are reset as well
+    assert executor_list == [None, None]
+    # The worker opened its own connections
+    assert pool_id != parent_pool_id
+    assert value_list == [1, 4, 9]
+    # The parent still owns its pool and threads
+    assert id(engine.pool) == parent_pool_id
+    assert table1._extern_read_executor is not None
+    assert depc1.get('square', [1, 2, 3], 'value') == [1, 4, 9]
+    table1.shutdown_extern_readers()
+    table2.shutdown_extern_readers()
+
+
+def test_reset_forked_engine_before_dispose_close():
+    class _Pool(object):
+        def recreate(self):
+            return _Pool()
+
+    class _OldEngine(object):
+        """ dispose() only takes close since SQLAlchemy 1.4.33 """
+
+        def __init__(self):
+            self.pool = _Pool()
+
+        def dispose(self):
+            raise AssertionError('would close the parent connections')
+
+    engine = _OldEngine()
+    pool = engine.pool
+    depcache_table._reset_forked_engine(engine)
+    assert isinstance(engine.pool, _Pool) and engine.pool is not pool
+
+
+def test_threaded_extern_reads_match_serial(tmp_path):
+    depc = _make_depc(str(tmp_path / 'depc'))
+    table = depc['square']
+    table._extern_read_workers = 1
+    aid_list = list(range(1, 31))
+    depc.get('square', aid_list, 'vec')
+    # Reversed so the order of the results is checked
+    rowid_list = depc.get_rowids('square', aid_list[::-1])
+    expected = table.get_row_data(rowid_list, 'vec')
+    assert table._extern_read_executor is None
+
+    table._extern_read_workers = 4
+    got = table.get_row_data(rowid_list, 'vec')
+    executor = table._extern_read_executor[1]
+    assert [len(vec) for vec in got] == aid_list[::-1]
+    assert all(np.all(vec == vec_) for vec, vec_ in zip(got, expected))
+
+    # Changing the number of threads replaces the pool and stops the old one
+    table._extern_read_workers = 2
+    got = table.get_row_data(rowid_list, 'vec')
+    assert all(np.all(vec == vec_) for vec, vec_ in zip(got, expected))
+    assert executor._shutdown
+    assert table._extern_read_executor[0] == 2
+
+    table.shutdown_extern_readers()
+    assert table._extern_read_executor is None
+    # The next read starts a new pool
+    got = table.get_row_data(rowid_list, 'vec')
+    assert all(np.all(vec == vec_) for vec, vec_ in zip(got, expected))
+    table.shutdown_extern_readers()
+
+
+def test_concurrent_extern_reads_and_shutdowns(tmp_path, monkeypatch):
+    depc = _make_depc(str(tmp_path / 'depc'))
+    table = depc['square']
+    aid_list = list(range(1, 21))
+    rowid_list = depc.get_rowids('square', aid_list)
+    started = []
+    errors = []
+
+    def _read(num_workers):
+        try:
+            for _ in range(20):
+                table._extern_read_workers = num_workers
+                got = table.get_row_data(rowid_list, 'vec')
+                assert [len(vec) for vec in got] == aid_list
+                table.shutdown_extern_readers()
+        except Exception as ex:
+            errors.append(ex)
+
+    create_executor = futures.ThreadPoolExecutor
+
+    def _counting_executor(*args, **kwargs):
+        executor = create_executor(*args, **kwargs)
+        started.append(executor)
+        return executor
+
+    monkeypatch.setattr(depcache_table.futures, 'ThreadPoolExecutor', _counting_executor)
+    thread_list = [threading.Thread(target=_read, args=(n,)) for n in [2, 3, 4, 2]]
+    for thread in thread_list:
+        thread.start()
+    for thread in thread_list:
+        thread.join()
+    assert errors == []
+    assert table._extern_read_executor is None
+    # Every pool that was started was also stopped
+    assert len(started) > 0 and all(executor._shutdown for executor in started)
+
+
+def test_packed_extern_paths_follow_the_record(tmp_path):
+    depc = _make_depc(str(tmp_path / 'depc'), extern_storage='packed')
+    aid_list = [3, 5]
+    fpath_list = depc.get('square', aid_list, 'vec', read_extern=False)
+    for aid, fpath in zip(aid_list, fpath_list):
+        assert np.all(np.load(fpath) == np.arange(aid))
+    # A file left from an older value of the record is replaced
+    np.save(fpath_list[0], np.arange(100))
+    fpath_list_ = depc.get('square', aid_list, 'vec', read_extern=False)
+    assert fpath_list_ == fpath_list
+    for aid, fpath in zip(aid_list, fpath_list_):
+        assert np.all(np.load(fpath) == np.arange(aid))
+
+
+def test_write_behind_persists_rows(tmp_path, monkeypatch):
+    cache_dpath = str(tmp_path / 'depc')
+    num_puts = []
+    put = depcache_table._ChunkWriter.put
+
+    def _put(writer, colnames, params_list):
+        num_puts.append(len(params_list))
+        return put(writer, colnames, params_list)
+
+    monkeypatch.setattr(depcache_table._ChunkWriter, 'put', _put)
+    aid_list = list(range(1, 11))
+    depc = _make_depc(cache_dpath, write_behind=True)
+    value_list = depc.get('square', aid_list, 'value')
+    assert value_list == [aid * aid for aid in aid_list]
+    assert sum(num_puts) == len(aid_list)
+
+    # A new depcache on the same files finds every row without computing
+    depc2 = _make_depc(cache_dpath, write_behind=False)
+    assert None not in depc2.get_rowids('square', aid_list, ensure=False)
+    assert depc2.get('square', aid_list, 'value') == value_list
+
+
+def test_write_behind_error_propagates():
+    class _FailingDB(object):
+        def _add(self, tablename, colnames, params_list, nInput=None):
+            raise ValueError('insert failed')
+
+    writer = depcache_table._ChunkWriter(_FailingDB(), 'square')
+    writer.put(('value',), [(1,)])
+    with pytest.raises(ValueError):
+        writer.close()
+    # Later chunks are refused
+    with pytest.raises(ValueError):
+        writer.put(('value',), [(2,)])
+
+
+@pytest.mark.parametrize('uri', ['sqlite://', 'sqlite:///:memory:'])
+def test_write_behind_skips_in_memory_databases(tmp_path, uri):
+    table = _make_depc(str(tmp_path / 'depc'), write_behind=True)['square']
+    writer = table._make_chunk_writer()
+    assert isinstance(writer, depcache_table._ChunkWriter)
+    writer.close()
+    # Every connection to an in-memory database opens a different database
+    table.db = SQLDatabaseController(uri, 'testing')
+    assert table._make_chunk_writer() is None
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import pytest
+import utool as ut
+
+from wbia.dtool.extern_storage import PackedExternStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PackedExternStore(str(tmp_path / 'packed'), segment_max_bytes=100)
+    yield store
+    store.close()
+
+
+def test_get_many(store):
+    store.put_many([('a', b'spam'), ('b', b''), ('c', b'eggs')])
+    assert store.get_many(['c', 'missing', 'a', 'b', 'a']) == [
+        b'eggs',
+        None,
+        b'spam',
+        b'',
+        b'spam',
+    ]
+    assert store.contains_many(['a', 'missing']) == [True, False]
+
+
+def test_segment_rollover(store):
+    items = [('key%d' % (i,), bytes([i]) * 30) for i in range(10)]
+    for item in items:
+        store.put_many([item])
+    stats = store.get_stats()
+    assert stats['num_segments'] == 3
+    assert stats['num_records'] == 10
+    assert store.get_many([key for key, _ in items]) == [blob for _, blob in items]
+
+
+def test_replace_and_compact(store):
+    items = [('key%d' % (i,), bytes([i]) * 30) for i in range(8)]
+    store.put_many(items[0:4])
+    store.put_many(items[4:8])
+    # Replacing values leaves dead bytes behind in the old segment
+    store.put_many([('key0', b'new0'), ('key1', b'new1')])
+    assert store.delete_many(['key2', 'unknown']) == 1
+    assert store.get_stats()['dead_nbytes'] == 90
+
+    num_moved = store.compact()
+
+    assert num_moved == 1
+    stats = store.get_stats()
+    assert stats['dead_nbytes'] == 0
+    assert stats['num_records'] == 7
+    keys = ['key%d' % (i,) for i in range(8)]
+    expected = [b'new0', b'new1', None] + [blob for _, blob in items[3:]]
+    assert store.get_many(keys) == expected
+    # Nothing left to compact
+    assert store.compact() == 0
+
+
+def test_dumps_and_loads(store):
+    text = ut.lorium_ipsum()
+    blob = store.dumps(ut.writeto, 'text_id=1.txt', text)
+    assert blob == text.encode('utf8')
+    assert store.loads(ut.readfrom, 'text_id=1.txt', blob) == text
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import collections
+
+import numpy as np
+
+from wbia.dtool.row_cache import RowCache
+
+
+def test_put_leaves_the_callers_arrays_alone():
+    cache = RowCache(budget=1.0)
+    vecs = np.arange(10)
+    kpts = np.ones((3, 6))
+    cache.put(('feat', 1, ('vecs', 'kpts'), True), (vecs, [kpts]))
+    # The caller can keep working on its arrays
+    assert vecs.flags.writeable and kpts.flags.writeable
+    vecs[0] = 100
+    cached_vecs, (cached_kpts,) = cache.get_many([('feat', 1, ('vecs', 'kpts'), True)])[0]
+    assert cached_vecs[0] == 0
+    assert not cached_vecs.flags.writeable
+    assert not cached_kpts.flags.writeable
+
+
+def test_put_freezes_nested_arrays():
+    Row = collections.namedtuple('Row', ('arrs', 'meta'))
+    objs = np.empty(2, dtype=object)
+    objs[0] = np.zeros(3)
+    objs[1] = {'inner': [np.zeros(2)]}
+    value = Row([np.zeros(4)], {'arr': np.zeros(5), 'objs': objs})
+    cache = RowCache(budget=1.0)
+    cache.put(('tbl', 1, ('row',), True), value)
+    frozen = cache.get_many([('tbl', 1, ('row',), True)])[0]
+    assert isinstance(frozen, Row)
+    frozen_objs = frozen.meta['objs']
+    arr_list = [
+        frozen.arrs[0],
+        frozen.meta['arr'],
+        frozen_objs,
+        frozen_objs[0],
+        frozen_objs[1]['inner'][0],
+    ]
+    assert not any(arr.flags.writeable for arr in arr_list)
+    # Nothing the caller holds was frozen
+    assert value.arrs[0].flags.writeable and value.meta['arr'].flags.writeable
+    assert objs.flags.writeable and objs[0].flags.writeable
+    assert objs[1]['inner'][0].flags.writeable
@@ -623,6 +623,23 @@ class TestExecutionAPI(BaseAPITestCase):
         results = self.ctrlr._engine.execute(f'select count(*) from {table_name}')
         assert results.fetchone()[0] == 0
 
+    def test_executemany_batched_update(self):
+        table_name = 'test_executemany'
+        self.make_table(table_name)
+
+        # Create some dummy records
+        self.populate_table(table_name)
+
+        # Call the testing target
+        update = text(f'UPDATE {table_name} SET z = :z WHERE id = :id')
+        params = [dict(id=i + 1, z=i * 10.0) for i in range(0, 10)]
+        results = self.ctrlr.executemany(update, params, batch_size=3)
+
+        # Check for results
+        assert results == [None] * len(params)
+        results = self.ctrlr._engine.execute(f'SELECT id, z FROM {table_name}')
+        assert results.fetchall() == [(i + 1, i * 10.0) for i in range(0, 10)]
+
     def test_executeone_for_single_column(self):
         # Should unwrap the resulting query value (no tuple wrapping)
         table_name = 'test_executeone'
@@ -662,6 +679,64 @@ class TestAdditionAPI(BaseAPITestCase):
         expected = [(i + 1, x, y, z) for i, (x, y, z) in enumerate(parameter_values)]
         assert results.fetchall() == expected
 
+    def test_add_in_batches(self):
+        table_name = 'test_add'
+        self.make_table(table_name)
+
+        parameter_values = [
+            ('odd' if i % 2 else 'even', i, i * 2.01) for i in range(0, 10)
+        ]
+
+        # Call the testing target, with batches that do not evenly divide the rows
+        ids = self.ctrlr._add(table_name, ['x', 'y', 'z'], parameter_values, batch_size=3)
+
+        # Verify the resulting ids
+        assert ids == [i + 1 for i in range(0, len(parameter_values))]
+        results = self.ctrlr._engine.execute(f'SELECT id, x, y, z FROM {table_name}')
+        expected = [(i + 1, x, y, z) for i, (x, y, z) in enumerate(parameter_values)]
+        assert results.fetchall() == expected
+
+    def test_add_with_given_ids(self):
+        table_name = 'test_add'
+        self.make_table(table_name)
+
+        parameter_values = [(100 - i, str(i), i, i * 2.01) for i in range(0, 5)]
+
+        # Call the testing target
+        ids = self.ctrlr._add(table_name, ['id', 'x', 'y', 'z'], parameter_values)
+
+        # The ids are returned in the order the rows were given
+        assert ids == [100 - i for i in range(0, 5)]
+
+    def test_add_with_none_ids(self):
+        table_name = 'test_add'
+        self.make_table(table_name)
+
+        parameter_values = [(None, str(i), i, i * 2.01) for i in range(0, 7)]
+
+        # Call the testing target
+        ids = self.ctrlr._add(
+            table_name, ['id', 'x', 'y', 'z'], parameter_values, batch_size=3
+        )
+
+        # Ids passed as None are generated in the order of the rows
+        assert ids == [i + 1 for i in range(0, 7)]
+        results = self.ctrlr._engine.execute(f'SELECT id, y FROM {table_name}')
+        assert results.fetchall() == [(i + 1, i) for i in range(0, 7)]
+
+    def test_add_with_some_none_ids(self):
+        table_name = 'test_add'
+        self.make_table(table_name)
+
+        parameter_values = [(None, 'a', 0, 0.0), (50, 'b', 1, 1.0), (None, 'c', 2, 2.0)]
+
+        # Call the testing target
+        ids = self.ctrlr._add(table_name, ['id', 'x', 'y', 'z'], parameter_values)
+
+        assert ids == [1, 50, 51]
+        results = self.ctrlr._engine.execute(f'SELECT id, x FROM {table_name}')
+        assert results.fetchall() == [(1, 'a'), (50, 'b'), (51, 'c')]
+
 
 class TestGettingAPI(BaseAPITestCase):
     def test_get_where_without_where_condition(self):
@@ -850,6 +925,102 @@ class TestGettingAPI(BaseAPITestCase):
         # Verify getting
         assert data == expected
 
+    def test_get_bulk(self):
+        table_name = 'test_getting'
+        self.make_table(table_name)
+        self.populate_table(table_name)
+
+        # Out of order, repeated and missing ids
+        requested_ids = [7, 2, 99, 2, np.int64(5)]
+
+        # Call the testing target
+        data = self.ctrlr.get_bulk(table_name, ['x', 'y', 'z'], requested_ids)
+
+        # Verify getting matches the per-id getter
+        expected = self.ctrlr.get(table_name, ['x', 'y', 'z'], requested_ids)
+        assert data == expected
+        assert data[2] is None
+
+        # Single column results are unpacked unless asked otherwise
+        assert self.ctrlr.get_bulk(table_name, ['y'], [3, 1]) == [2, 0]
+        assert self.ctrlr.get_bulk(table_name, ['y'], [3, 99], keepwrap=True) == [
+            (2,),
+            None,
+        ]
+        data = self.ctrlr.get_bulk(table_name, ['y'], [3, 99], unpack_scalars=False)
+        assert data == [[2], []]
+
+    def test_get_bulk_by_unique_column(self):
+        table_name = 'test_get_bulk_uuid'
+        self.ctrlr._engine.execute(
+            f'CREATE TABLE {table_name} '
+            '(id INTEGER PRIMARY KEY, uuid UUID NOT NULL, y INTEGER, '
+            'CONSTRAINT unique_uuid UNIQUE (uuid))'
+        )
+        uuids = [uuid.uuid4() for i in range(1200)]
+        table = self.ctrlr._reflect_table(table_name)
+        with self.ctrlr.connect() as conn:
+            conn.execute(
+                table.insert(), [{'uuid': u, 'y': i} for i, u in enumerate(uuids)]
+            )
+
+        # Large lookups on a unique column use the bulk getter
+        requested = uuids[::-1] + [uuid.uuid4()]
+        data = self.ctrlr.get(table_name, ['id', 'y'], requested, id_colname='uuid')
+
+        # Verify getting
+        expected = [(len(uuids) - i, len(uuids) - i - 1) for i in range(len(uuids))]
+        assert data == expected + [None]
+        assert self.ctrlr._is_unique_column(table_name, 'uuid')
+        assert not self.ctrlr._is_unique_column(table_name, 'y')
+
+    def test_get_bulk_ndarray_copies(self):
+        table_name = 'test_get_bulk_ndarray'
+        self.ctrlr._engine.execute(
+            f'CREATE TABLE {table_name} (id INTEGER PRIMARY KEY, arr NDARRAY)'
+        )
+        table = self.ctrlr._reflect_table(table_name)
+        arrs = [np.arange(i, dtype=np.float32) for i in range(1, 6)]
+        with self.ctrlr.connect() as conn:
+            conn.execute(
+                table.insert(), [{'id': i, 'arr': a} for i, a in enumerate(arrs)]
+            )
+
+        # Writable copies by default, like the per-id getter
+        data = self.ctrlr.get_bulk(table_name, ['arr'], [4, 0, 99])
+        assert data[2] is None
+        assert all(np.all(got == arrs[i]) for got, i in zip(data, [4, 0]))
+        assert all(got.flags.writeable and got.flags.owndata for got in data[:2])
+        # Read-only views on the fetched buffers when asked for
+        views = self.ctrlr.get_bulk(table_name, ['arr'], [4, 0], zero_copy=True)
+        assert all(np.all(got == arrs[i]) for got, i in zip(views, [4, 0]))
+        assert not any(got.flags.writeable for got in views)
+
+    def test_get_bulk_in_callers_transaction(self):
+        table_name = 'test_getting'
+        self.make_table(table_name)
+        self.populate_table(table_name)
+
+        insert_stmt = text(f'INSERT INTO {table_name} (x, y, z) VALUES (:x, :y, :z)')
+        with self.ctrlr.connect() as conn:
+            trans = conn.begin()
+            conn.execute(insert_stmt, x='new', y=99, z=0.5)
+            # The uncommitted row is visible to the bulk getter...
+            data = self.ctrlr.get_bulk(table_name, ['y'], [11, 1])
+            assert data == [99, 0]
+            trans.rollback()
+
+        # ... which didn't commit the caller's work
+        assert self.ctrlr.get_bulk(table_name, ['y'], [11, 1]) == [None, 0]
+
+    def test_get_bulk_on_non_unique_column(self):
+        table_name = 'test_getting'
+        self.make_table(table_name)
+        self.populate_table(table_name)
+
+        with pytest.raises(ValueError):
+            self.ctrlr.get_bulk(table_name, ['y'], ['even'], id_colname='x')
+
 
 class TestSettingAPI(BaseAPITestCase):
     def test_setting(self):
@@ -884,6 +1055,21 @@ class TestSettingAPI(BaseAPITestCase):
             set_rows = sorted(results)
         assert set_rows == expected
 
+    def test_setting_in_batches(self):
+        table_name = 'test_setting'
+        self.make_table(table_name)
+        self.populate_table(table_name)
+
+        # Call the testing target, using the implicit rowid
+        ids = list(range(10, 0, -1))
+        values = [(str(id), id * 1.5) for id in ids]
+        self.ctrlr.set(table_name, ['x', 'z'], values, ids, batch_size=4)
+
+        # Verify setting
+        results = self.ctrlr._engine.execute(f'SELECT id, x, z FROM {table_name}')
+        expected = [(id, str(id), id * 1.5) for id in range(1, 11)]
+        assert results.fetchall() == expected
+
 
 class TestDeletionAPI(BaseAPITestCase):
     def test_delete(self):
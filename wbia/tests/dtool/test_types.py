@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import io
 import uuid
 
 import numpy as np
@@ -140,6 +141,46 @@ def test_numpy_ndarray(db):
     assert (selected_value == insert_value).all()
 
 
+ndarrays = (
+    np.array(3.5),
+    np.zeros((0, 128), np.uint8),
+    np.asfortranarray(np.arange(12, dtype=np.float64).reshape(3, 4)),
+    np.array([True, False]),
+    np.array([[1, 2], [3, 4]], dtype='>i4'),
+    np.array([{'a': 1}, None], dtype=object),
+)
+
+
+@pytest.mark.parametrize('insert_value', ndarrays)
+def test_numpy_ndarray_layouts(db, insert_value):
+    db.execute(text('CREATE TABLE test(x NDARRAY)'))
+
+    stmt = text('INSERT INTO test(x) VALUES (:x)')
+    stmt = stmt.bindparams(bindparam('x', type_=NDArray))
+    db.execute(stmt, x=insert_value)
+
+    stmt = text('SELECT x FROM test').columns(x=NDArray)
+    selected_value = db.execute(stmt).fetchone()[0]
+    assert selected_value.dtype == insert_value.dtype
+    assert selected_value.shape == insert_value.shape
+    assert (selected_value == insert_value).all()
+    # Decoded arrays are writable copies
+    assert selected_value.flags.writeable
+
+
+def test_numpy_ndarray_legacy_encoding(db):
+    # Values written with np.save by earlier versions are still readable
+    db.execute(text('CREATE TABLE test(x NDARRAY)'))
+    insert_value = np.array([[1, 2, 3], [4, 5, 6]], np.int32)
+    out = io.BytesIO()
+    np.save(out, insert_value)
+    db.execute(text('INSERT INTO test(x) VALUES (:x)'), x=out.getvalue())
+
+    stmt = text('SELECT x FROM test').columns(x=NDArray)
+    selected_value = db.execute(stmt).fetchone()[0]
+    assert (selected_value == insert_value).all()
+
+
 np_numbers = (
     np.int8(120),
     np.int16(32767),
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from wbia.web import apis_query, job_engine
+
+
+class _FakeChipMatch(object):
+    def __init__(self, qaid):
+        self.qaid = qaid
+
+    def to_dict(self):
+        return {'qaid': self.qaid, 'daid_list': [self.qaid + 1]}
+
+
+class _FakeQueryRequest(object):
+    def __init__(self, qaids):
+        self.qaids = qaids
+
+    def execute_iter(self):
+        for qaid in self.qaids:
+            yield _FakeChipMatch(qaid)
+
+
+def test_execute_query_dicts_reports_every_partial_result(monkeypatch):
+    reports = []
+
+    def report_job_progress(progress, partial_result=None):
+        reports.append((progress, partial_result))
+        return True
+
+    monkeypatch.setattr(job_engine, 'report_job_progress', report_job_progress)
+    # The whole job finishes within one reporting interval
+    monkeypatch.setattr(job_engine, 'JOB_PROGRESS_SECONDS', 1e9)
+    qaids = [3, 1, 2]
+    dict_list = apis_query._execute_query_dicts(None, _FakeQueryRequest(qaids), False)
+
+    assert [dict_['qaid'] for dict_ in dict_list] == qaids
+    partial_qaids = [dict_['qaid'] for _, partial in reports for dict_ in partial]
+    assert sorted(partial_qaids) == sorted(qaids)
+    assert reports[-1][0] == {'num_completed': 3, 'num_total': 3}
+
+
+def test_execute_query_dicts_reports_without_duplicates(monkeypatch):
+    reports = []
+
+    def report_job_progress(progress, partial_result=None):
+        reports.append((progress, partial_result))
+        return True
+
+    monkeypatch.setattr(job_engine, 'report_job_progress', report_job_progress)
+    # Report after every chip match
+    monkeypatch.setattr(job_engine, 'JOB_PROGRESS_SECONDS', 0)
+    qaids = list(range(1, 6))
+    apis_query._execute_query_dicts(None, _FakeQueryRequest(qaids), False)
+
+    partial_qaids = [dict_['qaid'] for _, partial in reports for dict_ in partial]
+    assert partial_qaids == qaids
+    assert reports[-1][0] == {'num_completed': 5, 'num_total': 5}
@@ -197,6 +197,7 @@ def start_identify_annots(
     callback_url=None,
     callback_method=None,
     lane='slow',
+    priority=0,
 ):
     r"""
     REST:
@@ -323,7 +324,12 @@ def start_identify_annots(
     )
     args = (qaid_list, daid_list, pipecfg)
     jobid = ibs.job_manager.jobiface.queue_job(
-        'query_chips_simple_dict', callback_url, callback_method, lane, *args
+        'query_chips_simple_dict',
+        callback_url,
+        callback_method,
+        lane,
+        *args,
+        priority=priority,
     )
 
     # if callback_url is not None:
@@ -346,6 +352,7 @@ def start_identify_annots_query_complete(
     callback_url=None,
     callback_method=None,
     lane='slow',
+    priority=0,
 ):
     r"""
     REST:
@@ -400,7 +407,12 @@ def start_identify_annots_query_complete(
         k,
     )
     jobid = ibs.job_manager.jobiface.queue_job(
-        'query_chips_graph_complete', callback_url, callback_method, lane, *args
+        'query_chips_graph_complete',
+        callback_url,
+        callback_method,
+        lane,
+        *args,
+        priority=priority,
     )
     return jobid
 
@@ -422,6 +434,7 @@ def start_identify_annots_query(
     callback_url=None,
     callback_method=None,
     lane='slow',
+    priority=0,
 ):
     r"""
     REST:
@@ -627,7 +640,12 @@ def start_identify_annots_query(
     )
     args = (qaid_list, daid_list, user_feedback, query_config_dict, echo_query_params)
     jobid = ibs.job_manager.jobiface.queue_job(
-        'query_chips_graph', callback_url, callback_method, lane, *args
+        'query_chips_graph',
+        callback_url,
+        callback_method,
+        lane,
+        *args,
+        priority=priority,
     )
     return jobid
 
@@ -635,7 +653,13 @@ def start_identify_annots_query(
 @register_ibs_method
 @register_api('/api/engine/wic/cnn/', methods=['POST'])
 def start_wic_image(
-    ibs, image_uuid_list, callback_url=None, callback_method=None, lane='fast', **kwargs
+    ibs,
+    image_uuid_list,
+    callback_url=None,
+    callback_method=None,
+    lane='fast',
+    priority=0,
+    **kwargs
 ):
     """
     REST:
@@ -659,7 +683,12 @@ def start_wic_image(
         kwargs,
     )
     jobid = ibs.job_manager.jobiface.queue_job(
-        'wic_cnn_json', callback_url, callback_method, lane, *args
+        'wic_cnn_json',
+        callback_url,
+        callback_method,
+        lane,
+        *args,
+        priority=priority,
     )
 
     # if callback_url is not None:
@@ -672,7 +701,13 @@ def start_wic_image(
 @register_ibs_method
 @register_api('/api/engine/detect/cnn/yolo/', methods=['POST'])
 def start_detect_image_yolo(
-    ibs, image_uuid_list, callback_url=None, callback_method=None, lane='fast', **kwargs
+    ibs,
+    image_uuid_list,
+    callback_url=None,
+    callback_method=None,
+    lane='fast',
+    priority=0,
+    **kwargs
 ):
     """
     REST:
@@ -696,7 +731,12 @@ def start_detect_image_yolo(
         kwargs,
     )
     jobid = ibs.job_manager.jobiface.queue_job(
-        'detect_cnn_yolo_json', callback_url, callback_method, lane, *args
+        'detect_cnn_yolo_json',
+        callback_url,
+        callback_method,
+        lane,
+        *args,
+        priority=priority,
     )
 
     # if callback_url is not None:
@@ -709,7 +749,13 @@ def start_detect_image_yolo(
 @register_ibs_method
 @register_api('/api/engine/labeler/cnn/', methods=['POST'])
 def start_labeler_cnn(
-    ibs, annot_uuid_list, callback_url=None, callback_method=None, lane='fast', **kwargs
+    ibs,
+    annot_uuid_list,
+    callback_url=None,
+    callback_method=None,
+    lane='fast',
+    priority=0,
+    **kwargs
 ):
     # Check UUIDs
     ibs.web_check_uuids(qannot_uuid_list=annot_uuid_list)
@@ -725,7 +771,12 @@ def start_labeler_cnn(
         kwargs,
     )
     jobid = ibs.job_manager.jobiface.queue_job(
-        'labeler_cnn', callback_url, callback_method, lane, *args
+        'labeler_cnn',
+        callback_url,
+        callback_method,
+        lane,
+        *args,
+        priority=priority,
     )
 
     # if callback_url is not None:
@@ -738,7 +789,13 @@ def start_labeler_cnn(
 @register_ibs_method
 @register_api('/api/engine/review/query/chip/best/', methods=['POST'])
 def start_review_query_chips_best(
-    ibs, annot_uuid, callback_url=None, callback_method=None, lane='slow', **kwargs
+    ibs,
+    annot_uuid,
+    callback_url=None,
+    callback_method=None,
+    lane='slow',
+    priority=0,
+    **kwargs
 ):
     annot_uuid_list = [annot_uuid]
 
@@ -753,7 +810,12 @@ def start_review_query_chips_best(
     aid = aid_list[0]
     args = (aid,)
     jobid = ibs.job_manager.jobiface.queue_job(
-        'review_query_chips_best', callback_url, callback_method, lane, *args
+        'review_query_chips_best',
+        callback_url,
+        callback_method,
+        lane,
+        *args,
+        priority=priority,
     )
 
     # if callback_url is not None:
@@ -779,7 +841,13 @@ def start_detect_image_test_yolo(ibs):
 @register_ibs_method
 @register_api('/api/engine/detect/cnn/lightnet/', methods=['POST', 'GET'])
 def start_detect_image_lightnet(
-    ibs, image_uuid_list, callback_url=None, callback_method=None, lane='fast', **kwargs
+    ibs,
+    image_uuid_list,
+    callback_url=None,
+    callback_method=None,
+    lane='fast',
+    priority=0,
+    **kwargs
 ):
     """
     REST:
@@ -803,7 +871,12 @@ def start_detect_image_lightnet(
         kwargs,
     )
     jobid = ibs.job_manager.jobiface.queue_job(
-        'detect_cnn_lightnet_json', callback_url, callback_method, lane, *args
+        'detect_cnn_lightnet_json',
+        callback_url,
+        callback_method,
+        lane,
+        *args,
+        priority=priority,
     )
 
     # if callback_url is not None:
@@ -829,7 +902,13 @@ def start_detect_image_test_lightnet(ibs):
 @register_ibs_method
 @register_api('/api/engine/classify/whaleshark/injury/', methods=['POST'])
 def start_predict_ws_injury_interim_svm(
-    ibs, annot_uuid_list, callback_url=None, callback_method=None, lane='fast', **kwargs
+    ibs,
+    annot_uuid_list,
+    callback_url=None,
+    callback_method=None,
+    lane='fast',
+    priority=0,
+    **kwargs
 ):
     """
     REST:
@@ -870,7 +949,12 @@ def start_predict_ws_injury_interim_svm(
     annots = ibs.annots(uuids=annot_uuid_list)
     args = (annots.aids,)
     jobid = ibs.job_manager.jobiface.queue_job(
-        'predict_ws_injury_interim_svm', callback_url, callback_method, lane, *args
+        'predict_ws_injury_interim_svm',
+        callback_url,
+        callback_method,
+        lane,
+        *args,
+        priority=priority,
     )
 
     # if callback_url is not None:
@@ -16,6 +16,7 @@ import utool as ut
 from wbia.web import appfuncs as appf
 from wbia import constants as const
 import traceback
+import time
 import requests
 import six
 from datetime import datetime
@@ -780,6 +781,19 @@ def log_render_status(ibs, *args):
         logger.info('WRITE RENDER.LOG FAILED')
 
 
+def clean_query_config_dict(query_config_dict):
+    curvrank_daily_tag = query_config_dict.get('curvrank_daily_tag', None)
+    if curvrank_daily_tag is not None:
+        if len(curvrank_daily_tag) > 144:
+            curvrank_daily_tag_ = ut.hashstr27(curvrank_daily_tag)
+            curvrank_daily_tag_ = 'wbia-shortened-%s' % (curvrank_daily_tag_,)
+            logger.info('[WARNING] curvrank_daily_tag too long (Probably an old job)')
+            logger.info('[WARNING] Original: %r' % (curvrank_daily_tag,))
+            logger.info('[WARNING] Shortened: %r' % (curvrank_daily_tag_,))
+            query_config_dict['curvrank_daily_tag'] = curvrank_daily_tag_
+    return query_config_dict
+
+
 @register_ibs_method
 @register_api('/api/query/graph/', methods=['GET', 'POST'])
 def query_chips_graph(
@@ -811,15 +825,10 @@ def query_chips_graph(
     proot = query_config_dict.get('proot', proot)
     logger.info('query_config_dict = %r' % (query_config_dict,))
 
-    curvrank_daily_tag = query_config_dict.get('curvrank_daily_tag', None)
-    if curvrank_daily_tag is not None:
-        if len(curvrank_daily_tag) > 144:
-            curvrank_daily_tag_ = ut.hashstr27(curvrank_daily_tag)
-            curvrank_daily_tag_ = 'wbia-shortened-%s' % (curvrank_daily_tag_,)
-            logger.info('[WARNING] curvrank_daily_tag too long (Probably an old job)')
-            logger.info('[WARNING] Original: %r' % (curvrank_daily_tag,))
-            logger.info('[WARNING] Shortened: %r' % (curvrank_daily_tag_,))
-            query_config_dict['curvrank_daily_tag'] = curvrank_daily_tag_
+    query_config_dict = clean_query_config_dict(query_config_dict)
+
+    # The job engine passes the (cm_list, qreq_) of a coalesced batch query
+    coalesced = kwargs.pop('__coalesced__', None)
 
     num_qaids = len(qaid_list)
     num_daids = len(daid_list)
@@ -847,12 +856,15 @@ def query_chips_graph(
             'There are 0 valid database aids, %d were provided' % (num_daids,)
         )
 
-    cm_list, qreq_ = ibs.query_chips(
-        qaid_list=qaid_list,
-        daid_list=daid_list,
-        cfgdict=query_config_dict,
-        return_request=True,
-    )
+    if coalesced is None:
+        cm_list, qreq_ = ibs.query_chips(
+            qaid_list=qaid_list,
+            daid_list=daid_list,
+            cfgdict=query_config_dict,
+            return_request=True,
+        )
+    else:
+        cm_list, qreq_ = coalesced
 
     annot_inference = OrigAnnotInference(qreq_, cm_list, user_feedback)
     inference_dict = annot_inference.make_annot_inference_dict()
@@ -1353,18 +1365,12 @@ def query_chips(
         assert qaid_list is None, 'do not specify qreq and qaids'
         assert daid_list is None, 'do not specify qreq and daids'
         was_scalar = False
-    cm_list = qreq_.execute()
-    assert isinstance(cm_list, list), 'Chip matches were not returned as a list'
-
-    # Convert to cm_list
-    if return_cm_simple_dict:
-        for cm in cm_list:
-            cm.qauuid = ibs.get_annot_uuids(cm.qaid)
-            cm.dauuid_list = ibs.get_annot_uuids(cm.daid_list)
-        keys = ['qaid', 'daid_list', 'score_list', 'qauuid', 'dauuid_list']
-        cm_list = [ut.dict_subset(cm.to_dict(), keys) for cm in cm_list]
-    elif return_cm_dict:
-        cm_list = [cm.to_dict() for cm in cm_list]
+    if return_cm_simple_dict or return_cm_dict:
+        # Convert the chip matches as they stream out of the pipeline
+        cm_list = _execute_query_dicts(ibs, qreq_, return_cm_simple_dict)
+    else:
+        cm_list = qreq_.execute()
+        assert isinstance(cm_list, list), 'Chip matches were not returned as a list'
 
     if was_scalar:
         # hack for scalar input
@@ -1377,6 +1383,42 @@ def query_chips(
         return cm_list
 
 
+def _execute_query_dicts(ibs, qreq_, simple):
+    """
+    Runs a query request and converts each chip match to a dict as soon as
+    its chunk finishes, so the chip matches of a large request are never
+    held together.  Inside the job engine the finished dicts are published
+    as partial results.
+    """
+    from wbia.web import job_engine
+
+    keys = ['qaid', 'daid_list', 'score_list', 'qauuid', 'dauuid_list']
+    num_total = len(qreq_.qaids)
+    qaid2_dict = {}
+    pending = []
+    last_report = time.time()
+    for cm in qreq_.execute_iter():
+        if simple:
+            cm.qauuid = ibs.get_annot_uuids(cm.qaid)
+            cm.dauuid_list = ibs.get_annot_uuids(cm.daid_list)
+            dict_ = ut.dict_subset(cm.to_dict(), keys)
+        else:
+            dict_ = cm.to_dict()
+        qaid2_dict[cm.qaid] = dict_
+        pending.append(dict_)
+        if time.time() - last_report >= job_engine.JOB_PROGRESS_SECONDS:
+            progress = {'num_completed': len(qaid2_dict), 'num_total': num_total}
+            job_engine.report_job_progress(progress, pending)
+            pending = []
+            last_report = time.time()
+    if pending:
+        # Publish the dicts finished since the last report
+        progress = {'num_completed': len(qaid2_dict), 'num_total': num_total}
+        job_engine.report_job_progress(progress, pending)
+    dict_list = [qaid2_dict.get(qaid, None) for qaid in qreq_.qaids]
+    return dict_list
+
+
 ##########################################################################################
 
 
@@ -61,12 +61,18 @@ import uuid  # NOQA
 import numpy as np
 import shelve
 import random
-from datetime import datetime, timedelta
+import heapq
+import itertools
+import collections
+import json
+import threading
+from datetime import datetime
 import pytz
 import flask
-from os.path import join, exists, abspath, splitext, basename
+from os.path import join, splitext, basename
 from functools import partial
 from wbia.control import controller_inject
+from wbia.web.job_store import JobStore, JOB_STORE_FNAME
 import multiprocessing
 
 
@@ -84,20 +90,46 @@ ctx = zmq.Context.instance()
 # FIXME: needs to use correct number of ports
 URL = 'tcp://127.0.0.1'
 NUM_ENGINES = 1 if ut.get_argflag('--serial-job-lanes') else 2
+# Lanes and their number of engines, e.g. --engine-lanes fast:2,slow:4,detect:1
+ENGINE_LANES = ut.get_argval(
+    '--engine-lanes', type_=str, default='fast:%d,slow:%d' % (NUM_ENGINES, NUM_ENGINES)
+)
+# Jobs with an unknown or missing lane are routed here
+DEFAULT_ENGINE_LANE = 'slow'
+# Queued jobs of these actions that share a query config and database annotations
+# are run together as one QueryRequest
+COALESCE_ACTIONS = ['query_chips_graph']
+COALESCE_MAX = ut.get_argval('--engine-coalesce-max', type_=int, default=16)
+# Seconds the first job of a coalescable group may wait for more jobs to join it
+COALESCE_WINDOW = ut.get_argval('--engine-coalesce-window', type_=float, default=0.0)
+# Warm engines keep several indexers and their database features resident between
+# jobs, e.g. --engine-warm-species zebra_plains giraffe_reticulated
+ENGINE_WARM_SPECIES = ut.get_argval('--engine-warm-species', type_=list, default=[])
+ENGINE_WARM = ut.get_argflag('--engine-warm') or len(ENGINE_WARM_SPECIES) > 0
+ENGINE_WARM_CACHE_SIZE = ut.get_argval('--engine-warm-cache-size', type_=int, default=4)
+# Memory budget (in MB) for the resident indexers and features of each engine
+ENGINE_WARM_BUDGET = ut.get_argval('--engine-warm-budget', type_=float, default=4096.0)
 # VERBOSE_JOBS = (
 #     ut.get_argflag('--bg') or ut.get_argflag('--fg') or ut.get_argflag('--verbose-jobs')
 # )
 VERBOSE_JOBS = False
 
 
-GLOBAL_SHELVE_LOCK = multiprocessing.Lock()
-
-
 TIMESTAMP_FMTSTR = '%Y-%m-%d %H:%M:%S %Z'
 TIMESTAMP_TIMEZONE = 'US/Pacific'
 
 
-JOB_STATUS_CACHE = {}
+# Jobs are not restarted after this many attempts
+JOB_MAX_ATTEMPTS = 20
+# Completed jobs are hidden from listings after this many days
+JOB_ARCHIVE_DAYS = 14
+# Minimum seconds between the progress reports of a streaming job
+JOB_PROGRESS_SECONDS = ut.get_argval(
+    '--engine-progress-seconds', type_=float, default=5.0
+)
+
+# Set by the engine loop while it runs a single job (see report_job_progress)
+_ENGINE_JOB = threading.local()
 
 
 def update_proctitle(procname, dbname=None):
@@ -115,32 +147,26 @@ def update_proctitle(procname, dbname=None):
         print('pip install setproctitle')
 
 
-def _get_engine_job_paths(ibs):
-    shelve_path = ibs.get_shelves_path()
-    ut.ensuredir(shelve_path)
-    record_filepath_list = list(ut.iglob(join(shelve_path, '*.pkl')))
-    return record_filepath_list
-
-
-def _get_engine_lock_paths(ibs):
+def get_job_store(ibs):
+    """
+    Returns the job record store for this database.  The store is shared by
+    every engine process that has an ibs handle.
+    """
     shelve_path = ibs.get_shelves_path()
     ut.ensuredir(shelve_path)
-    lock_filepath_list = list(ut.iglob(join(shelve_path, '*.lock')))
-    return lock_filepath_list
+    store_fpath = join(shelve_path, JOB_STORE_FNAME)
+    return JobStore(store_fpath)
 
 
 @register_ibs_method
 def retry_job(ibs, jobid):
-    shelve_path = ibs.get_shelves_path()
-    job_record_filename = '%s.pkl' % (jobid,)
-    job_record_filepath = join(shelve_path, job_record_filename)
-    assert exists(job_record_filepath)
-
-    job_record = ut.load_cPkl(job_record_filepath)
+    store = get_job_store(ibs)
+    engine_request = store.get_request(jobid)
+    assert engine_request is not None, 'unknown jobid=%r' % (jobid,)
 
-    job_action = job_record['request']['action']
-    job_args = job_record['request']['args']
-    job_kwargs = job_record['request']['kwargs']
+    job_action = engine_request['action']
+    job_args = engine_request['args']
+    job_kwargs = engine_request['kwargs']
 
     job_func = getattr(ibs, job_action, None)
     if job_func is not None:
@@ -191,12 +217,6 @@ def initialize_job_manager(ibs):
             dbdir=ibs.get_dbdir(), containerized=ibs.containerized
         )
 
-    # Delete any leftover locks from before
-    lock_filepath_list = _get_engine_lock_paths(ibs)
-    print('Deleting %d leftover engine locks' % (len(lock_filepath_list),))
-    for lock_filepath in lock_filepath_list:
-        ut.delete(lock_filepath)
-
     ibs.job_manager.jobiface = JobInterface(
         0, ibs.job_manager.reciever.port_dict, ibs=ibs
     )
@@ -271,6 +291,120 @@ def get_process_alive_status(ibs):
     return status_dict
 
 
+@register_ibs_method
+@register_api(
+    '/api/engine/lane/status/', methods=['GET', 'POST'], __api_plural_check__=False
+)
+def get_job_lane_status(ibs):
+    """
+    Web call that returns the queue depth, wait times, and engine counts of
+    each engine lane
+    """
+    status = ibs.job_manager.jobiface.get_lane_status()
+    return status['lanes']
+
+
+@register_ibs_method
+def get_engine_nnindex_cache_stats(ibs):
+    """
+    Returns the hit / miss / eviction counters and resident size of the
+    nearest neighbor indexer cache of the current process
+    """
+    from wbia.algo.hots import neighbor_index_cache
+
+    return neighbor_index_cache.get_nnindex_cache_stats()
+
+
+@register_ibs_method
+@register_api(
+    '/api/engine/nnindex/cache/status/',
+    methods=['GET', 'POST'],
+    __api_plural_check__=False,
+)
+def start_engine_nnindex_cache_stats(ibs, lane=DEFAULT_ENGINE_LANE, priority=0):
+    """
+    Web call that queues a job returning the indexer cache counters of the
+    engine that runs it.  Each engine has its own cache, so repeated calls may
+    report different engines of the lane.
+    """
+    jobid = ibs.job_manager.jobiface.queue_job(
+        'get_engine_nnindex_cache_stats',
+        None,
+        None,
+        lane,
+        priority=priority,
+    )
+    return jobid
+
+
+@register_ibs_method
+@register_api('/api/engine/depc/plan/', methods=['GET', 'POST'])
+def get_depc_plan(ibs, tablename, uuid_list, config=None, depc_name='annot'):
+    """
+    Web call that reports how many rows of each depcache table computing
+    ``tablename`` for the given image, annot or part uuids would take, and an
+    estimated time, without computing anything.  Clients can use it to reject
+    or schedule large backfills.
+
+    The estimate uses the compute times stored by the depcache, which include
+    the times recorded by the job engines.
+
+    Args:
+        tablename (str): depcache table, e.g. 'featweight'
+        uuid_list (list): uuids of the root objects
+        config (dict): table config (default = None)
+        depc_name (str): 'image', 'annot' or 'part' (default = 'annot')
+
+    Returns:
+        dict: see ``DependencyCache.plan``
+    """
+    root_rowid_getters = {
+        'image': ibs.get_image_gids_from_uuid,
+        'annot': ibs.get_annot_aids_from_uuid,
+        'part': ibs.get_part_rowids_from_uuid,
+    }
+    if depc_name not in root_rowid_getters:
+        raise ValueError('unknown depc_name=%r' % (depc_name,))
+    depc = getattr(ibs, 'depc_' + depc_name)
+    root_rowids = root_rowid_getters[depc_name](uuid_list)
+    missing_uuid_list = [
+        uuid_ for uuid_, rowid in zip(uuid_list, root_rowids) if rowid is None
+    ]
+    if len(missing_uuid_list) > 0:
+        if depc_name == 'image':
+            raise controller_inject.WebMissingUUIDException(
+                missing_image_uuid_list=missing_uuid_list
+            )
+        if depc_name == 'annot':
+            raise controller_inject.WebMissingUUIDException(
+                missing_annot_uuid_list=missing_uuid_list
+            )
+        raise ValueError('Missing part UUIDs %r' % (missing_uuid_list,))
+    return depc.plan(tablename, root_rowids, config=config)
+
+
+def warmup_engine(ibs, species_list):
+    """
+    Turns an engine into a warm query worker: the indexer memcache is grown to
+    hold several indexers and their database features, then filled for each
+    species in ``species_list``.
+    """
+    from wbia.algo.hots import neighbor_index_cache
+
+    neighbor_index_cache.NEIGHBOR_CACHE.configure(
+        max_size=ENGINE_WARM_CACHE_SIZE,
+        budget=ENGINE_WARM_BUDGET,
+        keep_features=True,
+    )
+    try:
+        neighbor_index_cache.warmup_nnindexer_cache(ibs, species_list)
+    except Exception as ex:
+        # A failed warmup only costs latency, the engine can still serve jobs
+        ut.printex(ex, 'engine warmup failed', iswarning=True)
+    stats = neighbor_index_cache.get_nnindex_cache_stats()
+    print('[engine] warm nnindex cache = %s' % (ut.repr2(stats),))
+
+
 @register_ibs_method
 @register_api(
     '/api/engine/job/status/', methods=['GET', 'POST'], __api_plural_check__=False
@@ -287,6 +421,9 @@ def get_job_status(ibs, jobid=None):
         publishing            - job is done on the engine, pushing results to collector
         completed | exception - job is complete or has an error
 
+    Jobs that stream their results also report a ``progress`` dict while
+    they are working (see report_job_progress).
+
     CommandLine:
         # Run Everything together
         python -m wbia.web.job_engine --exec-get_job_status
@@ -372,6 +509,20 @@ def get_job_result(ibs, jobid):
     return result
 
 
+@register_ibs_method
+@register_api('/api/engine/job/result/partial/', methods=['GET', 'POST'])
+def get_job_partial_result(ibs, jobid, offset=0):
+    """
+    Web call that returns the results a running job has published so far.
+
+    The reply contains the partial results published from chunk ``offset``
+    onwards and the ``offset`` to pass on the next call to only get newer
+    results.  Progress counters are returned by /api/engine/job/status/.
+    """
+    result = ibs.job_manager.jobiface.get_job_partial_result(jobid, offset=offset)
+    return result
+
+
 @register_ibs_method
 @register_api('/api/engine/job/result/wait/', methods=['GET', 'POST'])
 def wait_for_job_result(ibs, jobid, timeout=10, freq=0.1):
@@ -464,16 +615,242 @@ def spawn_background_process(func, *args, **kwargs):
     return proc_obj
 
 
+def parse_engine_lanes(lanes_str):
+    """
+    Parses a comma separated ``lane:num_engines`` spec.  Lanes given without a
+    count get NUM_ENGINES engines.
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.web.job_engine import *  # NOQA
+        >>> num_engines = parse_engine_lanes('fast:1, SLOW:3,detect')
+        >>> print(list(num_engines.items()))
+        [('fast', 1), ('slow', 3), ('detect', 2)]
+    """
+    num_engines = {}
+    for lane_str in lanes_str.split(','):
+        lane, _, num_str = lane_str.strip().partition(':')
+        lane = lane.strip().lower()
+        if len(lane) == 0:
+            continue
+        num = int(num_str) if num_str.strip() else NUM_ENGINES
+        assert num > 0, 'lane %r needs at least one engine' % (lane,)
+        num_engines[lane] = num
+    assert DEFAULT_ENGINE_LANE in num_engines, 'the %r lane is required' % (
+        DEFAULT_ENGINE_LANE,
+    )
+    return num_engines
+
+
+def get_coalesce_key(engine_request):
+    """
+    Returns a key shared by jobs that can run as one QueryRequest, or None.
+
+    Only the inputs that shape the query itself (action, database annotations
+    and query config) go into the key.  Per job inputs such as user feedback
+    only change how each job's results are presented.
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.web.job_engine import *  # NOQA
+        >>> req1 = {'action': 'query_chips_graph', 'args': [[1], [3, 2], None, {'K': 1}]}
+        >>> req2 = {'action': 'query_chips_graph', 'args': [[4], [2, 3], {}, {'K': 1}]}
+        >>> req3 = {'action': 'query_chips_graph', 'args': [[4], [2, 3], {}, {'K': 2}]}
+        >>> assert get_coalesce_key(req1) == get_coalesce_key(req2)
+        >>> assert get_coalesce_key(req1) != get_coalesce_key(req3)
+        >>> assert get_coalesce_key({'action': 'helloworld', 'args': []}) is None
+    """
+    action = engine_request.get('action', None)
+    if action not in COALESCE_ACTIONS:
+        return None
+    args = engine_request.get('args', [])
+    if len(args) < 4:
+        return None
+    try:
+        key_data = [action, sorted(args[1]), args[3]]
+        key = ut.hashstr27(json.dumps(key_data, sort_keys=True))
+    except (TypeError, ValueError):
+        key = None
+    return key
+
+
+class LaneScheduler(object):
+    """
+    Holds the queued jobs of one engine lane and hands them to idle engines.
+
+    Jobs with a higher priority always go first.  Jobs of equal priority are
+    ordered with start-time fair queuing over the submitting clients: each job
+    is tagged ``max(lane virtual time, client's previous tag) + 1``, so a client
+    that submits thousands of jobs only delays its own later jobs.
+
+    When a job with a coalesce key is dispatched, queued jobs with the same key
+    are sent along with it (up to ``coalesce_max`` jobs) as one batch.  With a
+    ``coalesce_window`` the first job of a group is held for up to that many
+    seconds so that more jobs can join it.
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.web.job_engine import *  # NOQA
+        >>> scheduler = LaneScheduler('slow')
+        >>> for index in range(3):
+        >>>     scheduler.push([], {'jobid': 'a%d' % (index,), 'client': 'a'})
+        >>> scheduler.push([], {'jobid': 'b0', 'client': 'b'})
+        >>> scheduler.push([], {'jobid': 'c0', 'client': 'c', 'priority': 5})
+        >>> jobid_list = [scheduler.pop()[0][1]['jobid'] for _ in range(5)]
+        >>> print(jobid_list)
+        ['c0', 'a0', 'b0', 'a1', 'a2']
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.web.job_engine import *  # NOQA
+        >>> scheduler = LaneScheduler('slow', coalesce_max=3)
+        >>> query_args = [[1], [2, 3], None, {}]
+        >>> for index in range(4):
+        >>>     request = {'jobid': 'q%d' % (index,), 'action': 'query_chips_graph'}
+        >>>     scheduler.push([], ut.dict_union(request, {'args': query_args}))
+        >>> scheduler.push([], {'jobid': 'other', 'action': 'helloworld'})
+        >>> batch_list = [scheduler.pop() for _ in range(3)]
+        >>> print([[req['jobid'] for _, req in batch] for batch in batch_list])
+        [['q0', 'q1', 'q2'], ['q3'], ['other']]
+    """
+
+    def __init__(self, lane, coalesce_window=0.0, coalesce_max=1):
+        self.lane = lane
+        self.coalesce_window = coalesce_window
+        self.coalesce_max = coalesce_max
+        self.heap = []
+        self.counter = itertools.count()
+        self.vtime = 0
+        self.client_tags = {}
+        self.client_depth = collections.Counter()
+        self.engines = set()
+        self.idle_engines = collections.deque()
+        self.hold_until = None
+        self.num_dispatched = 0
+        self.num_coalesced = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, idents, engine_request):
+        client = engine_request.get('client', None)
+        try:
+            priority = float(engine_request.get('priority', None) or 0)
+        except (TypeError, ValueError):
+            priority = 0.0
+        key = get_coalesce_key(engine_request) if self.coalesce_max > 1 else None
+        tag = max(self.vtime, self.client_tags.get(client, 0)) + 1
+        self.client_tags[client] = tag
+        self.client_depth[client] += 1
+        enqueued = time.time()
+        item = (-priority, tag, next(self.counter), enqueued, key, idents, engine_request)
+        heapq.heappush(self.heap, item)
+
+    def _group(self, item):
+        """ The queued items that would be dispatched together with item """
+        key = item[4]
+        if key is None:
+            return []
+        other_list = [other for other in self.heap if other[4] == key and other != item]
+        return sorted(other_list)[: self.coalesce_max - 1]
+
+    def _finish(self, item):
+        _, tag, _, enqueued, _, idents, engine_request = item
+        client = engine_request.get('client', None)
+        self.client_depth[client] -= 1
+        if self.client_depth[client] <= 0:
+            del self.client_depth[client]
+            del self.client_tags[client]
+
+        wait = time.time() - enqueued
+        self.num_dispatched += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        return idents, engine_request
+
+    def pop(self):
+        """ Removes the next job and any jobs coalesced with it """
+        item = heapq.heappop(self.heap)
+        self.vtime = item[1]
+        other_list = self._group(item)
+        if len(other_list) > 0:
+            counter_set = {other[2] for other in other_list}
+            self.heap = [other for other in self.heap if other[2] not in counter_set]
+            heapq.heapify(self.heap)
+            self.num_coalesced += len(other_list)
+        return [self._finish(item_) for item_ in [item] + other_list]
+
+    def _is_held(self, now):
+        item = self.heap[0]
+        if item[4] is None or self.coalesce_window <= 0:
+            return False
+        deadline = item[3] + self.coalesce_window
+        if now >= deadline or len(self._group(item)) + 1 >= self.coalesce_max:
+            return False
+        self.hold_until = deadline
+        return True
+
+    def add_idle_engine(self, engine_ident):
+        self.engines.add(engine_ident)
+        if engine_ident not in self.idle_engines:
+            self.idle_engines.append(engine_ident)
+
+    def dispatch(self, engine_send_socket):
+        """ Sends queued jobs to idle engines, returns the dispatched jobids """
+        jobid_list = []
+        self.hold_until = None
+        now = time.time()
+        while len(self.idle_engines) > 0 and len(self.heap) > 0:
+            if self._is_held(now):
+                break
+            engine_ident = self.idle_engines.popleft()
+            batch = self.pop()
+            idents = batch[0][0]
+            engine_request_list = ut.take_column(batch, 1)
+            if len(engine_request_list) == 1:
+                engine_request = engine_request_list[0]
+            else:
+                engine_request = {'batch': engine_request_list}
+            send_multipart_json(
+                engine_send_socket, [engine_ident] + idents, engine_request
+            )
+            jobid_list += ut.take_column(engine_request_list, 'jobid')
+        return jobid_list
+
+    def get_status(self):
+        now = time.time()
+        depth_by_priority = collections.Counter()
+        wait_oldest = 0.0
+        for item in self.heap:
+            depth_by_priority[-item[0]] += 1
+            wait_oldest = max(wait_oldest, now - item[3])
+        wait_mean = self.wait_total / self.num_dispatched if self.num_dispatched else 0.0
+        status = {
+            'num_engines': len(self.engines),
+            'num_idle': len(self.idle_engines),
+            'depth': len(self.heap),
+            'depth_by_priority': {
+                str(priority): num for priority, num in depth_by_priority.items()
+            },
+            'depth_by_client': {
+                str(client): num for client, num in self.client_depth.items()
+            },
+            'num_dispatched': self.num_dispatched,
+            'num_coalesced': self.num_coalesced,
+            'wait_oldest_sec': wait_oldest,
+            'wait_mean_sec': wait_mean,
+            'wait_max_sec': self.wait_max,
+        }
+        return status
+
+
 class JobBackend(object):
     def __init__(self, **kwargs):
-        # self.num_engines = 3
         self.engine_queue_proc = None
-        self.engine_lanes = ['fast', 'slow']
-
-        self.engine_lanes = [lane.lower() for lane in self.engine_lanes]
-        assert 'slow' in self.engine_lanes
-
-        self.num_engines = {lane: NUM_ENGINES for lane in self.engine_lanes}
+        self.num_engines = parse_engine_lanes(ENGINE_LANES)
+        self.engine_lanes = list(self.num_engines.keys())
         self.engine_procs = None
         self.collect_queue_proc = None
         self.collect_proc = None
@@ -628,198 +1005,137 @@ class JobBackend(object):
         return status_dict
 
 
-def get_shelve_lock_filepath(shelve_filepath):
-    shelve_lock_filepath = '%s.lock' % (shelve_filepath,)
-    return shelve_lock_filepath
+def _epoch_to_timestamp(epoch):
+    if epoch is None:
+        return None
+    timezone = pytz.timezone(TIMESTAMP_TIMEZONE)
+    timestamp = datetime.fromtimestamp(epoch, timezone).strftime(TIMESTAMP_FMTSTR)
+    return timestamp
 
 
-def touch_shelve_lock_file(shelve_filepath):
-    shelve_lock_filepath = get_shelve_lock_filepath(shelve_filepath)
-    assert not exists(shelve_lock_filepath)
-    ut.touch(shelve_lock_filepath, verbose=False)
-    assert exists(shelve_lock_filepath)
+def _timestamp_to_epoch(timestamp):
+    if timestamp is None:
+        return None
+    timezone = pytz.timezone(TIMESTAMP_TIMEZONE)
+    timestamp_date = timezone.localize(convert_to_date(timestamp))
+    return timestamp_date.timestamp()
 
 
-def delete_shelve_lock_file(shelve_filepath):
-    shelve_lock_filepath = get_shelve_lock_filepath(shelve_filepath)
-    assert exists(shelve_lock_filepath)
-    ut.delete(shelve_lock_filepath, verbose=False)
-    assert not exists(shelve_lock_filepath)
+def _format_elapsed(total_seconds):
+    hours = total_seconds // (60 * 60)
+    minutes = (total_seconds - hours * 60 * 60) // 60
+    seconds = total_seconds - hours * 60 * 60 - minutes * 60
+    args = (hours, minutes, seconds, total_seconds)
+    return '%d hours %d min. %s sec. (total: %d sec.)' % args
 
 
-def wait_for_shelve_lock_file(shelve_filepath, timeout=600):
-    shelve_lock_filepath = get_shelve_lock_filepath(shelve_filepath)
-    start_time = time.time()
-    while exists(shelve_lock_filepath):
-        current_time = time.time()
-        elapsed = current_time - start_time
-        if elapsed >= timeout:
-            return False
-        time.sleep(1)
-        if int(elapsed) % 5 == 0:
-            print('Waiting for %0.02f seconds for lock so far' % (elapsed,))
-    return True
+def get_job_times(job):
+    """
+    Builds the legacy metadata ``times`` dict from the timing columns of a job
+    store row
+    """
+    started = job['time_started']
+    received = job['time_received']
+    completed = job['time_completed']
+
+    runtime_sec, turnaround_sec = None, None
+    if None not in [started, completed]:
+        runtime_sec = int(completed - started)
+    if None not in [received, completed]:
+        turnaround_sec = int(completed - received)
+
+    times = {
+        'received': _epoch_to_timestamp(received),
+        'started': _epoch_to_timestamp(started),
+        'updated': _epoch_to_timestamp(job['time_updated']),
+        'completed': _epoch_to_timestamp(completed),
+        'runtime': None if runtime_sec is None else _format_elapsed(runtime_sec),
+        'turnaround': None if turnaround_sec is None else _format_elapsed(turnaround_sec),
+        'runtime_sec': runtime_sec,
+        'turnaround_sec': turnaround_sec,
+    }
+    return times
 
 
-def get_shelve_value(shelve_filepath, key):
-    wait_for_shelve_lock_file(shelve_filepath)
-    with GLOBAL_SHELVE_LOCK:
-        wait_for_shelve_lock_file(shelve_filepath)
-        touch_shelve_lock_file(shelve_filepath)
+def _get_legacy_shelve_value(shelve_filepath, key):
     value = None
     try:
         with shelve.open(shelve_filepath, 'r') as shelf:
             value = shelf.get(key)
     except Exception:
         pass
-    delete_shelve_lock_file(shelve_filepath)
     return value
 
 
-def set_shelve_value(shelve_filepath, key, value):
-    wait_for_shelve_lock_file(shelve_filepath)
-    with GLOBAL_SHELVE_LOCK:
-        wait_for_shelve_lock_file(shelve_filepath)
-        touch_shelve_lock_file(shelve_filepath)
-    flag = False
-    try:
-        with shelve.open(shelve_filepath) as shelf:
-            shelf[key] = value
-        flag = True
-    except Exception:
-        pass
-    delete_shelve_lock_file(shelve_filepath)
-    return flag
-
+def import_legacy_jobs(ibs, store):
+    """
+    Moves the records written by the old shelve based engine (a ``.pkl``
+    record plus ``.input.shelve`` / ``.output.shelve`` files per job) into the
+    job store, then moves their files to the shelves archive.
+    """
+    import tqdm
 
-def get_shelve_filepaths(ibs, jobid):
-    shelve_path = ibs.get_shelves_path()
-    shelve_input_filepath = abspath(join(shelve_path, '%s.input.shelve' % (jobid,)))
-    shelve_output_filepath = abspath(join(shelve_path, '%s.output.shelve' % (jobid,)))
-    return shelve_input_filepath, shelve_output_filepath
-
-
-def initialize_process_record(
-    record_filepath,
-    shelve_input_filepath,
-    shelve_output_filepath,
-    shelve_path,
-    shelve_archive_path,
-    jobiface_id,
-):
-    MAX_ATTEMPTS = 20
-    ARCHIVE_DAYS = 14
+    shelve_path = ibs.get_shelves_path().rstrip('/')
+    shelve_archive_path = '%s_ARCHIVE' % (shelve_path,)
 
-    timezone = pytz.timezone(TIMESTAMP_TIMEZONE)
-    now = datetime.now(timezone)
-    now = now.replace(microsecond=0)
-    now = now.replace(second=0)
-    now = now.replace(minute=0)
-    now = now.replace(hour=0)
-
-    archive_delta = timedelta(days=ARCHIVE_DAYS)
-    archive_date = now - archive_delta
-    archive_timestamp = archive_date.strftime(TIMESTAMP_FMTSTR)
-
-    jobid = splitext(basename(record_filepath))[0]
-    jobcounter = None
-
-    # Load the engine record
-    record = ut.load_cPkl(record_filepath, verbose=False)
-
-    # Load the record info
-    engine_request = record.get('request', None)
-    attempts = record.get('attempts', 0)
-    completed = record.get('completed', False)
-
-    # Check status
-    suppressed = attempts >= MAX_ATTEMPTS
-    corrupted = engine_request is None
-
-    # Load metadata
-    metadata = get_shelve_value(shelve_input_filepath, 'metadata')
-
-    if metadata is None:
-        print('Missing metadata...corrupted')
-        corrupted = True
-
-    archived = False
-    if not corrupted:
-        jobcounter = metadata.get('jobcounter', None)
-        times = metadata.get('times', {})
-
-        if jobcounter is None:
-            print('Missing jobcounter...corrupted')
-            corrupted = True
-
-        job_age = None
-        if not corrupted and completed:
-            completed_timestamp = times.get('completed', None)
-            if completed_timestamp is not None:
-                try:
-                    archive_elapsed = calculate_timedelta(
-                        completed_timestamp, archive_timestamp
-                    )
-                    job_age = archive_elapsed[-1]
-                    archived = job_age > 0
-                except Exception:
-                    args = (
-                        completed_timestamp,
-                        archive_timestamp,
-                    )
-                    print(
-                        '[job_engine] Could not determine archive status!\n\tCompleted: %r\n\tArchive: %r'
-                        % args
-                    )
+    record_filepath_list = list(ut.iglob(join(shelve_path, '*.pkl')))
+    if len(record_filepath_list) > 0:
+        print('Importing %d legacy engine jobs...' % (len(record_filepath_list),))
+        ut.ensuredir(shelve_archive_path)
 
-            if archived:
-                with ut.Indenter('[client %d] ' % (jobiface_id)):
-                    color = 'brightmagenta'
-                    print_ = partial(ut.colorprint, color=color)
-                    print_('ARCHIVING JOB (AGE: %d SECONDS)' % (job_age,))
-                    job_scr_filepath_list = list(
-                        ut.iglob(join(shelve_path, '%s*' % (jobid,)))
-                    )
-                    for job_scr_filepath in job_scr_filepath_list:
-                        job_dst_filepath = job_scr_filepath.replace(
-                            shelve_path, shelve_archive_path
-                        )
-                        ut.copy(
-                            job_scr_filepath, job_dst_filepath, overwrite=True
-                        )  # ut.copy allows for overwrite, ut.move does not
-                        ut.delete(job_scr_filepath)
-
-    if archived:
-        # We have archived the job, don't bother registering it
-        engine_request = None
-    else:
-        if completed or suppressed or corrupted:
-            # Register the job, pass the jobcounter and jobid only
-            engine_request = None
-        else:
-            # We have a pending job, restart with the original request
-            with ut.Indenter('[client %d] ' % (jobiface_id)):
-                color = 'brightblue' if attempts == 0 else 'brightred'
-                print_ = partial(ut.colorprint, color=color)
+    for record_filepath in tqdm.tqdm(record_filepath_list):
+        jobid = splitext(basename(record_filepath))[0]
+        try:
+            record = ut.load_cPkl(record_filepath, verbose=False)
+        except Exception:
+            record = {}
 
-                print_(
-                    'RESTARTING FAILED JOB FROM RESTART (ATTEMPT %d)' % (attempts + 1,)
-                )
-                print_(ut.repr3(record_filepath))
-                # print_(ut.repr3(record))
+        shelve_input_filepath = join(shelve_path, '%s.input.shelve' % (jobid,))
+        shelve_output_filepath = join(shelve_path, '%s.output.shelve' % (jobid,))
+        metadata = _get_legacy_shelve_value(shelve_input_filepath, 'metadata')
+        engine_result = _get_legacy_shelve_value(shelve_output_filepath, 'result')
 
-                times = metadata.get('times', {})
-                received = times['received']
+        engine_request = record.get('request', None)
+        completed = record.get('completed', False)
 
-                engine_request['restart_jobid'] = jobid
-                engine_request['restart_jobcounter'] = jobcounter
-                engine_request['restart_received'] = received
-                record['attempts'] = attempts + 1
+        values = {
+            'attempts': record.get('attempts', 0),
+            'completed': int(completed),
+        }
+        if engine_request is not None:
+            store.set_request(jobid, engine_request)
+        if metadata is not None:
+            times = metadata.get('times', None) or {}
+            for key in ['received', 'started', 'updated', 'completed']:
+                try:
+                    epoch = _timestamp_to_epoch(times.get(key, None))
+                except Exception:
+                    epoch = None
+                if epoch is not None:
+                    values['time_%s' % (key,)] = epoch
+            store.set_metadata(jobid, metadata)
+        if engine_result is not None:
+            store.set_result(jobid, engine_result)
+
+        if completed:
+            if None in [metadata, engine_result]:
+                values['status'] = 'corrupted'
+            else:
+                values['status'] = engine_result['exec_status']
+        elif None in [engine_request, metadata]:
+            values['status'] = 'corrupted'
+        store.update(jobid, **values)
 
-                ut.save_cPkl(record_filepath, record, verbose=False)
+        job_src_filepath_list = list(ut.iglob(join(shelve_path, '%s*' % (jobid,))))
+        for job_src_filepath in job_src_filepath_list:
+            job_dst_filepath = job_src_filepath.replace(shelve_path, shelve_archive_path)
+            # ut.copy allows for overwrite, ut.move does not
+            ut.copy(job_src_filepath, job_dst_filepath, overwrite=True, verbose=False)
+            ut.delete(job_src_filepath, verbose=False)
 
-    values = jobcounter, jobid, engine_request, archived, completed, suppressed, corrupted
-    return values
+    # Lock files are no longer used, remove any that were left behind
+    for lock_filepath in ut.iglob(join(shelve_path, '*.lock')):
+        ut.delete(lock_filepath, verbose=False)
 
 
 class JobInterface(object):
@@ -828,6 +1144,7 @@ class JobInterface(object):
         jobiface.ibs = ibs
         jobiface.verbose = 2 if VERBOSE_JOBS else 1
         jobiface.port_dict = port_dict
+        jobiface.store = None if ibs is None else get_job_store(ibs)
         print('JobInterface ports:')
         ut.print_dict(jobiface.port_dict)
 
@@ -881,140 +1198,75 @@ class JobInterface(object):
     def queue_interrupted_jobs(jobiface):
         import tqdm
 
-        ibs = jobiface.ibs
+        store = jobiface.store
+        if store is None:
+            return
 
-        if ibs is not None:
-            shelve_path = ibs.get_shelves_path()
-            shelve_path = shelve_path.rstrip('/')
-            shelve_archive_path = '%s_ARCHIVE' % (shelve_path,)
-            ut.ensuredir(shelve_archive_path)
+        import_legacy_jobs(jobiface.ibs, store)
 
-            record_filepath_list = _get_engine_job_paths(ibs)
+        archive_before = time.time() - JOB_ARCHIVE_DAYS * 24 * 60 * 60
+        num_archived = store.archive_completed(archive_before)
 
-            num_records = len(record_filepath_list)
-            print('Reloading %d engine jobs...' % (num_records,))
+        pending_job_list = store.get_pending_jobs()
+        print('Reloading %d interrupted engine jobs...' % (len(pending_job_list),))
 
-            shelve_input_filepath_list = []
-            shelve_output_filepath_list = []
-            for record_filepath in record_filepath_list:
-                jobid = splitext(basename(record_filepath))[0]
-                shelve_input_filepath, shelve_output_filepath = get_shelve_filepaths(
-                    ibs, jobid
-                )
-                shelve_input_filepath_list.append(shelve_input_filepath)
-                shelve_output_filepath_list.append(shelve_output_filepath)
-
-            arg_iter = list(
-                zip(
-                    record_filepath_list,
-                    shelve_input_filepath_list,
-                    shelve_output_filepath_list,
-                    [shelve_path] * num_records,
-                    [shelve_archive_path] * num_records,
-                    [jobiface.id_] * num_records,
-                )
-            )
-            if len(arg_iter) > 0:
-                values_list = ut.util_parallel.generate2(
-                    initialize_process_record, arg_iter
-                )
-                values_list = list(values_list)
+        restart_job_list = []
+        num_suppressed, num_corrupted = 0, 0
+        for job in pending_job_list:
+            jobid = job['jobid']
+            if job['request'] is None or job['jobcounter'] is None:
+                store.transition(jobid, 'corrupted', force=True)
+                num_corrupted += 1
+            elif job['attempts'] >= JOB_MAX_ATTEMPTS:
+                store.transition(jobid, 'suppressed', force=True)
+                num_suppressed += 1
             else:
-                values_list = []
-
-            print('Processed %d records' % (len(values_list),))
-
-            restart_jobcounter_list = []
-            restart_jobid_list = []
-            restart_request_list = []
-
-            global_jobcounter = 0
-            num_registered, num_restarted = 0, 0
-            num_completed, num_archived, num_suppressed, num_corrupted = 0, 0, 0, 0
-
-            for values in tqdm.tqdm(values_list):
-                (
-                    jobcounter,
-                    jobid,
-                    engine_request,
-                    archived,
-                    completed,
-                    suppressed,
-                    corrupted,
-                ) = values
-
-                if archived:
-                    assert engine_request is None
-                    num_archived += 1
-                    continue
-
-                if jobcounter is not None:
-                    global_jobcounter = max(global_jobcounter, jobcounter)
-
-                if engine_request is None:
-                    assert not archived
-                    if completed:
-                        status = 'completed'
-                        num_completed += 1
-                    elif suppressed:
-                        status = 'suppressed'
-                        num_suppressed += 1
-                    else:
-                        status = 'corrupted'
-                        num_corrupted += 1
-
-                    reply_notify = {
-                        'jobid': jobid,
-                        'status': status,
-                        'action': 'register',
-                    }
-                    print('Sending register: %r' % (reply_notify,))
-                    jobiface.collect_recieve_socket.send_json(reply_notify)
-                    reply = jobiface.collect_recieve_socket.recv_json()
-                    jobid_ = reply['jobid']
-                    assert jobid_ == jobid
-                else:
-                    num_restarted += 1
-                    restart_jobcounter_list.append(jobcounter)
-                    restart_jobid_list.append(jobid)
-                    restart_request_list.append(engine_request)
+                restart_job_list.append(job)
 
-                num_registered += 1
+        print('\t %d restarted jobs' % (len(restart_job_list),))
+        print('\t %d suppressed jobs' % (num_suppressed,))
+        print('\t %d corrupted jobs' % (num_corrupted,))
+        print('Archived %d jobs...' % (num_archived,))
 
-            assert num_restarted == len(restart_jobcounter_list)
+        # Update the jobcounter to be up to date
+        global_jobcounter = store.get_max_jobcounter()
+        update_notify = {
+            '__set_jobcounter__': global_jobcounter,
+        }
+        print('Updating completed job counter: %r' % (update_notify,))
+        jobiface.engine_recieve_socket.send_json(update_notify)
+        reply = jobiface.engine_recieve_socket.recv_json()
+        jobcounter_ = reply['jobcounter']
+        assert jobcounter_ == global_jobcounter
 
-            print('Registered %d jobs...' % (num_registered,))
-            print('\t %d completed jobs' % (num_completed,))
-            print('\t %d restarted jobs' % (num_restarted,))
-            print('\t %d suppressed jobs' % (num_suppressed,))
-            print('\t %d corrupted jobs' % (num_corrupted,))
-            print('Archived %d jobs...' % (num_archived,))
+        print('Re-sending %d engine jobs...' % (len(restart_job_list),))
 
-            # Update the jobcounter to be up to date
-            update_notify = {
-                '__set_jobcounter__': global_jobcounter,
-            }
-            print('Updating completed job counter: %r' % (update_notify,))
-            jobiface.engine_recieve_socket.send_json(update_notify)
-            reply = jobiface.engine_recieve_socket.recv_json()
-            jobcounter_ = reply['jobcounter']
-            assert jobcounter_ == global_jobcounter
+        # Pending jobs are sorted by jobcounter
+        for job in tqdm.tqdm(restart_job_list):
+            jobid = job['jobid']
+            jobcounter = job['jobcounter']
+            attempts = job['attempts']
 
-            print('Re-sending %d engine jobs...' % (len(restart_jobcounter_list),))
+            with ut.Indenter('[client %d] ' % (jobiface.id_)):
+                color = 'brightblue' if attempts == 0 else 'brightred'
+                print_ = partial(ut.colorprint, color=color)
+                print_(
+                    'RESTARTING FAILED JOB FROM RESTART (ATTEMPT %d)' % (attempts + 1,)
+                )
+                print_(ut.repr3(jobid))
 
-            index_list = np.argsort(restart_jobcounter_list)
-            zipped = list(
-                zip(restart_jobcounter_list, restart_jobid_list, restart_request_list)
-            )
-            zipped = ut.take(zipped, index_list)
+            engine_request = ut.from_json(job['request'])
+            engine_request['restart_jobid'] = jobid
+            engine_request['restart_jobcounter'] = jobcounter
+            engine_request['restart_received'] = _epoch_to_timestamp(job['time_received'])
+            store.increment_attempts(jobid)
 
-            for jobcounter, jobid, engine_request in tqdm.tqdm(zipped):
-                jobiface.engine_recieve_socket.send_json(engine_request)
-                reply = jobiface.engine_recieve_socket.recv_json()
-                jobcounter_ = reply['jobcounter']
-                jobid_ = reply['jobid']
-                assert jobcounter_ == jobcounter
-                assert jobid_ == jobid
+            jobiface.engine_recieve_socket.send_json(engine_request)
+            reply = jobiface.engine_recieve_socket.recv_json()
+            jobcounter_ = reply['jobcounter']
+            jobid_ = reply['jobid']
+            assert jobcounter_ == jobcounter
+            assert jobid_ == jobid
 
     def queue_job(
         jobiface,
@@ -1023,6 +1275,7 @@ class JobInterface(object):
         callback_method=None,
         lane='slow',
         *args,
+        priority=0,
         **kwargs
     ):
         r"""
@@ -1030,6 +1283,10 @@ class JobInterface(object):
             This is just a function that lives in the main thread and ships off
             a job.
 
+        Jobs with a higher ``priority`` are started first within their lane.
+        Jobs of equal priority are shared fairly between the web clients that
+        submitted them.
+
         FIXME: I do not like having callback_url and callback_method specified
                like this with args and kwargs. If these must be there then
                they should be specified first, or
@@ -1045,6 +1302,7 @@ class JobInterface(object):
                 print('----')
 
             request = {}
+            client = None
             try:
                 if flask.request:
                     request = {
@@ -1052,6 +1310,7 @@ class JobInterface(object):
                         'function': flask.request.endpoint,
                         'input': flask.request.processed,
                     }
+                    client = flask.request.remote_addr
             except RuntimeError:
                 pass
 
@@ -1066,6 +1325,8 @@ class JobInterface(object):
                 'restart_jobcounter': None,
                 'restart_received': None,
                 'lane': lane,
+                'priority': priority,
+                'client': client,
             }
             if jobiface.verbose >= 2:
                 print('Queue job: %s' % (ut.repr2(engine_request, truncate=True),))
@@ -1076,19 +1337,9 @@ class JobInterface(object):
             print('reply_notify = %r' % (reply_notify,))
             jobid = reply_notify['jobid']
 
-            ibs = jobiface.ibs
-            if ibs is not None:
-                shelve_path = ibs.get_shelves_path()
-                ut.ensuredir(shelve_path)
-
-                record_filename = '%s.pkl' % (jobid,)
-                record_filepath = join(shelve_path, record_filename)
-                record = {
-                    'request': engine_request,
-                    'attempts': 0,
-                    'completed': False,
-                }
-                ut.save_cPkl(record_filepath, record, verbose=False)
+            if jobiface.store is not None:
+                # Keep the request so the job can be restarted after a crash
+                jobiface.store.set_request(jobid, engine_request)
 
             # Release memor
             action = None
@@ -1101,6 +1352,14 @@ class JobInterface(object):
 
             return jobid
 
+    def get_lane_status(jobiface):
+        with ut.Indenter('[client %d] ' % (jobiface.id_)):
+            pair_msg = {'__lane_status__': True}
+            # CALLS: engine_queue
+            jobiface.engine_recieve_socket.send_json(pair_msg)
+            reply = jobiface.engine_recieve_socket.recv_json()
+        return reply
+
     def get_job_id_list(jobiface):
         with ut.Indenter('[client %d] ' % (jobiface.id_)):
             if False:  # jobiface.verbose >= 1:
@@ -1156,6 +1415,17 @@ class JobInterface(object):
             reply = jobiface.collect_recieve_socket.recv_json()
         return reply
 
+    def get_job_partial_result(jobiface, jobid, offset=0):
+        with ut.Indenter('[client %d] ' % (jobiface.id_)):
+            if jobiface.verbose >= 1:
+                print('----')
+                print('Request partial result of jobid=%r' % (jobid,))
+            pair_msg = dict(action='job_partial_result', jobid=jobid, offset=offset)
+            # CALLER: collector_request_partial_result
+            jobiface.collect_recieve_socket.send_json(pair_msg)
+            reply = jobiface.collect_recieve_socket.recv_json()
+        return reply
+
     def get_unpacked_result(jobiface, jobid):
         reply = jobiface.get_job_result(jobid)
         json_result = reply['json_result']
@@ -1240,6 +1510,10 @@ def collect_queue_loop(port_dict):
 def engine_queue_loop(port_dict, engine_lanes):
     """
     Specialized queue loop
+
+    Jobs wait in a LaneScheduler per lane.  Engines announce themselves as
+    ready on their lane socket and are sent the next job by priority and
+    fair share across clients, so a backlog never sits in an engine's socket.
     """
     # Flow of information tags:
     # NAME: engine_queue
@@ -1268,12 +1542,12 @@ def engine_queue_loop(port_dict, engine_lanes):
         if VERBOSE_JOBS:
             print('bind %s_url2 = %r' % (name, interface_engine_pull))
 
-        # bind the server router to the queue dealer
+        # bind the lane routers, engines connect to these as dealers
         engine_send_socket_dict = {}
         for lane in interface_engine_push_dict:
-            engine_send_socket = ctx.socket(zmq.DEALER)  # CHECKED - DEALER
+            engine_send_socket = ctx.socket(zmq.ROUTER)  # CHECKED - ROUTER
             engine_send_socket.setsockopt_string(
-                zmq.IDENTITY, 'special_queue.' + lane + '.' + name + '.' + 'DEALER'
+                zmq.IDENTITY, 'special_queue.' + lane + '.' + name + '.' + 'ROUTER'
             )
             engine_send_socket.bind(interface_engine_push_dict[lane])
             if VERBOSE_JOBS:
@@ -1298,12 +1572,43 @@ def engine_queue_loop(port_dict, engine_lanes):
             engine_send_socket = engine_send_socket_dict[lane]
             poller.register(engine_send_socket, zmq.POLLIN)
 
+        scheduler_dict = {
+            lane: LaneScheduler(
+                lane, coalesce_window=COALESCE_WINDOW, coalesce_max=COALESCE_MAX
+            )
+            for lane in engine_lanes
+        }
+
         # always start at 0
         global_jobcounter = 0
 
         try:
             while True:
-                evts = dict(poller.poll())
+                # Wake up when a held coalescing window closes
+                hold_list = [
+                    scheduler.hold_until
+                    for scheduler in scheduler_dict.values()
+                    if scheduler.hold_until is not None
+                ]
+                if len(hold_list) > 0:
+                    timeout = max(0, int(1000 * (min(hold_list) - time.time())) + 1)
+                else:
+                    timeout = None
+                evts = dict(poller.poll(timeout))
+                for lane in engine_send_socket_dict:
+                    if scheduler_dict[lane].hold_until is not None:
+                        scheduler_dict[lane].dispatch(engine_send_socket_dict[lane])
+
+                    engine_send_socket = engine_send_socket_dict[lane]
+                    if engine_send_socket in evts:
+                        # CALLER: engine_ready
+                        idents, engine_notify = rcv_multipart_json(
+                            engine_send_socket, num=1, print=print
+                        )
+                        scheduler = scheduler_dict[lane]
+                        scheduler.add_idle_engine(idents[0])
+                        scheduler.dispatch(engine_send_socket)
+
                 if engine_receive_socket in evts:
                     # CALLER: job_client
                     idents, engine_request = rcv_multipart_json(
@@ -1324,6 +1629,17 @@ def engine_queue_loop(port_dict, engine_lanes):
                         send_multipart_json(engine_receive_socket, idents, reply_notify)
                         continue
 
+                    if engine_request.get('__lane_status__', False):
+                        reply_notify = {
+                            'lanes': {
+                                lane: scheduler_dict[lane].get_status()
+                                for lane in scheduler_dict
+                            },
+                        }
+                        # RETURNS: job_client_return
+                        send_multipart_json(engine_receive_socket, idents, reply_notify)
+                        continue
+
                     # jobid = 'jobid-%04d' % (jobcounter,)
                     jobid = '%s' % (uuid.uuid4(),)
                     jobcounter = global_jobcounter + 1
@@ -1338,15 +1654,16 @@ def engine_queue_loop(port_dict, engine_lanes):
                     restart_jobid = engine_request.get('restart_jobid', None)
                     restart_jobcounter = engine_request.get('restart_jobcounter', None)
                     restart_received = engine_request.get('restart_received', None)
-                    lane = engine_request.get('lane', 'slow')
+                    lane = engine_request.get('lane', DEFAULT_ENGINE_LANE)
+                    priority = engine_request.get('priority', 0)
 
                     if lane not in engine_lanes:
                         print(
                             'WARNING: did not recognize desired lane %r from %r'
                             % (lane, engine_lanes)
                         )
-                        print('WARNING: Defaulting to slow lane')
-                        lane = 'slow'
+                        print('WARNING: Defaulting to %s lane' % (DEFAULT_ENGINE_LANE,))
+                        lane = DEFAULT_ENGINE_LANE
 
                     engine_request['lane'] = lane
 
@@ -1418,6 +1735,7 @@ def engine_queue_loop(port_dict, engine_lanes):
                                 'turnaround_sec': None,
                             },
                             'lane': lane,
+                            'priority': priority,
                         },
                         'action': 'metadata',
                     }
@@ -1446,15 +1764,12 @@ def engine_queue_loop(port_dict, engine_lanes):
                     collect_recieve_socket.send_json(reply_notify)
 
                     ######################################################################
-                    # Status: Queueing on the Engine
+                    # Status: Queueing in the lane scheduler
                     assert 'jobid' not in engine_request
                     engine_request['jobid'] = jobid
 
-                    if VERBOSE_JOBS:
-                        print('... notifying backend engine to start')
-                    # CALL: engine_
-                    engine_send_socket = engine_send_socket_dict[lane]
-                    send_multipart_json(engine_send_socket, idents, engine_request)
+                    scheduler = scheduler_dict[lane]
+                    scheduler.push(idents, engine_request)
 
                     # Release
                     idents = None
@@ -1472,6 +1787,13 @@ def engine_queue_loop(port_dict, engine_lanes):
                         print('...notifying collector that job was queued')
                     # CALLS: collector_notify
                     collect_recieve_socket.send_json(queued_notify)
+
+                    ######################################################################
+                    # Hand the job to an idle engine, if there is one
+                    if VERBOSE_JOBS:
+                        print('... notifying backend engine to start')
+                    # CALL: engine_
+                    scheduler.dispatch(engine_send_socket_dict[lane])
         except KeyboardInterrupt:
             print('Caught ctrl+c in %s queue. Gracefully exiting' % (loop_name,))
 
@@ -1533,7 +1855,7 @@ def engine_loop(id_, port_dict, dbdir, containerized, lane):
 
         assert dbdir is not None
 
-        engine_send_sock = ctx.socket(zmq.ROUTER)  # CHECKED - ROUTER
+        engine_send_sock = ctx.socket(zmq.DEALER)  # CHECKED - DEALER
         engine_send_sock.setsockopt_string(
             zmq.IDENTITY,
             'engine.%s.%s' % (lane, id_),
@@ -1554,80 +1876,113 @@ def engine_loop(id_, port_dict, dbdir, containerized, lane):
         ibs = wbia.opendb(dbdir=dbdir, use_cache=False, web=False, daily_backup=False)
         update_proctitle('engine_loop.%s.%s' % (lane, id_), dbname=ibs.dbname)
 
+        if ENGINE_WARM:
+            warmup_engine(ibs, ENGINE_WARM_SPECIES)
+
         try:
             while True:
                 try:
+                    # Ask the lane scheduler for the next job
+                    # CALLS: engine_ready
+                    send_multipart_json(engine_send_sock, [], {'ready': True})
+
                     idents, engine_request = rcv_multipart_json(
-                        engine_send_sock, print=print
+                        engine_send_sock, num=1, print=print
                     )
 
-                    action = engine_request['action']
-                    jobid = engine_request['jobid']
-                    args = engine_request['args']
-                    kwargs = engine_request['kwargs']
-                    callback_url = engine_request['callback_url']
-                    callback_method = engine_request['callback_method']
-                    lane_ = engine_request['lane']
+                    # Coalesced query jobs arrive together as one batch
+                    engine_request_list = engine_request.get('batch', [engine_request])
 
-                    if VERBOSE_JOBS:
-                        print('\tjobid = %r' % (jobid,))
-                        print('\taction = %r' % (action,))
-                        print('\targs = %r' % (args,))
-                        print('\tkwargs = %r' % (kwargs,))
-                        print('\tlane = %r' % (lane,))
-                        print('\tlane_ = %r' % (lane_,))
-
-                    # Notify start working
-                    reply_notify = {
-                        # 'idents': idents,
-                        'jobid': jobid,
-                        'status': 'working',
-                        'action': 'notification',
-                    }
-                    collect_recieve_socket.send_json(reply_notify)
+                    for engine_request in engine_request_list:
+                        jobid = engine_request['jobid']
 
-                    engine_result = on_engine_request(ibs, jobid, action, args, kwargs)
-                    exec_status = engine_result['exec_status']
+                        if VERBOSE_JOBS:
+                            print('\tjobid = %r' % (jobid,))
+                            print('\taction = %r' % (engine_request['action'],))
+                            print('\targs = %r' % (engine_request['args'],))
+                            print('\tkwargs = %r' % (engine_request['kwargs'],))
+                            print('\tlane = %r' % (lane,))
+                            print('\tlane_ = %r' % (engine_request['lane'],))
 
-                    # Notify start working
-                    reply_notify = {
-                        # 'idents': idents,
-                        'jobid': jobid,
-                        'status': 'publishing',
-                        'action': 'notification',
-                    }
-                    collect_recieve_socket.send_json(reply_notify)
+                        # Notify start working
+                        reply_notify = {
+                            # 'idents': idents,
+                            'jobid': jobid,
+                            'status': 'working',
+                            'action': 'notification',
+                        }
+                        collect_recieve_socket.send_json(reply_notify)
 
-                    # Store results in the collector
-                    collect_request = {
-                        # 'idents': idents,
-                        'action': 'store',
-                        'jobid': jobid,
-                        'engine_result': engine_result,
-                        'callback_url': callback_url,
-                        'callback_method': callback_method,
-                    }
-                    # if VERBOSE_JOBS:
-                    print(
-                        '...done working. pushing result to collector for jobid %s'
-                        % (jobid,)
-                    )
+                    if len(engine_request_list) > 1:
+                        engine_result_list = on_engine_request_batch(
+                            ibs, engine_request_list
+                        )
+                    else:
+                        _ENGINE_JOB.sender = partial(
+                            _send_job_progress,
+                            collect_recieve_socket,
+                            engine_request['jobid'],
+                        )
+                        try:
+                            engine_result_list = [
+                                on_engine_request(
+                                    ibs,
+                                    engine_request['jobid'],
+                                    engine_request['action'],
+                                    engine_request['args'],
+                                    engine_request['kwargs'],
+                                )
+                            ]
+                        finally:
+                            _ENGINE_JOB.sender = None
+
+                    for engine_request, engine_result in zip(
+                        engine_request_list, engine_result_list
+                    ):
+                        jobid = engine_request['jobid']
+                        exec_status = engine_result['exec_status']
+
+                        # Notify start working
+                        reply_notify = {
+                            # 'idents': idents,
+                            'jobid': jobid,
+                            'status': 'publishing',
+                            'action': 'notification',
+                        }
+                        collect_recieve_socket.send_json(reply_notify)
+
+                        # Store results in the collector
+                        collect_request = {
+                            # 'idents': idents,
+                            'action': 'store',
+                            'jobid': jobid,
+                            'engine_result': engine_result,
+                            'callback_url': engine_request['callback_url'],
+                            'callback_method': engine_request['callback_method'],
+                        }
+                        # if VERBOSE_JOBS:
+                        print(
+                            '...done working. pushing result to collector for jobid %s'
+                            % (jobid,)
+                        )
 
-                    # CALLS: collector_store
-                    collect_recieve_socket.send_json(collect_request)
+                        # CALLS: collector_store
+                        collect_recieve_socket.send_json(collect_request)
 
-                    # Notify start working
-                    reply_notify = {
-                        # 'idents': idents,
-                        'jobid': jobid,
-                        'status': exec_status,
-                        'action': 'notification',
-                    }
-                    collect_recieve_socket.send_json(reply_notify)
+                        # Notify start working
+                        reply_notify = {
+                            # 'idents': idents,
+                            'jobid': jobid,
+                            'status': exec_status,
+                            'action': 'notification',
+                        }
+                        collect_recieve_socket.send_json(reply_notify)
 
                     # We no longer need the engine result, and can clear it's memory
                     engine_request = None
+                    engine_request_list = None
                     engine_result = None
+                    engine_result_list = None
                     collect_request = None
                 except KeyboardInterrupt:
                     raise
@@ -1670,6 +2025,88 @@ def engine_loop(id_, port_dict, dbdir, containerized, lane):
             print('Exiting engine loop')
 
 
+def _send_job_progress(collect_recieve_socket, jobid, progress, partial_result):
+    collect_request = {
+        'action': 'progress',
+        'jobid': jobid,
+        'progress': progress,
+        'partial_result': partial_result,
+    }
+    # CALLS: collector_progress
+    collect_recieve_socket.send_json(collect_request)
+
+
+def report_job_progress(progress, partial_result=None):
+    """
+    Reports the progress of the job that this engine is running.
+
+    Does nothing outside of an engine, or for coalesced batch jobs, so
+    actions can call it unconditionally.
+
+    Args:
+        progress (dict): JSON compatible counters, e.g. num_completed
+        partial_result (list): results finished since the last report,
+            returned by /api/engine/job/result/partial/
+
+    Returns:
+        bool: True if the report was sent
+    """
+    sender = getattr(_ENGINE_JOB, 'sender', None)
+    if sender is None:
+        return False
+    if partial_result is not None:
+        partial_result = ut.to_json(partial_result)
+    sender(progress, partial_result)
+    return True
+
+
+def on_engine_request_batch(ibs, engine_request_list):
+    """
+    Runs coalesced query jobs (see get_coalesce_key) as one QueryRequest over
+    the union of their query annotations.  Each job then gets its own ChipMatch
+    subset and a QueryRequest view restricted to its qaids.  If the shared
+    query fails every job is run on its own instead.
+    """
+    from wbia.web.apis_query import clean_query_config_dict
+
+    jobid_list = ut.take_column(engine_request_list, 'jobid')
+    print('Running %d coalesced jobs: %r' % (len(jobid_list), jobid_list))
+
+    try:
+        args = engine_request_list[0]['args']
+        valid_aid_set = set(ibs.get_valid_aids())
+        qaid_set = set(ut.flatten([req['args'][0] for req in engine_request_list]))
+        qaid_list = sorted(qaid_set & valid_aid_set)
+        daid_list = sorted(set(args[1]) & valid_aid_set)
+        query_config_dict = clean_query_config_dict(dict(args[3]))
+        cm_list, qreq_ = ibs.query_chips(
+            qaid_list=qaid_list,
+            daid_list=daid_list,
+            cfgdict=query_config_dict,
+            return_request=True,
+        )
+        qaid2_cm = {cm.qaid: cm for cm in cm_list}
+    except Exception as ex:
+        ut.printex(ex, 'Coalesced query failed, running jobs separately', iswarning=True)
+        qaid2_cm, qreq_ = None, None
+
+    engine_result_list = []
+    for engine_request in engine_request_list:
+        args = engine_request['args']
+        kwargs = dict(engine_request['kwargs'])
+        if qaid2_cm is not None:
+            qaid_list_ = sorted(set(args[0]) & set(qaid2_cm.keys()))
+            if len(qaid_list_) > 0:
+                cm_list_ = ut.take(qaid2_cm, qaid_list_)
+                qreq2_ = qreq_.shallowcopy(qaids=qaid_list_)
+                kwargs['__coalesced__'] = (cm_list_, qreq2_)
+        engine_result = on_engine_request(
+            ibs, engine_request['jobid'], engine_request['action'], args, kwargs
+        )
+        engine_result_list.append(engine_result)
+    return engine_result_list
+
+
 def on_engine_request(
     ibs, jobid, action, args, kwargs, attempts=3, retry_delay_min=1, retry_delay_max=60
 ):
@@ -1759,10 +2196,7 @@ def collector_loop(port_dict, dbdir, containerized):
         ibs = wbia.opendb(dbdir=dbdir, use_cache=False, web=False, daily_backup=False)
         update_proctitle('collector_loop', dbname=ibs.dbname)
 
-        shelve_path = ibs.get_shelves_path()
-        ut.ensuredir(shelve_path)
-
-        collector_data = {}
+        store = get_job_store(ibs)
 
         try:
             while True:
@@ -1779,8 +2213,7 @@ def collector_loop(port_dict, dbdir, containerized):
                     reply = on_collect_request(
                         ibs,
                         collect_request,
-                        collector_data,
-                        shelve_path,
+                        store,
                         containerized=containerized,
                     )
                 except Exception as ex:
@@ -1820,19 +2253,6 @@ def _timestamp():
     return timestamp
 
 
-def invalidate_global_cache(jobid):
-    global JOB_STATUS_CACHE
-    JOB_STATUS_CACHE.pop(jobid, None)
-
-
-def get_collector_shelve_filepaths(collector_data, jobid):
-    if jobid is None:
-        return None, None
-    shelve_input_filepath = collector_data.get(jobid, {}).get('input', None)
-    shelve_output_filepath = collector_data.get(jobid, {}).get('output', None)
-    return shelve_input_filepath, shelve_output_filepath
-
-
 def convert_to_date(timestamp):
     TIMESTAMP_FMTSTR_ = ' '.join(TIMESTAMP_FMTSTR.split(' ')[:-1])
     timestamp_ = ' '.join(timestamp.split(' ')[:-1])
@@ -1857,9 +2277,7 @@ def calculate_timedelta(start, end):
     return hours, minutes, seconds, total_seconds
 
 
-def on_collect_request(
-    ibs, collect_request, collector_data, shelve_path, containerized=False
-):
+def on_collect_request(ibs, collect_request, store, containerized=False):
     """ Run whenever the collector recieves a message """
     import requests
 
@@ -1872,21 +2290,6 @@ def on_collect_request(
         'jobid': jobid,
     }
 
-    # Ensure we have a collector record for the jobid
-    if jobid is not None:
-        if jobid not in collector_data:
-            collector_data[jobid] = {
-                'status': None,
-                'input': None,
-                'output': None,
-            }
-        runtime_lock_filepath = join(shelve_path, '%s.lock' % (jobid,))
-    else:
-        runtime_lock_filepath = None
-
-    args = get_collector_shelve_filepaths(collector_data, jobid)
-    collector_shelve_input_filepath, collector_shelve_output_filepath = args
-
     print(
         'on_collect_request action = %r, jobid = %r, status = %r'
         % (
@@ -1897,7 +2300,7 @@ def on_collect_request(
     )
 
     if action == 'notification':
-        assert None not in [jobid, runtime_lock_filepath]
+        assert jobid is not None
 
         # received
         # accepted
@@ -1909,123 +2312,34 @@ def on_collect_request(
         # suppressed
         # corrupted
 
-        current_status = collector_data[jobid].get('status', None)
-        print('Updating jobid = %r status %r -> %r' % (jobid, current_status, status))
-        collector_data[jobid]['status'] = status
-
-        print('Notify %s' % ut.repr3(collector_data[jobid]))
-        invalidate_global_cache(jobid)
-
-        if status == 'received':
-            ut.touch(runtime_lock_filepath)
-
-        if status == 'completed':
-            if exists(runtime_lock_filepath):
-                ut.delete(runtime_lock_filepath)
-
-            # Mark the engine request as finished
-            record_filename = '%s.pkl' % (jobid,)
-            record_filepath = join(shelve_path, record_filename)
-            record = ut.load_cPkl(record_filepath, verbose=False)
-            record['completed'] = True
-            ut.save_cPkl(record_filepath, record, verbose=False)
-            record = None
-
-        # Update relevant times in the shelf
-        if collector_shelve_input_filepath is None:
-            metadata = None
-        else:
-            metadata = get_shelve_value(collector_shelve_input_filepath, 'metadata')
-
-        if metadata is not None:
-            times = metadata.get('times', {})
-            times['updated'] = _timestamp()
-
-            if status == 'working':
-                times['started'] = _timestamp()
-
-            if status == 'completed':
-                times['completed'] = _timestamp()
-
-            # Calculate runtime
-            received = times.get('received', None)
-            started = times.get('started', None)
-            completed = times.get('completed', None)
-            runtime = times.get('runtime', None)
-            turnaround = times.get('turnaround', None)
+        values = {}
+        jobcounter = collect_request.get('jobcounter', None)
+        if jobcounter is not None:
+            values['jobcounter'] = jobcounter
 
-            if None not in [started, completed] and runtime is None:
-                hours, minutes, seconds, total_seconds = calculate_timedelta(
-                    started, completed
-                )
-                args = (
-                    hours,
-                    minutes,
-                    seconds,
-                    total_seconds,
-                )
-                times['runtime'] = '%d hours %d min. %s sec. (total: %d sec.)' % args
-                times['runtime_sec'] = total_seconds
-
-            if None not in [received, completed] and turnaround is None:
-                hours, minutes, seconds, total_seconds = calculate_timedelta(
-                    received, completed
-                )
-                args = (
-                    hours,
-                    minutes,
-                    seconds,
-                    total_seconds,
-                )
-                times['turnaround'] = '%d hours %d min. %s sec. (total: %d sec.)' % args
-                times['turnaround_sec'] = total_seconds
-
-            metadata['times'] = times
-            set_shelve_value(collector_shelve_input_filepath, 'metadata', metadata)
-
-            metadata = None  # Release memory
-
-    elif action == 'register':
-        assert None not in [jobid]
-
-        invalidate_global_cache(jobid)
-
-        shelve_input_filepath, shelve_output_filepath = get_shelve_filepaths(ibs, jobid)
-        metadata = get_shelve_value(shelve_input_filepath, 'metadata')
-        engine_result = get_shelve_value(shelve_output_filepath, 'result')
-
-        if status == 'completed':
-            # Ensure we can read the data we expect out of a completed job
-            if None in [metadata, engine_result]:
-                status = 'corrupted'
+        # Out of order notifications are rejected by the store
+        current_status = store.get_status(jobid)
+        print('Updating jobid = %r status %r -> %r' % (jobid, current_status, status))
+        store.transition(jobid, status, **values)
 
-        collector_data[jobid] = {
-            'status': status,
-            'input': shelve_input_filepath,
-            'output': shelve_output_filepath,
-        }
-        print('Register %s' % ut.repr3(collector_data[jobid]))
+    elif action == 'progress':
+        # From the Engine
+        progress = collect_request.get('progress', None)
+        partial_result = collect_request.get('partial_result', None)
+        store.set_progress(jobid, progress, partial_result)
 
-        metadata, engine_result = None, None  # Release memory
+        partial_result = None  # Release memory
 
     elif action == 'metadata':
-        invalidate_global_cache(jobid)
-
         # From the Engine
         metadata = collect_request.get('metadata', None)
+        store.set_metadata(jobid, metadata)
 
-        shelve_input_filepath, shelve_output_filepath = get_shelve_filepaths(ibs, jobid)
-        collector_data[jobid]['input'] = shelve_input_filepath
-
-        set_shelve_value(shelve_input_filepath, 'metadata', metadata)
-
-        print('Stored Metadata %s' % ut.repr3(collector_data[jobid]))
+        print('Stored Metadata for jobid = %r' % (jobid,))
 
         metadata = None  # Release memory
 
     elif action == 'store':
-        invalidate_global_cache(jobid)
-
         # From the Engine
         engine_result = collect_request.get('engine_result', None)
         callback_url = collect_request.get('callback_url', None)
@@ -2033,14 +2347,9 @@ def on_collect_request(
 
         # Get the engine result jobid
         jobid = engine_result.get('jobid', jobid)
-        assert jobid in collector_data
-
-        shelve_input_filepath, shelve_output_filepath = get_shelve_filepaths(ibs, jobid)
-        collector_data[jobid]['output'] = shelve_output_filepath
-
-        set_shelve_value(shelve_output_filepath, 'result', engine_result)
+        store.set_result(jobid, engine_result)
 
-        print('Stored Result %s' % ut.repr3(collector_data[jobid]))
+        print('Stored Result for jobid = %r' % (jobid,))
 
         engine_result = None  # Release memory
 
@@ -2092,105 +2401,78 @@ def on_collect_request(
                 print('Callback FAILED!')
 
     elif action == 'job_status':
-        reply['jobstatus'] = collector_data.get(jobid, {}).get('status', 'unknown')
+        reply['jobstatus'] = store.get_status(jobid) or 'unknown'
+        reply['progress'] = store.get_progress(jobid)
 
-    elif action == 'job_status_dict':
-        json_result = {}
+    elif action == 'job_partial_result':
+        offset = int(collect_request.get('offset', 0))
+        partial_result, offset = store.get_partial_results(jobid, offset=offset)
+        reply['json_result'] = partial_result
+        reply['offset'] = offset
+        reply['jobstatus'] = store.get_status(jobid) or 'unknown'
 
-        for jobid in collector_data:
+        partial_result = None  # Release memory
 
-            if jobid in JOB_STATUS_CACHE:
-                job_status_data = JOB_STATUS_CACHE.get(jobid, None)
-            else:
-                status = collector_data[jobid]['status']
+    elif action == 'job_status_dict':
+        json_result = {}
 
-                shelve_input_filepath, shelve_output_filepath = get_shelve_filepaths(
-                    ibs, jobid
-                )
-                metadata = get_shelve_value(shelve_input_filepath, 'metadata')
-
-                cache = True
-                if metadata is None:
-                    if status in ['corrupted']:
-                        status = 'corrupted'
-                    elif status in ['suppressed']:
-                        status = 'suppressed'
-                    elif status in ['completed']:
-                        status = 'corrupted'
-                    else:
-                        # status = 'pending'
-                        cache = False
-                    metadata = {
-                        'jobcounter': -1,
-                    }
+        for job in store.get_status_rows():
+            status = job['status']
+            if job['missing_metadata'] and status in ['completed']:
+                status = 'corrupted'
 
-                times = metadata.get('times', {})
-                request = metadata.get('request', {})
-
-                # Support legacy jobs
-                if request is None:
-                    request = {}
-
-                job_status_data = {
-                    'status': status,
-                    'jobcounter': metadata.get('jobcounter', None),
-                    'action': metadata.get('action', None),
-                    'endpoint': request.get('endpoint', None),
-                    'function': request.get('function', None),
-                    'time_received': times.get('received', None),
-                    'time_started': times.get('started', None),
-                    'time_runtime': times.get('runtime', None),
-                    'time_updated': times.get('updated', None),
-                    'time_completed': times.get('completed', None),
-                    'time_turnaround': times.get('turnaround', None),
-                    'time_runtime_sec': times.get('runtime_sec', None),
-                    'time_turnaround_sec': times.get('turnaround_sec', None),
-                    'lane': metadata.get('lane', None),
-                }
-                if cache:
-                    JOB_STATUS_CACHE[jobid] = job_status_data
-
-            json_result[jobid] = job_status_data
+            jobcounter = job['jobcounter']
+            times = get_job_times(job)
+
+            json_result[job['jobid']] = {
+                'status': status,
+                'jobcounter': -1 if jobcounter is None else jobcounter,
+                'action': job['action'],
+                'endpoint': job['endpoint'],
+                'function': job['function'],
+                'time_received': times['received'],
+                'time_started': times['started'],
+                'time_runtime': times['runtime'],
+                'time_updated': times['updated'],
+                'time_completed': times['completed'],
+                'time_turnaround': times['turnaround'],
+                'time_runtime_sec': times['runtime_sec'],
+                'time_turnaround_sec': times['turnaround_sec'],
+                'lane': job['lane'],
+            }
 
         reply['json_result'] = json_result
 
-        metadata = None  # Release memory
-
     elif action == 'job_id_list':
-        reply['jobid_list'] = sorted(list(collector_data.keys()))
+        reply['jobid_list'] = store.get_jobid_list()
 
     elif action == 'job_input':
-        if jobid not in collector_data:
+        job = store.get_job(jobid)
+        if job is None:
             reply['status'] = 'invalid'
             metadata = None
         else:
-            metadata = get_shelve_value(collector_shelve_input_filepath, 'metadata')
+            metadata = store.get_metadata(jobid)
             if metadata is None:
                 reply['status'] = 'corrupted'
+            else:
+                metadata['times'] = get_job_times(job)
 
         reply['json_result'] = metadata
 
         metadata = None  # Release memory
 
     elif action == 'job_result':
-        if jobid not in collector_data:
+        status = store.get_status(jobid)
+        if status is None:
             reply['status'] = 'invalid'
             result = None
         else:
-            status = collector_data[jobid]['status']
-
-            engine_result = get_shelve_value(collector_shelve_output_filepath, 'result')
+            engine_result = store.get_result(jobid)
 
             if engine_result is None:
-                if status in ['corrupted']:
-                    status = 'corrupted'
-                elif status in ['suppressed']:
-                    status = 'suppressed'
-                elif status in ['completed']:
+                if status in ['completed']:
                     status = 'corrupted'
-                else:
-                    # status = 'pending'
-                    pass
                 reply['status'] = status
                 result = None
             else:
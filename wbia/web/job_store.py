@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite backed record store for the zmq job engine.
+
+All job records live in a single WAL-mode database inside the engine shelves
+directory.  Each process (the web client and the collector) opens its own
+connection, so the collector can write status updates while the web process
+polls without any lock files.  Status changes go through
+:func:`JobStore.transition`, which checks and updates a job inside one
+``BEGIN IMMEDIATE`` transaction.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import contextlib
+import utool as ut
+
+(print, rrr, profile) = ut.inject2(__name__)
+logger = logging.getLogger('wbia')
+
+
+JOB_STORE_FNAME = 'jobs.sqlite3'
+
+JOB_STATUS_LIST = [
+    'received',
+    'accepted',
+    'queued',
+    'working',
+    'publishing',
+    'completed',
+    'exception',
+    'suppressed',
+    'corrupted',
+]
+
+# Maps a target status to the statuses a job is allowed to move from.  Engine
+# and queue notifications arrive on different sockets, so a late 'queued' must
+# not overwrite 'working'.  A restarted job re-enters as 'received' from any
+# state that is not 'completed'.
+JOB_STATUS_TRANSITIONS = {
+    'received': {None} | (set(JOB_STATUS_LIST) - {'completed'}),
+    'accepted': {'received'},
+    'queued': {'received', 'accepted'},
+    'working': {'received', 'accepted', 'queued'},
+    'publishing': {'working'},
+    'completed': {'working', 'publishing'},
+    'exception': {'working', 'publishing'},
+    'suppressed': set(JOB_STATUS_LIST) - {'completed'} | {None},
+    'corrupted': set(JOB_STATUS_LIST) | {None},
+}
+
+JOB_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    jobid          TEXT PRIMARY KEY,
+    jobcounter     INTEGER,
+    status         TEXT,
+    lane           TEXT,
+    action         TEXT,
+    endpoint       TEXT,
+    function       TEXT,
+    attempts       INTEGER NOT NULL DEFAULT 0,
+    completed      INTEGER NOT NULL DEFAULT 0,
+    archived       INTEGER NOT NULL DEFAULT 0,
+    time_received  REAL,
+    time_started   REAL,
+    time_updated   REAL,
+    time_completed REAL,
+    request        TEXT,
+    metadata       TEXT,
+    exec_status    TEXT,
+    result         TEXT,
+    progress       TEXT
+)
+"""
+
+# Chunks of results that running jobs publish before they complete
+JOB_PARTIAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_partials (
+    jobid          TEXT NOT NULL,
+    seq            INTEGER NOT NULL,
+    result         TEXT,
+    PRIMARY KEY (jobid, seq)
+)
+"""
+
+# Columns added after the first release of the jobs table
+JOB_ADDED_COLUMNS = [('progress', 'TEXT')]
+
+JOB_INDEX_SCHEMAS = [
+    'CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (archived, status)',
+    'CREATE INDEX IF NOT EXISTS jobs_lane_idx ON jobs (archived, lane, status)',
+    'CREATE INDEX IF NOT EXISTS jobs_counter_idx ON jobs (archived, jobcounter)',
+    'CREATE INDEX IF NOT EXISTS jobs_completed_idx ON jobs (completed, time_completed)',
+]
+
+# Small columns returned for status listings; never touches the blobs
+JOB_STATUS_COLUMNS = [
+    'jobid',
+    'jobcounter',
+    'status',
+    'lane',
+    'action',
+    'endpoint',
+    'function',
+    'attempts',
+    'time_received',
+    'time_started',
+    'time_updated',
+    'time_completed',
+]
+
+
+class JobStore(object):
+    """
+    Indexed job record store shared between the job engine processes.
+
+    Args:
+        fpath (str): path to the sqlite database file
+        timeout (float): seconds to wait on a locked database
+
+    Example:
+        >>> # ENABLE_DOCTEST
+        >>> from wbia.web.job_store import *  # NOQA
+        >>> dpath = ut.ensure_app_resource_dir('wbia', 'test_job_store')
+        >>> fpath = ut.unixjoin(dpath, JOB_STORE_FNAME)
+        >>> ut.delete(fpath, verbose=False)
+        >>> store = JobStore(fpath)
+        >>> assert store.transition('job1', 'received', jobcounter=1)
+        >>> store.set_request('job1', {'action': 'helloworld', 'lane': 'fast'})
+        >>> assert store.transition('job1', 'working')
+        >>> assert not store.transition('job1', 'queued')
+        >>> assert store.transition('job1', 'completed')
+        >>> store.set_result('job1', {'exec_status': 'completed', 'json_result': '1'})
+        >>> row = store.get_job('job1')
+        >>> print(ut.repr2(ut.dict_subset(row, ['status', 'lane', 'completed'])))
+        {'status': 'completed', 'lane': 'fast', 'completed': 1}
+        >>> assert store.get_jobid_list() == ['job1']
+        >>> assert store.get_result('job1')['json_result'] == '1'
+        >>> assert store.transition('job2', 'received')
+        >>> store.set_progress('job2', {'num_completed': 2}, ut.to_json([1, 2]))
+        >>> store.set_progress('job2', {'num_completed': 3}, ut.to_json([3]))
+        >>> print(store.get_progress('job2'))
+        {'num_completed': 3}
+        >>> print(store.get_partial_results('job2', offset=1))
+        ([3], 2)
+        >>> store.close()
+    """
+
+    def __init__(self, fpath, timeout=60.0):
+        self.fpath = fpath
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._transaction() as cur:
+            cur.execute(JOB_TABLE_SCHEMA)
+            cur.execute('PRAGMA table_info(jobs)')
+            colnames = {row[1] for row in cur.fetchall()}
+            for colname, coltype in JOB_ADDED_COLUMNS:
+                if colname not in colnames:
+                    cur.execute('ALTER TABLE jobs ADD COLUMN %s %s' % (colname, coltype))
+            cur.execute(JOB_PARTIAL_SCHEMA)
+            for index_schema in JOB_INDEX_SCHEMAS:
+                cur.execute(index_schema)
+
+    def __getstate__(self):
+        return {'fpath': self.fpath, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        """ One connection per thread and process """
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != pid:
+            conn = sqlite3.connect(self.fpath, timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        cur = self.connection.cursor()
+        cur.execute('BEGIN IMMEDIATE')
+        try:
+            yield cur
+        except Exception:
+            cur.execute('ROLLBACK')
+            raise
+        else:
+            cur.execute('COMMIT')
+        finally:
+            cur.close()
+
+    def _query(self, sql, params=()):
+        cur = self.connection.execute(sql, params)
+        try:
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+    def _update(self, cur, jobid, values):
+        cur.execute(
+            'INSERT OR IGNORE INTO jobs (jobid, time_received) VALUES (?, ?)',
+            (jobid, time.time()),
+        )
+        if values:
+            colnames = sorted(values.keys())
+            assignments = ', '.join(['%s = ?' % (colname,) for colname in colnames])
+            params = [values[colname] for colname in colnames] + [jobid]
+            cur.execute('UPDATE jobs SET %s WHERE jobid = ?' % (assignments,), params)
+
+    def update(self, jobid, **values):
+        """ Creates the job if needed and overwrites the given columns """
+        with self._transaction() as cur:
+            self._update(cur, jobid, values)
+
+    def transition(self, jobid, status, force=False, **values):
+        """
+        Atomically moves a job to a new status.
+
+        The move is rejected (returns False) if the job's current status is not
+        an allowed source for ``status`` in ``JOB_STATUS_TRANSITIONS``, unless
+        ``force`` is True.  Timing columns are maintained here so they stay
+        consistent with the status.
+        """
+        assert status in JOB_STATUS_TRANSITIONS, 'unknown job status %r' % (status,)
+        now = time.time()
+        with self._transaction() as cur:
+            cur.execute('SELECT status FROM jobs WHERE jobid = ?', (jobid,))
+            row = cur.fetchone()
+            current = None if row is None else row[0]
+            if not force and current not in JOB_STATUS_TRANSITIONS[status]:
+                logger.info(
+                    '[job_store] rejected jobid=%r status %r -> %r'
+                    % (jobid, current, status)
+                )
+                return False
+            values = dict(values)
+            values['status'] = status
+            values['time_updated'] = now
+            if status == 'received' and current is not None:
+                # A restarted job publishes its partial results again
+                values['progress'] = None
+                cur.execute('DELETE FROM job_partials WHERE jobid = ?', (jobid,))
+            if status == 'working':
+                values['time_started'] = now
+            elif status == 'completed':
+                values['time_completed'] = now
+                values['completed'] = 1
+            self._update(cur, jobid, values)
+        return True
+
+    def set_request(self, jobid, engine_request):
+        """ Stores the engine request so the job can be restarted """
+        self.update(
+            jobid,
+            request=ut.to_json(engine_request),
+            action=engine_request.get('action', None),
+            lane=engine_request.get('lane', None),
+        )
+
+    def set_metadata(self, jobid, metadata):
+        """
+        Stores job metadata.  The ``times`` entry is not stored because the
+        timing columns are authoritative.
+        """
+        metadata = dict(metadata)
+        metadata.pop('times', None)
+        request = metadata.get('request', None) or {}
+        self.update(
+            jobid,
+            metadata=ut.to_json(metadata),
+            jobcounter=metadata.get('jobcounter', None),
+            action=metadata.get('action', None),
+            lane=metadata.get('lane', None),
+            endpoint=request.get('endpoint', None),
+            function=request.get('function', None),
+        )
+
+    def set_result(self, jobid, engine_result):
+        self.update(
+            jobid,
+            exec_status=engine_result['exec_status'],
+            result=engine_result['json_result'],
+        )
+
+    def set_progress(self, jobid, progress, partial_result=None):
+        """
+        Stores the latest progress dict of a running job and appends a chunk
+        of partial results (already JSON encoded) if one is given.
+        """
+        with self._transaction() as cur:
+            self._update(cur, jobid, {'progress': ut.to_json(progress)})
+            if partial_result is not None:
+                cur.execute(
+                    'INSERT INTO job_partials (jobid, seq, result) '
+                    'SELECT ?, COALESCE(MAX(seq) + 1, 0), ? FROM job_partials '
+                    'WHERE jobid = ?',
+                    (jobid, partial_result, jobid),
+                )
+
+    def get_progress(self, jobid):
+        rows = self._query(
+            'SELECT progress FROM jobs WHERE jobid = ? AND archived = 0', (jobid,)
+        )
+        if not rows or rows[0][0] is None:
+            return None
+        return ut.from_json(rows[0][0])
+
+    def get_partial_results(self, jobid, offset=0):
+        """
+        Returns the partial results published from chunk ``offset`` onwards
+        and the offset to pass to get the chunks published after them.
+        """
+        rows = self._query(
+            'SELECT seq, result FROM job_partials WHERE jobid = ? AND seq >= ? '
+            'ORDER BY seq',
+            (jobid, offset),
+        )
+        partial_result = []
+        for row in rows:
+            partial_result.extend(ut.from_json(row['result']))
+        next_offset = rows[-1]['seq'] + 1 if rows else offset
+        return partial_result, next_offset
+
+    def get_job(self, jobid, colnames=None):
+        """ Returns a dict of job columns or None for unknown / archived jobs """
+        if colnames is None:
+            colnames = JOB_STATUS_COLUMNS + ['completed']
+        sql = 'SELECT %s FROM jobs WHERE jobid = ? AND archived = 0' % (
+            ', '.join(colnames),
+        )
+        rows = self._query(sql, (jobid,))
+        return dict(rows[0]) if rows else None
+
+    def get_status(self, jobid):
+        rows = self._query(
+            'SELECT status FROM jobs WHERE jobid = ? AND archived = 0', (jobid,)
+        )
+        return rows[0][0] if rows else None
+
+    def get_request(self, jobid):
+        rows = self._query('SELECT request FROM jobs WHERE jobid = ?', (jobid,))
+        if not rows or rows[0][0] is None:
+            return None
+        return ut.from_json(rows[0][0])
+
+    def get_metadata(self, jobid):
+        """ Returns the stored metadata dict (without times) or None """
+        rows = self._query(
+            'SELECT metadata FROM jobs WHERE jobid = ? AND archived = 0', (jobid,)
+        )
+        if not rows or rows[0][0] is None:
+            return None
+        return ut.from_json(rows[0][0])
+
+    def get_result(self, jobid):
+        """ Returns the stored engine result dict or None """
+        rows = self._query(
+            'SELECT exec_status, result FROM jobs WHERE jobid = ? AND archived = 0',
+            (jobid,),
+        )
+        if not rows or rows[0]['result'] is None:
+            return None
+        return {
+            'exec_status': rows[0]['exec_status'],
+            'json_result': rows[0]['result'],
+            'jobid': jobid,
+        }
+
+    def get_jobid_list(self):
+        rows = self._query('SELECT jobid FROM jobs WHERE archived = 0 ORDER BY jobid')
+        return [row[0] for row in rows]
+
+    def get_status_rows(self):
+        """ Status columns of every live job, plus whether metadata is missing """
+        sql = (
+            'SELECT %s, metadata IS NULL AS missing_metadata '
+            'FROM jobs WHERE archived = 0 ORDER BY jobcounter'
+        ) % (', '.join(JOB_STATUS_COLUMNS),)
+        return [dict(row) for row in self._query(sql)]
+
+    def get_pending_jobs(self):
+        """ Jobs that never completed and have not been given up on """
+        sql = (
+            'SELECT jobid, jobcounter, attempts, time_received, request FROM jobs '
+            'WHERE archived = 0 AND completed = 0 '
+            "AND (status IS NULL OR status NOT IN ('suppressed', 'corrupted')) "
+            'ORDER BY jobcounter'
+        )
+        return [dict(row) for row in self._query(sql)]
+
+    def get_max_jobcounter(self):
+        rows = self._query('SELECT MAX(jobcounter) FROM jobs')
+        return rows[0][0] or 0
+
+    def increment_attempts(self, jobid):
+        with self._transaction() as cur:
+            cur.execute(
+                'UPDATE jobs SET attempts = attempts + 1 WHERE jobid = ?', (jobid,)
+            )
+
+    def archive_completed(self, before):
+        """ Hides completed jobs that finished before the ``before`` epoch """
+        with self._transaction() as cur:
+            cur.execute(
+                'UPDATE jobs SET archived = 1 '
+                'WHERE completed = 1 AND archived = 0 AND time_completed < ?',
+                (before,),
+            )
+            num_archived = cur.rowcount
+            cur.execute(
+                'DELETE FROM job_partials WHERE jobid IN '
+                '(SELECT jobid FROM jobs WHERE archived = 1)'
+            )
+        return num_archived
@@ -98,6 +98,21 @@ PROMETHEUS_DATA = {
         'Number of web exceptions',
         ['name', 'tag'],
     ),
+    'depc_seconds': Gauge(
+        'wbia_depc_seconds',
+        'Number of seconds spent per depcache table and operation',
+        ['name', 'depc', 'table', 'stat'],
+    ),
+    'depc_rows': Gauge(
+        'wbia_depc_rows',
+        'Number of rows processed per depcache table and operation',
+        ['name', 'depc', 'table', 'stat'],
+    ),
+    'depc_calls': Gauge(
+        'wbia_depc_calls',
+        'Number of calls per depcache table and operation',
+        ['name', 'depc', 'table', 'stat'],
+    ),
 }
 
 
@@ -363,6 +378,32 @@ def prometheus_update(ibs, *args, **kwargs):
                 except Exception:
                     pass
 
+                try:
+                    for depc_name in ['image', 'annot', 'part']:
+                        depc = getattr(ibs, 'depc_' + depc_name)
+                        if depc is None:
+                            continue
+                        for tablename, table_stats in depc.get_stats().items():
+                            for stat, values in table_stats.items():
+                                num_calls, num_rows, seconds = values
+                                labels = {
+                                    'name': container_name,
+                                    'depc': depc_name,
+                                    'table': tablename,
+                                    'stat': stat,
+                                }
+                                PROMETHEUS_DATA['depc_calls'].labels(**labels).set(
+                                    num_calls
+                                )
+                                PROMETHEUS_DATA['depc_rows'].labels(**labels).set(
+                                    num_rows
+                                )
+                                PROMETHEUS_DATA['depc_seconds'].labels(**labels).set(
+                                    seconds
+                                )
+                except Exception:
+                    pass
+
                 try:
                     # logger.info(ut.repr3(status_dict))
                     process_status_dict = ibs.get_process_alive_status()